@@ -1,6 +1,7 @@
 # 鉴权拦截器 + 请求上下文：《接口设计说明书》请求头 Content-Type、Authorization、X-Request-ID
 from __future__ import annotations
 
+import hashlib
 import os
 import time
 import uuid
@@ -12,6 +13,9 @@ from fastapi import Header, HTTPException, Request
 # 请求级上下文
 request_id_ctx: ContextVar[str] = ContextVar("request_id", default="")
 tenant_id_ctx: ContextVar[str] = ContextVar("tenant_id", default="default")
+# 网关透传的截止时间（X-Request-Deadline，Unix 毫秒）；0 表示无
+DEADLINE_HEADER = "X-Request-Deadline"
+deadline_ctx: ContextVar[float] = ContextVar("deadline", default=0.0)
 
 
 def get_request_id() -> str:
@@ -22,6 +26,48 @@ def get_tenant_id() -> str:
     return tenant_id_ctx.get()
 
 
+def parse_deadline(value: Optional[str]) -> float:
+    """X-Request-Deadline -> Unix 秒；缺失或非法返回 0。"""
+    try:
+        ms = float((value or "").strip())
+    except ValueError:
+        return 0.0
+    return ms / 1000.0 if ms > 0 else 0.0
+
+
+def strong_etag(body: bytes) -> str:
+    """响应 body 的强 ETag（与网关 GET 缓存算法一致：128 位 BLAKE2b）。"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 弱比较：忽略 W/ 前缀，* 匹配任意。"""
+    if not if_none_match or not etag:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def remaining_time() -> Optional[float]:
+    """当前请求剩余秒数；无截止时间返回 None。下游调用超时应取 min(自身超时, 剩余时间)。"""
+    deadline = deadline_ctx.get()
+    return deadline - time.time() if deadline else None
+
+
+def deadline_exceeded() -> bool:
+    left = remaining_time()
+    return left is not None and left <= 0
+
+
+def check_deadline() -> None:
+    """长耗时处理（批量写入、逐条调用）可在步骤间调用：调用方已放弃时提前结束，返回 504。"""
+    if deadline_exceeded():
+        raise HTTPException(
+            status_code=504,
+            detail={"code": "DEADLINE_EXCEEDED", "message": "请求已超过截止时间", "details": "", "requestId": get_request_id()},
+        )
+
+
 def validate_token(authorization: Optional[str]) -> tuple[bool, str]:
     """通过 HTTP 调用平台认证（不依赖 platform_core）；未配置时接受 Bearer。"""
     if not authorization or not (authorization.strip().startswith("Bearer ") or authorization.strip().startswith("bearer ")):
@@ -34,7 +80,8 @@ def validate_token(authorization: Optional[str]) -> tuple[bool, str]:
     try:
         import urllib.request
         req = urllib.request.Request(f"{auth_url.rstrip('/')}/api/auth/me", method="GET", headers={"Authorization": authorization.strip()})
-        with urllib.request.urlopen(req, timeout=5) as r:
+        left = remaining_time()
+        with urllib.request.urlopen(req, timeout=5 if left is None else max(0.001, min(5, left))) as r:
             return (200 <= r.status < 300), "" if 200 <= r.status < 300 else "平台认证失败"
     except Exception as e:
         return False, str(e)
@@ -1,10 +1,13 @@
 # 示例路由：复制模板后替换为 orders、work_orders 等资源
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Request
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
 from api.schemas import ItemCreate, ItemUpdate, ListResponse
 from api.middleware import get_tenant_id, get_request_id, require_auth, require_request_id
+from models import parse_fields
 from service import ItemService
 
 router = APIRouter()
@@ -12,12 +15,18 @@ router = APIRouter()
 
 @router.get("", response_model=ListResponse)
 async def list_items(
+    response: Response,
     page: int = 1,
     pageSize: int = 20,
+    fields: Optional[str] = None,
     tenant_id: str = Depends(get_tenant_id),
     _auth=Depends(require_auth),
 ):
-    data, total = ItemService.list(tenant_id, page=page, page_size=pageSize)
+    selected = parse_fields(fields)
+    data, total = ItemService.list(tenant_id, page=page, page_size=pageSize, fields=selected)
+    if selected:
+        # 声明已在服务层投影，网关不再重复解析
+        response.headers["X-Fields-Applied"] = ",".join(selected)
     return ListResponse(data=data, total=total)
 
 
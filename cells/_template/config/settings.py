@@ -22,5 +22,8 @@ class Settings:
     # 多租户默认值
     DEFAULT_TENANT_ID: str = os.environ.get("DEFAULT_TENANT_ID", "default")
 
+    # 条件 GET：仅对不超过该大小（字节）且带 Content-Length 的响应计算 ETag
+    ETAG_MAX_BYTES: int = int(os.environ.get("CELL_ETAG_MAX_BYTES", str(1024 * 1024)))
+
 
 settings = Settings()
@@ -5,10 +5,20 @@ import time
 import uuid
 
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from config import settings
-from api.middleware import request_id_ctx, tenant_id_ctx, get_request_id
+from api.middleware import (
+    DEADLINE_HEADER,
+    deadline_ctx,
+    deadline_exceeded,
+    etag_matches,
+    get_request_id,
+    parse_deadline,
+    request_id_ctx,
+    strong_etag,
+    tenant_id_ctx,
+)
 from api.routes import router as items_router
 
 app = FastAPI(
@@ -17,18 +27,44 @@ app = FastAPI(
     version="1.0.0",
 )
 
-# 请求上下文与 X-Response-Time（3.1.3 响应头）
+# 请求上下文与 X-Response-Time（3.1.3 响应头）；网关透传的截止时间已过则直接 504，不再执行业务
 @app.middleware("http")
 async def add_request_id_and_timing(request: Request, call_next):
     rid = request.headers.get("X-Request-ID") or request.headers.get("X-Trace-Id") or str(uuid.uuid4()).replace("-", "")[:32]
     tid = (request.headers.get("X-Tenant-Id") or "").strip() or settings.DEFAULT_TENANT_ID
     request_id_ctx.set(rid)
     tenant_id_ctx.set(tid)
+    deadline_ctx.set(parse_deadline(request.headers.get(DEADLINE_HEADER)))
+    if deadline_exceeded():
+        return JSONResponse(
+            status_code=504,
+            content={"code": "DEADLINE_EXCEEDED", "message": "请求已超过截止时间", "details": "", "requestId": rid},
+        )
     start = time.perf_counter()
     response = await call_next(request)
     response.headers["X-Response-Time"] = str(int((time.perf_counter() - start) * 1000))
     return response
 
+
+# 条件 GET：200 响应附强 ETag，If-None-Match 命中返回 304（网关缓存回源重验证时不再传输 body）；
+# 流式响应（无 Content-Length，如导出）与超过 ETAG_MAX_BYTES 的响应原样透传，不整体读入内存
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    response = await call_next(request)
+    if request.method != "GET" or response.status_code != 200 or "etag" in response.headers:
+        return response
+    length = response.headers.get("content-length")
+    if not length or int(length) > settings.ETAG_MAX_BYTES:
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = strong_etag(body)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    headers["ETag"] = etag
+    return Response(body, status_code=200, headers=headers)
+
+
 # 示例资源路由（复制模板后改为 /orders、/work-orders 等）
 app.include_router(items_router, prefix="/items", tags=["items"])
 
@@ -1,4 +1,4 @@
 # 数据模型层：与业务实体对应，复制模板后替换为 ERP/MES 等实体
-from .base import BaseModel
+from .base import BaseModel, parse_fields, project
 
-__all__ = ["BaseModel"]
+__all__ = ["BaseModel", "parse_fields", "project"]
@@ -1,7 +1,10 @@
 # 模型基类与通用字段（可选：与 ORM 对接时在此扩展）
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+# 列表字段投影（fields=a,b,c）单次最多字段数，与网关一致
+MAX_FIELDS = 64
 
 
 class BaseModel:
@@ -13,3 +16,34 @@ class BaseModel:
 
     def to_dict(self) -> Dict[str, Any]:
         raise NotImplementedError("子类实现")
+
+
+def parse_fields(raw: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """解析查询参数 fields（逗号分隔），去重保序；未传或为空返回 None（返回全部字段）。"""
+    if not raw:
+        return None
+    seen: Dict[str, None] = {}
+    for name in raw.split(","):
+        name = name.strip()
+        if name and len(seen) < MAX_FIELDS:
+            seen[name] = None
+    return tuple(seen) or None
+
+
+def project(record: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """按字段投影单条记录；点号路径（customer.name）选取嵌套对象子字段，未知字段忽略。"""
+    if not fields:
+        return record
+    out: Dict[str, Any] = {}
+    for path in fields:
+        head, _, rest = path.partition(".")
+        if head not in record:
+            continue
+        value = record[head]
+        if not rest:
+            out[head] = value
+        elif isinstance(value, dict):
+            sub = project(value, [rest])
+            if sub:
+                out[head] = {**out.get(head, {}), **sub}
+    return out
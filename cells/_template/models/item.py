@@ -3,7 +3,9 @@ from __future__ import annotations
 
 import time
 import uuid
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Sequence
+
+from .base import project
 
 
 def _ts() -> str:
@@ -19,11 +21,13 @@ _store: Dict[str, Dict[str, Any]] = {}
 _idempotent: Dict[str, str] = {}
 
 
-def list_items(tenant_id: str, page: int = 1, page_size: int = 20) -> tuple[list, int]:
+def list_items(tenant_id: str, page: int = 1, page_size: int = 20,
+               fields: Optional[Sequence[str]] = None) -> tuple[list, int]:
+    """fields 非空时只取所列字段（接数据库时对应 SELECT 列）。"""
     out = [v for v in _store.values() if v.get("tenantId") == tenant_id]
     total = len(out)
     start = (page - 1) * page_size
-    return out[start : start + page_size], total
+    return [project(v, fields) for v in out[start : start + page_size]], total
 
 
 def get_item(tenant_id: str, item_id: str) -> Optional[Dict[str, Any]]:
@@ -1,7 +1,7 @@
 # 示例业务服务：复制模板后替换为订单服务、工单服务等
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 
 from models import item as item_model
 
@@ -10,8 +10,10 @@ class ItemService:
     """示例 CRUD 服务，对接 models 层。"""
 
     @staticmethod
-    def list(tenant_id: str, page: int = 1, page_size: int = 20) -> tuple[List[Dict], int]:
-        return item_model.list_items(tenant_id, page, page_size)
+    def list(tenant_id: str, page: int = 1, page_size: int = 20,
+             fields: Optional[Sequence[str]] = None) -> tuple[List[Dict], int]:
+        """fields 为列表字段投影（parse_fields 结果），None 返回全部字段。"""
+        return item_model.list_items(tenant_id, page, page_size, fields)
 
     @staticmethod
     def get(tenant_id: str, item_id: str) -> Optional[Dict[str, Any]]:
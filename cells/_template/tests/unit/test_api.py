@@ -1,6 +1,8 @@
 # 标准化接口与错误码测试（《接口设计说明书》）
 from __future__ import annotations
 
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -53,3 +55,38 @@ def test_post_requires_x_request_id(client):
     r = client.post("/items", json={"name": "x"}, headers=_headers())
     assert r.status_code == 400
     assert "X-Request-ID" in (r.json().get("message") or "")
+
+
+def test_expired_deadline_rejected(client):
+    expired = str(int((time.time() - 1) * 1000))
+    r = client.get("/items", headers={**_headers(), "X-Request-Deadline": expired})
+    assert r.status_code == 504
+    assert r.json().get("code") == "DEADLINE_EXCEEDED"
+    future = str(int((time.time() + 30) * 1000))
+    assert client.get("/items", headers={**_headers(), "X-Request-Deadline": future}).status_code == 200
+
+
+def test_list_fields_projection(client):
+    client.post("/items", json={"name": "投影"}, headers=_headers(tenant="tenant-fields", request_id="req-fields"))
+    r = client.get("/items?fields=itemId,name,unknown", headers=_headers(tenant="tenant-fields"))
+    assert r.status_code == 200
+    assert r.headers["X-Fields-Applied"] == "itemId,name,unknown"
+    assert r.json()["total"] == 1
+    assert set(r.json()["data"][0]) == {"itemId", "name"}
+    full = client.get("/items", headers=_headers(tenant="tenant-fields"))
+    assert "X-Fields-Applied" not in full.headers and "createdAt" in full.json()["data"][0]
+
+
+def test_conditional_get_skips_streaming_responses(client):
+    from fastapi.responses import StreamingResponse
+
+    @app.get("/_stream")
+    def _stream():
+        return StreamingResponse(iter([b"a" * 10, b"b" * 10]), media_type="text/csv")
+
+    r = client.get("/items", headers=_headers())
+    etag = r.headers["ETag"]
+    assert client.get("/items", headers={**_headers(), "If-None-Match": etag}).status_code == 304
+    s = client.get("/_stream", headers=_headers())
+    assert s.status_code == 200 and s.content == b"a" * 10 + b"b" * 10
+    assert "ETag" not in s.headers  # 流式响应不缓冲、不计算 ETag
@@ -24,6 +24,16 @@ def _human_audit(tenant_id: str, operation_desc: str, trace_id: str = "") -> Non
     import logging
     logging.getLogger("crm.audit").info(msg)
 
+
+def _publish_opportunity_change(event_type: str, tenant_id: str, trace_id: str, **data) -> None:
+    """商机变更事件（crm.opportunity.*）：网关据此失效预测/赢率缓存；发布失败不影响业务。"""
+    try:
+        from .event_publisher import publish
+        publish(event_type, {**data, "tenantId": tenant_id}, trace_id=trace_id)
+    except Exception:
+        pass
+
+
 app = Flask(__name__)
 app.config["JSON_AS_ASCII"] = False
 
@@ -235,6 +245,8 @@ def create_opportunity():
     )
     store.idempotent_set(req_id, o["opportunityId"])
     _human_audit(tenant_id, f"创建了商机 {title} (opportunityId={o['opportunityId']})，客户 {customer_id}", request.headers.get("X-Trace-Id") or req_id)
+    _publish_opportunity_change("crm.opportunity.created", tenant_id, req_id, opportunityId=o["opportunityId"],
+                                customerId=customer_id, amountCents=o.get("amountCents", 0), stage=o.get("stage"))
     return jsonify(o), 201
 
 
@@ -341,6 +353,9 @@ def convert_lead(lead_id: str):
     if not lead:
         return jsonify(_err("NOT_FOUND", "线索不存在或已转化", "", req_id)), 404
     store.idempotent_set(req_id, lead_id)
+    if opportunity_id:
+        _publish_opportunity_change("crm.opportunity.created", tenant_id, req_id, opportunityId=opportunity_id,
+                                    customerId=customer_id or "", leadId=lead_id)
     return (
         jsonify({"leadId": lead_id, "customerId": customer_id or "", "opportunityId": opportunity_id or ""}),
         200,
@@ -484,6 +499,7 @@ def add_opportunity_line(opportunity_id: str):
     if not line:
         return jsonify(_err("BAD_REQUEST", "商机或产品不存在", "", rid)), 400
     store.idempotent_set(rid, line["lineId"])
+    _publish_opportunity_change("crm.opportunity.updated", tid, rid, opportunityId=opportunity_id)
     return jsonify(line), 201
 
 
@@ -493,6 +509,7 @@ def remove_opportunity_line(opportunity_id: str, line_id: str):
     ok = store.opportunity_line_remove(_tenant(), opportunity_id, line_id)
     if not ok:
         return jsonify(_err("NOT_FOUND", "行项目不存在", "", _request_id())), 404
+    _publish_opportunity_change("crm.opportunity.updated", _tenant(), _request_id(), opportunityId=opportunity_id)
     return jsonify({"ok": True}), 200
 
 
@@ -16,6 +16,15 @@ def _user_id(request: Request) -> str:
     return (request.headers.get("X-User-Id") or "").strip() or "system"
 
 
+def _publish_change(event_type: str, tenant_id: str, trace_id: str, **data) -> None:
+    """商机变更事件（crm.opportunity.*）：网关据此失效预测/赢率缓存；发布失败不影响业务。"""
+    try:
+        from ..event_publisher import publish
+        publish(event_type, {**data, "tenantId": tenant_id}, trace_id=trace_id)
+    except Exception:
+        pass
+
+
 @router.get("", response_model=ListResponse)
 async def list_opportunities(
     customerId: Optional[str] = None,
@@ -89,6 +98,8 @@ async def import_opportunities_batch(
             created.append({"index": i, "opportunityId": o["opportunityId"], "title": title})
         except Exception as e:
             errors.append({"index": i, "reason": str(e), "title": title})
+    if created:
+        _publish_change("crm.opportunity.imported", tenant_id, get_request_id(), count=len(created))
     return {"accepted": True, "created": len(created), "errors": len(errors), "details": created, "errorsDetail": errors}
 
 
@@ -122,6 +133,8 @@ async def create_opportunity(
     o = db.opportunity_create(tenant_id, body.customerId, body.title.strip(), body.amountCents, body.currency, body.stage)
     db.idempotent_set(rid, "opportunity", o["opportunityId"])
     db.audit_append(tenant_id, _user_id(request), "opportunity.create", "opportunity", o["opportunityId"], rid)
+    _publish_change("crm.opportunity.created", tenant_id, rid, opportunityId=o["opportunityId"],
+                    customerId=o.get("customerId", ""), amountCents=o.get("amountCents", 0), stage=o.get("stage"))
     return o
 
 
@@ -140,6 +153,8 @@ async def update_opportunity(
     if not o:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "商机不存在", "details": "请检查商机编号或刷新列表后重试", "requestId": rid})
     db.audit_append(tenant_id, _user_id(request), "opportunity.update", "opportunity", opportunity_id, rid)
+    _publish_change("crm.opportunity.updated", tenant_id, rid, opportunityId=opportunity_id,
+                    amountCents=o.get("amountCents", 0), stage=o.get("stage"))
     return o
 
 
@@ -154,3 +169,4 @@ async def delete_opportunity(
     if not ok:
         raise HTTPException(status_code=404, detail={"code": "NOT_FOUND", "message": "商机不存在", "details": "该商机可能已被删除，请刷新列表", "requestId": get_request_id()})
     db.audit_append(tenant_id, _user_id(request), "opportunity.delete", "opportunity", opportunity_id, get_request_id())
+    _publish_change("crm.opportunity.deleted", tenant_id, get_request_id(), opportunityId=opportunity_id)
@@ -79,3 +79,18 @@ def test_customer_360(client):
     assert r2.status_code == 200
     assert r2.json["customer"]["name"] == "360客户"
     assert "contacts" in r2.json and "opportunities" in r2.json
+
+
+def test_opportunity_changes_publish_events(client, monkeypatch):
+    from src import event_publisher
+    published = []
+    monkeypatch.setattr(event_publisher, "publish", lambda t, d, trace_id="", event_id="": published.append((t, d)) or True)
+    r = client.post("/customers", json={"name": "事件客户"}, headers=_headers(tenant="t-evt", request_id="evt-c1"))
+    customer_id = r.json["customerId"]
+    r = client.post("/opportunities", json={"customerId": customer_id, "title": "商机A", "amountCents": 100},
+                    headers=_headers(tenant="t-evt", request_id="evt-o1"))
+    assert r.status_code == 201
+    # 网关按合约 invalidateOn: crm.opportunity.* 失效预测/赢率缓存（按租户）
+    assert published == [("crm.opportunity.created", {
+        "opportunityId": r.json["opportunityId"], "customerId": customer_id, "amountCents": 100,
+        "stage": r.json.get("stage"), "tenantId": "t-evt"})]
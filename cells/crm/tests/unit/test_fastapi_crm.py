@@ -116,6 +116,21 @@ def test_opportunities_crud(client):
     assert r3.json()["total"] >= 1
 
 
+def test_opportunity_changes_publish_events(client, monkeypatch):
+    from src import event_publisher
+    published = []
+    monkeypatch.setattr(event_publisher, "publish", lambda t, d, trace_id="", event_id="": published.append((t, d)) or True)
+    rc = client.post("/customers", json={"name": "事件客户"}, headers=_headers(tenant="t-evt", request_id="req-evt-c"))
+    r = client.post("/opportunities", json={"customerId": rc.json()["customerId"], "title": "商机E", "amountCents": 100},
+                    headers=_headers(tenant="t-evt", request_id="req-evt-o"))
+    oid = r.json()["opportunityId"]
+    client.patch(f"/opportunities/{oid}", json={"stage": 3}, headers=_headers(tenant="t-evt", request_id="req-evt-u"))
+    client.delete(f"/opportunities/{oid}", headers=_headers(tenant="t-evt"))
+    # 网关按合约 invalidateOn: crm.opportunity.* 失效预测/赢率缓存（按租户）
+    assert [t for t, _ in published] == ["crm.opportunity.created", "crm.opportunity.updated", "crm.opportunity.deleted"]
+    assert all(d["tenantId"] == "t-evt" and d["opportunityId"] == oid for _, d in published)
+
+
 def test_follow_ups_crud(client):
     r = client.post("/follow-ups", json={"content": "电话跟进，客户有意向", "followUpType": "call"}, headers=_headers(request_id="req-fu1"))
     assert r.status_code == 201
@@ -36,7 +36,7 @@ def _compute_expected(method: str, path: str, body: bytes, headers: dict, timest
     secret = _get_secret()
     if not secret:
         return ""
-    parts = [method.upper(), path or "/", body or b""]
+    parts = [method.upper().encode("utf-8"), (path or "/").encode("utf-8"), body or b""]
     for h in SIGNED_HEADERS:
         parts.append((headers.get(h) or "").encode("utf-8"))
     parts.append(str(timestamp).encode("utf-8"))
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 """在容器内启动网关，使用环境变量解析路由与熔断；可选接入治理中心（注册发现、链路与指标）。"""
+import importlib.util
 import os
 import sys
 import logging
@@ -8,36 +9,61 @@ sys.path.insert(0, os.environ.get("APP_ROOT", "/app"))
 logging.basicConfig(level=logging.INFO)
 
 from platform_core.core.gateway.app import create_app
-from platform_core.core.gateway.config import load_routes
+from platform_core.core.gateway.config import get_route_table
 from platform_core.core.gateway.circuit_breaker import CircuitBreakerRegistry
+from platform_core.core.gateway.prefork import resolve_workers, serve
 
 def _env_resolver(cell):
-    routes = load_routes()
-    return routes.get(cell) or os.environ.get(f"CELL_{cell.upper()}_URL")
+    # 预编译路由快照：无锁读取，GATEWAY_ROUTES_PATH 变更时自动热加载
+    return get_route_table().get(cell) or os.environ.get(f"CELL_{cell.upper()}_URL")
 
 def _log_emit(trace_id, cell, path, status, duration_ms):
     logging.info("request cell=%s path=%s status=%s duration_ms=%s trace_id=%s", cell, path, status, duration_ms, trace_id)
 
-# 若配置了治理中心：解析优先走治理中心（仅返回健康细胞），并上报链路与 RED 指标
-try:
-    from platform_core.core.governance.client import (
-        create_resolver_with_fallback,
-        create_emit_with_ingest,
-        _get_base as _governance_base,
-    )
-    if _governance_base():
-        resolver = create_resolver_with_fallback(_env_resolver)
-        emit = create_emit_with_ingest(_log_emit)
-        logging.info("gateway using governance: %s", _governance_base())
-    else:
-        resolver = _env_resolver
-        emit = _log_emit
-except Exception as e:
-    logging.warning("governance client not used: %s", e)
-    resolver = _env_resolver
-    emit = _log_emit
-
-breakers = CircuitBreakerRegistry()
-app = create_app(resolver, emit, circuit_breakers=breakers, use_dynamic_routes=True)
+def _resolver_and_emit():
+    """若配置了治理中心：解析优先走治理中心（仅返回健康细胞），并上报链路与 RED 指标。"""
+    try:
+        from platform_core.core.governance.client import (
+            create_resolver_with_fallback,
+            create_emit_with_ingest,
+            _get_base as _governance_base,
+        )
+        if _governance_base():
+            logging.info("gateway using governance: %s", _governance_base())
+            return create_resolver_with_fallback(_env_resolver), create_emit_with_ingest(_log_emit)
+    except Exception as e:
+        logging.warning("governance client not used: %s", e)
+    return _env_resolver, _log_emit
+
+
 port = int(os.environ.get("GATEWAY_PORT", "8000"))
-app.run(host="0.0.0.0", port=port)
+# GATEWAY_ENGINE=asgi：事件循环承载上游转发（需 uvicorn），未安装时回退 Flask
+use_asgi = os.environ.get("GATEWAY_ENGINE", "").strip().lower() == "asgi"
+if use_asgi and importlib.util.find_spec("uvicorn") is None:
+    logging.warning("asgi engine unavailable (uvicorn not installed), fallback to flask")
+    use_asgi = False
+
+
+def _build(breakers=None):
+    resolver, emit = _resolver_and_emit()
+    breakers = breakers or CircuitBreakerRegistry()
+    if use_asgi:
+        from platform_core.core.gateway.asgi_app import create_asgi_app
+        return create_asgi_app(resolver, emit, circuit_breakers=breakers, use_dynamic_routes=True)
+    return create_app(resolver, emit, circuit_breakers=breakers, use_dynamic_routes=True)
+
+
+# GATEWAY_WORKERS>1（或 0=CPU 核数）：prefork 多进程，限流/熔断/会话经共享内存跨 worker 生效
+workers = resolve_workers()
+if workers > 1:
+    logging.info("gateway engine: %s, prefork workers=%d", "asgi" if use_asgi else "flask", workers)
+    serve(_build, "0.0.0.0", port, workers, asgi=use_asgi)
+    sys.exit(0)
+
+app = _build()
+if use_asgi:
+    import uvicorn
+    logging.info("gateway engine: asgi (uvicorn)")
+    uvicorn.run(app, host="0.0.0.0", port=port, lifespan="on", log_level="info")
+else:
+    app.run(host="0.0.0.0", port=port)
@@ -1,12 +1,16 @@
 """
 事件总线：重试、死信队列、消息幂等（平台层通用能力，无业务逻辑）。
 供网关 POST/GET /api/events 使用；生产可对接 Kafka/RabbitMQ，此处为内存 Stub。
+进程内订阅（subscribe）：新接受的事件同步回调订阅者（如网关缓存失效），回调异常不影响事件接受。
 """
 from __future__ import annotations
 
+import logging
 import os
 import time
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("platform.event_bus")
 
 # 幂等：已接受的 eventId 集合，避免重复入库（TTL 简化：保留最近 N 条）
 _IDEM_MAX = int(os.environ.get("EVENT_BUS_IDEM_MAX", "5000"))
@@ -16,6 +20,21 @@ _DLQ: List[Dict[str, Any]] = []
 _MAX_EVENTS = int(os.environ.get("EVENT_BUS_MAX_EVENTS", "1000"))
 _MAX_DLQ = int(os.environ.get("EVENT_BUS_MAX_DLQ", "500"))
 _RETRY_COUNT = int(os.environ.get("EVENT_BUS_RETRY_COUNT", "3"))
+_SUBSCRIBERS: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def subscribe(callback: Callable[[Dict[str, Any]], None]) -> None:
+    """注册进程内订阅者；每个新接受的事件（幂等重复与死信除外）回调一次。"""
+    if callback not in _SUBSCRIBERS:
+        _SUBSCRIBERS.append(callback)
+
+
+def _notify(entry: Dict[str, Any]) -> None:
+    for callback in list(_SUBSCRIBERS):
+        try:
+            callback(entry)
+        except Exception as e:
+            logger.warning("event subscriber failed: %s %s", entry.get("eventType"), e)
 
 
 def _trim_idem():
@@ -64,6 +83,7 @@ def accept_event(
     _EVENTS.append(entry)
     while len(_EVENTS) > _MAX_EVENTS:
         _EVENTS.pop(0)
+    _notify(entry)
     return True, "accepted"
 
 
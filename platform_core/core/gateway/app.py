@@ -18,7 +18,7 @@ except ImportError:
     jsonify = None
 
 try:
-    from .config import load_routes
+    from .config import get_route_table
     from .circuit_breaker import CircuitBreakerRegistry
     from .session_store import create_token_store
     from . import http_client as _http_client
@@ -26,8 +26,17 @@ try:
     from . import traffic_light as _traffic_light
     from . import rate_limit as _rate_limit
     from . import audit_log as _audit_log
+    from . import load_balancer as _load_balancer
+    from . import batch as _batch
+    from . import deadline as _deadline
+    from . import fair_queue as _fair_queue
+    from . import cache_policy as _cache_policy
+    from . import inprocess as _inprocess
+    from . import idempotency as _idempotency
+    from . import projection as _projection
+    from .pipeline import AsyncEmitter, GatewayConfig, Pipeline, RequestPrincipal, bind_monitor_emit
 except ImportError:
-    load_routes = None
+    get_route_table = None
     CircuitBreakerRegistry = None
     create_token_store = None
     _http_client = None
@@ -35,12 +44,23 @@ except ImportError:
     _traffic_light = None
     _rate_limit = None
     _audit_log = None
+    _load_balancer = None
+    _batch = None
+    _deadline = None
+    _fair_queue = None
+    _cache_policy = None
+    _inprocess = None
+    _idempotency = None
+    _projection = None
+    AsyncEmitter = GatewayConfig = Pipeline = RequestPrincipal = bind_monitor_emit = None
 
 try:
     from ..tenant import get_tenant_store, get_tenant_quota, get_tenant_config_store, get_tenant_role_store
+    from ..tenant.quota import REASON_MESSAGES as _QUOTA_MESSAGES
 except ImportError:
     get_tenant_store = None
     get_tenant_quota = None
+    _QUOTA_MESSAGES = {}
     get_tenant_config_store = None
     get_tenant_role_store = None
 
@@ -64,35 +84,57 @@ def _json_log(level: str, msg: str, trace_id: str, **kwargs):
 def _ensure_trace_id():
     """从请求头获取或生成 trace_id，满足 CT 扫描原则。"""
     trace_id = request.headers.get("X-Trace-Id") or request.headers.get("X-Request-ID") if request else None
-    if not trace_id:
-        trace_id = str(uuid.uuid4()).replace("-", "")[:32]
-    return trace_id
+    return trace_id or os.urandom(16).hex()
 
 
 def _ensure_span_id():
     """全链路追踪：子 span_id，供下游串联。"""
-    if request and request.headers.get("X-Span-Id"):
-        return request.headers.get("X-Span-Id")
-    return str(uuid.uuid4()).replace("-", "")[:16]
+    return (request.headers.get("X-Span-Id") if request else None) or os.urandom(8).hex()
 
 
-def _required_headers():
-    """《接口设计说明书》3.1.3：请求头必须包含 Content-Type、Authorization、X-Request-ID（POST/PUT）。"""
-    if not request:
-        return None, None
-    method = request.method.upper()
+def _check_required_headers(method: str, headers):
+    """必填请求头校验（与框架无关）：headers 需支持 .get(name)；供 Flask 与 ASGI 引擎共用。"""
+    method = method.upper()
     missing = []
-    if not request.headers.get("Content-Type") and method in ("POST", "PUT", "PATCH"):
+    if not headers.get("Content-Type") and method in ("POST", "PUT", "PATCH"):
         missing.append("Content-Type")
-    if not request.headers.get("Authorization"):
+    if not headers.get("Authorization"):
         missing.append("Authorization")
-    if method in ("POST", "PUT", "PATCH") and not request.headers.get("X-Request-ID"):
+    if method in ("POST", "PUT", "PATCH") and not headers.get("X-Request-ID"):
         missing.append("X-Request-ID")
     if missing:
-        return None, {"code": "MISSING_HEADER", "message": f"缺少必须请求头: {', '.join(missing)}", "requestId": request.headers.get("X-Request-ID", "")}
+        return None, {"code": "MISSING_HEADER", "message": f"缺少必须请求头: {', '.join(missing)}", "requestId": headers.get("X-Request-ID", "")}
     return True, None
 
 
+def _required_headers():
+    """《接口设计说明书》3.1.3：请求头必须包含 Content-Type、Authorization、X-Request-ID（POST/PUT）。"""
+    if not request:
+        return None, None
+    return _check_required_headers(request.method, request.headers)
+
+
+def _bearer_token(auth_header: str) -> str:
+    """从 Authorization 头解析 Bearer token；无则返回空串。"""
+    auth = auth_header or ""
+    return auth[7:].strip() if auth.startswith("Bearer ") else ""
+
+
+def _parse_app_keys() -> dict:
+    """细胞接入应用密钥：GATEWAY_APP_KEYS 或 GATEWAY_APP_KEY，格式 cell:key 或 key（通配），返回 app_key -> cell_id|"*"。"""
+    keys = {}
+    raw = os.environ.get("GATEWAY_APP_KEYS", "").strip() or os.environ.get("GATEWAY_APP_KEY", "").strip()
+    if raw:
+        for part in raw.replace(";", ",").split(","):
+            part = part.strip()
+            if ":" in part:
+                cell_id, key = part.split(":", 1)
+                keys[key.strip()] = cell_id.strip()
+            elif part:
+                keys[part] = "*"
+    return keys
+
+
 def _error_response(code: str, message: str, details: str, request_id: str, status: int = 400):
     """《接口设计说明书》统一错误响应格式。"""
     body = {"code": code, "message": message, "details": details, "requestId": request_id}
@@ -104,92 +146,160 @@ def _error_response(code: str, message: str, details: str, request_id: str, stat
     )
 
 
+def _apply_signature(fwd_headers: dict, method: str, path: str, body, secret: bytes = b"") -> None:
+    """USE_REAL_FORWARD 加签：按方法、细胞内路径、请求体与关键头计算签名并写入转发头；secret 取自启动期配置快照。"""
+    if _signing and secret:
+        hs = {k: fwd_headers.get(k) or "" for k in ("X-Request-ID", "X-Tenant-Id", "X-Trace-Id")}
+        sig = _signing.compute_signature(method, f"/{path}", body or b"", hs, secret=secret)
+        if sig:
+            fwd_headers[_signing.SIGNATURE_HEADER] = sig
+            fwd_headers[_signing.SIGNATURE_TIME_HEADER] = str(int(time.time()))
+
+
+def _mock_payload(cell: str, path: str, method: str, trace_id: str, span_id: str, base_url: str) -> dict:
+    """未开启真实转发时返回前端期望的列表/健康结构，避免控制台报错。"""
+    if method.upper() == "GET" and path == "health":
+        return {"status": "up", "cell": cell}
+    if method.upper() == "GET":
+        return {"data": [], "total": 0}
+    return {
+        "gateway": "ok",
+        "cell": cell,
+        "path": path,
+        "traceId": trace_id,
+        "spanId": span_id,
+        "forwardTo": f"{base_url.rstrip('/')}/{path}",
+    }
+
+
+def _should_stream(path: str, content_length, chunked_upload: bool) -> bool:
+    """是否走流式转发；http_client 不可用时按 GATEWAY_STREAM_PATHS 关键字判断。"""
+    if _http_client and getattr(_http_client, "should_stream", None):
+        return _http_client.should_stream(path, content_length, chunked_upload)
+    keywords = [k.strip().lower() for k in os.environ.get("GATEWAY_STREAM_PATHS", "export,download").split(",") if k.strip()]
+    return chunked_upload or any(k in (path or "").lower() for k in keywords)
+
+
+def _iter_urllib_response(r, chunk_size: int = 65536):
+    """按块读取 urllib 响应直至结束，迭代完成或客户端断开时关闭上游连接。"""
+    if _http_client and getattr(_http_client, "iter_file_chunks", None):
+        return _http_client.iter_file_chunks(r, close=r.close)
+
+    def _gen():
+        try:
+            while True:
+                chunk = r.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            r.close()
+    return _gen()
+
+
+def _cache_args(cell, path, method, tenant_id, principal=None):
+    """GET 缓存参数：细胞合约声明了缓存策略时按合约（未声明的接口不缓存），否则按 GATEWAY_GET_CACHE_TTL_SEC。"""
+    if _cache_policy is None:
+        return {"use_cache": method.upper() == "GET" and float(os.environ.get("GATEWAY_GET_CACHE_TTL_SEC", "0")) > 0}
+    return _cache_policy.cache_args(cell, path, method, tenant_id or "",
+                                    principal.info if principal is not None else None)
+
+
+def _projection_fields(method, query_string):
+    """GET 列表字段投影：查询串携带 fields= 时返回字段元组，否则 None。"""
+    if _projection is None or method.upper() != "GET":
+        return None
+    return _projection.parse_fields(query_string)
+
+
+def _forward_failed(e, trace_id, cell, deadline=0.0, **log):
+    """转发异常 -> 统一错误响应：已超过截止时间为 504 DEADLINE_EXCEEDED，其余为 502 CELL_UNREACHABLE。"""
+    _json_log("error", "forward_failed", trace_id, cell=cell, error=str(e), **log)
+    request_id = request.headers.get("X-Request-ID", "")
+    if _deadline and (isinstance(e, _deadline.DeadlineExceeded) or (deadline and _deadline.remaining(deadline) <= 0)):
+        return _error_response("DEADLINE_EXCEEDED", "请求已超过截止时间", "", request_id, 504)
+    return _error_response("CELL_UNREACHABLE", str(e), "", request_id, 502)
+
+
+def _stream_proxy(base_url, path, fwd_headers, timeout_sec, max_retries, chunked_upload, trace_id, cell, deadline=0.0,
+                  signing_secret=b""):
+    """
+    流式代理：请求体以 request.stream 直接交给上游，响应体以生成器回写客户端。
+    开启加签时须对完整请求体签名，此时请求体先读入内存（响应仍流式）。
+    """
+    method = request.method.upper()
+    query_string = request.query_string.decode() if request.query_string else ""
+    content_length = None if chunked_upload else request.content_length
+    body_stream = request.stream if (chunked_upload or content_length) else None
+    if _signing and signing_secret:
+        body = request.get_data() or b""
+        hs = {k: request.headers.get(k) or "" for k in ("X-Request-ID", "X-Tenant-Id", "X-Trace-Id")}
+        sig = _signing.compute_signature(method, f"/{path}", body, hs, secret=signing_secret)
+        if sig:
+            fwd_headers[_signing.SIGNATURE_HEADER] = sig
+            fwd_headers[_signing.SIGNATURE_TIME_HEADER] = str(int(time.time()))
+        body_stream, content_length = (body or None), (len(body) if body else None)
+    try:
+        if _http_client and getattr(_http_client, "stream_request", None):
+            status, out_headers, chunks = _http_client.stream_request(
+                base_url, path, method, body_stream, fwd_headers,
+                timeout=timeout_sec, max_retries=max_retries, query_string=query_string,
+                content_length=content_length, client_accept_encoding=request.headers.get("Accept-Encoding"),
+                cell=cell, deadline=deadline,
+            )
+        else:
+            import urllib.request
+            import urllib.error
+            target = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
+            req = urllib.request.Request(target, method=method, data=body_stream)
+            for h, v in fwd_headers.items():
+                req.add_header(h, v)
+            if body_stream is not None and content_length is not None:
+                req.add_header("Content-Length", str(content_length))
+            try:
+                r = urllib.request.urlopen(req, timeout=timeout_sec)
+            except urllib.error.HTTPError as e:
+                r = e
+            status = r.getcode()
+            out_headers = {k: v for k, v in r.headers.items() if k.lower() not in ("transfer-encoding", "connection")}
+            chunks = _iter_urllib_response(r)
+    except Exception as e:
+        return _forward_failed(e, trace_id, cell, deadline, stream=True)
+    mimetype = out_headers.get("Content-Type", "application/json") or "application/json"
+    resp = Response(chunks, status=status, mimetype=mimetype, direct_passthrough=True)
+    for k, v in out_headers.items():
+        if k.lower() != "content-type":
+            resp.headers[k] = v
+    return resp
+
+
 def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None, use_dynamic_routes=False):
     """
     创建网关 Flask 应用。
-    - registry_resolver(cell_name)->base_url；若为 None 且 use_dynamic_routes 则用 load_routes()。
-    - monitor_emit(trace_id, cell, path, status, duration_ms)：可选监控回调。
+    - registry_resolver(cell_name)->base_url（多实例时逗号分隔，由 load_balancer 按 P2C/EWMA 选择）；
+      若为 None 且 use_dynamic_routes 则用预编译路由表（get_route_table，文件变更热加载）。
+    - monitor_emit(trace_id, cell, path, status, duration_ms[, span_id])：可选监控回调；声明 span_id 参数时传入网关 span。
     - circuit_breakers：CircuitBreakerRegistry 实例，可选；熔断时返回 503 CIRCUIT_OPEN。
-    - 限流、应用密钥、操作审计由 before_request/after_request 注入，不修改业务路由。
+    - 限流、应用密钥、租户配额、操作审计等按启动期配置快照编译为请求流水线（见 pipeline），不修改业务路由。
+    - GATEWAY_INPROCESS_CELLS 挂载的细胞在网关进程内调度（见 inprocess），其余细胞经 HTTP 转发。
     """
     app = Flask(__name__)
     app.config["JSON_AS_ASCII"] = False
-    routes_map = load_routes() if (use_dynamic_routes and load_routes) else {}
-    resolver = registry_resolver or (lambda c: routes_map.get(c))
-    breakers = circuit_breakers
+    route_table = get_route_table() if get_route_table else None
 
-    # 细胞接入应用密钥（可选）：X-App-Key 与 GATEWAY_APP_KEYS 或 GATEWAY_APP_KEY 校验
-    _APP_KEYS = {}  # app_key -> cell_id or "*"
-    _app_keys_raw = os.environ.get("GATEWAY_APP_KEYS", "").strip() or os.environ.get("GATEWAY_APP_KEY", "").strip()
-    if _app_keys_raw:
-        for part in _app_keys_raw.replace(";", ",").split(","):
-            part = part.strip()
-            if ":" in part:
-                cell_id, key = part.split(":", 1)
-                _APP_KEYS[key.strip()] = cell_id.strip()
-            elif part:
-                _APP_KEYS[part] = "*"
+    def _routes():
+        """当前路由快照（只读）；未加载配置模块时为空。"""
+        return route_table.snapshot if route_table is not None else {}
 
-    @app.before_request
-    def before():
-        request.trace_id = _ensure_trace_id()
-        request.span_id = _ensure_span_id()
-        request.start_time = time.perf_counter()
-        # 防刷/限流
-        if _rate_limit and getattr(_rate_limit, "allow_request", None):
-            ip = request.remote_addr or "0.0.0.0"
-            auth = request.headers.get("Authorization") or ""
-            token = (auth[7:].strip() if auth.startswith("Bearer ") else "") or None
-            ok, reason = _rate_limit.allow_request(ip, token)
-            if not ok:
-                return _error_response("RATE_LIMIT", "请求过于频繁，请稍后重试", reason, request.headers.get("X-Request-ID", ""), 429)
-        # 应用密钥校验（可选）：若配置了 GATEWAY_APP_KEYS 且请求带 X-App-Key，则校验
-        if _APP_KEYS and request.path.startswith("/api/"):
-            app_key = (request.headers.get("X-App-Key") or "").strip()
-            if app_key and app_key not in _APP_KEYS:
-                return _error_response("INVALID_APP_KEY", "应用密钥无效", "", request.headers.get("X-Request-ID", ""), 401)
-        # 多租户：对业务路径校验租户有效性及配额（数据隔离：仅合法且未超配额租户可访问）
-        if os.environ.get("GATEWAY_VALIDATE_TENANT") == "1" and request.path.startswith("/api/v1/"):
-            tenant_id = (request.headers.get("X-Tenant-Id") or "").strip()
-            if tenant_id and get_tenant_store and get_tenant_quota:
-                if not get_tenant_store().is_valid(tenant_id):
-                    return _error_response("TENANT_INVALID", "租户不存在、已禁用或已到期", "", request.headers.get("X-Request-ID", ""), 403)
-                ok, reason = get_tenant_quota().allow_request(tenant_id)
-                if not ok:
-                    return _error_response("QUOTA_EXCEEDED", "租户接口请求量已达配额上限，请稍后重试", reason, request.headers.get("X-Request-ID", ""), 429)
+    resolver = registry_resolver or (lambda c: route_table.get(c) if (use_dynamic_routes and route_table) else None)
+    # 单机进程内调度：GATEWAY_INPROCESS_CELLS 挂载的细胞解析为 inproc://<cell>，转发时直接调用其 WSGI 应用
+    if _inprocess and _inprocess.get_dispatcher().enabled:
+        resolver = _inprocess.get_dispatcher().wrap_resolver(resolver)
+    breakers = circuit_breakers
 
-    @app.after_request
-    def after(resp):
-        # 安全响应头：防点击劫持、MIME 嗅探、XSS 等（OWASP 推荐）
-        resp.headers["X-Content-Type-Options"] = "nosniff"
-        resp.headers["X-Frame-Options"] = "DENY"
-        resp.headers["X-XSS-Protection"] = "1; mode=block"
-        if getattr(request, "start_time", None) is not None:
-            duration_ms = int((time.perf_counter() - request.start_time) * 1000)
-            resp.headers["X-Response-Time"] = str(duration_ms)
-            resp.headers["X-Trace-Id"] = getattr(request, "trace_id", "")
-            resp.headers["X-Span-Id"] = getattr(request, "span_id", "")
-            cell = getattr(request, "cell", None)
-            if callable(monitor_emit) and getattr(request, "trace_id", None) and cell is not None:
-                monitor_emit(request.trace_id, cell, request.path, resp.status_code, duration_ms)
-            if breakers and cell:
-                breakers.get(cell).record(success=resp.status_code < 500)
-            if os.environ.get("APM_LOG") == "1" and getattr(request, "trace_id", None):
-                _json_log("info", "apm_span", request.trace_id, span_id=getattr(request, "span_id", ""), cell=cell, path=request.path, status=resp.status_code, duration_ms=duration_ms)
-            # 操作审计落盘（不可删改）
-            if _audit_log and getattr(_audit_log, "append", None):
-                auth = request.headers.get("Authorization") or ""
-                token = (auth[7:].strip() if auth.startswith("Bearer ") else "") or ""
-                user_info = (_token_store.get(token) if token else None) or {}
-                _audit_log.append(
-                    request.method, request.path, resp.status_code, duration_ms,
-                    trace_id=getattr(request, "trace_id", ""),
-                    tenant_id=request.headers.get("X-Tenant-Id", ""),
-                    user=user_info.get("username", ""),
-                    cell=cell or "",
-                    ip=request.remote_addr or "",
-                )
-        return resp
+    # 启动期配置快照：转发、租户校验、应用密钥（GATEWAY_APP_KEYS 或 GATEWAY_APP_KEY）等开关只读取一次
+    config = GatewayConfig.from_env(app_keys=_parse_app_keys())
+    app.extensions["gateway_config"] = config
 
     # ---------- 认证与管理端 API（管理端/客户端登录、细胞管理、权限） ----------
     _MOCK_USERS = {
@@ -201,22 +311,199 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
     _token_store = create_token_store() if create_token_store else _DictTokenStore()
     # 生产环境必须禁用 Mock 认证，对接认证中心；GATEWAY_USE_MOCK_AUTH=0 时登录返回 503
     _use_mock_auth = os.environ.get("GATEWAY_USE_MOCK_AUTH", "1") == "1"
+    # 供 ASGI 引擎等同进程组件复用同一会话存储与解析器（审计取用户名、代理解析 base_url）
+    app.extensions["gateway_token_store"] = _token_store
+    app.extensions["gateway_resolver"] = resolver
+    # 红绿灯饱和度信号：审计写入队列（后台定时采样）；上游压力按细胞由自适应并发限制处理
+    if _traffic_light and getattr(_traffic_light, "register_signal", None):
+        if _audit_log and getattr(_audit_log, "stats", None):
+            def _audit_queue_saturation() -> float:
+                st = _audit_log.stats()
+                return st["queueDepth"] / max(1, st["queueMax"])
+            _traffic_light.register_signal("audit_queue", _audit_queue_saturation)
+    # GET 缓存策略：构建应用时即订阅事件总线，首个 GET 之前到达的失效事件同样生效（prefork 下每个 worker 各自订阅）
+    if _cache_policy is not None:
+        _cache_policy.get_policy_table()
     _CELL_ENABLED = {}  # cell_id -> bool，默认 True
 
-    @app.before_request
-    def _require_admin_for_admin_routes():
-        """管理端接口仅允许 role=admin 的用户访问，防止越权（渗透测试修复）。"""
-        if not request.path.startswith("/api/admin/"):
+    # ---------- 请求流水线：按配置快照编译启用的阶段，逐请求只按序执行（见 pipeline） ----------
+    monitor_emit = bind_monitor_emit(monitor_emit)
+    _monitor = AsyncEmitter(monitor_emit) if monitor_emit is not None and config.monitor_async else None
+    app.extensions["gateway_monitor"] = _monitor
+    emit = _monitor.submit if _monitor is not None else monitor_emit
+
+    def _stage_trace():
+        request.trace_id = _ensure_trace_id()
+        request.span_id = _ensure_span_id()
+
+    def _stage_rate_limit():
+        """防刷/限流。"""
+        ok, reason = _rate_limit.allow_request(request.remote_addr or "0.0.0.0", request.principal.token or None)
+        if not ok:
+            return _error_response("RATE_LIMIT", "请求过于频繁，请稍后重试", reason, request.headers.get("X-Request-ID", ""), 429)
+
+    def _stage_app_key():
+        """应用密钥校验：配置了密钥且请求带 X-App-Key 时校验。"""
+        if request.path.startswith("/api/"):
+            app_key = (request.headers.get("X-App-Key") or "").strip()
+            if app_key and app_key not in config.app_keys:
+                return _error_response("INVALID_APP_KEY", "应用密钥无效", "", request.headers.get("X-Request-ID", ""), 401)
+
+    def _stage_tenant():
+        """多租户：对业务路径校验租户有效性及配额（数据隔离：仅合法且未超配额租户可访问）。"""
+        if not request.path.startswith("/api/v1/"):
             return None
-        auth = request.headers.get("Authorization") or ""
-        token = (auth[7:].strip() if auth.startswith("Bearer ") else "") or ""
-        if not token:
-            return None  # 由路由返回 401
-        user = _token_store.get(token)
-        if not user or user.get("role") != "admin":
+        tenant_id = (request.headers.get("X-Tenant-Id") or "").strip()
+        if not tenant_id:
+            return None
+        if not get_tenant_store().is_valid(tenant_id):
+            return _error_response("TENANT_INVALID", "租户不存在、已禁用或已到期", "", request.headers.get("X-Request-ID", ""), 403)
+        # 批量请求的请求量、并发与流量均按子请求计，信封本身不计配额
+        if request.path == "/api/v1/batch":
+            return None
+        # 请求量、并发、流量一次判定
+        ok, reason, request.tenant_lease = get_tenant_quota().admit(tenant_id, request.content_length or 0)
+        if not ok:
+            return _error_response("QUOTA_EXCEEDED", _QUOTA_MESSAGES.get(reason, "租户配额已达上限，请稍后重试"), reason, request.headers.get("X-Request-ID", ""), 429)
+
+    def _stage_admin_auth():
+        """管理端接口仅允许 role=admin 的用户访问，防止越权（渗透测试修复）；无 token 时由路由返回 401。"""
+        if not request.path.startswith("/api/admin/") or not request.principal.token:
+            return None
+        if request.principal.role != "admin":
             return _error_response("FORBIDDEN", "仅管理员可访问管理端接口", "", request.headers.get("X-Request-ID", ""), 403)
-        return None
-    # 细胞展示名：仅作默认中文名，细胞名录以 load_routes() 与 env CELL_*_URL 为准（架构合规：不硬编码细胞名录）
+
+    def _after_headers(resp, duration_ms):
+        # 安全响应头：防点击劫持、MIME 嗅探、XSS 等（OWASP 推荐）
+        resp.headers["X-Content-Type-Options"] = "nosniff"
+        resp.headers["X-Frame-Options"] = "DENY"
+        resp.headers["X-XSS-Protection"] = "1; mode=block"
+        resp.headers["X-Response-Time"] = str(duration_ms)
+        resp.headers["X-Trace-Id"] = getattr(request, "trace_id", "")
+        resp.headers["X-Span-Id"] = getattr(request, "span_id", "")
+
+    def _after_monitor(resp, duration_ms):
+        cell = getattr(request, "cell", None)
+        if cell is not None and getattr(request, "trace_id", None):
+            # 后台线程无请求上下文：span_id 在此取出随参数入队
+            emit(request.trace_id, cell, request.path, resp.status_code, duration_ms, getattr(request, "span_id", ""))
+
+    def _after_breaker(resp, duration_ms):
+        # 仅统计实际发往细胞的调用；网关自身的拒绝（舱壁、降载、排队、熔断、未注册）与幂等重放不计入
+        cell = getattr(request, "cell", None)
+        if cell and getattr(request, "upstream_attempted", False):
+            breakers.get(cell).record(success=resp.status_code < 500, duration_ms=duration_ms)
+
+    def _after_upstream(resp, duration_ms):
+        """自适应并发采样与负载均衡反馈。"""
+        limiter = getattr(request, "concurrency_limiter", None)
+        if limiter is not None:
+            limiter.on_sample(duration_ms, dropped=resp.status_code in (502, 503, 504))
+        endpoint = getattr(request, "upstream_endpoint", None)
+        if endpoint is not None:
+            request.upstream_endpoint = None
+            _load_balancer.get_load_balancer().on_result(endpoint, duration_ms, success=resp.status_code < 500)
+
+    def _after_apm_log(resp, duration_ms):
+        if getattr(request, "trace_id", None):
+            _json_log("info", "apm_span", request.trace_id, span_id=getattr(request, "span_id", ""), cell=getattr(request, "cell", None),
+                      path=request.path, status=resp.status_code, duration_ms=duration_ms)
+
+    def _after_audit(resp, duration_ms):
+        # 操作审计落盘（不可删改）；用户名取自请求级身份，不再二次查询会话存储
+        _audit_log.append(
+            request.method, request.path, resp.status_code, duration_ms,
+            trace_id=getattr(request, "trace_id", ""),
+            tenant_id=request.headers.get("X-Tenant-Id", ""),
+            user=request.principal.username,
+            cell=getattr(request, "cell", None) or "",
+            ip=request.remote_addr or "",
+        )
+
+    def _after_idempotency(resp, duration_ms):
+        # 幂等执行者完成：非流式响应按规则保存并唤醒同键等待者；流式响应不保存
+        ticket = getattr(request, "idempotency", None)
+        if ticket is not None:
+            request.idempotency = None
+            if resp.is_streamed:
+                ticket.abandon()
+            else:
+                ticket.complete(resp.status_code, resp.headers, resp.get_data())
+
+    def _after_release(resp, duration_ms):
+        # 租户响应流量按响应体长度记账（流式响应长度未知时不计）
+        lease = getattr(request, "tenant_lease", None)
+        if lease is not None:
+            lease.response_bytes = resp.calculate_content_length() or 0
+        # 舱壁、自适应并发、公平排队与租户并发名额在响应体发送完毕（含流式）后归还
+        for attr in ("bulkhead", "concurrency_limiter", "fair_ticket", "tenant_lease"):
+            holder = getattr(request, attr, None)
+            if holder is not None:
+                setattr(request, attr, None)
+                resp.call_on_close(holder.release)
+
+    stages = [("trace", _stage_trace)]
+    if _rate_limit and getattr(_rate_limit, "allow_request", None):
+        stages.append(("rate_limit", _stage_rate_limit))
+    if config.app_keys:
+        stages.append(("app_key", _stage_app_key))
+    if config.validate_tenant and get_tenant_store and get_tenant_quota:
+        stages.append(("tenant", _stage_tenant))
+    stages.append(("admin_auth", _stage_admin_auth))
+    after_stages = [("headers", _after_headers)]
+    if callable(emit):
+        after_stages.append(("monitor", _after_monitor))
+    if breakers:
+        after_stages.append(("breaker", _after_breaker))
+    if _traffic_light or _load_balancer:
+        after_stages.append(("upstream", _after_upstream))
+    if config.apm_log:
+        after_stages.append(("apm_log", _after_apm_log))
+    if _audit_log and getattr(_audit_log, "append", None):
+        after_stages.append(("audit", _after_audit))
+    _idem_cache = _idempotency.get_idempotency_cache() if _idempotency else None
+    if _idem_cache is not None and _idem_cache.enabled and config.real_forward:
+        after_stages.append(("idempotency", _after_idempotency))
+
+        @app.teardown_request
+        def _idempotency_teardown(exc):
+            """未经 after_request 的异常路径：放弃执行者身份，等待者接替执行。"""
+            ticket = getattr(request, "idempotency", None)
+            if ticket is not None:
+                request.idempotency = None
+                ticket.abandon()
+    else:
+        _idem_cache = None
+    after_stages.append(("release", _after_release))
+    pipeline = Pipeline(stages, after_stages, server_timing=config.server_timing)
+    app.extensions["gateway_pipeline"] = pipeline
+
+    @app.before_request
+    def before():
+        request.start_time = time.perf_counter()
+        request.principal = RequestPrincipal(_token_store, request.headers.get("Authorization"))
+        return pipeline.run_before(request)
+
+    @app.after_request
+    def after(resp):
+        start = getattr(request, "start_time", None)
+        duration_ms = int((time.perf_counter() - start) * 1000) if start is not None else 0
+        return pipeline.run_after(request, resp, duration_ms)
+
+    @app.route("/api/admin/gateway/pipeline", methods=["GET"])
+    def admin_gateway_pipeline():
+        """管理端：已编译的流水线阶段、各阶段累计/平均耗时与启动期配置快照。"""
+        if not request.headers.get("Authorization"):
+            return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
+        out = pipeline.stats()
+        out["config"] = config.public()
+        if _monitor is not None:
+            out["monitorDropped"] = _monitor.dropped
+        if _idem_cache is not None:
+            out["idempotency"] = _idem_cache.stats()
+        return jsonify(out), 200
+
+    # 细胞展示名：仅作默认中文名，细胞名录以路由表与 env CELL_*_URL 为准（架构合规：不硬编码细胞名录）
     _CELL_DISPLAY_NAMES = {
         "crm": "客户关系", "erp": "企业资源", "wms": "仓储管理", "hrm": "人力资源", "oa": "协同办公",
         "mes": "制造执行", "tms": "运输管理", "srm": "供应商", "plm": "产品生命周期", "ems": "能源管理",
@@ -224,9 +511,8 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
     }
 
     def _cell_list():
-        """细胞名录：优先来自 load_routes()，再并上展示名 key，保证新增细胞仅需配置无需改代码。"""
-        r = load_routes() if load_routes else {}
-        ids = set(r.keys())
+        """细胞名录：优先来自路由表快照，再并上展示名 key，保证新增细胞仅需配置无需改代码。"""
+        ids = set(_routes().keys())
         ids.update(_CELL_DISPLAY_NAMES.keys())
         return sorted(ids)
 
@@ -268,7 +554,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         """管理端：细胞列表及启用状态（需 Authorization）。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
-        routes_map = load_routes() if load_routes else {}
+        routes_map = _routes()
         out = []
         for cid in _cell_list():
             enabled = _CELL_ENABLED.get(cid, True)
@@ -295,11 +581,14 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         """管理端：当前网关路由配置（细胞 -> base_url），不耦合业务逻辑。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
-        routes_map = load_routes() if load_routes else {}
+        routes_map = dict(_routes())
         for cid in _cell_list():
             if cid not in routes_map:
                 routes_map[cid] = os.environ.get(f"CELL_{cid.upper()}_URL", "") or "(未配置)"
-        return jsonify({"routes": routes_map, "total": len(routes_map)}), 200
+        out = {"routes": routes_map, "total": len(routes_map)}
+        if _load_balancer:
+            out["endpoints"] = _load_balancer.get_load_balancer().stats()
+        return jsonify(out), 200
 
     # ---------- 数据湖代理：GATEWAY 统一入口，DATALAKE_URL 指向数据湖服务时转发 ----------
     _datalake_url = os.environ.get("DATALAKE_URL", "").strip().rstrip("/")
@@ -322,8 +611,13 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
             for h in ("Authorization", "Content-Type", "X-Request-ID", "X-Tenant-Id", "X-Trace-Id", "X-Role", "X-Data-Role"):
                 if request.headers.get(h):
                     req.add_header(h, request.headers.get(h))
-            with urllib.request.urlopen(req, timeout=60) as r:
-                return Response(r.read(), status=r.getcode(), mimetype=r.headers.get("Content-Type", "application/json") or "application/json")
+            r = urllib.request.urlopen(req, timeout=60)
+            mimetype = r.headers.get("Content-Type", "application/json") or "application/json"
+            if _should_stream(path, None, False) or (request.args.get("format") or "").lower() == "csv":
+                # CSV/导出等大文件：按块透传，首字节即返回
+                return Response(_iter_urllib_response(r), status=r.getcode(), mimetype=mimetype, direct_passthrough=True)
+            with r:
+                return Response(r.read(), status=r.getcode(), mimetype=mimetype)
         except urllib.error.HTTPError as e:
             return Response(e.read() if e.fp else b"{}", status=e.code, mimetype="application/json")
         except Exception as e:
@@ -354,10 +648,10 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         """管理端：代理细胞接口文档（如 /docs、/redoc），便于查看模块 API。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
-        base_url = (resolver(cell_id) if callable(resolver) else None) or routes_map.get(cell_id) or os.environ.get(f"CELL_{cell_id.upper()}_URL", "")
+        base_url = (resolver(cell_id) if callable(resolver) else None) or _routes().get(cell_id) or os.environ.get(f"CELL_{cell_id.upper()}_URL", "")
         if not base_url or str(base_url).startswith("("):
             return _error_response("NOT_FOUND", "细胞未配置或不可达", "", request.headers.get("X-Request-ID", ""), 404)
-        base_url = str(base_url).rstrip("/")
+        base_url = _load_balancer.split_urls(base_url)[0] if _load_balancer else str(base_url).split(",")[0].rstrip("/")
         path = ("docs/" + docpath).rstrip("/") if docpath else "docs"
         try:
             import urllib.request
@@ -430,7 +724,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
 
     @app.route("/api/admin/tenants", methods=["POST"])
     def admin_tenants_create():
-        """创建租户。body: { "tenantId": "xxx", "name": "名称", "expireAt": 可选时间戳 }。"""
+        """创建租户。body: { "tenantId": "xxx", "name": "名称", "expireAt": 可选时间戳, "plan": 可选套餐 }。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
         if not get_tenant_store:
@@ -442,7 +736,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         name = (body.get("name") or tenant_id or "").strip()
         expire_at = body.get("expireAt") if body.get("expireAt") is not None else None
         try:
-            t = get_tenant_store().create(tenant_id, name, expire_at=expire_at)
+            t = get_tenant_store().create(tenant_id, name, expire_at=expire_at, plan=body.get("plan"))
             if get_tenant_role_store:
                 get_tenant_role_store().ensure_tenant_admin(tenant_id)
             return jsonify(t), 201
@@ -451,7 +745,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
 
     @app.route("/api/admin/tenants/<tenant_id>", methods=["PATCH"])
     def admin_tenants_patch(tenant_id):
-        """启用/禁用/到期：body { "status": "enabled"|"disabled", "expireAt": 可选 }。"""
+        """启用/禁用/到期/套餐：body { "status": "enabled"|"disabled", "expireAt": 可选, "plan": 可选 }。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
         if not get_tenant_store:
@@ -468,6 +762,11 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
             store.disable(tenant_id)
         if "expireAt" in body:
             store.set_expire_at(tenant_id, body.get("expireAt"))
+        if body.get("plan"):
+            try:
+                store.set_plan(tenant_id, body["plan"])
+            except ValueError as e:
+                return _error_response("BAD_REQUEST", str(e), "", request.headers.get("X-Request-ID", ""), 400)
         return jsonify(store.get(tenant_id)), 200
 
     @app.route("/api/admin/tenants/<tenant_id>/quota", methods=["GET"])
@@ -480,7 +779,8 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
 
     @app.route("/api/admin/tenants/<tenant_id>/quota", methods=["PUT"])
     def admin_tenants_quota_put(tenant_id):
-        """设置配额。body: { "requestsPerMin": 可选, "cpuLimit": 可选, "memoryMb": 可选, "storageGb": 可选 }。"""
+        """设置配额。body: { "requestsPerMin", "maxConcurrent", "requestBytesPerMin", "responseBytesPerMin",
+        "cpuLimit", "memoryMb", "storageGb" }，均可选。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
         if not get_tenant_quota:
@@ -494,6 +794,9 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
             cpu_limit=body.get("cpuLimit"),
             memory_mb=body.get("memoryMb"),
             storage_gb=body.get("storageGb"),
+            max_concurrent=body.get("maxConcurrent"),
+            request_bytes_per_min=body.get("requestBytesPerMin"),
+            response_bytes_per_min=body.get("responseBytesPerMin"),
         )
         return jsonify(q), 200
 
@@ -579,7 +882,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
 
     @app.route("/api/admin/audit-logs", methods=["GET"])
     def admin_audit_logs():
-        """操作审计日志检索（落盘不可删改）。支持 since/to/traceId/tenantId/cell/limit。"""
+        """操作审计日志检索（落盘不可删改）。支持 since/to/traceId/tenantId/user/status/cell/limit，按段索引定位。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
         since = float(request.args.get("since", 0) or 0)
@@ -588,18 +891,40 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         trace_id = (request.args.get("traceId") or "").strip()
         tenant_id = (request.args.get("tenantId") or "").strip()
         cell = (request.args.get("cell") or "").strip()
+        user = (request.args.get("user") or "").strip()
+        status_raw = (request.args.get("status") or "").strip()
+        status = int(status_raw) if status_raw.isdigit() else None
         limit = min(500, max(1, int(request.args.get("limit", 100) or 100)))
         if _audit_log and getattr(_audit_log, "search", None):
-            out = _audit_log.search(since_ts=since, to_ts=to_ts, trace_id=trace_id or "", tenant_id=tenant_id or "", cell=cell or "", limit=limit)
+            out = _audit_log.search(since_ts=since, to_ts=to_ts, trace_id=trace_id, tenant_id=tenant_id, cell=cell,
+                                    limit=limit, user=user, status=status)
         else:
             out = []
         return jsonify({"data": out, "total": len(out)}), 200
 
     @app.route("/api/admin/audit-logs/export", methods=["GET"])
     def admin_audit_logs_export():
-        """导出操作审计日志（文件下载）。"""
+        """导出操作审计日志（流式下载，跨全部段）。支持 since/to/traceId/tenantId/user/status/cell 过滤。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
+        if _audit_log and getattr(_audit_log, "export_iter", None) and _audit_log.export_path():
+            to_raw = request.args.get("to", "")
+            status_raw = (request.args.get("status") or "").strip()
+            chunks = _audit_log.export_iter(
+                since_ts=float(request.args.get("since", 0) or 0),
+                to_ts=float(to_raw) if to_raw else None,
+                trace_id=(request.args.get("traceId") or "").strip(),
+                tenant_id=(request.args.get("tenantId") or "").strip(),
+                cell=(request.args.get("cell") or "").strip(),
+                user=(request.args.get("user") or "").strip(),
+                status=int(status_raw) if status_raw.isdigit() else None,
+            )
+            return Response(
+                chunks,
+                mimetype="text/plain; charset=utf-8",
+                headers={"Content-Disposition": "attachment; filename=operation_audit.log"},
+                direct_passthrough=True,
+            )
         if _audit_log and getattr(_audit_log, "export_path", None):
             path = _audit_log.export_path()
             if path and os.path.isfile(path):
@@ -612,11 +937,8 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         """01 4.3 一键求救（Panic Button）：踢出会话、冻结、锁屏、告警。当前为占位，记录日志并返回 200；生产对接安全团队与会话管理。"""
         if not request.headers.get("Authorization"):
             return _error_response("UNAUTHORIZED", "缺少 Authorization", "", request.headers.get("X-Request-ID", ""), 401)
-        trace_id = getattr(request, "trace_id", _ensure_trace_id())
-        auth = request.headers.get("Authorization") or ""
-        token = auth[7:].strip() if auth.startswith("Bearer ") else ""
-        user_info = (_token_store.get(token) if token else None) or {}
-        username = user_info.get("username", "unknown")
+        trace_id = getattr(request, "trace_id", None) or _ensure_trace_id()
+        username = request.principal.username or "unknown"
         _json_log("warn", "panic_button_triggered", trace_id, username=username, message="一键求救已触发，生产环境应踢出会话、冻结、锁屏并通知安全团队")
         return jsonify({
             "message": "一键求救已接收；生产环境将执行：踢出所有会话、冻结敏感操作、锁屏并通知安全团队",
@@ -641,7 +963,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
         body = request.get_json() or {}
         event_id = body.get("eventId") or str(uuid.uuid4())
         event_type = body.get("eventType", "")
-        trace_id = getattr(request, "trace_id", _ensure_trace_id())
+        trace_id = getattr(request, "trace_id", None) or _ensure_trace_id()
         if _event_bus:
             accepted, reason = _event_bus.accept_event(event_id, event_type, trace_id, body.get("data"), retry_count=0)
             if not accepted:
@@ -705,17 +1027,226 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
             return _error_response("UNAUTHORIZED", "token 无效或已过期", "", request.headers.get("X-Request-ID", ""), 401)
         return jsonify(user_info), 200
 
+    def _fair_acquire(cell, tenant_id, deadline, trace_id):
+        """细胞内租户加权公平排队（权重取租户套餐）：返回 ((code, message, status) 或 None, ticket)。"""
+        if not _fair_queue:
+            return None, None
+        tenant = (tenant_id or "").strip() or "default"
+        weight = get_tenant_store().weight(tenant) if get_tenant_store else 1.0
+        timeout = _fair_queue.FAIR_QUEUE_TIMEOUT_SEC
+        if deadline:
+            timeout = min(timeout, _deadline.remaining(deadline))
+        try:
+            ticket = _fair_queue.get_scheduler(cell).acquire(tenant, weight, timeout)
+        except _fair_queue.QueueFull:
+            _json_log("warn", "tenant_queue_full", trace_id, cell=cell, tenant=tenant)
+            return ("TENANT_QUEUE_FULL", "租户排队请求过多，请稍后重试", 429), None
+        if ticket is None:
+            _json_log("warn", "fair_queue_timeout", trace_id, cell=cell, tenant=tenant)
+            return ("QUEUE_TIMEOUT", "网关繁忙，排队超时，请稍后重试", 503), None
+        return None, ticket
+
+    def _admit(cell, method, path, trace_id):
+        """细胞调用准入：红绿灯、熔断、自适应并发、舱壁；返回 ((code, message, status) 或 None, limiter, bulkhead)。"""
+        # 00 #8 红绿灯：CPU 超阈值时仅放行 GET，其余返回 503
+        if config.traffic_light and _traffic_light and method.upper() != "GET" and _traffic_light.is_red_light():
+            _traffic_light.emit_red_light_log(trace_id, method, path)
+            return ("RED_LIGHT", "系统负载过高，仅允许只读请求，请稍后重试", 503), None, None
+        if breakers and not breakers.get(cell).allow_request():
+            _json_log("warn", "circuit_open", trace_id, cell=cell)
+            return ("CIRCUIT_OPEN", f"细胞 {cell} 熔断中", 503), None, None
+        # 自适应并发限制：按观测延迟调节的在途上限，超出即降载
+        limiter = _traffic_light.get_limiter(cell) if _traffic_light and getattr(_traffic_light, "get_limiter", None) else None
+        if limiter is not None and not limiter.try_acquire():
+            _json_log("warn", "adaptive_limit_reject", trace_id, cell=cell, limit=limiter.limit)
+            return ("OVERLOADED", f"细胞 {cell} 负载过高，请稍后重试", 503), None, None
+        # 舱壁：该细胞在途请求已达上限时立即拒绝，不排队占用网关线程
+        bulkhead = None
+        if breakers and getattr(breakers, "bulkhead", None):
+            bulkhead = breakers.bulkhead(cell)
+            if not bulkhead.try_acquire():
+                if limiter is not None:
+                    limiter.release()
+                _json_log("warn", "bulkhead_full", trace_id, cell=cell, in_flight=bulkhead.in_flight)
+                return ("CELL_BUSY", f"细胞 {cell} 并发已达上限，请稍后重试", 503), None, None
+        return None, limiter, bulkhead
+
+    def _idempotency_begin(cell, path, deadline, trace_id):
+        """幂等判定：重放/冲突/处理中时返回响应；成为执行者时凭据挂在 request.idempotency，返回 None。"""
+        request_id = request.headers.get("X-Request-ID", "")
+        chunked_upload = "chunked" in (request.headers.get("Transfer-Encoding") or "").lower()
+        if not request_id or _should_stream(path, request.content_length, chunked_upload):
+            return None
+        fp = _idempotency.fingerprint(request.method, cell, path, request.get_data())
+        wait = _idempotency.IDEMPOTENCY_WAIT_SEC
+        if deadline:
+            wait = min(wait, _deadline.remaining(deadline))
+        state, value = _idem_cache.begin((request.headers.get("X-Tenant-Id") or "").strip(), request_id, fp, wait)
+        if state == _idempotency.OWNER:
+            request.idempotency = value
+            return None
+        if state == _idempotency.REPLAY:
+            status, headers, body = value
+            resp = Response(body, status=status, headers=headers)
+            resp.headers[_idempotency.REPLAY_HEADER] = "true"
+            return resp
+        if state == _idempotency.MISMATCH:
+            _json_log("warn", "idempotency_key_reused", trace_id, cell=cell, request_id=request_id)
+            return _error_response("IDEMPOTENCY_KEY_REUSED", "X-Request-ID 已用于不同的请求", "", request_id, 422)
+        _json_log("warn", "idempotency_in_progress", trace_id, cell=cell, request_id=request_id)
+        return _error_response("REQUEST_IN_PROGRESS", "相同 X-Request-ID 的请求正在处理，请稍后重试", "", request_id, 409)
+
+    @app.route("/api/v1/batch", methods=["POST"])
+    def batch():
+        """批量接口：一次认证后子请求并发扇出至各细胞；每个子请求单独限流/配额/熔断/舱壁，保留各自状态码。"""
+        trace_id = getattr(request, "trace_id", None) or _ensure_trace_id()
+        request_id = request.headers.get("X-Request-ID", "")
+        ok, err = _required_headers()
+        if not ok:
+            _json_log("warn", "missing_headers", trace_id, error=err)
+            return _error_response(err["code"], err["message"], err.get("details", ""), err["requestId"], 400)
+        tenant_id = (request.headers.get("X-Tenant-Id") or "").strip()
+        if config.require_tenant_id and not tenant_id:
+            _json_log("warn", "missing_tenant_id", trace_id, cell="batch")
+            return _error_response(
+                "MISSING_TENANT_ID",
+                "请求头缺少租户标识",
+                "生产环境要求请求头携带 X-Tenant-Id，请登录后使用系统分配的租户ID",
+                request_id,
+                400,
+            )
+        if _batch is None:
+            return _error_response("NOT_SUPPORTED", "批量接口不可用", "", request_id, 501)
+        items, error = _batch.parse_batch(request.get_json(silent=True))
+        if error:
+            return _error_response("INVALID_BATCH", "批量请求格式错误", error, request_id, 400)
+        ip = request.remote_addr or "0.0.0.0"
+        span_id = getattr(request, "span_id", "")
+        principal = request.principal
+        token = principal.token or None
+        user = principal.username
+        shared_headers = {h: request.headers.get(h) for h in ("Authorization", "X-Tenant-Id") if request.headers.get(h)}
+        shared_headers["X-Trace-Id"] = trace_id
+        real_forward = config.real_forward
+        timeout_sec = config.proxy_timeout_sec
+        max_retries = config.proxy_retry_count
+
+        def _settle(item, limiter, bulkhead, endpoint, status, duration_ms, lease=None, response_bytes=0, attempted=False):
+            """子请求完成：与 after_request 一致地上报监控、熔断、自适应并发、负载均衡与审计，并归还名额。"""
+            path = f"/api/v1/{item.cell}/{item.path}"
+            if callable(emit):
+                emit(trace_id, item.cell, path, status, duration_ms, span_id)
+            if breakers and attempted:
+                breakers.get(item.cell).record(success=status < 500, duration_ms=duration_ms)
+            if limiter is not None:
+                limiter.on_sample(duration_ms, dropped=status in (502, 503, 504))
+                limiter.release()
+            if bulkhead is not None:
+                bulkhead.release()
+            if lease is not None:
+                lease.response_bytes = response_bytes
+                lease.release()
+            if endpoint is not None:
+                _load_balancer.get_load_balancer().on_result(endpoint, duration_ms, success=status < 500)
+            if _audit_log and getattr(_audit_log, "append", None):
+                _audit_log.append(item.method, path, status, duration_ms, trace_id=trace_id, tenant_id=tenant_id,
+                                  user=user, cell=item.cell, ip=ip)
+
+        def _prepare(item):
+            """子请求准入：拒绝时返回子响应，放行时返回在线程池中执行的转发函数。"""
+            rid = item.headers.setdefault("X-Request-ID", f"{request_id}-{item.id}" if request_id else item.id)
+
+            def reject(code, message, details, status):
+                return _batch.error_result(item.id, code, message, details, rid, status)
+
+            if _rate_limit and getattr(_rate_limit, "allow_request", None):
+                allowed, reason = _rate_limit.allow_request(ip, token)
+                if not allowed:
+                    return reject("RATE_LIMIT", "请求过于频繁，请稍后重试", reason, 429)
+            lease = None
+            if config.validate_tenant and tenant_id and get_tenant_quota:
+                allowed, reason, lease = get_tenant_quota().admit(tenant_id, len(item.body or b""))
+                if not allowed:
+                    return reject("QUOTA_EXCEEDED", _QUOTA_MESSAGES.get(reason, "租户配额已达上限，请稍后重试"), reason, 429)
+            # 截止时间：批量请求的截止时间（客户端提示/路由默认）与子请求 timeoutMs 取最早者
+            deadline = time.time() + item.timeout
+            if _deadline:
+                deadline = min(deadline, _deadline.compute(request.headers, item.cell, item.path, timeout_sec))
+                if _deadline.remaining(deadline) <= 0:
+                    if lease is not None:
+                        lease.release()
+                    return reject("DEADLINE_EXCEEDED", "请求已超过截止时间", "", 504)
+            rejected, limiter, bulkhead = _admit(item.cell, item.method, f"/api/v1/{item.cell}/{item.path}", trace_id)
+            if rejected:
+                if lease is not None:
+                    lease.release()
+                return reject(rejected[0], rejected[1], "", rejected[2])
+            base_url = resolver(item.cell) if callable(resolver) else None
+            if not base_url:
+                _json_log("warn", "cell_not_found", trace_id, cell=item.cell)
+                _settle(item, limiter, bulkhead, None, 503, 0, lease)
+                return reject("CELL_NOT_FOUND", f"细胞未注册: {item.cell}", "", 503)
+            endpoint = _load_balancer.get_load_balancer().pick(item.cell, base_url) if _load_balancer else None
+            if endpoint is not None:
+                base_url = endpoint.url
+
+            def call():
+                start = time.perf_counter()
+                status = 502
+                ticket = None
+                body = b""
+                attempted = False
+                try:
+                    queue_rejected, ticket = _fair_acquire(item.cell, tenant_id, deadline, trace_id)
+                    if queue_rejected:
+                        status = queue_rejected[2]
+                        return reject(queue_rejected[0], queue_rejected[1], "", status)
+                    attempted = True
+                    if real_forward:
+                        fwd_headers = {**shared_headers, **item.headers, "X-Span-Id": os.urandom(8).hex()}
+                        if _deadline:
+                            fwd_headers[_deadline.HEADER] = _deadline.header_value(deadline)
+                        _apply_signature(fwd_headers, item.method, item.path, item.body, config.signing_secret)
+                        status, out_headers, body = _http_client.forward_request(
+                            base_url, item.path, item.method, item.body, fwd_headers,
+                            timeout=min(timeout_sec, item.timeout), max_retries=max_retries, cell=item.cell,
+                            query_string=item.query_string, deadline=deadline,
+                            **_cache_args(item.cell, item.path, item.method, tenant_id, principal),
+                            fields=_projection_fields(item.method, item.query_string),
+                        )
+                    else:
+                        payload = _mock_payload(item.cell, item.path, item.method, trace_id, "", base_url)
+                        status, out_headers, body = 200, {"Content-Type": "application/json"}, json.dumps(payload).encode("utf-8")
+                    return _batch.item_result(item.id, status, out_headers, body)
+                except Exception as e:
+                    _json_log("error", "forward_failed", trace_id, cell=item.cell, error=str(e))
+                    if _batch.is_timeout(e):
+                        status = 504
+                        return _batch.timeout_result(item)
+                    status = 502
+                    return reject("CELL_UNREACHABLE", str(e), "", 502)
+                finally:
+                    if ticket is not None:
+                        ticket.release()
+                    _settle(item, limiter, bulkhead, endpoint, status, int((time.perf_counter() - start) * 1000),
+                            lease, len(body or b""), attempted)
+
+            return call
+
+        results = _batch.gather(items, [_prepare(item) for item in items], request_id)
+        return jsonify({"responses": results}), 200
+
     @app.route("/api/v1/<cell>/<path:path>", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
     def proxy(cell, path):
         """细胞代理：校验必填头、租户（可选）、红绿灯、熔断后转发至细胞 base_url/path；加签由 USE_REAL_FORWARD 时注入。"""
-        trace_id = getattr(request, "trace_id", _ensure_trace_id())
+        trace_id = getattr(request, "trace_id", None) or _ensure_trace_id()
         request.cell = cell
         ok, err = _required_headers()
         if not ok:
             _json_log("warn", "missing_headers", trace_id, error=err)
             return _error_response(err["code"], err["message"], err.get("details", ""), err["requestId"], 400)
         # 商用化：多租户隔离 - 生产环境可要求必须传 X-Tenant-Id（GATEWAY_REQUIRE_TENANT_ID=1）
-        if os.environ.get("GATEWAY_REQUIRE_TENANT_ID") == "1":
+        if config.require_tenant_id:
             tenant_id = (request.headers.get("X-Tenant-Id") or "").strip()
             if not tenant_id:
                 _json_log("warn", "missing_tenant_id", trace_id, cell=cell)
@@ -726,93 +1257,74 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
                     request.headers.get("X-Request-ID", ""),
                     400,
                 )
-        # 00 #8 红绿灯：CPU 超阈值时仅放行 GET，其余返回 503
-        if _traffic_light and _traffic_light.is_red_light() and request.method.upper() != "GET":
-            _traffic_light.emit_red_light_log(trace_id, request.method, request.path)
-            return _error_response("RED_LIGHT", "系统负载过高，仅允许只读请求，请稍后重试", "", request.headers.get("X-Request-ID", ""), 503)
-        if breakers and not breakers.get(cell).allow_request():
-            _json_log("warn", "circuit_open", trace_id, cell=cell)
-            return _error_response("CIRCUIT_OPEN", f"细胞 {cell} 熔断中", "", request.headers.get("X-Request-ID", ""), 503)
+        # 截止时间：客户端提示与路由默认取最早者；已过期的请求不再占用细胞
+        timeout_sec = config.proxy_timeout_sec
+        deadline = _deadline.compute(request.headers, cell, path, timeout_sec) if _deadline else 0.0
+        if deadline and _deadline.remaining(deadline) <= 0:
+            _json_log("warn", "deadline_exceeded", trace_id, cell=cell)
+            return _error_response("DEADLINE_EXCEEDED", "请求已超过截止时间", "", request.headers.get("X-Request-ID", ""), 504)
+        # 写请求幂等：同租户同 X-Request-ID 的重试重放已完成响应，并发重复等待首个请求完成，不再到达细胞
+        if _idem_cache is not None and request.method in _idempotency.METHODS:
+            replay = _idempotency_begin(cell, path, deadline, trace_id)
+            if replay is not None:
+                return replay
+        rejected, limiter, bulkhead = _admit(cell, request.method, request.path, trace_id)
+        if rejected:
+            return _error_response(rejected[0], rejected[1], "", request.headers.get("X-Request-ID", ""), rejected[2])
+        # 细胞内租户加权公平排队：过载时重负载租户排队更久，不拖累其他租户；慢细胞不占用其他细胞的名额
+        rejected, request.fair_ticket = _fair_acquire(cell, request.headers.get("X-Tenant-Id"), deadline, trace_id)
+        if rejected:
+            for holder in (bulkhead, limiter):
+                if holder is not None:
+                    holder.release()
+            return _error_response(rejected[0], rejected[1], "", request.headers.get("X-Request-ID", ""), rejected[2])
+        request.bulkhead = bulkhead
+        request.concurrency_limiter = limiter
         base_url = resolver(cell) if callable(resolver) else None
         if not base_url:
             _json_log("warn", "cell_not_found", trace_id, cell=cell)
             return _error_response("CELL_NOT_FOUND", f"细胞未注册: {cell}", "", request.headers.get("X-Request-ID", ""), 503)
-        if os.environ.get("USE_REAL_FORWARD") == "1":
-            body = request.get_data() or None
-            timeout_sec = int(os.environ.get("GATEWAY_PROXY_TIMEOUT_SEC", "30"))
-            max_retries = max(0, int(os.environ.get("GATEWAY_PROXY_RETRY_COUNT", "2")))
+        # 多实例：P2C + EWMA 选择实例，离群实例被临时摘除
+        endpoint = _load_balancer.get_load_balancer().pick(cell, base_url) if _load_balancer else None
+        if endpoint is not None:
+            base_url = endpoint.url
+            request.upstream_endpoint = endpoint
+        request.upstream_attempted = True
+        if config.real_forward:
+            max_retries = config.proxy_retry_count
             headers_to_forward = ("Authorization", "Content-Type", "X-Request-ID", "X-Tenant-Id", "X-Trace-Id", "X-Span-Id")
             fwd_headers = {h: request.headers.get(h) or "" for h in headers_to_forward if request.headers.get(h)}
-            if _signing and os.environ.get("GATEWAY_SIGNING_SECRET"):
-                hs = {k: request.headers.get(k) or "" for k in ("X-Request-ID", "X-Tenant-Id", "X-Trace-Id")}
-                sig = _signing.compute_signature(request.method, f"/{path}", body or b"", hs)
-                if sig:
-                    fwd_headers[_signing.SIGNATURE_HEADER] = sig
-                    fwd_headers[_signing.SIGNATURE_TIME_HEADER] = str(int(time.time()))
-            use_cache = request.method.upper() == "GET" and float(os.environ.get("GATEWAY_GET_CACHE_TTL_SEC", "0")) > 0
-            if _http_client and getattr(_http_client, "forward_request", None):
-                try:
-                    status, out_headers, resp_body = _http_client.forward_request(
-                        base_url, path, request.method, body, fwd_headers,
-                        timeout=timeout_sec, max_retries=max_retries, cell=cell,
-                        query_string=request.query_string.decode() if request.query_string else "",
-                        use_cache=use_cache,
-                        client_accept_encoding=request.headers.get("Accept-Encoding"),
-                    )
-                    mimetype = out_headers.get("Content-Type", "application/json") or "application/json"
-                    resp = Response(resp_body, status=status, mimetype=mimetype)
-                    for k, v in out_headers.items():
-                        if k.lower() != "content-type":
-                            resp.headers[k] = v
-                    return resp
-                except Exception as e:
-                    _json_log("error", "forward_failed", trace_id, cell=cell, error=str(e))
-                    return _error_response("CELL_UNREACHABLE", str(e), "", request.headers.get("X-Request-ID", ""), 502)
-            import urllib.request
-            import urllib.error
-            target = f"{base_url.rstrip('/')}/{path}" + (f"?{request.query_string.decode()}" if request.query_string else "")
-            last_exc = None
-            for attempt in range(max_retries + 1):
-                try:
-                    req = urllib.request.Request(target, method=request.method, data=body)
-                    for h, v in fwd_headers.items():
-                        req.add_header(h, v)
-                    with urllib.request.urlopen(req, timeout=timeout_sec) as r:
-                        code = r.getcode()
-                        resp_body = r.read()
-                        if 500 <= code < 600 and attempt < max_retries:
-                            time.sleep(0.2 * (2 ** attempt) + (uuid.uuid4().int % 100) / 1000.0)
-                            continue
-                        return Response(resp_body, status=code, mimetype=r.headers.get("Content-Type", "application/json") or "application/json")
-                except urllib.error.HTTPError as e:
-                    last_exc = e
-                    if 500 <= e.code < 600 and attempt < max_retries:
-                        time.sleep(0.2 * (2 ** attempt) + (uuid.uuid4().int % 100) / 1000.0)
-                        continue
-                    return Response(e.read() if e.fp else b"{}", status=e.code, mimetype="application/json")
-                except Exception as e:
-                    last_exc = e
-                    if attempt < max_retries:
-                        time.sleep(0.2 * (2 ** attempt) + (uuid.uuid4().int % 100) / 1000.0)
-                        continue
-                    _json_log("error", "forward_failed", trace_id, cell=cell, error=str(e))
-                    return _error_response("CELL_UNREACHABLE", str(e), "", request.headers.get("X-Request-ID", ""), 502)
-            if last_exc:
-                _json_log("error", "forward_failed", trace_id, cell=cell, error=str(last_exc))
-                return _error_response("CELL_UNREACHABLE", str(last_exc), "", request.headers.get("X-Request-ID", ""), 502)
-        # 未开启真实转发时返回前端期望的列表/健康结构，避免控制台报错
-        if request.method.upper() == "GET" and path == "health":
-            return jsonify({"status": "up", "cell": cell}), 200
-        if request.method.upper() == "GET":
-            return jsonify({"data": [], "total": 0}), 200
-        return jsonify({
-            "gateway": "ok",
-            "cell": cell,
-            "path": path,
-            "traceId": trace_id,
-            "spanId": getattr(request, "span_id", ""),
-            "forwardTo": f"{base_url.rstrip('/')}/{path}",
-        }), 200
+            if deadline:
+                fwd_headers[_deadline.HEADER] = _deadline.header_value(deadline)
+            # 流式转发：导出/下载类路径或大请求体，请求体与响应体按块管道传输，不整体进入网关内存
+            chunked_upload = "chunked" in (request.headers.get("Transfer-Encoding") or "").lower()
+            if _should_stream(path, request.content_length, chunked_upload):
+                return _stream_proxy(base_url, path, fwd_headers, timeout_sec, max_retries, chunked_upload, trace_id, cell,
+                                     deadline, config.signing_secret)
+            body = request.get_data() or None
+            _apply_signature(fwd_headers, request.method, path, body, config.signing_secret)
+            cache_args = _cache_args(cell, path, request.method, request.headers.get("X-Tenant-Id"), request.principal)
+            query_string = request.query_string.decode() if request.query_string else ""
+            # 无 urllib3 时 http_client 内部回退到 urllib（同一重试策略、重试预算与截止时间）
+            try:
+                status, out_headers, resp_body = _http_client.forward_request(
+                    base_url, path, request.method, body, fwd_headers,
+                    timeout=timeout_sec, max_retries=max_retries, cell=cell,
+                    query_string=query_string, **cache_args,
+                    fields=_projection_fields(request.method, query_string),
+                    client_accept_encoding=request.headers.get("Accept-Encoding"),
+                    deadline=deadline,
+                    client_if_none_match=request.headers.get("If-None-Match"),
+                )
+                mimetype = out_headers.get("Content-Type", "application/json") or "application/json"
+                resp = Response(resp_body, status=status, mimetype=mimetype)
+                for k, v in out_headers.items():
+                    if k.lower() != "content-type":
+                        resp.headers[k] = v
+                return resp
+            except Exception as e:
+                return _forward_failed(e, trace_id, cell, deadline)
+        return jsonify(_mock_payload(cell, path, request.method, trace_id, getattr(request, "span_id", ""), base_url)), 200
 
     @app.route("/health")
     def health():
@@ -864,7 +1376,7 @@ def create_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None,
 # 独立运行时的入口（开箱即用：动态路由 + 熔断 + 追踪）
 if __name__ == "__main__":
     def _resolve(cell):
-        routes = load_routes() if load_routes else {}
+        routes = get_route_table().snapshot if get_route_table else {}
         return routes.get(cell) or os.environ.get(f"CELL_{cell.upper()}_URL", "http://localhost:8001")
     def _emit(trace_id, cell, path, status, duration_ms):
         _json_log("info", "request", trace_id, cell=cell, path=path, status=status, duration_ms=duration_ms)
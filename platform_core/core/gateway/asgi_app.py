@@ -0,0 +1,516 @@
+"""
+网关异步引擎（ASGI）：事件循环承载 /api/v1/<cell>/<path> 的上游转发，在途请求不再各占一个 OS 线程。
+- 代理链路（限流、应用密钥、租户校验/配额、必填头、红绿灯、熔断、加签、审计、监控上报）与 create_app 行为一致。
+- 上游等待与重试退避只挂起协程（async_http_client），慢细胞下可同时承载数千在途请求，内存随连接数平稳增长。
+- 导出/下载类路径与大请求体（should_stream）按块经 receive/send 与上游管道传输，不整体读入内存；
+  开启加签时请求体需整体签名而先读入（响应仍流式），进程内细胞（inproc://）仍整体转发。
+- 其余路由（登录、管理端、事件、演示页等）经有界线程池桥接到同一个 Flask 应用，行为不变。
+- 可能阻塞的回调（registry_resolver、monitor_emit、审计落盘）放入线程池执行，不阻塞事件循环。
+启用：GATEWAY_ENGINE=asgi，由 deploy/run_gateway.py 通过 uvicorn（可选依赖）启动；也可挂到任意 ASGI 服务器。
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import app as _gateway_app
+from . import inprocess as _inprocess
+from .async_http_client import AsyncConnectionPool, forward_request_async, stream_request_async
+from .pipeline import RequestPrincipal, bind_monitor_emit
+
+logger = logging.getLogger("gateway.asgi")
+
+# 桥接 Flask（非代理路由）与阻塞回调的线程数
+ASGI_WORKER_THREADS = int(os.environ.get("GATEWAY_ASGI_WORKER_THREADS", "32"))
+_PROXY_PATH = re.compile(r"^/api/v1/([^/]+)/(.+)$")
+_PROXY_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+_SECURITY_HEADERS = (
+    ("X-Content-Type-Options", "nosniff"),
+    ("X-Frame-Options", "DENY"),
+    ("X-XSS-Protection", "1; mode=block"),
+)
+
+
+class _Headers:
+    """ASGI 请求头的大小写无关只读视图（与 Flask request.headers.get 用法一致）。"""
+
+    def __init__(self, raw: List[Tuple[bytes, bytes]]):
+        self._h: Dict[str, str] = {}
+        for k, v in raw:
+            name = k.decode("latin-1").lower()
+            val = v.decode("latin-1")
+            self._h[name] = f"{self._h[name]}, {val}" if name in self._h else val
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self._h.get(name.lower(), default)
+
+    def items(self):
+        return self._h.items()
+
+
+def _error_payload(code: str, message: str, details: str, request_id: str) -> bytes:
+    return json.dumps({"code": code, "message": message, "details": details, "requestId": request_id}, ensure_ascii=False).encode("utf-8")
+
+
+class GatewayASGI:
+    """ASGI 可调用对象：代理路由走异步转发，其余路由桥接至 Flask 网关应用。"""
+
+    def __init__(self, flask_app, monitor_emit: Optional[Callable] = None, circuit_breakers=None):
+        self.flask_app = flask_app
+        self.monitor_emit = bind_monitor_emit(monitor_emit)
+        self.breakers = circuit_breakers
+        self.resolver = flask_app.extensions.get("gateway_resolver")
+        self.token_store = flask_app.extensions.get("gateway_token_store")
+        # 与 Flask 应用共用启动期配置快照（转发开关、租户校验、应用密钥、超时与重试）
+        self.config = flask_app.extensions["gateway_config"]
+        self._pool: Optional[AsyncConnectionPool] = None
+        self._pool_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor = ThreadPoolExecutor(max_workers=ASGI_WORKER_THREADS, thread_name_prefix="gateway-asgi")
+
+    # ---------- ASGI 入口 ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        m = _PROXY_PATH.match(scope.get("path") or "")
+        if m and scope["method"].upper() in _PROXY_METHODS and self.config.real_forward:
+            await self._proxy(scope, receive, send, m.group(1), m.group(2))
+        else:
+            await self._call_wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            msg = await receive()
+            if msg["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif msg["type"] == "lifespan.shutdown":
+                await self.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        self._executor.shutdown(wait=False)
+
+    def _get_pool(self) -> AsyncConnectionPool:
+        """连接与信号量绑定事件循环；循环变化（如测试中多次 asyncio.run）时重建连接池。"""
+        loop = asyncio.get_running_loop()
+        if self._pool is None or self._pool_loop is not loop:
+            self._pool = AsyncConnectionPool()
+            self._pool_loop = loop
+        return self._pool
+
+    async def _run_blocking(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    # ---------- 代理链路：与 create_app 的 before_request / proxy / after_request 对齐 ----------
+    async def _proxy(self, scope, receive, send, cell: str, path: str) -> None:
+        start = time.perf_counter()
+        method = scope["method"].upper()
+        headers = _Headers(scope.get("headers") or [])
+        request_id = headers.get("X-Request-ID", "")
+        trace_id = headers.get("X-Trace-Id") or request_id or os.urandom(16).hex()
+        span_id = headers.get("X-Span-Id") or os.urandom(8).hex()
+        principal = RequestPrincipal(self.token_store, headers.get("Authorization"))
+        ip = (scope.get("client") or ("0.0.0.0", 0))[0] or "0.0.0.0"
+        query_string = (scope.get("query_string") or b"").decode("latin-1")
+        ctx = {"cell": None}
+
+        async def respond(status: int, body: Any, resp_headers: Dict[str, str]) -> None:
+            """body 为 bytes 时整体发送；为异步块迭代器（流式转发）时逐块发送，结束后关闭上游。"""
+            ctx["status"] = status
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            streamed = not isinstance(body, (bytes, bytearray))
+            out = [(k.encode("latin-1"), str(v).encode("latin-1")) for k, v in resp_headers.items()
+                   if not (streamed and k.lower() == "content-length")]
+            if not streamed:
+                out.append((b"content-length", str(len(body)).encode()))
+            for k, v in _SECURITY_HEADERS:
+                out.append((k.encode(), v.encode()))
+            out.append((b"x-response-time", str(duration_ms).encode()))
+            out.append((b"x-trace-id", trace_id.encode("latin-1")))
+            out.append((b"x-span-id", span_id.encode("latin-1")))
+            sent = 0
+            if streamed:
+                try:
+                    await send({"type": "http.response.start", "status": status, "headers": out})
+                    async for chunk in body:
+                        sent += len(chunk)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    await send({"type": "http.response.body", "body": b""})
+                except Exception as e:
+                    # 响应头已发出，无法改写状态码：记录后中断连接，客户端按不完整响应处理
+                    _gateway_app._json_log("error", "forward_failed", trace_id, cell=ctx["cell"], error=str(e), stream=True)
+                finally:
+                    await body.aclose()
+            else:
+                await send({"type": "http.response.start", "status": status, "headers": out})
+                await send({"type": "http.response.body", "body": body})
+                sent = len(body)
+            ticket = ctx.pop("ticket", None)
+            if ticket is not None:
+                ticket.release()
+            lease = ctx.pop("lease", None)
+            if lease is not None:
+                lease.response_bytes = sent
+                lease.release()
+            idem = ctx.pop("idem", None)
+            if idem is not None:
+                idem.complete(status, resp_headers, body)
+            self._after(method, scope.get("path") or "", status, duration_ms, trace_id, span_id, headers, ctx["cell"], ip,
+                        principal, ctx.get("upstream", False))
+
+        async def reject(code: str, message: str, details: str, status: int) -> None:
+            await respond(status, _error_payload(code, message, details, request_id),
+                          {"Content-Type": "application/json; charset=utf-8"})
+
+        rate_limit = _gateway_app._rate_limit
+        if rate_limit and getattr(rate_limit, "allow_request", None):
+            ok, reason = rate_limit.allow_request(ip, principal.token or None)
+            if not ok:
+                return await reject("RATE_LIMIT", "请求过于频繁，请稍后重试", reason, 429)
+        if self.config.app_keys:
+            app_key = (headers.get("X-App-Key") or "").strip()
+            if app_key and app_key not in self.config.app_keys:
+                return await reject("INVALID_APP_KEY", "应用密钥无效", "", 401)
+        if self.config.validate_tenant:
+            tenant_id = (headers.get("X-Tenant-Id") or "").strip()
+            if tenant_id and _gateway_app.get_tenant_store and _gateway_app.get_tenant_quota:
+                if not _gateway_app.get_tenant_store().is_valid(tenant_id):
+                    return await reject("TENANT_INVALID", "租户不存在、已禁用或已到期", "", 403)
+                try:
+                    request_bytes = int(headers.get("Content-Length") or 0)
+                except ValueError:
+                    request_bytes = 0
+                ok, reason, ctx["lease"] = _gateway_app.get_tenant_quota().admit(tenant_id, request_bytes)
+                if not ok:
+                    return await reject("QUOTA_EXCEEDED", _gateway_app._QUOTA_MESSAGES.get(reason, "租户配额已达上限，请稍后重试"), reason, 429)
+
+        ctx["cell"] = cell
+        ok, err = _gateway_app._check_required_headers(method, headers)
+        if not ok:
+            _gateway_app._json_log("warn", "missing_headers", trace_id, error=err)
+            return await reject(err["code"], err["message"], err.get("details", ""), 400)
+        if self.config.require_tenant_id and not (headers.get("X-Tenant-Id") or "").strip():
+            _gateway_app._json_log("warn", "missing_tenant_id", trace_id, cell=cell)
+            return await reject("MISSING_TENANT_ID", "请求头缺少租户标识",
+                                "生产环境要求请求头携带 X-Tenant-Id，请登录后使用系统分配的租户ID", 400)
+        deadline_mod = _gateway_app._deadline
+        deadline = 0.0
+        if deadline_mod:
+            deadline = deadline_mod.compute(headers, cell, path, self.config.proxy_timeout_sec)
+            if deadline_mod.remaining(deadline) <= 0:
+                _gateway_app._json_log("warn", "deadline_exceeded", trace_id, cell=cell)
+                return await reject("DEADLINE_EXCEEDED", "请求已超过截止时间", "", 504)
+        # 写请求幂等：重试重放已完成响应；同键在途时先不阻塞判定，需等待时交给线程池，不阻塞事件循环
+        idempotency = _gateway_app._idempotency
+        cache = idempotency.get_idempotency_cache() if idempotency else None
+        if (cache is not None and cache.enabled and method in idempotency.METHODS and request_id
+                and not _gateway_app._should_stream(path, *_upload_framing(headers))):
+            body = await _read_body(receive)
+            receive = _replay_receive(body)
+            tenant_id = (headers.get("X-Tenant-Id") or "").strip()
+            fp = idempotency.fingerprint(method, cell, path, body)
+            state, value = cache.begin(tenant_id, request_id, fp, 0)
+            if state == idempotency.BUSY:
+                wait = idempotency.IDEMPOTENCY_WAIT_SEC
+                if deadline:
+                    wait = min(wait, deadline_mod.remaining(deadline))
+                state, value = await self._run_blocking(cache.begin, tenant_id, request_id, fp, wait)
+            if state == idempotency.REPLAY:
+                status, resp_headers, resp_body = value
+                return await respond(status, resp_body, {**resp_headers, idempotency.REPLAY_HEADER: "true"})
+            if state == idempotency.MISMATCH:
+                _gateway_app._json_log("warn", "idempotency_key_reused", trace_id, cell=cell, request_id=request_id)
+                return await reject("IDEMPOTENCY_KEY_REUSED", "X-Request-ID 已用于不同的请求", "", 422)
+            if state == idempotency.BUSY:
+                _gateway_app._json_log("warn", "idempotency_in_progress", trace_id, cell=cell, request_id=request_id)
+                return await reject("REQUEST_IN_PROGRESS", "相同 X-Request-ID 的请求正在处理，请稍后重试", "", 409)
+            ctx["idem"] = value
+        traffic_light = _gateway_app._traffic_light
+        if self.config.traffic_light and traffic_light and method != "GET" and traffic_light.is_red_light():
+            traffic_light.emit_red_light_log(trace_id, method, scope.get("path") or "")
+            return await reject("RED_LIGHT", "系统负载过高，仅允许只读请求，请稍后重试", "", 503)
+        if self.breakers and not self.breakers.get(cell).allow_request():
+            _gateway_app._json_log("warn", "circuit_open", trace_id, cell=cell)
+            return await reject("CIRCUIT_OPEN", f"细胞 {cell} 熔断中", "", 503)
+        limiter = traffic_light.get_limiter(cell) if traffic_light and getattr(traffic_light, "get_limiter", None) else None
+        if limiter is not None and not limiter.try_acquire():
+            _gateway_app._json_log("warn", "adaptive_limit_reject", trace_id, cell=cell, limit=limiter.limit)
+            return await reject("OVERLOADED", f"细胞 {cell} 负载过高，请稍后重试", "", 503)
+        bulkhead = self.breakers.bulkhead(cell) if self.breakers and getattr(self.breakers, "bulkhead", None) else None
+        if bulkhead is not None and not bulkhead.try_acquire():
+            if limiter is not None:
+                limiter.release()
+            _gateway_app._json_log("warn", "bulkhead_full", trace_id, cell=cell, in_flight=bulkhead.in_flight)
+            return await reject("CELL_BUSY", f"细胞 {cell} 并发已达上限，请稍后重试", "", 503)
+        # 细胞内租户加权公平排队：协程内等待，不占用线程；名额在响应发出后归还
+        fair_queue = _gateway_app._fair_queue
+        if fair_queue:
+            tenant = (headers.get("X-Tenant-Id") or "").strip() or "default"
+            store = _gateway_app.get_tenant_store
+            timeout = fair_queue.FAIR_QUEUE_TIMEOUT_SEC
+            if deadline:
+                timeout = min(timeout, deadline_mod.remaining(deadline))
+            queue_rejected = None
+            try:
+                ctx["ticket"] = await fair_queue.get_scheduler(cell).acquire_async(
+                    tenant, store().weight(tenant) if store else 1.0, timeout)
+            except fair_queue.QueueFull:
+                _gateway_app._json_log("warn", "tenant_queue_full", trace_id, cell=cell, tenant=tenant)
+                queue_rejected = ("TENANT_QUEUE_FULL", "租户排队请求过多，请稍后重试", 429)
+            if queue_rejected is None and ctx["ticket"] is None:
+                _gateway_app._json_log("warn", "fair_queue_timeout", trace_id, cell=cell, tenant=tenant)
+                queue_rejected = ("QUEUE_TIMEOUT", "网关繁忙，排队超时，请稍后重试", 503)
+            if queue_rejected is not None:
+                for holder in (bulkhead, limiter):
+                    if holder is not None:
+                        holder.release()
+                return await reject(queue_rejected[0], queue_rejected[1], "", queue_rejected[2])
+        try:
+            await self._forward(receive, path, method, headers, query_string, cell, trace_id, respond, reject, deadline,
+                                principal, ctx)
+        finally:
+            for key in ("ticket", "lease", "idem"):
+                holder = ctx.pop(key, None)
+                if holder is not None:
+                    holder.release()
+            if bulkhead is not None:
+                bulkhead.release()
+            if limiter is not None:
+                limiter.on_sample((time.perf_counter() - start) * 1000, dropped=ctx.get("status", 502) in (502, 503, 504))
+                limiter.release()
+
+    async def _forward(self, receive, path: str, method: str, headers: _Headers, query_string: str,
+                       cell: str, trace_id: str, respond, reject, deadline: float = 0.0, principal=None,
+                       ctx: Optional[Dict[str, Any]] = None) -> None:
+        """解析细胞地址并异步转发（舱壁名额由调用方持有）；解析成功后在 ctx 标记已发往细胞，供熔断计数。"""
+        base_url = await self._run_blocking(self.resolver, cell) if callable(self.resolver) else None
+        if not base_url:
+            _gateway_app._json_log("warn", "cell_not_found", trace_id, cell=cell)
+            return await reject("CELL_NOT_FOUND", f"细胞未注册: {cell}", "", 503)
+        if ctx is not None:
+            ctx["upstream"] = True
+        balancer = _gateway_app._load_balancer.get_load_balancer() if _gateway_app._load_balancer else None
+        endpoint = balancer.pick(cell, base_url) if balancer else None
+        if endpoint is None:
+            return await self._forward_to(receive, base_url, path, method, headers, query_string, cell, trace_id,
+                                          respond, reject, deadline, principal)
+        start = time.perf_counter()
+        status = [502]
+
+        async def _respond(st, body, hdrs):
+            status[0] = st
+            await respond(st, body, hdrs)
+
+        try:
+            await self._forward_to(receive, endpoint.url, path, method, headers, query_string, cell, trace_id,
+                                   _respond, reject, deadline, principal)
+        finally:
+            balancer.on_result(endpoint, (time.perf_counter() - start) * 1000, success=status[0] < 500)
+
+    async def _forward_to(self, receive, base_url: str, path: str, method: str, headers: _Headers, query_string: str,
+                          cell: str, trace_id: str, respond, reject, deadline: float = 0.0, principal=None) -> None:
+        """转发到选定实例；deadline（Unix 秒）透传至细胞并约束重试与对冲。should_stream 的请求按块转发。"""
+        timeout_sec = self.config.proxy_timeout_sec
+        max_retries = self.config.proxy_retry_count
+        signing = _gateway_app._signing
+        signed = bool(signing and self.config.signing_secret)
+        content_length, chunked_upload = _upload_framing(headers)
+        streamed = _gateway_app._should_stream(path, content_length, chunked_upload) and not _inprocess.is_inprocess(base_url)
+        if streamed and not signed:
+            body = _iter_body(receive) if (chunked_upload or content_length) else None
+        else:
+            body = await _read_body(receive) or None
+            content_length = len(body) if body else None
+        fwd_headers = {h: headers.get(h) for h in ("Authorization", "Content-Type", "X-Request-ID", "X-Tenant-Id", "X-Trace-Id", "X-Span-Id") if headers.get(h)}
+        if deadline:
+            fwd_headers[_gateway_app._deadline.HEADER] = _gateway_app._deadline.header_value(deadline)
+        if signed:
+            hs = {k: headers.get(k) or "" for k in ("X-Request-ID", "X-Tenant-Id", "X-Trace-Id")}
+            sig = signing.compute_signature(method, f"/{path}", body or b"", hs, secret=self.config.signing_secret)
+            if sig:
+                fwd_headers[signing.SIGNATURE_HEADER] = sig
+                fwd_headers[signing.SIGNATURE_TIME_HEADER] = str(int(time.time()))
+        try:
+            if streamed:
+                status, out_headers, resp_body = await stream_request_async(
+                    self._get_pool(), base_url, path, method, body, fwd_headers,
+                    timeout=timeout_sec, max_retries=max_retries, query_string=query_string,
+                    content_length=content_length if body is not None else None,
+                    client_accept_encoding=headers.get("Accept-Encoding"), cell=cell, deadline=deadline,
+                )
+            else:
+                cache_args = _gateway_app._cache_args(cell, path, method, headers.get("X-Tenant-Id"), principal)
+                status, out_headers, resp_body = await forward_request_async(
+                    self._get_pool(), base_url, path, method, body, fwd_headers,
+                    timeout=timeout_sec, max_retries=max_retries, cell=cell,
+                    query_string=query_string, **cache_args,
+                    fields=_gateway_app._projection_fields(method, query_string),
+                    client_accept_encoding=headers.get("Accept-Encoding"), deadline=deadline,
+                    client_if_none_match=headers.get("If-None-Match"),
+                )
+        except Exception as e:
+            _gateway_app._json_log("error", "forward_failed", trace_id, cell=cell, error=str(e))
+            if deadline and (isinstance(e, _gateway_app._deadline.DeadlineExceeded)
+                             or _gateway_app._deadline.remaining(deadline) <= 0):
+                return await reject("DEADLINE_EXCEEDED", "请求已超过截止时间", "", 504)
+            return await reject("CELL_UNREACHABLE", str(e) or type(e).__name__, "", 502)
+        if not any(k.lower() == "content-type" for k in out_headers):
+            out_headers = {**out_headers, "Content-Type": "application/json"}
+        await respond(status, resp_body, out_headers)
+
+    def _after(self, method: str, path: str, status: int, duration_ms: int, trace_id: str, span_id: str,
+               headers: _Headers, cell: Optional[str], ip: str, principal=None, upstream: bool = False) -> None:
+        """对应 after_request：熔断计数就地更新（仅实际发往细胞的调用）；监控上报与审计落盘交给线程池，响应已发出不等待。"""
+        if self.breakers and cell and upstream:
+            self.breakers.get(cell).record(success=status < 500, duration_ms=duration_ms)
+        if self.config.apm_log:
+            _gateway_app._json_log("info", "apm_span", trace_id, span_id=span_id, cell=cell, path=path, status=status, duration_ms=duration_ms)
+        monitor_emit = self.monitor_emit
+        audit_log = _gateway_app._audit_log
+        tenant_id = headers.get("X-Tenant-Id", "")
+
+        def _work():
+            if callable(monitor_emit) and cell is not None:
+                try:
+                    monitor_emit(trace_id, cell, path, status, duration_ms, span_id)
+                except Exception as e:
+                    logger.debug("monitor_emit failed: %s", e)
+            if audit_log and getattr(audit_log, "append", None):
+                audit_log.append(method, path, status, duration_ms, trace_id=trace_id, tenant_id=tenant_id,
+                                 user=principal.username if principal is not None else "", cell=cell or "", ip=ip)
+
+        self._executor.submit(_work)
+
+    # ---------- 非代理路由：桥接 Flask WSGI ----------
+    async def _call_wsgi(self, scope, receive, send) -> None:
+        body = await _read_body(receive)
+        environ = _build_environ(scope, body)
+        status_headers: Dict[str, Any] = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            status_headers["status"] = int(status.split(" ", 1)[0])
+            status_headers["headers"] = response_headers
+            return lambda data: None
+
+        def _run() -> bytes:
+            result = self.flask_app(environ, start_response)
+            try:
+                return b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+
+        payload = await self._run_blocking(_run)
+        out = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in status_headers.get("headers", [])]
+        await send({"type": "http.response.start", "status": status_headers.get("status", 500), "headers": out})
+        await send({"type": "http.response.body", "body": payload})
+
+
+def _upload_framing(headers: _Headers) -> Tuple[Optional[int], bool]:
+    """请求体分帧：(Content-Length 或 None, 是否 chunked 上传)，参数顺序同 should_stream。"""
+    try:
+        content_length = int(headers.get("Content-Length")) if headers.get("Content-Length") else None
+    except ValueError:
+        content_length = None
+    return content_length, "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+
+
+async def _iter_body(receive):
+    """按 ASGI 消息逐块产出请求体（流式转发），不整体缓冲；客户端中途断开时抛出 ConnectionError。"""
+    while True:
+        msg = await receive()
+        if msg["type"] == "http.disconnect":
+            raise ConnectionError("client disconnected")
+        chunk = msg.get("body", b"")
+        if chunk:
+            yield chunk
+        if not msg.get("more_body"):
+            return
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        msg = await receive()
+        if msg["type"] == "http.disconnect":
+            break
+        chunks.append(msg.get("body", b""))
+        if not msg.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay_receive(body: bytes):
+    """已读出的请求体重新作为 ASGI receive 提供给后续转发。"""
+    sent = [False]
+
+    async def receive():
+        if sent[0]:
+            return {"type": "http.disconnect"}
+        sent[0] = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    return receive
+
+
+def _build_environ(scope, body: bytes) -> Dict[str, Any]:
+    """ASGI scope -> WSGI environ（PEP 3333）。"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("0.0.0.0", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope.get("path", "/"),
+        "QUERY_STRING": (scope.get("query_string") or b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for k, v in scope.get("headers") or []:
+        name = k.decode("latin-1").upper().replace("-", "_")
+        value = v.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name == "CONTENT_LENGTH":
+            continue
+        else:
+            key = "HTTP_" + name
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def create_asgi_app(registry_resolver=None, monitor_emit=None, circuit_breakers=None, use_dynamic_routes=False):
+    """
+    创建 ASGI 网关：参数与 create_app 一致。
+    内部先构建同一个 Flask 应用（非代理路由、会话存储、解析器共用），再由 GatewayASGI 承接代理转发。
+    """
+    flask_app = _gateway_app.create_app(
+        registry_resolver, monitor_emit, circuit_breakers=circuit_breakers, use_dynamic_routes=use_dynamic_routes,
+    )
+    return GatewayASGI(flask_app, monitor_emit=monitor_emit, circuit_breakers=circuit_breakers)
+
+
+__all__ = ["GatewayASGI", "create_asgi_app"]
@@ -0,0 +1,531 @@
+"""
+网关异步上游客户端（asyncio 原生 HTTP/1.1）：供 ASGI 引擎转发 /api/v1/<cell>/<path>。
+- 连接池：按 (scheme, host, port) 复用 keep-alive 连接；每 host 在途连接数由信号量封顶，超出时协程排队而非占用线程。
+- 重试：与 http_client.forward_request 一致（retry_policy 策略与细胞重试预算，GET 超过 p95 时对冲），
+  退避使用 asyncio.sleep、对冲以协程并发，不阻塞事件循环。
+- GET 缓存与压缩复用 http_client 的实现，保证两种引擎行为一致；并发未命中按 key 合并为一个上游协程，
+  陈旧命中先返回旧值并以后台任务刷新。
+- inproc://<cell>（进程内调度，见 inprocess）在线程池中调用细胞 WSGI 应用，不对冲。
+- 流式：stream_request_async 只读取响应头即返回，响应体按 STREAM_CHUNK_BYTES 分块异步读取；请求体可为异步块迭代器
+  （ASGI receive），按 Content-Length 或 chunked 边读边发；连接与每 host 名额在响应体读完或关闭时归还。
+无第三方依赖；仅支持 http/https 与 Content-Length / chunked / 连接关闭三种响应分帧。
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import ssl
+import zlib
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from . import http_client as _http_client
+from . import inprocess as _inprocess
+from . import projection as _projection
+from . import retry_policy as _retry_policy
+
+logger = logging.getLogger("gateway.async_http_client")
+
+# 每 host 最大在途连接数（协程超出则排队）；空闲连接保留上限
+ASYNC_POOL_MAX_PER_HOST = int(os.environ.get("GATEWAY_ASYNC_POOL_MAX_PER_HOST", "256"))
+ASYNC_POOL_MAX_IDLE = int(os.environ.get("GATEWAY_ASYNC_POOL_MAX_IDLE", "64"))
+_CONNECT_TIMEOUT_SEC = 5.0
+_HOP_BY_HOP = ("transfer-encoding", "connection", "keep-alive")
+
+_HostKey = Tuple[str, str, int]
+_Conn = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class UpstreamResponse:
+    """上游响应：status、headers（保留原始大小写）、body；keep_alive 表示连接可否归还连接池。"""
+
+    __slots__ = ("status", "headers", "body", "keep_alive")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes, keep_alive: bool):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+
+
+class UpstreamStream:
+    """
+    流式上游响应：status、headers 已读取；本身即响应体的异步块迭代器（每块不超过 STREAM_CHUNK_BYTES，
+    单次读取超过 timeout 抛出 asyncio.TimeoutError）。读完、出错或 aclose 时归还连接与每 host 名额（幂等）。
+    """
+
+    def __init__(self, pool: "AsyncConnectionPool", key: _HostKey, conn: _Conn, sem: asyncio.Semaphore,
+                 method: str, head: Tuple[int, Dict[str, str], bool], timeout: float):
+        self.status, self.headers, self._keep_alive = head
+        self._pool = pool
+        self._key = key
+        self._conn: Optional[_Conn] = conn
+        self._sem = sem
+        self._framing = _framing(method, self.status, self.headers)
+        self._timeout = timeout
+        self._body: Optional[AsyncIterator[bytes]] = None
+        self._gunzip: Any = None
+
+    def release(self, reuse: bool = False) -> None:
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._release_conn(self._key, conn, reuse and self._keep_alive and self._framing[0] != "eof")
+            self._sem.release()
+
+    def decode_gzip(self) -> None:
+        """增量解压 gzip 响应体（客户端不接受 gzip 时使用，同 http_client._gunzip_chunks）。"""
+        self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def __aiter__(self) -> "UpstreamStream":
+        return self
+
+    async def __anext__(self) -> bytes:
+        while self._conn is not None:
+            if self._body is None:
+                self._body = _body_chunks(self._conn[0], *self._framing, _http_client.STREAM_CHUNK_BYTES)
+            try:
+                part = await asyncio.wait_for(self._body.__anext__(), timeout=self._timeout)
+            except StopAsyncIteration:
+                self.release(reuse=True)
+                if self._gunzip is not None:
+                    tail = self._gunzip.flush()
+                    if tail:
+                        return tail
+                break
+            except BaseException:
+                self.release()
+                raise
+            if self._gunzip is None:
+                return part
+            part = self._gunzip.decompress(part)
+            if part:
+                return part
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        self.release()
+
+
+class AsyncConnectionPool:
+    """asyncio 连接池：同一事件循环内使用，不跨线程。"""
+
+    def __init__(self, max_per_host: Optional[int] = None, max_idle: Optional[int] = None):
+        self.max_per_host = max_per_host or ASYNC_POOL_MAX_PER_HOST
+        self.max_idle = max_idle or ASYNC_POOL_MAX_IDLE
+        self._idle: Dict[_HostKey, Deque[_Conn]] = {}
+        self._sems: Dict[_HostKey, asyncio.Semaphore] = {}
+        self._ssl_ctx: Optional[ssl.SSLContext] = None
+        # GET 缓存 key -> 在途上游任务（单飞合并）
+        self.inflight: Dict[str, "asyncio.Future"] = {}
+
+    def _sem(self, key: _HostKey) -> asyncio.Semaphore:
+        sem = self._sems.get(key)
+        if sem is None:
+            sem = self._sems[key] = asyncio.Semaphore(self.max_per_host)
+        return sem
+
+    async def _acquire_conn(self, key: _HostKey, reuse: bool = True) -> Tuple[_Conn, bool]:
+        """返回 (连接, 是否复用)。复用前丢弃已被对端关闭的连接；reuse=False 时总是新建。"""
+        idle = self._idle.get(key) if reuse else None
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return (reader, writer), True
+            writer.close()
+        scheme, host, port = key
+        ssl_ctx = None
+        if scheme == "https":
+            if self._ssl_ctx is None:
+                self._ssl_ctx = ssl.create_default_context()
+            ssl_ctx = self._ssl_ctx
+        conn = await asyncio.wait_for(asyncio.open_connection(host, port, ssl=ssl_ctx), timeout=_CONNECT_TIMEOUT_SEC)
+        return conn, False
+
+    def _release_conn(self, key: _HostKey, conn: _Conn, keep_alive: bool) -> None:
+        reader, writer = conn
+        idle = self._idle.setdefault(key, deque())
+        if keep_alive and not writer.is_closing() and len(idle) < self.max_idle:
+            idle.append(conn)
+        else:
+            writer.close()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Optional[bytes],
+        timeout: float,
+    ) -> UpstreamResponse:
+        """发送单次请求（不重试）。复用连接失败（对端已关闭）时自动新建连接重发一次。"""
+        key, target, host_header = _target(url)
+        async with self._sem(key):
+            for _ in range(2):
+                conn, reused = await self._acquire_conn(key)
+                try:
+                    resp = await asyncio.wait_for(
+                        _roundtrip(conn, method, target, host_header, headers, body),
+                        timeout=timeout,
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    conn[1].close()
+                    if reused:
+                        logger.debug("stale pooled connection to %s:%s dropped: %s", key[1], key[2], e)
+                        continue
+                    raise
+                except BaseException:
+                    conn[1].close()
+                    raise
+                self._release_conn(key, conn, resp.keep_alive)
+                return resp
+        raise ConnectionError(f"upstream {key[1]}:{key[2]} unavailable")
+
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        body: Any,
+        timeout: float,
+        content_length: Optional[int] = None,
+    ) -> "UpstreamStream":
+        """
+        发送单次请求（不重试）并只读取响应头；响应体经返回对象分块读取，读完或关闭时归还连接与名额。
+        body 为 bytes、异步块迭代器或 None；异步迭代器无法重放，因此使用新建连接。
+        """
+        key, target, host_header = _target(url)
+        replayable = body is None or isinstance(body, (bytes, bytearray))
+        sem = self._sem(key)
+        await sem.acquire()
+        try:
+            for _ in range(2):
+                conn, reused = await self._acquire_conn(key, reuse=replayable)
+                try:
+                    await _write_request(conn[1], method, target, host_header, headers, body, content_length, timeout)
+                    head = await asyncio.wait_for(_read_head(conn[0]), timeout=timeout)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    conn[1].close()
+                    if reused:
+                        logger.debug("stale pooled connection to %s:%s dropped: %s", key[1], key[2], e)
+                        continue
+                    raise
+                except BaseException:
+                    conn[1].close()
+                    raise
+                return UpstreamStream(self, key, conn, sem, method, head, timeout)
+            raise ConnectionError(f"upstream {key[1]}:{key[2]} unavailable")
+        except BaseException:
+            sem.release()
+            raise
+
+    async def close(self) -> None:
+        for idle in self._idle.values():
+            while idle:
+                _, writer = idle.pop()
+                writer.close()
+        self._idle.clear()
+
+
+def _target(url: str) -> Tuple[_HostKey, str, str]:
+    """URL -> (连接池 key, 请求目标, Host 头)。"""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "http").lower()
+    host = parts.hostname or "localhost"
+    port = parts.port or (443 if scheme == "https" else 80)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    return (scheme, host, port), target, (host if parts.port is None else f"{host}:{port}")
+
+
+async def _write_request(writer: asyncio.StreamWriter, method: str, target: str, host_header: str,
+                         headers: Dict[str, str], body: Any, content_length: Optional[int] = None,
+                         timeout: Optional[float] = None) -> None:
+    """写请求行与头；body 为异步块迭代器时边读边发（长度未知用 chunked），每次 drain 不超过 timeout。"""
+    streamed = body is not None and not isinstance(body, (bytes, bytearray))
+    lines = [f"{method} {target} HTTP/1.1", f"Host: {host_header}"]
+    lower = {k.lower() for k in headers}
+    for k, v in headers.items():
+        if k.lower() in ("host", "content-length", "connection", "transfer-encoding"):
+            continue
+        lines.append(f"{k}: {v}")
+    if streamed:
+        lines.append("Transfer-Encoding: chunked" if content_length is None else f"Content-Length: {content_length}")
+    elif body or method in ("POST", "PUT", "PATCH") or "content-length" in lower:
+        lines.append(f"Content-Length: {len(body or b'')}")
+    lines.append("Connection: keep-alive")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if streamed:
+        async for chunk in body:
+            if not chunk:
+                continue
+            if content_length is None:
+                writer.write(b"%x\r\n" % len(chunk))
+                writer.write(chunk)
+                writer.write(b"\r\n")
+            else:
+                writer.write(chunk)
+            await asyncio.wait_for(writer.drain(), timeout=timeout)
+        if content_length is None:
+            writer.write(b"0\r\n\r\n")
+    elif body:
+        writer.write(body)
+    await asyncio.wait_for(writer.drain(), timeout=timeout)
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bool]:
+    """读取状态行与响应头，返回 (status, headers, keep_alive)。"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("upstream closed connection")
+    parts = status_line.decode("latin-1").split(" ", 2)
+    status = int(parts[1])
+    resp_headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        resp_headers[name.strip()] = value.strip()
+    connection = next((v for k, v in resp_headers.items() if k.lower() == "connection"), "")
+    return status, resp_headers, connection.lower() != "close" and parts[0] != "HTTP/1.0"
+
+
+def _framing(method: str, status: int, headers: Dict[str, str]) -> Tuple[str, int]:
+    """响应体分帧：("none"|"chunked"|"length"|"eof", 长度)。"""
+    lower_headers = {k.lower(): v for k, v in headers.items()}
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        return "none", 0
+    if "chunked" in lower_headers.get("transfer-encoding", "").lower():
+        return "chunked", 0
+    if "content-length" in lower_headers:
+        return "length", int(lower_headers["content-length"])
+    return "eof", 0
+
+
+async def _body_chunks(reader: asyncio.StreamReader, framing: str, length: int,
+                       chunk_size: int) -> AsyncIterator[bytes]:
+    """按分帧读取响应体，每块不超过 chunk_size 字节。"""
+    if framing == "chunked":
+        while True:
+            size_line = await reader.readline()
+            left = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+            if left == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            while left > 0:
+                part = await reader.readexactly(min(left, chunk_size))
+                left -= len(part)
+                yield part
+            await reader.readexactly(2)
+    elif framing == "length":
+        while length > 0:
+            part = await reader.readexactly(min(length, chunk_size))
+            length -= len(part)
+            yield part
+    elif framing == "eof":
+        while True:
+            part = await reader.read(chunk_size)
+            if not part:
+                return
+            yield part
+
+
+async def _roundtrip(conn: _Conn, method: str, target: str, host_header: str,
+                     headers: Dict[str, str], body: Optional[bytes]) -> UpstreamResponse:
+    reader, writer = conn
+    await _write_request(writer, method, target, host_header, headers, body)
+    status, resp_headers, keep_alive = await _read_head(reader)
+    framing, length = _framing(method, status, resp_headers)
+    chunks = [part async for part in _body_chunks(reader, framing, length, length or _http_client.STREAM_CHUNK_BYTES)]
+    return UpstreamResponse(status, resp_headers, b"".join(chunks), keep_alive and framing != "eof")
+
+
+async def forward_request_async(
+    pool: AsyncConnectionPool,
+    base_url: str,
+    path: str,
+    method: str,
+    body: Optional[bytes],
+    headers: Dict[str, str],
+    timeout: float = 30,
+    max_retries: int = 2,
+    cell: str = "",
+    query_string: str = "",
+    use_cache: bool = True,
+    client_accept_encoding: Optional[str] = None,
+    deadline: float = 0.0,
+    client_if_none_match: Optional[str] = None,
+    cache_policy: Optional[Any] = None,
+    cache_scope: str = "",
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    forward_request 的异步版本：签名与返回值一致，返回 (status_code, response_headers, body_bytes)。
+    等待上游与退避期间只挂起协程，不占用线程。
+    """
+    method = method.upper()
+    url = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
+    forward_headers = dict(headers)
+    if not any(k.lower() == "accept-encoding" for k in forward_headers):
+        forward_headers["Accept-Encoding"] = "gzip"
+
+    if not (method == "GET" and use_cache and _http_client._cache_ttl(cache_policy) > 0):
+        if method == "GET" and client_if_none_match:
+            forward_headers["If-None-Match"] = client_if_none_match
+        status, out_headers, data = _projection.apply(
+            await _fetch_async(pool, method, url, body, forward_headers, timeout, max_retries, cell, path, deadline),
+            fields)
+        return _http_client._finish(status, out_headers, data, client_accept_encoding)
+
+    cache_key = _http_client._cache_key(cell, path, query_string or "", cache_scope)
+
+    async def _fetch_and_store(deadline: float = 0.0, etag: str = "") -> Tuple[int, Dict[str, str], bytes]:
+        fetch_headers = {**forward_headers, "If-None-Match": etag} if etag else forward_headers
+        try:
+            result = _projection.apply(
+                await _fetch_async(pool, method, url, body, fetch_headers, timeout, max_retries, cell, path, deadline),
+                fields)
+            _http_client._revalidated(cache_key, result, etag, cache_policy)
+            return result
+        finally:
+            pool.inflight.pop(cache_key, None)
+
+    hit = _http_client._cached(cache_key, client_accept_encoding, allow_stale=True)
+    if hit:
+        result, stale = hit
+        if stale and cache_key not in pool.inflight:
+            etag = _http_client.base_etag(_http_client._header(result[1], "ETag"))
+            task = pool.inflight[cache_key] = asyncio.ensure_future(_fetch_and_store(etag=etag))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return _http_client._conditional(result, client_if_none_match)
+    fut = pool.inflight.get(cache_key)
+    if fut is None:
+        fut = pool.inflight[cache_key] = asyncio.ensure_future(_fetch_and_store(deadline))
+    status, out_headers, data = await asyncio.shield(fut)
+    hit = _http_client._cached(cache_key, client_accept_encoding)
+    if hit:
+        return _http_client._conditional(hit[0], client_if_none_match)
+    return _http_client._finish(status, dict(out_headers), data, client_accept_encoding)
+
+
+async def _attempt_async(pool: AsyncConnectionPool, method: str, url: str, body: Optional[bytes],
+                         headers: Dict[str, str], timeout: float) -> Tuple[int, Dict[str, str], bytes]:
+    """单次上游请求，返回 (status, headers, body)；body 保持上游编码，由 _finish 决定透传或解压。"""
+    if _inprocess.is_inprocess(url):
+        # 细胞 WSGI 应用为同步调用，放入线程池执行，不阻塞事件循环
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _inprocess.get_dispatcher().call, url, method, body, headers)
+    resp = await pool.request(method, url, headers, body, timeout)
+    out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in _HOP_BY_HOP and k.lower() != "content-length"}
+    return resp.status, out_headers, resp.body
+
+
+async def _hedged_async(ctl: "_retry_policy.RetryController", delay: float,
+                        *args) -> Tuple[int, Dict[str, str], bytes]:
+    """retry_policy.run_hedged 的协程版本：首个请求 delay 秒未返回时并发第二个，取先成功者，取消落败者。"""
+    first = asyncio.ensure_future(_attempt_async(*args))
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done or not ctl.try_hedge():
+        return await first
+    second = asyncio.ensure_future(_attempt_async(*args))
+    pending = {first, second}
+    last_result, last_exc = None, None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is not None:
+                    last_exc = t.exception()
+                    continue
+                result = t.result()
+                if result[0] not in ctl.policy.statuses:
+                    if t is second:
+                        _retry_policy.note_hedge_win()
+                    return result
+                last_result = result
+    finally:
+        for t in pending:
+            t.cancel()
+    if last_result is not None:
+        return last_result
+    raise last_exc or RuntimeError("hedged request failed")
+
+
+async def _fetch_async(pool: AsyncConnectionPool, method: str, url: str, body: Optional[bytes],
+                       headers: Dict[str, str], timeout: float, max_retries: int,
+                       cell: str = "", path: str = "", deadline: float = 0.0) -> Tuple[int, Dict[str, str], bytes]:
+    """异步请求上游（重试策略与截止时间处理与 http_client._fetch 一致），返回 (status, headers, body)。"""
+    ctl = _retry_policy.begin(method, cell, path, max_retries, deadline=deadline)
+    loop = asyncio.get_running_loop()
+    for attempt in range(ctl.max_attempts):
+        start = loop.time()
+        attempt_timeout = ctl.attempt_timeout(timeout)
+        try:
+            delay = None if _inprocess.is_inprocess(url) else ctl.hedge_delay()
+            if delay is not None:
+                result = await _hedged_async(ctl, delay, pool, method, url, body, headers, attempt_timeout)
+            else:
+                result = await _attempt_async(pool, method, url, body, headers, attempt_timeout)
+        except Exception as e:
+            if ctl.retry_error(e, attempt):
+                await asyncio.sleep(ctl.backoff(attempt))
+                continue
+            raise
+        ctl.record_latency((loop.time() - start) * 1000)
+        if ctl.retry_status(result[0], attempt):
+            await asyncio.sleep(ctl.backoff(attempt))
+            continue
+        return result
+    raise RuntimeError("forward failed")
+
+
+async def stream_request_async(
+    pool: AsyncConnectionPool,
+    base_url: str,
+    path: str,
+    method: str,
+    body: Any,
+    headers: Dict[str, str],
+    timeout: float = 30,
+    max_retries: int = 2,
+    query_string: str = "",
+    content_length: Optional[int] = None,
+    client_accept_encoding: Optional[str] = None,
+    cell: str = "",
+    deadline: float = 0.0,
+) -> Tuple[int, Dict[str, str], AsyncIterator[bytes]]:
+    """
+    http_client.stream_request 的异步版本：body 为 bytes、异步块迭代器（如 ASGI receive）或 None。
+    返回 (status_code, response_headers, body_chunks)；body_chunks 为异步生成器，迭代结束或 aclose 时归还连接。
+    编码、重试（仅可重放的请求体）与截止时间语义同 stream_request；不对冲，不支持 inproc://。
+    """
+    method = method.upper()
+    url = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
+    client_gzip = _http_client.accepts_gzip(client_accept_encoding)
+    forward_headers = {k: v for k, v in headers.items() if k.lower() not in ("content-length", "transfer-encoding")}
+    forward_headers["Accept-Encoding"] = "gzip" if client_gzip else "identity"
+    ctl = _retry_policy.begin(method, cell, path, max_retries,
+                              replayable=body is None or isinstance(body, (bytes, bytearray)), deadline=deadline)
+    for attempt in range(ctl.max_attempts):
+        attempt_timeout = ctl.attempt_timeout(timeout)
+        try:
+            resp = await pool.stream(method, url, forward_headers, body, attempt_timeout, content_length)
+        except Exception as e:
+            if ctl.retry_error(e, attempt):
+                await asyncio.sleep(ctl.backoff(attempt))
+                continue
+            raise
+        if ctl.retry_status(resp.status, attempt):
+            resp.release()
+            await asyncio.sleep(ctl.backoff(attempt))
+            continue
+        upstream_gzip = next((v for k, v in resp.headers.items() if k.lower() == "content-encoding"), "").lower() == "gzip"
+        passthrough = client_gzip or not upstream_gzip
+        if not passthrough:
+            resp.decode_gzip()
+        return resp.status, _http_client._stream_out_headers(resp.headers, passthrough), resp
+    raise RuntimeError("forward failed")
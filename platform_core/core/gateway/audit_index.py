@@ -0,0 +1,188 @@
+"""
+操作审计段索引：每个段文件一份稀疏时间索引 + 二级索引（租户、用户、traceId、状态码、细胞）。
+- 稀疏时间索引：每 SPARSE_EVERY 条记录一个 (ts, 字节偏移)，按时间范围检索时二分定位后顺序读，无需扫描整段。
+- 二级索引：字段值 -> 行字节偏移列表，按 traceId/租户等检索时直接 seek 读取命中行。
+- 段级 min/max ts：范围检索时整段跳过不相交的段。
+活动段索引由写线程增量维护（内存）；段封存时落盘为 <段文件>.idx（JSON，原子替换）。
+缺失索引的历史段在首次检索时扫描一次重建并落盘。
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+SPARSE_EVERY = int(os.environ.get("GATEWAY_AUDIT_SPARSE_EVERY", "256"))
+INDEXED_FIELDS = ("tenantId", "user", "traceId", "status", "cell")
+INDEX_SUFFIX = ".idx"
+
+
+class SegmentIndex:
+    """单段索引；add 由写线程调用，查询方法可被检索线程并发调用（内部锁保护）。"""
+
+    def __init__(self, sparse_every: Optional[int] = None) -> None:
+        self.sparse_every = sparse_every or SPARSE_EVERY
+        self.count = 0
+        self.min_ts: Optional[float] = None
+        self.max_ts: Optional[float] = None
+        self._sparse_ts: List[float] = []
+        self._sparse_off: List[int] = []
+        self._postings: Dict[str, Dict[str, List[int]]] = {f: {} for f in INDEXED_FIELDS}
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any], offset: int) -> None:
+        ts = float(record.get("ts", 0) or 0)
+        with self._lock:
+            if self.count % self.sparse_every == 0:
+                self._sparse_ts.append(ts)
+                self._sparse_off.append(offset)
+            self.count += 1
+            self.min_ts = ts if self.min_ts is None else min(self.min_ts, ts)
+            self.max_ts = ts if self.max_ts is None else max(self.max_ts, ts)
+            for f in INDEXED_FIELDS:
+                v = record.get(f)
+                if v is None or v == "":
+                    continue
+                self._postings[f].setdefault(str(v), []).append(offset)
+
+    def overlaps(self, since_ts: float, to_ts: Optional[float]) -> bool:
+        with self._lock:
+            if self.count == 0:
+                return False
+            if self.max_ts is not None and self.max_ts < since_ts:
+                return False
+            if to_ts is not None and self.min_ts is not None and self.min_ts > to_ts:
+                return False
+            return True
+
+    def seek_offset(self, since_ts: float) -> int:
+        """不晚于 since_ts 的最近稀疏点偏移（从此处顺序读即可覆盖 since_ts 之后全部记录）。"""
+        with self._lock:
+            i = bisect.bisect_left(self._sparse_ts, since_ts) - 1
+            return self._sparse_off[i] if i >= 0 else 0
+
+    def candidates(self, filters: Dict[str, str]) -> Optional[List[int]]:
+        """按二级索引求命中行偏移（多个条件取交集，升序）；无可用索引条件时返回 None。"""
+        keys = [(f, str(v)) for f, v in filters.items() if f in INDEXED_FIELDS and v not in (None, "")]
+        if not keys:
+            return None
+        with self._lock:
+            lists = [self._postings[f].get(v, []) for f, v in keys]
+            lists.sort(key=len)
+            if not lists[0]:
+                return []
+            result = set(lists[0])
+            for other in lists[1:]:
+                result.intersection_update(other)
+                if not result:
+                    return []
+        return sorted(result)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "minTs": self.min_ts,
+                "maxTs": self.max_ts,
+                "sparseEvery": self.sparse_every,
+                "sparse": [self._sparse_ts, self._sparse_off],
+                "postings": self._postings,
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SegmentIndex":
+        idx = cls(sparse_every=int(data.get("sparseEvery") or SPARSE_EVERY))
+        idx.count = int(data.get("count", 0))
+        idx.min_ts = data.get("minTs")
+        idx.max_ts = data.get("maxTs")
+        sparse = data.get("sparse") or [[], []]
+        idx._sparse_ts, idx._sparse_off = list(sparse[0]), list(sparse[1])
+        postings = data.get("postings") or {}
+        for f in INDEXED_FIELDS:
+            idx._postings[f] = postings.get(f, {})
+        return idx
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SegmentIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def build(cls, segment_path: str) -> "SegmentIndex":
+        """扫描段文件重建索引（流式逐行，不整体读入）。"""
+        idx = cls()
+        offset = 0
+        with open(segment_path, "rb") as f:
+            for raw in f:
+                line = raw.strip()
+                if line:
+                    try:
+                        idx.add(json.loads(line.decode("utf-8")), offset)
+                    except Exception:
+                        pass
+                offset += len(raw)
+        return idx
+
+
+def load_or_build(segment_path: str) -> SegmentIndex:
+    """读取段索引；不存在或损坏时重建并落盘。"""
+    idx_path = segment_path + INDEX_SUFFIX
+    if os.path.isfile(idx_path):
+        try:
+            return SegmentIndex.load(idx_path)
+        except Exception:
+            pass
+    idx = SegmentIndex.build(segment_path)
+    try:
+        idx.save(idx_path)
+    except OSError:
+        pass
+    return idx
+
+
+def iter_segment(path: str, idx: SegmentIndex, since_ts: float, to_ts: Optional[float],
+                 filters: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """按索引读取单段中满足条件的记录（时间升序）；非索引字段在读出后过滤。"""
+    if not idx.overlaps(since_ts, to_ts):
+        return
+    offsets = idx.candidates(filters)
+    with open(path, "rb") as f:
+        if offsets is None:
+            f.seek(idx.seek_offset(since_ts))
+            lines: Iterator[bytes] = iter(f)
+        else:
+            lines = _read_at(f, offsets)
+        for raw in lines:
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                r = json.loads(raw.decode("utf-8"))
+            except Exception:
+                continue
+            ts = r.get("ts", 0)
+            if ts < since_ts:
+                continue
+            if to_ts is not None and ts > to_ts:
+                if offsets is None:
+                    break
+                continue
+            if all(v in (None, "") or str(r.get(k, "")) == str(v) for k, v in filters.items()):
+                yield r
+
+
+def _read_at(f, offsets: List[int]) -> Iterator[bytes]:
+    for off in offsets:
+        f.seek(off)
+        yield f.readline()
+
+
+__all__ = ["SegmentIndex", "load_or_build", "iter_segment", "INDEXED_FIELDS", "INDEX_SUFFIX"]
@@ -1,24 +1,56 @@
 """
 全平台操作审计日志：落盘即不可删改（仅追加），支持检索与导出。
 日志写入 glass_house/operation_audit.log（追加模式）；网关在每次请求后追加一条。
-每条记录含 lineHash（SHA256 前 16 字符）供事后校验完整性，实现操作日志不可篡改。
+每条记录含 prevHash（上一条 lineHash）与 lineHash（SHA256 前 16 字符，覆盖 prevHash），形成哈希链，
+任意一行被改动或删除都会使后续校验失败，实现操作日志不可篡改。
+性能：append 仅把记录放入有界内存队列即返回；后台写线程成组取出，计算哈希链、单次写入并 fsync（组提交），
+文件句柄常驻，超过段大小时滚动为 operation_audit.<时间>.<序号>.log。请求延迟不再取决于磁盘 I/O。
+GATEWAY_AUDIT_ASYNC=0 时退回同步写入（同样使用哈希链与滚动）。
+prefork 多 worker：master 持有唯一写线程，worker 的 append 经跨进程队列提交（use_shared_queue），哈希链与滚动只有一个写者；
+worker 内检索不使用内存缓存，活动段索引从文件重建。
+检索：每段维护稀疏时间索引与租户/用户/traceId/状态码二级索引（见 audit_index），按时间范围或条件 seek 定位，
+导出按段流式输出，均不整体读入文件。
 """
 from __future__ import annotations
 
+import atexit
+import glob
 import hashlib
+import logging
+import multiprocessing
 import os
 import json
+import queue
 import time
 import threading
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .audit_index import SegmentIndex, iter_segment, load_or_build
+
+logger = logging.getLogger("gateway.audit")
 
 _ROOT = os.environ.get("SUPERPAAS_ROOT", "")
 _AUDIT_DIR = os.path.join(_ROOT, "glass_house") if _ROOT else ""
 _AUDIT_FILE = os.path.join(_AUDIT_DIR, "operation_audit.log") if _AUDIT_DIR else ""
 _LOCK = threading.Lock()
-# 内存缓存最近 N 条供检索（可选）
-_MEM_CACHE: List[Dict[str, Any]] = []
+# 内存缓存最近 N 条供检索（可选）；deque 定长，淘汰为 O(1)
 _MEM_CACHE_MAX = int(os.environ.get("GATEWAY_AUDIT_MEM_CACHE_MAX", "5000"))
+_MEM_CACHE: Deque[Dict[str, Any]] = deque(maxlen=_MEM_CACHE_MAX)
+# 异步组提交参数
+_ASYNC = os.environ.get("GATEWAY_AUDIT_ASYNC", "1") == "1"
+_QUEUE_MAX = int(os.environ.get("GATEWAY_AUDIT_QUEUE_MAX", "10000"))
+_BATCH_MAX = int(os.environ.get("GATEWAY_AUDIT_BATCH_MAX", "512"))
+_FLUSH_INTERVAL_SEC = float(os.environ.get("GATEWAY_AUDIT_FLUSH_INTERVAL_MS", "50")) / 1000.0
+_ENQUEUE_TIMEOUT_SEC = float(os.environ.get("GATEWAY_AUDIT_ENQUEUE_TIMEOUT_MS", "100")) / 1000.0
+_FSYNC = os.environ.get("GATEWAY_AUDIT_FSYNC", "1") == "1"
+_SEGMENT_MAX_BYTES = int(os.environ.get("GATEWAY_AUDIT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+# 已封存段索引的内存缓存上限（段数）
+_INDEX_CACHE_MAX = int(os.environ.get("GATEWAY_AUDIT_INDEX_CACHE_MAX", "32"))
+_INDEX_CACHE: "OrderedDict[str, SegmentIndex]" = OrderedDict()
+_EXPORT_CHUNK_BYTES = 64 * 1024
+
+_GENESIS_HASH = "0" * 16
 
 
 def _ensure_dir() -> bool:
@@ -32,14 +64,250 @@ def _ensure_dir() -> bool:
 
 
 def _line_hash(record: Dict[str, Any]) -> str:
-    """计算记录内容哈希（不含 lineHash 自身），用于不可篡改校验。"""
+    """计算记录内容哈希（不含 lineHash 自身，含 prevHash），用于不可篡改校验。"""
     payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
     return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 
 
+def _tail_last_hash(path: str) -> str:
+    """读取文件最后一条记录的 lineHash（仅读尾部），用于重启后续接哈希链。"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 65536))
+            lines = f.read().splitlines()
+        for raw in reversed(lines):
+            raw = raw.strip()
+            if raw:
+                return json.loads(raw.decode("utf-8")).get("lineHash") or _GENESIS_HASH
+    except Exception:
+        pass
+    return _GENESIS_HASH
+
+
+class _SegmentWriter:
+    """活动段文件写入器：句柄常驻、哈希链续接、按大小滚动、增量维护活动段索引。仅由单一线程（写线程或持锁的同步写）调用。"""
+
+    def __init__(self) -> None:
+        self._path = ""
+        self._fh = None
+        self._size = 0
+        self._last_hash = _GENESIS_HASH
+        self._seq = 0
+        self.index = SegmentIndex()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    def _open(self, path: str) -> None:
+        self.close()
+        self._path = path
+        exists = os.path.isfile(path)
+        self._last_hash = _tail_last_hash(path) if exists else self._last_hash
+        self.index = SegmentIndex.build(path) if exists else SegmentIndex()
+        self._fh = open(path, "ab")
+        self._size = self._fh.tell()
+
+    def _rotate(self) -> None:
+        """活动文件封存为段文件；哈希链跨段延续（新段首行 prevHash 指向旧段末行）。"""
+        path = self._path
+        self.close()
+        self._seq += 1
+        base, ext = os.path.splitext(path)
+        stamp = time.strftime('%Y%m%d%H%M%S', time.gmtime())
+        sealed = f"{base}.{stamp}.{self._seq:04d}{ext}"
+        while os.path.exists(sealed):  # 重启后序号归零，避免同一秒内覆盖已封存段
+            self._seq += 1
+            sealed = f"{base}.{stamp}.{self._seq:04d}{ext}"
+        try:
+            os.replace(path, sealed)
+            _on_segment_sealed(sealed, self.index)
+        except OSError as e:
+            logger.warning("audit segment rotate failed: %s", e)
+        last = self._last_hash
+        self._open(path)
+        self._last_hash = last
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        path = _AUDIT_FILE
+        if not path or not _ensure_dir():
+            return
+        if self._fh is None or self._path != path:
+            self._open(path)
+        lines = []
+        offset = self._size
+        for record in records:
+            record["prevHash"] = self._last_hash
+            record["lineHash"] = _line_hash(record)
+            self._last_hash = record["lineHash"]
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            lines.append(line)
+            self.index.add(record, offset)
+            offset += len(line)
+        self._fh.write(b"".join(lines))
+        self._fh.flush()
+        if _FSYNC:
+            os.fsync(self._fh.fileno())
+        self._size = offset
+        with _LOCK:
+            _MEM_CACHE.extend(records)
+        if self._size >= _SEGMENT_MAX_BYTES:
+            self._rotate()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except Exception:
+                pass
+            self._fh = None
+
+
+def _on_segment_sealed(path: str, index: SegmentIndex) -> None:
+    """段封存回调：活动段索引落盘为 <段文件>.idx 并放入索引缓存；亦可在此扩展上传归档等。"""
+    try:
+        index.save(path + ".idx")
+    except OSError as e:
+        logger.warning("audit segment index save failed path=%s err=%s", path, e)
+    _cache_index(path, index)
+
+
+def _cache_index(path: str, index: SegmentIndex) -> None:
+    with _LOCK:
+        _INDEX_CACHE[path] = index
+        _INDEX_CACHE.move_to_end(path)
+        while len(_INDEX_CACHE) > _INDEX_CACHE_MAX:
+            _INDEX_CACHE.popitem(last=False)
+
+
+def _sealed_index(path: str) -> SegmentIndex:
+    with _LOCK:
+        idx = _INDEX_CACHE.get(path)
+        if idx is not None:
+            _INDEX_CACHE.move_to_end(path)
+            return idx
+    idx = load_or_build(path)
+    _cache_index(path, idx)
+    return idx
+
+
+def _join(q: Any, timeout: float) -> bool:
+    """等待跨进程队列中已提交的记录全部落盘（JoinableQueue.join 无超时，交给守护线程等待）。"""
+    done = threading.Event()
+    threading.Thread(target=lambda: (q.join(), done.set()), name="gateway-audit-join", daemon=True).start()
+    return done.wait(timeout)
+
+
+class _AuditWriter:
+    """
+    后台写线程：有界队列 -> 成组写入 + fsync。flush() 用于关闭前或检索前确保落盘。
+    shared 为跨进程 JoinableQueue 时：master（consume=True）消费并落盘，worker（consume=False）仅入队。
+    """
+
+    def __init__(self, shared: Any = None, consume: bool = True) -> None:
+        self._queue: Any = shared if shared is not None else queue.Queue(maxsize=_QUEUE_MAX)
+        self._shared = shared is not None
+        self._segment = _SegmentWriter()
+        self.dropped = 0
+        if consume:
+            self._thread = threading.Thread(target=self._run, name="gateway-audit-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put(record, timeout=_ENQUEUE_TIMEOUT_SEC)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("audit queue full, dropped=%s", self.dropped)
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        if self._shared:
+            return _join(self._queue, timeout)
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=_FLUSH_INTERVAL_SEC)
+            except queue.Empty:
+                continue
+            batch: List[Dict[str, Any]] = []
+            waiters: List[threading.Event] = []
+            item = first
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= _BATCH_MAX:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._segment.write_batch(batch)
+                except Exception as e:
+                    logger.warning("audit batch write failed size=%s err=%s", len(batch), e)
+            for w in waiters:
+                w.set()
+            if self._shared:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+_writer: Optional[_AuditWriter] = None
+_writer_lock = threading.Lock()
+_sync_segment = _SegmentWriter()
+_shared_queue: Any = None
+
+
+def create_shared_queue() -> Any:
+    """prefork：master 在 fork 前创建跨进程记录队列。"""
+    return multiprocessing.get_context("fork").JoinableQueue(_QUEUE_MAX)
+
+
+def use_shared_queue(shared: Any, consume: bool = False) -> None:
+    """
+    prefork：master（consume=True）启动唯一写线程消费队列；worker 的 append 仅入队（同步模式亦然）。
+    fork 时 master 写线程可能持有模块锁、内存缓存为 fork 时快照，worker 内重建锁并清空缓存，检索改读文件。
+    """
+    global _writer, _shared_queue, _LOCK, _writer_lock, _MEM_CACHE
+    if not consume:
+        _LOCK = threading.Lock()
+        _writer_lock = threading.Lock()
+        _MEM_CACHE = deque(maxlen=_MEM_CACHE_MAX)
+    _shared_queue = shared
+    _writer = _AuditWriter(shared, consume=consume)
+
+
+def _get_writer() -> _AuditWriter:
+    global _writer
+    if _writer is not None:
+        return _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = _AuditWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
 def append(method: str, path: str, status: int, duration_ms: int, trace_id: str = "",
            tenant_id: str = "", user: str = "", cell: str = "", ip: str = "", extra: Optional[Dict] = None) -> None:
-    """追加一条操作审计记录（仅追加，不可删改）；含 lineHash 供事后校验。"""
+    """追加一条操作审计记录（仅追加，不可删改）；哈希链由写线程在落盘时计算。"""
+    if not _AUDIT_FILE:
+        return
     ts = time.time()
     record = {
         "ts": ts,
@@ -55,68 +323,135 @@ def append(method: str, path: str, status: int, duration_ms: int, trace_id: str
         "ip": ip or "",
         **(extra or {}),
     }
-    record["lineHash"] = _line_hash(record)
-    line = json.dumps(record, ensure_ascii=False) + "\n"
-    if _ensure_dir() and _AUDIT_FILE:
-        try:
-            with _LOCK:
-                with open(_AUDIT_FILE, "a", encoding="utf-8") as f:
-                    f.write(line)
-                _MEM_CACHE.append(record)
-                if len(_MEM_CACHE) > _MEM_CACHE_MAX:
-                    _MEM_CACHE.pop(0)
-        except Exception:
-            pass
+    if _ASYNC or _shared_queue is not None:
+        _get_writer().submit(record)
+        return
+    try:
+        with _writer_lock:
+            _sync_segment.write_batch([record])
+    except Exception:
+        pass
 
 
-def search(since_ts: float = 0, to_ts: Optional[float] = None, trace_id: str = "", tenant_id: str = "",
-           cell: str = "", limit: int = 100) -> List[Dict[str, Any]]:
-    """检索审计日志。优先从内存缓存取；否则读文件（若存在）。"""
-    out: List[Dict[str, Any]] = []
-    with _LOCK:
-        src = _MEM_CACHE if _MEM_CACHE else _read_file_since(since_ts, to_ts, limit * 2)
-        for r in src:
-            if r.get("ts", 0) < since_ts:
-                continue
-            if to_ts is not None and r.get("ts", 0) > to_ts:
-                continue
-            if trace_id and r.get("traceId") != trace_id:
-                continue
-            if tenant_id and r.get("tenantId") != tenant_id:
-                continue
-            if cell and r.get("cell") != cell:
-                continue
-            out.append(r)
-            if len(out) >= limit:
-                break
-    return out
+def flush(timeout: float = 5.0) -> bool:
+    """等待已提交记录全部落盘（异步模式与 prefork 队列）；同步模式直接返回 True。"""
+    if _writer is None:
+        return True
+    return _writer.flush(timeout)
 
 
-def _read_file_since(since_ts: float, to_ts: Optional[float], max_lines: int) -> List[Dict[str, Any]]:
-    """从文件尾部读取最近记录。"""
-    if not _AUDIT_FILE or not os.path.isfile(_AUDIT_FILE):
-        return []
-    result = []
-    try:
-        with open(_AUDIT_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        for line in reversed(lines[-max_lines:] if len(lines) > max_lines else lines):
+def stats() -> Dict[str, Any]:
+    """写入管道状态：队列深度、丢弃条数（队列满且超时）。"""
+    w = _writer
+    return {
+        "async": _ASYNC or _shared_queue is not None,
+        "queueDepth": w._queue.qsize() if w else 0,
+        "queueMax": _QUEUE_MAX,
+        "dropped": w.dropped if w else 0,
+    }
+
+
+def verify_chain(path: Optional[str] = None, prev_hash: Optional[str] = None) -> Tuple[bool, int]:
+    """逐行校验哈希链。返回 (是否完整, 首个异常行号；完整时为校验行数)。"""
+    path = path or _AUDIT_FILE
+    if not path or not os.path.isfile(path):
+        return True, 0
+    expected_prev = prev_hash
+    n = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
             line = line.strip()
             if not line:
                 continue
             try:
                 r = json.loads(line)
-                if r.get("ts", 0) >= since_ts and (to_ts is None or r.get("ts", 0) <= to_ts):
-                    result.append(r)
             except Exception:
+                return False, n
+            line_hash = r.pop("lineHash", "")
+            if _line_hash(r) != line_hash:
+                return False, n
+            if expected_prev is not None and r.get("prevHash") != expected_prev:
+                return False, n
+            expected_prev = line_hash
+    return True, n
+
+
+def _segments() -> List[Tuple[str, SegmentIndex]]:
+    """按时间升序返回 (段路径, 段索引)：已封存段（文件名含封存时间）在前，活动段在最后。"""
+    if not _AUDIT_FILE:
+        return []
+    base, ext = os.path.splitext(_AUDIT_FILE)
+    out = [(p, _sealed_index(p)) for p in sorted(glob.glob(f"{glob.escape(base)}.*{ext}"))]
+    if os.path.isfile(_AUDIT_FILE):
+        seg = (_writer._segment if _writer is not None else None) if _ASYNC or _shared_queue is not None else _sync_segment
+        if seg is not None and seg.path == _AUDIT_FILE:
+            out.append((_AUDIT_FILE, seg.index))
+        else:
+            out.append((_AUDIT_FILE, SegmentIndex.build(_AUDIT_FILE)))
+    return out
+
+
+def _iter_records(since_ts: float, to_ts: Optional[float], filters: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    for path, idx in _segments():
+        try:
+            yield from iter_segment(path, idx, since_ts, to_ts, filters)
+        except OSError:
+            continue  # 段在检索期间被滚动/归档
+
+
+def _match(r: Dict[str, Any], since_ts: float, to_ts: Optional[float], filters: Dict[str, Any]) -> bool:
+    ts = r.get("ts", 0)
+    if ts < since_ts or (to_ts is not None and ts > to_ts):
+        return False
+    return all(v in (None, "") or str(r.get(k, "")) == str(v) for k, v in filters.items())
+
+
+def search(since_ts: float = 0, to_ts: Optional[float] = None, trace_id: str = "", tenant_id: str = "",
+           cell: str = "", limit: int = 100, user: str = "", status: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    检索审计日志（时间升序，最多 limit 条）。内存缓存覆盖 since_ts 时直接取内存；
+    否则按段索引定位：跳过时间不相交的段，条件检索走二级索引，纯时间范围走稀疏索引 seek 后顺序读。
+    """
+    filters = {"traceId": trace_id, "tenantId": tenant_id, "cell": cell, "user": user, "status": status}
+    with _LOCK:
+        mem = list(_MEM_CACHE)
+    if mem and mem[0].get("ts", 0) <= since_ts:
+        src: Iterator[Dict[str, Any]] = (r for r in mem if _match(r, since_ts, to_ts, filters))
+    else:
+        src = _iter_records(since_ts, to_ts, filters)
+    out: List[Dict[str, Any]] = []
+    for r in src:
+        out.append(r)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def export_iter(since_ts: float = 0, to_ts: Optional[float] = None, trace_id: str = "", tenant_id: str = "",
+                cell: str = "", user: str = "", status: Optional[int] = None) -> Iterator[bytes]:
+    """
+    流式导出（NDJSON 字节块）：无任何条件时按段顺序原样分块输出；有条件时按索引逐条输出命中记录。
+    内存占用与导出规模无关。
+    """
+    filters = {"traceId": trace_id, "tenantId": tenant_id, "cell": cell, "user": user, "status": status}
+    if not since_ts and to_ts is None and all(v in (None, "") for v in filters.values()):
+        for path, _ in _segments():
+            try:
+                with open(path, "rb") as f:
+                    while True:
+                        chunk = f.read(_EXPORT_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        yield chunk
+            except OSError:
                 continue
-    except Exception:
-        pass
-    return result
+        return
+    for r in _iter_records(since_ts, to_ts, filters):
+        yield (json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8")
 
 
 def export_path() -> Optional[str]:
-    """返回审计日志文件路径（供导出下载）。"""
+    """返回活动段文件路径（兼容旧的单文件下载；完整导出请用 export_iter）。"""
     if _AUDIT_FILE and os.path.isfile(_AUDIT_FILE):
         return _AUDIT_FILE
     return None
@@ -0,0 +1,189 @@
+"""
+批量接口：POST /api/v1/batch 一次认证，子请求并发扇出至各细胞，逐项返回原状态码。
+- 请求体 {"requests": [{"id", "method", "path", "query", "headers", "body", "timeoutMs"}]}，
+  path 为 /api/v1/<cell>/<path>，也可用 cell + path 分开传；
+- 准入（限流、租户配额、红绿灯、熔断、自适应并发、舱壁）由网关对每个子请求单独执行；
+- 子请求超时（timeoutMs，不超过 GATEWAY_BATCH_ITEM_TIMEOUT_SEC）单独返回 504，不影响其他子请求；
+- 响应 {"responses": [{"id", "status", "headers", "body"}]}，顺序与请求一致；JSON 响应体内联为对象，其余为文本。
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+BATCH_MAX_ITEMS = int(os.environ.get("GATEWAY_BATCH_MAX_ITEMS", "20"))
+BATCH_ITEM_TIMEOUT_SEC = float(os.environ.get("GATEWAY_BATCH_ITEM_TIMEOUT_SEC", "10"))
+_METHODS = ("GET", "POST", "PUT", "PATCH", "DELETE")
+# 子请求可自带的请求头；认证与租户头只取批量请求本身，子请求不可覆盖
+_ITEM_HEADERS = ("Content-Type", "X-Request-ID")
+# 不回传给调用方的响应头（子响应体已解压、重新序列化）
+_DROP_HEADERS = ("content-length", "content-encoding", "transfer-encoding", "connection", "keep-alive")
+
+
+class BatchItem:
+    """单个子请求（已校验）。"""
+
+    __slots__ = ("id", "method", "cell", "path", "query_string", "headers", "body", "timeout")
+
+    def __init__(self, id: str, method: str, cell: str, path: str, query_string: str,
+                 headers: Dict[str, str], body: Optional[bytes], timeout: float):
+        self.id = id
+        self.method = method
+        self.cell = cell
+        self.path = path
+        self.query_string = query_string
+        self.headers = headers
+        self.body = body
+        self.timeout = timeout
+
+
+def _parse_item(index: int, raw: Any, default_timeout: float) -> Tuple[Optional[BatchItem], str]:
+    if not isinstance(raw, dict):
+        return None, f"requests[{index}] 须为对象"
+    item_id = str(raw.get("id") if raw.get("id") is not None else index)
+    method = str(raw.get("method") or "GET").upper()
+    if method not in _METHODS:
+        return None, f"requests[{index}] 不支持的方法: {method}"
+    path = str(raw.get("path") or "").strip()
+    cell = str(raw.get("cell") or "").strip()
+    if path.startswith("/api/v1/"):
+        cell, _, path = path[len("/api/v1/"):].partition("/")
+    path = path.lstrip("/")
+    path, _, inline_query = path.partition("?")
+    if not cell or not path:
+        return None, f"requests[{index}] 须指定 /api/v1/<cell>/<path> 或 cell + path"
+    query = raw.get("query")
+    if isinstance(query, dict):
+        query_string = urlencode(query, doseq=True)
+    else:
+        query_string = str(query or inline_query).lstrip("?")
+    headers = {}
+    raw_headers = raw.get("headers") if isinstance(raw.get("headers"), dict) else {}
+    for k, v in raw_headers.items():
+        name = next((h for h in _ITEM_HEADERS if h.lower() == str(k).lower()), None)
+        if name and v:
+            headers[name] = str(v)
+    body = raw.get("body")
+    if body is None:
+        data = None
+    elif isinstance(body, (dict, list)):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers.setdefault("Content-Type", "application/json")
+    else:
+        data = str(body).encode("utf-8")
+    timeout = default_timeout
+    if raw.get("timeoutMs") is not None:
+        try:
+            timeout = min(default_timeout, max(0.001, float(raw["timeoutMs"]) / 1000.0))
+        except (TypeError, ValueError):
+            return None, f"requests[{index}].timeoutMs 须为数字"
+    return BatchItem(item_id, method, cell, path, query_string, headers, data, timeout), ""
+
+
+def parse_batch(payload: Any, max_items: Optional[int] = None,
+                default_timeout: Optional[float] = None) -> Tuple[List[BatchItem], str]:
+    """校验批量请求体，返回 (子请求列表, 错误说明)；错误说明非空时整批拒绝。"""
+    max_items = BATCH_MAX_ITEMS if max_items is None else max_items
+    default_timeout = BATCH_ITEM_TIMEOUT_SEC if default_timeout is None else default_timeout
+    raw_items = payload.get("requests") if isinstance(payload, dict) else None
+    if not isinstance(raw_items, list) or not raw_items:
+        return [], "请求体须为 {\"requests\": [...]} 且至少包含一个子请求"
+    if len(raw_items) > max_items:
+        return [], f"子请求数 {len(raw_items)} 超过上限 {max_items}"
+    items = []
+    for i, raw in enumerate(raw_items):
+        item, err = _parse_item(i, raw, default_timeout)
+        if err:
+            return [], err
+        items.append(item)
+    ids = [it.id for it in items]
+    if len(set(ids)) != len(ids):
+        return [], "子请求 id 不可重复"
+    return items, ""
+
+
+def item_result(item_id: str, status: int, headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+    """子响应：JSON 响应体内联为对象，其余按 UTF-8 文本返回。"""
+    out_headers = {k: v for k, v in (headers or {}).items() if k.lower() not in _DROP_HEADERS}
+    content_type = next((v for k, v in out_headers.items() if k.lower() == "content-type"), "")
+    text = (body or b"").decode("utf-8", errors="replace")
+    payload: Any = text
+    if "json" in content_type.lower() and text:
+        try:
+            payload = json.loads(text)
+        except ValueError:
+            pass
+    return {"id": item_id, "status": status, "headers": out_headers, "body": payload}
+
+
+def error_result(item_id: str, code: str, message: str, details: str, request_id: str, status: int) -> Dict[str, Any]:
+    """子请求失败：body 为网关统一错误格式。"""
+    return {
+        "id": item_id,
+        "status": status,
+        "headers": {"Content-Type": "application/json; charset=utf-8"},
+        "body": {"code": code, "message": message, "details": details, "requestId": request_id},
+    }
+
+
+def timeout_result(item: BatchItem, request_id: str = "") -> Dict[str, Any]:
+    """子请求超时：504 GATEWAY_TIMEOUT。"""
+    return error_result(item.id, "GATEWAY_TIMEOUT", f"子请求超时（{int(item.timeout * 1000)}ms）", "",
+                        item.headers.get("X-Request-ID", request_id), 504)
+
+
+def is_timeout(exc: BaseException) -> bool:
+    """上游读超时（urllib3 ReadTimeoutError / socket.timeout 等）：子请求按超时返回 504。"""
+    seen = 0
+    while exc is not None and seen < 5:
+        if isinstance(exc, TimeoutError) or "Timeout" in type(exc).__name__:
+            return True
+        exc = getattr(exc, "reason", None) or exc.__cause__
+        seen += 1
+    return False
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is not None:
+        return _executor
+    with _executor_lock:
+        if _executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("GATEWAY_BATCH_WORKERS", "32")), thread_name_prefix="gateway-batch",
+            )
+        return _executor
+
+
+def gather(items: List[BatchItem], calls: List[Union[Dict[str, Any], Callable[[], Dict[str, Any]]]],
+           request_id: str = "") -> List[Dict[str, Any]]:
+    """
+    并发执行子请求：calls[i] 为已确定的子响应（准入拒绝）或返回子响应的可调用对象。
+    各子请求从批量开始计时，超过自身 timeout 返回 504；超时的调用在后台继续完成并归还资源。
+    """
+    executor = _get_executor()
+    start = time.monotonic()
+    futures = [executor.submit(c) if callable(c) else None for c in calls]
+    results = []
+    for item, call, fut in zip(items, calls, futures):
+        if fut is None:
+            results.append(call)
+            continue
+        try:
+            results.append(fut.result(timeout=max(0.0, start + item.timeout - time.monotonic())))
+        except FutureTimeout:
+            results.append(timeout_result(item, request_id))
+        except Exception as e:
+            results.append(error_result(item.id, "CELL_UNREACHABLE", str(e), "",
+                                        item.headers.get("X-Request-ID", request_id), 502))
+    return results
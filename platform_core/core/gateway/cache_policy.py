@@ -0,0 +1,269 @@
+"""
+合约驱动的 GET 缓存策略：细胞在 api_contract.yaml 的 GET 操作上以 x-cache 声明可缓存性、TTL、
+按租户/用户/角色区分（varyBy）与失效事件（invalidateOn），网关按声明缓存并在事件到达时失效。
+
+    /customers/{customerId}:
+      get:
+        x-cache:
+          ttlSec: 300           # 新鲜期（秒）
+          staleSec: 30          # 可选：陈旧可用窗口，缺省取 GATEWAY_GET_CACHE_STALE_SEC
+          varyBy: [tenant]      # tenant / user / role，缺省 [tenant]
+          invalidateOn: [crm.customer.*, crm.contract.signed]
+
+- 合约中声明了 x-cache 的细胞只缓存已声明的接口（合约即白名单）；未声明任何策略的细胞沿用 GATEWAY_GET_CACHE_TTL_SEC。
+- 路径模板编译一次：无参数路径为 dict 查找，带 {param} 的模板合并为单个正则。
+- 失效采用代数（generation）计数：事件到达时对应主题的代数递增，缓存键携带代数，旧条目即不可达并由 LRU 回收，
+  失效为 O(1)，不遍历缓存。事件 data.tenantId 存在时只失效该租户（策略按租户区分时），否则失效全部租户。
+- 主题支持精确匹配与前缀通配（crm.customer.* / *）。事件来自进程内事件总线（event_bus.subscribe）；
+  prefork 多 worker 时代数位于共享内存（shared_state.SharedGenerationTable），事件投递到任一 worker，
+  所有 worker 的缓存键随之变化；缓存条目本身仍按 worker 独立。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger("gateway.cache_policy")
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+# 细胞合约目录：<dir>/<cell>/api_contract.yaml
+CONTRACTS_DIR = os.environ.get("GATEWAY_CONTRACTS_DIR", "") or os.path.join(_ROOT, "cells")
+_CONTRACT_FILE = "api_contract.yaml"
+VARY_DIMENSIONS = ("tenant", "user", "role")
+_PARAM = re.compile(r"\{[^/{}]+\}")
+
+
+class CachePolicy:
+    """单个接口的缓存策略。"""
+
+    __slots__ = ("ttl_sec", "stale_sec", "vary", "topics")
+
+    def __init__(self, ttl_sec: float, stale_sec: Optional[float] = None,
+                 vary: Tuple[str, ...] = ("tenant",), topics: Tuple[str, ...] = ()) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.stale_sec = stale_sec
+        self.vary = vary
+        self.topics = topics
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "CachePolicy":
+        """解析 x-cache 声明；非法时抛 ValueError。"""
+        ttl = float(spec.get("ttlSec", 0))
+        if ttl <= 0:
+            raise ValueError("ttlSec 必须大于 0")
+        stale = spec.get("staleSec")
+        vary = tuple(spec.get("varyBy") or ("tenant",))
+        unknown = [v for v in vary if v not in VARY_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"未知 varyBy: {unknown}")
+        topics = tuple(str(t).strip() for t in spec.get("invalidateOn") or () if str(t).strip())
+        return cls(ttl, float(stale) if stale is not None else None, vary, topics)
+
+    @property
+    def needs_principal(self) -> bool:
+        return "user" in self.vary or "role" in self.vary
+
+    def __repr__(self) -> str:
+        return f"CachePolicy(ttl_sec={self.ttl_sec}, vary={self.vary}, topics={self.topics})"
+
+
+class _CellPolicies:
+    """单个细胞已编译的策略：精确路径 dict + 参数模板合并正则（按分组序号定位策略）。"""
+
+    __slots__ = ("exact", "pattern", "templated")
+
+    def __init__(self, entries: List[Tuple[str, CachePolicy]]) -> None:
+        self.exact: Dict[str, CachePolicy] = {}
+        self.templated: List[CachePolicy] = []
+        parts = []
+        for template, policy in entries:
+            if _PARAM.search(template):
+                literal = _PARAM.split(template)
+                parts.append("(" + "[^/]+".join(re.escape(s) for s in literal) + ")")
+                self.templated.append(policy)
+            else:
+                self.exact[template] = policy
+        self.pattern: Optional[Pattern[str]] = re.compile("|".join(parts)) if parts else None
+
+    def lookup(self, path: str) -> Optional[CachePolicy]:
+        policy = self.exact.get(path)
+        if policy is None and self.pattern is not None:
+            m = self.pattern.fullmatch(path)
+            if m:
+                policy = self.templated[m.lastindex - 1]
+        return policy
+
+
+def _load_contract(path: str) -> List[Tuple[str, CachePolicy]]:
+    import yaml
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+    entries = []
+    for template, ops in (data.get("paths") or {}).items():
+        spec = ((ops or {}).get("get") or {}).get("x-cache") if isinstance(ops, dict) else None
+        if not isinstance(spec, dict):
+            continue
+        try:
+            entries.append((str(template).strip("/"), CachePolicy.from_spec(spec)))
+        except (TypeError, ValueError) as e:
+            logger.warning("invalid x-cache in %s %s: %s", path, template, e)
+    return entries
+
+
+def _topic_candidates(event_type: str) -> List[str]:
+    """事件类型可命中的主题：自身、逐级前缀通配与 *。"""
+    segments = event_type.split(".")
+    return [event_type] + [".".join(segments[:i]) + ".*" for i in range(len(segments) - 1, 0, -1)] + ["*"]
+
+
+class MemoryGenerations:
+    """进程内失效代数：键 -> 单调递增计数（单进程默认后端）。"""
+
+    def __init__(self) -> None:
+        self._gen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> int:
+        return self._gen.get(key, 0)
+
+    def bump(self, key: str) -> None:
+        with self._lock:
+            self._gen[key] = self._gen.get(key, 0) + 1
+
+
+def _any_key(topic: str) -> str:
+    return "a|" + topic  # 任意事件递增
+
+
+def _global_key(topic: str) -> str:
+    return "g|" + topic  # 无租户事件递增
+
+
+def _tenant_key(topic: str, tenant_id: str) -> str:
+    return f"t|{topic}|{tenant_id}"  # 按 (主题, 租户) 递增
+
+
+class PolicyTable:
+    """全部细胞的缓存策略与失效代数（代数后端可替换为跨进程共享实现）。"""
+
+    def __init__(self, contracts_dir: Optional[str] = None, generations: Optional[Any] = None) -> None:
+        self.contracts_dir = CONTRACTS_DIR if contracts_dir is None else contracts_dir
+        self._cells: Dict[str, _CellPolicies] = {}
+        self._topics: set = set()
+        self._lock = threading.Lock()
+        self.generations = generations if generations is not None else MemoryGenerations()
+        self.reload()
+
+    def reload(self) -> None:
+        """重新扫描合约目录；单个合约解析失败时跳过该细胞。"""
+        cells: Dict[str, _CellPolicies] = {}
+        topics = set()
+        root = self.contracts_dir
+        for cell in sorted(os.listdir(root)) if root and os.path.isdir(root) else ():
+            path = os.path.join(root, cell, _CONTRACT_FILE)
+            if cell.startswith(("_", ".")) or not os.path.isfile(path):
+                continue
+            try:
+                entries = _load_contract(path)
+            except Exception as e:
+                logger.warning("contract load failed %s: %s", path, e)
+                continue
+            if entries:
+                cells[cell.lower()] = _CellPolicies(entries)
+                topics.update(t for _, p in entries for t in p.topics)
+        with self._lock:
+            self._cells = cells
+            self._topics = topics
+
+    def resolve(self, cell: str, path: str) -> Tuple[bool, Optional[CachePolicy]]:
+        """返回 (细胞是否声明了缓存策略, 命中的策略)。"""
+        compiled = self._cells.get(cell)
+        if compiled is None:
+            return False, None
+        return True, compiled.lookup(path.strip("/"))
+
+    def scope(self, policy: CachePolicy, tenant_id: str = "", user: str = "", role: str = "") -> str:
+        """缓存键后缀：varyBy 维度取值 + 失效代数（代数单调递增，其和变化即旧条目不可达）。"""
+        by_tenant = "tenant" in policy.vary
+        gens = self.generations
+        gen = 0
+        for topic in policy.topics:
+            if by_tenant:
+                gen += gens.get(_global_key(topic)) + gens.get(_tenant_key(topic, tenant_id))
+            else:
+                gen += gens.get(_any_key(topic))
+        values = {"tenant": tenant_id, "user": user, "role": role}
+        return "|".join(f"{v}={values[v]}" for v in policy.vary) + f"|g={gen}"
+
+    def invalidate(self, event_type: str, tenant_id: str = "") -> int:
+        """事件到达：递增命中主题的代数，返回命中的主题数。"""
+        if not event_type:
+            return 0
+        topics = self._topics
+        hit = [t for t in _topic_candidates(event_type) if t in topics]
+        gens = self.generations
+        for topic in hit:
+            gens.bump(_any_key(topic))
+            gens.bump(_tenant_key(topic, tenant_id) if tenant_id else _global_key(topic))
+        return len(hit)
+
+    def on_event(self, entry: Dict[str, Any]) -> None:
+        """event_bus 订阅回调。"""
+        payload = entry.get("payload") or {}
+        tenant_id = str(payload.get("tenantId") or "") if isinstance(payload, dict) else ""
+        self.invalidate(entry.get("eventType") or "", tenant_id)
+
+
+_default: Optional[PolicyTable] = None
+_default_lock = threading.Lock()
+_generations: Optional[Any] = None
+
+
+def set_generation_backend(backend: Any) -> None:
+    """切换失效代数后端（prefork worker 启动时切换为共享内存实现）。"""
+    global _generations
+    with _default_lock:
+        _generations = backend
+        if _default is not None:
+            _default.generations = backend
+
+
+def get_policy_table() -> PolicyTable:
+    """进程内单例；首次创建时订阅事件总线（create_app 构建时即创建，不等首个 GET）。"""
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            table = PolicyTable(generations=_generations)
+            try:
+                from .. import event_bus
+                event_bus.subscribe(table.on_event)
+            except ImportError:
+                pass
+            _default = table
+        return _default
+
+
+def cache_args(cell: str, path: str, method: str, tenant_id: str = "", principal=None) -> Dict[str, Any]:
+    """
+    转发 GET 缓存参数（forward_request 关键字参数）：细胞声明了策略时按合约，否则按 GATEWAY_GET_CACHE_TTL_SEC。
+    principal 为惰性获取 {username, role} 的可调用对象，仅策略按用户/角色区分时调用。
+    """
+    if method.upper() != "GET":
+        return {"use_cache": False}
+    table = get_policy_table()
+    governed, policy = table.resolve(cell, path)
+    if not governed:
+        return {"use_cache": float(os.environ.get("GATEWAY_GET_CACHE_TTL_SEC", "0")) > 0}
+    if policy is None:
+        return {"use_cache": False}
+    info = (principal() if principal is not None and policy.needs_principal else None) or {}
+    scope = table.scope(policy, tenant_id or "", info.get("username", ""), info.get("role", ""))
+    return {"use_cache": True, "cache_policy": policy, "cache_scope": scope}
+
+
+__all__ = ["CachePolicy", "MemoryGenerations", "PolicyTable", "cache_args", "get_policy_table", "set_generation_backend"]
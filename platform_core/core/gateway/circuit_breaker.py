@@ -1,18 +1,24 @@
 """
 熔断器：《接口设计说明书》3.3.1
-触发条件：可配置时间窗内异常率 >= 阈值 -> 开启。
-恢复：半开状态放行少量探测请求，连续成功则关闭。
-高可用：参数可通过环境变量 GATEWAY_CB_* 覆盖，便于生产调优。
+触发条件：滚动时间窗内（环形桶，桶随时间滑动过期）异常率 >= 阈值，或慢调用率 >= 阈值 -> 开启。
+恢复：半开状态放行少量探测请求，连续成功则关闭（慢探测按失败计）。
+舱壁：每细胞并发上限，在途请求达到上限时立即拒绝，避免一个变慢的细胞占满网关线程、拖垮其他细胞。
+高可用：参数可通过环境变量 GATEWAY_CB_* / GATEWAY_BULKHEAD_* 覆盖，便于生产调优。
 """
 import os
 import time
 import threading
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 _WINDOW_SEC = 10
 _FAILURE_RATIO_THRESHOLD = 0.5
 _HALF_OPEN_PROBES = 3
 _PROBE_SUCCESSES_TO_CLOSE = 2
+_BUCKETS = 10
+_MIN_CALLS = 2
+_SLOW_CALL_MS = 5000
+_SLOW_CALL_RATIO = 0.8
+_BULKHEAD_MAX_CONCURRENT = 200
 
 
 def _float_env(key: str, default: float) -> float:
@@ -29,6 +35,54 @@ def _int_env(key: str, default: int) -> int:
         return default
 
 
+class _RollingWindow:
+    """环形桶滚动窗口：window_sec 均分为 buckets 个桶，维护总数/失败/慢调用的滑动和，更新 O(1)（均摊）。调用方加锁。"""
+
+    def __init__(self, window_sec: float, buckets: int):
+        self.buckets = max(1, buckets)
+        self.width = max(window_sec / self.buckets, 1e-3)
+        self._ids: List[int] = [-1] * self.buckets
+        self._total = [0] * self.buckets
+        self._failures = [0] * self.buckets
+        self._slow = [0] * self.buckets
+        self._last = -1
+        self.total = 0
+        self.failures = 0
+        self.slow = 0
+
+    def _reset_slot(self, slot: int, bucket_id: int) -> None:
+        self.total -= self._total[slot]
+        self.failures -= self._failures[slot]
+        self.slow -= self._slow[slot]
+        self._total[slot] = self._failures[slot] = self._slow[slot] = 0
+        self._ids[slot] = bucket_id
+
+    def advance(self, now: float) -> int:
+        """使窗口滑动到 now，过期桶清零；返回当前桶下标。"""
+        cur = int(now / self.width)
+        if cur != self._last:
+            start = max(self._last + 1, cur - self.buckets + 1)
+            for b in range(start, cur + 1):
+                self._reset_slot(b % self.buckets, b)
+            self._last = cur
+        return cur % self.buckets
+
+    def add(self, now: float, failure: bool, slow: bool) -> None:
+        slot = self.advance(now)
+        self._total[slot] += 1
+        self.total += 1
+        if failure:
+            self._failures[slot] += 1
+            self.failures += 1
+        if slow:
+            self._slow[slot] += 1
+            self.slow += 1
+
+    def clear(self) -> None:
+        for slot in range(self.buckets):
+            self._reset_slot(slot, self._ids[slot])
+
+
 class CircuitBreaker:
     """单细胞熔断器，线程安全。"""
 
@@ -39,50 +93,66 @@ class CircuitBreaker:
         failure_ratio: Optional[float] = None,
         half_open_probes: Optional[int] = None,
         probe_successes_to_close: Optional[int] = None,
+        slow_call_ms: Optional[float] = None,
+        slow_call_ratio: Optional[float] = None,
+        min_calls: Optional[int] = None,
+        buckets: Optional[int] = None,
     ):
         self.cell_name = cell_name
         self.window_sec = window_sec if window_sec is not None else _float_env("GATEWAY_CB_WINDOW_SEC", _WINDOW_SEC)
         self.failure_ratio = failure_ratio if failure_ratio is not None else _float_env("GATEWAY_CB_FAILURE_RATIO", _FAILURE_RATIO_THRESHOLD)
         self._half_open_probes_limit = half_open_probes if half_open_probes is not None else _int_env("GATEWAY_CB_HALF_OPEN_PROBES", _HALF_OPEN_PROBES)
         self._probe_successes_to_close = probe_successes_to_close if probe_successes_to_close is not None else _int_env("GATEWAY_CB_PROBE_SUCCESSES_TO_CLOSE", _PROBE_SUCCESSES_TO_CLOSE)
+        # 慢调用阈值（毫秒，0 关闭慢调用统计）与慢调用率阈值；窗口内最少调用数，避免小样本误判
+        self.slow_call_ms = slow_call_ms if slow_call_ms is not None else _float_env("GATEWAY_CB_SLOW_CALL_MS", _SLOW_CALL_MS)
+        self.slow_call_ratio = slow_call_ratio if slow_call_ratio is not None else _float_env("GATEWAY_CB_SLOW_CALL_RATIO", _SLOW_CALL_RATIO)
+        self.min_calls = min_calls if min_calls is not None else _int_env("GATEWAY_CB_MIN_CALLS", _MIN_CALLS)
+        self._init_state(buckets if buckets is not None else _int_env("GATEWAY_CB_BUCKETS", _BUCKETS))
+
+    def _init_state(self, buckets: int) -> None:
+        """可变状态（锁、状态机、滚动窗口）；多进程共享实现（shared_state）覆盖此方法。"""
         self._lock = threading.Lock()
         self._state = "closed"  # closed | open | half_open
-        self._window_start = time.monotonic()
-        self._successes = 0
-        self._failures = 0
+        self._window = _RollingWindow(self.window_sec, buckets)
+        self._opened_at = time.monotonic()
         self._half_open_successes = 0
         self._half_open_probes = 0
 
-    def record(self, success: bool) -> None:
+    def _is_slow(self, duration_ms: Optional[float]) -> bool:
+        return bool(self.slow_call_ms) and duration_ms is not None and duration_ms >= self.slow_call_ms
+
+    def _open(self, now: float) -> None:
+        self._state = "open"
+        self._opened_at = now
+        self._half_open_successes = 0
+        self._window.clear()
+
+    def record(self, success: bool, duration_ms: Optional[float] = None) -> None:
+        """记录一次调用结果；duration_ms 给出时参与慢调用率统计。"""
         with self._lock:
             now = time.monotonic()
-            if now - self._window_start >= self.window_sec:
-                self._window_start = now
-                self._successes = 0
-                self._failures = 0
+            slow = self._is_slow(duration_ms)
             if self._state == "half_open":
                 self._half_open_probes += 1
-                if success:
+                if success and not slow:
                     self._half_open_successes += 1
                     if self._half_open_successes >= self._probe_successes_to_close:
                         self._state = "closed"
                         self._half_open_successes = 0
                         self._half_open_probes = 0
+                        self._window.clear()
                 elif self._half_open_probes >= self._half_open_probes_limit:
-                    self._state = "open"
-                    self._window_start = now
-                    self._half_open_successes = 0
+                    self._open(now)
                 return
             if self._state == "open":
                 return
-            if success:
-                self._successes += 1
-            else:
-                self._failures += 1
-            total = self._successes + self._failures
-            if total >= 2 and self._failures / total >= self.failure_ratio:
-                self._state = "open"
-                self._window_start = now
+            w = self._window
+            w.add(now, not success, slow)
+            if w.total >= max(1, self.min_calls) and (
+                w.failures / w.total >= self.failure_ratio
+                or (self.slow_call_ms and w.slow / w.total >= self.slow_call_ratio)
+            ):
+                self._open(now)
 
     def allow_request(self) -> bool:
         """是否允许请求（未熔断或半开可放行）。"""
@@ -92,7 +162,7 @@ class CircuitBreaker:
             if self._state == "half_open":
                 return self._half_open_probes < self._half_open_probes_limit
             if self._state == "open":
-                if time.monotonic() - self._window_start >= self.window_sec:
+                if time.monotonic() - self._opened_at >= self.window_sec:
                     self._state = "half_open"
                     self._half_open_successes = 0
                     self._half_open_probes = 0
@@ -104,18 +174,76 @@ class CircuitBreaker:
         with self._lock:
             return self._state
 
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            w = self._window
+            w.advance(time.monotonic())
+            return {
+                "state": self._state,
+                "calls": w.total,
+                "failureRate": round(w.failures / w.total, 4) if w.total else 0.0,
+                "slowCallRate": round(w.slow / w.total, 4) if w.total else 0.0,
+            }
+
+
+class Bulkhead:
+    """单细胞并发舱壁：try_acquire 非阻塞，满即拒绝；max_concurrent <= 0 表示不限制（仍统计在途数）。"""
+
+    def __init__(self, cell_name: str, max_concurrent: Optional[int] = None):
+        self.cell_name = cell_name
+        if max_concurrent is None:
+            max_concurrent = _int_env(f"GATEWAY_BULKHEAD_{cell_name.upper()}_MAX_CONCURRENT",
+                                      _int_env("GATEWAY_BULKHEAD_MAX_CONCURRENT", _BULKHEAD_MAX_CONCURRENT))
+        self.max_concurrent = max_concurrent
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if 0 < self.max_concurrent <= self._in_flight:
+                self.rejected += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._in_flight > 0:
+                self._in_flight -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
 
 class CircuitBreakerRegistry:
-    """所有细胞的熔断器注册表；参数可从环境变量 GATEWAY_CB_* 读取。"""
+    """所有细胞的熔断器与舱壁注册表；参数可从环境变量 GATEWAY_CB_* / GATEWAY_BULKHEAD_* 读取。"""
     def __init__(self):
         self._breakers: Dict[str, CircuitBreaker] = {}
+        self._bulkheads: Dict[str, Bulkhead] = {}
         self._lock = threading.Lock()
 
+    def _new_breaker(self, cell_name: str) -> CircuitBreaker:
+        return CircuitBreaker(cell_name)
+
+    def _new_bulkhead(self, cell_name: str) -> Bulkhead:
+        return Bulkhead(cell_name)
+
     def get(self, cell_name: str) -> CircuitBreaker:
         with self._lock:
             if cell_name not in self._breakers:
-                self._breakers[cell_name] = CircuitBreaker(cell_name)
+                self._breakers[cell_name] = self._new_breaker(cell_name)
             return self._breakers[cell_name]
 
+    def bulkhead(self, cell_name: str) -> Bulkhead:
+        with self._lock:
+            if cell_name not in self._bulkheads:
+                self._bulkheads[cell_name] = self._new_bulkhead(cell_name)
+            return self._bulkheads[cell_name]
+
 
-__all__ = ["CircuitBreaker", "CircuitBreakerRegistry"]
+__all__ = ["CircuitBreaker", "CircuitBreakerRegistry", "Bulkhead"]
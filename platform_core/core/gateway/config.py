@@ -3,11 +3,19 @@
 《接口设计说明书》3.3：熔断 10s 内 50% 异常率开启；半开探测后恢复。
 零心智负担：开箱即用，从环境变量或默认文件加载。
 支持 JSON（routes 对象）与 YAML（gateway_route_spec 格式：routes 数组 id/path_prefix/upstream）。
+请求路径使用 RouteTable：路由编译一次为只读快照，查找为无锁 dict 读取；
+后台线程轮询 GATEWAY_ROUTES_PATH 的 mtime/size，变更时重新编译并原子替换快照，改路由无需重启。
 """
 import os
 import json
+import logging
 import re
-from typing import Dict
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger("gateway.config")
 
 CONFIG_PATH = os.environ.get("GATEWAY_ROUTES_PATH", "")
 DEFAULT_ROUTES: Dict[str, str] = {}
@@ -60,7 +68,10 @@ def _load_routes_from_file(path: str) -> Dict[str, str]:
 
 
 def load_routes() -> Dict[str, str]:
-    """加载 cell -> base_url 映射；优先环境变量 CELL_*_URL，再文件（JSON 或 YAML）。"""
+    """
+    加载 cell -> base_url 映射；优先环境变量 CELL_*_URL，再文件（JSON 或 YAML）。
+    每次调用都重新扫描与解析，请求路径请使用 get_route_table()。
+    """
     routes: Dict[str, str] = {}
     for key, val in os.environ.items():
         if key.startswith("CELL_") and key.endswith("_URL"):
@@ -73,3 +84,102 @@ def load_routes() -> Dict[str, str]:
     for cell, url in DEFAULT_ROUTES.items():
         routes.setdefault(cell, url)
     return routes
+
+
+# 路由文件轮询间隔（秒），0=不监听
+_WATCH_INTERVAL_SEC = float(os.environ.get("GATEWAY_ROUTES_WATCH_INTERVAL_SEC", "2"))
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size, st.st_ino
+    except OSError:
+        return None
+
+
+class RouteTable:
+    """预编译路由快照（只读 Mapping），文件变更时整表替换；读路径无锁。"""
+
+    def __init__(self, watch_interval_sec: Optional[float] = None):
+        self.watch_interval_sec = _WATCH_INTERVAL_SEC if watch_interval_sec is None else watch_interval_sec
+        self._snapshot: Mapping[str, str] = MappingProxyType({})
+        self._signature: Optional[Tuple[str, Optional[Tuple[int, int, int]]]] = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.reload()
+
+    @property
+    def snapshot(self) -> Mapping[str, str]:
+        return self._snapshot
+
+    def get(self, cell: str) -> Optional[str]:
+        return self._snapshot.get(cell)
+
+    def reload(self) -> bool:
+        """重新编译路由；解析失败时保留旧快照。返回是否成功。"""
+        with self._lock:
+            path = CONFIG_PATH
+            signature = (path, _file_signature(path) if path else None)
+            try:
+                routes = load_routes()
+            except Exception as e:
+                logger.warning("route reload failed, keep previous snapshot: %s", e)
+                self._signature = signature
+                return False
+            self._snapshot = MappingProxyType(routes)
+            self._signature = signature
+            self.version += 1
+            return True
+
+    def check(self) -> bool:
+        """路由文件（或 GATEWAY_ROUTES_PATH）变化时重新编译；返回是否发生重载。"""
+        path = CONFIG_PATH
+        if (path, _file_signature(path) if path else None) == self._signature:
+            return False
+        ok = self.reload()
+        if ok:
+            logger.info("gateway routes reloaded version=%d cells=%d", self.version, len(self._snapshot))
+        return ok
+
+    def start(self) -> None:
+        if self.watch_interval_sec <= 0:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="gateway-routes-watch", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.watch_interval_sec)
+            try:
+                self.check()
+            except Exception as e:
+                logger.debug("route watch error: %s", e)
+
+
+_route_table: Optional[RouteTable] = None
+_route_table_lock = threading.Lock()
+
+
+def get_route_table() -> RouteTable:
+    """进程级路由表单例（首次调用时编译并启动文件监听）。"""
+    global _route_table
+    if _route_table is not None:
+        return _route_table
+    with _route_table_lock:
+        if _route_table is None:
+            table = RouteTable()
+            table.start()
+            _route_table = table
+        return _route_table
+
+
+def set_route_table(table: Optional[RouteTable]) -> None:
+    """替换进程级路由表；prefork worker 使用不监听文件的路由表，由 master 统一监听并以 SIGHUP 触发重载。"""
+    global _route_table
+    with _route_table_lock:
+        _route_table = table
@@ -0,0 +1,85 @@
+"""
+请求截止时间（X-Request-Deadline）：网关按客户端提示与路由默认值确定截止时间并透传至细胞，
+重试/对冲不超出剩余预算，过期请求不再转发；客户端已放弃的请求不再占用细胞算力。
+- 取值：Unix 毫秒（绝对时间，网关与细胞需时钟同步）。
+- 客户端提示：X-Request-Deadline（绝对）或 X-Request-Timeout（相对毫秒）；只能缩短、不能超过路由默认值。
+- 路由默认：GATEWAY_DEADLINE_RULES（JSON 数组，按顺序首个匹配生效），
+  例 [{"cell": "erp", "path": "reports/", "timeoutMs": 60000}]；未匹配时为 GATEWAY_DEADLINE_DEFAULT_MS，
+  未配置则取转发超时 GATEWAY_PROXY_TIMEOUT_SEC。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from .retry_policy import DeadlineExceeded  # noqa: F401  供网关统一捕获
+
+logger = logging.getLogger("gateway.deadline")
+
+HEADER = "X-Request-Deadline"
+TIMEOUT_HEADER = "X-Request-Timeout"
+_DEFAULT_MS = float(os.environ.get("GATEWAY_DEADLINE_DEFAULT_MS", "0") or 0)
+
+
+def _load_rules() -> List[Dict[str, Any]]:
+    raw = (os.environ.get("GATEWAY_DEADLINE_RULES") or "").strip()
+    if not raw:
+        return []
+    try:
+        rules = json.loads(raw)
+        return [r for r in rules if isinstance(r, dict) and r.get("timeoutMs")]
+    except Exception as e:
+        logger.warning("invalid GATEWAY_DEADLINE_RULES ignored: %s", e)
+        return []
+
+
+_RULES = _load_rules()
+
+
+def route_timeout_ms(cell: str, path: str, default_timeout_sec: float) -> float:
+    """路由默认预算（毫秒）：首个匹配规则 > GATEWAY_DEADLINE_DEFAULT_MS > 转发超时。"""
+    path = (path or "").lstrip("/")
+    for rule in _RULES:
+        if rule.get("cell") and rule["cell"] != cell:
+            continue
+        if rule.get("path") and not path.startswith(str(rule["path"]).lstrip("/")):
+            continue
+        return float(rule["timeoutMs"])
+    return _DEFAULT_MS or float(default_timeout_sec) * 1000.0
+
+
+def parse(value: Optional[str]) -> float:
+    """X-Request-Deadline 头 -> Unix 秒；缺失或非法返回 0。"""
+    try:
+        ms = float((value or "").strip())
+    except ValueError:
+        return 0.0
+    return ms / 1000.0 if ms > 0 else 0.0
+
+
+def compute(headers, cell: str, path: str, default_timeout_sec: float, now: Optional[float] = None) -> float:
+    """按路由默认值与客户端提示（取最早者）计算截止时间（Unix 秒）；headers 需支持 .get(name)。"""
+    now = time.time() if now is None else now
+    deadline = now + route_timeout_ms(cell, path, default_timeout_sec) / 1000.0
+    hinted = parse(headers.get(HEADER))
+    if hinted:
+        deadline = min(deadline, hinted)
+    try:
+        timeout_ms = float((headers.get(TIMEOUT_HEADER) or "").strip() or 0)
+    except ValueError:
+        timeout_ms = 0.0
+    if timeout_ms > 0:
+        deadline = min(deadline, now + timeout_ms / 1000.0)
+    return deadline
+
+
+def remaining(deadline: float, now: Optional[float] = None) -> float:
+    """剩余秒数（可为负）。"""
+    return deadline - (time.time() if now is None else now)
+
+
+def header_value(deadline: float) -> str:
+    return str(int(deadline * 1000))
@@ -0,0 +1,192 @@
+"""
+租户加权公平排队：上游转发前按租户排队，过载时按租户套餐权重分配上游并发名额。
+- 调度器按细胞独立：在途上限 GATEWAY_FAIR_QUEUE_CONCURRENCY 为单个细胞的名额，慢细胞只让自己的请求排队，不占用其他细胞的名额。
+- 名额在细胞准入（熔断/自适应并发/舱壁）通过后申请，排队中的请求计入舱壁在途数；上限低于舱壁时超出部分按租户权重排队。
+- 有空闲名额且无人排队时直接放行（无额外开销）。
+- 名额用尽时进入租户自己的有界队列（GATEWAY_FAIR_QUEUE_MAX_PER_TENANT，满则 429），
+  按虚拟完成时间（WFQ：tag = max(全局虚拟时间, 租户上次 tag) + 1/权重）最小者出队；
+  重负载租户只拉长自己的排队时间，轻负载租户的请求始终排在前面。
+- 排队超过 GATEWAY_FAIR_QUEUE_TIMEOUT_MS（或请求截止时间）返回 503；线程与协程均可等待。
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+FAIR_QUEUE_CONCURRENCY = int(os.environ.get("GATEWAY_FAIR_QUEUE_CONCURRENCY", "128"))
+_MAX_PER_TENANT = int(os.environ.get("GATEWAY_FAIR_QUEUE_MAX_PER_TENANT", "100"))
+FAIR_QUEUE_TIMEOUT_SEC = float(os.environ.get("GATEWAY_FAIR_QUEUE_TIMEOUT_MS", "5000")) / 1000.0
+
+
+class QueueFull(Exception):
+    """租户队列已满。"""
+
+
+class Ticket:
+    """上游并发名额；release 幂等，可挂在响应关闭回调上。"""
+
+    __slots__ = ("_scheduler", "tenant", "waited_ms", "_released")
+
+    def __init__(self, scheduler: "FairScheduler", tenant: str, waited_ms: float = 0.0):
+        self._scheduler = scheduler
+        self.tenant = tenant
+        self.waited_ms = waited_ms
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+
+class _Waiter:
+    __slots__ = ("tenant", "granted", "cancelled", "_event", "_loop", "_future")
+
+    def __init__(self, tenant: str, event: Optional[threading.Event] = None):
+        self.tenant = tenant
+        self.granted = False
+        self.cancelled = False
+        self._event = event
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._future: Optional[asyncio.Future] = None
+
+    def _wake(self) -> None:
+        if self._event is not None:
+            self._event.set()
+        elif self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda f=self._future: f.done() or f.set_result(True))
+
+
+class FairScheduler:
+    """加权公平调度器（所有状态受同一把锁保护，出入队 O(log n)）。"""
+
+    def __init__(self, concurrency: Optional[int] = None, max_per_tenant: Optional[int] = None):
+        self.concurrency = FAIR_QUEUE_CONCURRENCY if concurrency is None else concurrency
+        self.max_per_tenant = _MAX_PER_TENANT if max_per_tenant is None else max_per_tenant
+        self._in_flight = 0
+        self._heap: List[Tuple[float, int, _Waiter]] = []
+        self._queued: Dict[str, int] = {}
+        self._last_tag: Dict[str, float] = {}
+        self._vtime = 0.0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tenant: str, key: str) -> None:
+        st = self._stats.get(tenant)
+        if st is None:
+            st = self._stats[tenant] = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+        st[key] += 1
+
+    def _enqueue(self, tenant: str, weight: float, event: Optional[threading.Event] = None) -> Optional[_Waiter]:
+        """有空闲名额且无人排队时直接占用并返回 None；否则入队返回等待者；队列满抛出 QueueFull。"""
+        with self._lock:
+            if self._in_flight < self.concurrency and not self._heap:
+                self._in_flight += 1
+                self._count(tenant, "admitted")
+                return None
+            if self._queued.get(tenant, 0) >= self.max_per_tenant:
+                self._count(tenant, "rejected")
+                raise QueueFull(tenant)
+            tag = max(self._vtime, self._last_tag.get(tenant, 0.0)) + 1.0 / max(weight, 1e-6)
+            self._last_tag[tenant] = tag
+            self._queued[tenant] = self._queued.get(tenant, 0) + 1
+            waiter = _Waiter(tenant, event)
+            heapq.heappush(self._heap, (tag, next(self._seq), waiter))
+            self._count(tenant, "queued")
+            return waiter
+
+    def _dispatch_locked(self) -> None:
+        """有空闲名额时按最小 tag 出队唤醒；跳过已超时取消的等待者。"""
+        while self._heap and self._in_flight < self.concurrency:
+            tag, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            self._vtime = tag
+            self._dequeued_locked(waiter.tenant)
+            waiter.granted = True
+            self._in_flight += 1
+            self._count(waiter.tenant, "admitted")
+            waiter._wake()
+
+    def _dequeued_locked(self, tenant: str) -> None:
+        left = self._queued.get(tenant, 1) - 1
+        if left > 0:
+            self._queued[tenant] = left
+            return
+        self._queued.pop(tenant, None)
+        if self._last_tag.get(tenant, 0.0) <= self._vtime:
+            self._last_tag.pop(tenant, None)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._dispatch_locked()
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """等待超时：若恰好已被授予名额则返回 True（照常使用），否则标记取消。"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            self._dequeued_locked(waiter.tenant)
+            self._count(waiter.tenant, "timeouts")
+            return False
+
+    def acquire(self, tenant: str, weight: float = 1.0, timeout: Optional[float] = None) -> Optional[Ticket]:
+        """线程内等待名额；超时返回 None，队列满抛出 QueueFull。"""
+        start = time.perf_counter()
+        waiter = self._enqueue(tenant, weight, threading.Event())
+        if waiter is not None:
+            if not waiter._event.wait(FAIR_QUEUE_TIMEOUT_SEC if timeout is None else max(0.0, timeout)):
+                if not self._give_up(waiter):
+                    return None
+        return Ticket(self, tenant, (time.perf_counter() - start) * 1000)
+
+    async def acquire_async(self, tenant: str, weight: float = 1.0, timeout: Optional[float] = None) -> Optional[Ticket]:
+        """协程内等待名额（不占用线程）；语义同 acquire。"""
+        start = time.perf_counter()
+        waiter = self._enqueue(tenant, weight)
+        if waiter is not None:
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            with self._lock:
+                waiter._loop, waiter._future = loop, fut
+                if waiter.granted:
+                    fut.set_result(True)
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), FAIR_QUEUE_TIMEOUT_SEC if timeout is None else max(0.0, timeout))
+            except asyncio.TimeoutError:
+                if not self._give_up(waiter):
+                    return None
+        return Ticket(self, tenant, (time.perf_counter() - start) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "inFlight": self._in_flight,
+                "queued": dict(self._queued),
+                "tenants": {t: dict(v) for t, v in self._stats.items()},
+            }
+
+
+_schedulers: Dict[str, FairScheduler] = {}
+_default_lock = threading.Lock()
+
+
+def get_scheduler(cell: str = "") -> FairScheduler:
+    """细胞对应的调度器（首次使用时创建）。"""
+    sched = _schedulers.get(cell)
+    if sched is not None:
+        return sched
+    with _default_lock:
+        sched = _schedulers.get(cell)
+        if sched is None:
+            sched = _schedulers[cell] = FairScheduler()
+        return sched
@@ -0,0 +1,203 @@
+"""
+网关 GET 响应缓存原语：O(1) LRU/TTL 缓存、单飞（single-flight）请求合并、陈旧可用（stale-while-revalidate）。
+- LRUTTLCache：OrderedDict 维护访问顺序，命中 move_to_end、淘汰 popitem，读写均为 O(1)。
+  条目过期后在 stale_sec 窗口内仍可作为陈旧副本返回，由调用方触发后台刷新。
+  条目可附带编码变体（如 gzip 字节），写入时压缩一次，命中时按客户端编码直接返回，不再逐请求压缩。
+  条目带强 ETag 时，编码变体返回派生 ETag（"<tag>-gzip"），同一资源不同表示的强校验值不同。
+  TTL/陈旧窗口可按条目指定（细胞合约声明的缓存策略），未指定时取缓存默认值。
+- SingleFlight：同一 key 的并发调用只执行一次，其余调用等待并共享结果（或异常）。
+线程安全；不依赖 Flask，可供同步转发与后台刷新线程共用。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 条目：(status, headers_list, body, fresh_until, stale_until, variants{encoding: body}, ttl_sec, stale_sec)
+_Entry = Tuple[int, List[Tuple[str, str]], bytes, float, float, Dict[str, bytes], float, float]
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    """编码变体的 ETag：在引号内追加 -<encoding>。"""
+    if not etag or not encoding or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def base_etag(etag: str) -> str:
+    """去掉编码变体后缀，得到原始表示的 ETag（回源条件请求使用）。"""
+    return etag[:-6] + '"' if etag.endswith('-gzip"') else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 判定（弱比较）：忽略 W/ 前缀与编码变体后缀；"*" 匹配任意已存在的表示。"""
+    value = (if_none_match or "").strip()
+    if not value or not etag:
+        return False
+    if value == "*":
+        return True
+    target = _opaque_tag(etag)
+    return any(_opaque_tag(t) == target for t in value.split(","))
+
+
+def _opaque_tag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    return tag[:-5] if tag.endswith("-gzip") else tag
+
+
+class LRUTTLCache:
+    """容量有界的 LRU + TTL 缓存。"""
+
+    def __init__(self, max_entries: int, ttl_sec: float, stale_sec: float = 0.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_sec = float(ttl_sec)
+        self.stale_sec = max(0.0, float(stale_sec))
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, allow_stale: bool = False,
+            encoding: str = "") -> Optional[Tuple[Tuple[int, Dict[str, str], bytes], bool]]:
+        """
+        返回 ((status, headers, body), is_stale) 或 None；超出陈旧窗口的条目顺带删除。
+        encoding 命中已存变体时返回该变体并带 Content-Encoding 头，否则返回原始 body。
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            status, headers_list, body, fresh_until, stale_until, variants = entry[:6]
+            if now > fresh_until:
+                if now > stale_until:
+                    del self._data[key]
+                    return None
+                if not allow_stale:
+                    return None
+            self._data.move_to_end(key)
+        headers = dict(headers_list)
+        if encoding and encoding in variants:
+            headers["Content-Encoding"] = encoding
+            body = variants[encoding]
+            if "ETag" in headers:
+                headers["ETag"] = variant_etag(headers["ETag"], encoding)
+        return (status, headers, body), now > fresh_until
+
+    def set(self, key: str, status: int, headers: Dict[str, str], body: bytes,
+            variants: Optional[Dict[str, bytes]] = None, ttl_sec: Optional[float] = None,
+            stale_sec: Optional[float] = None) -> None:
+        now = time.monotonic()
+        headers_list = [(k, v) for k, v in headers.items() if k.lower() not in ("transfer-encoding", "connection")]
+        ttl = self.ttl_sec if ttl_sec is None else float(ttl_sec)
+        stale = self.stale_sec if stale_sec is None else max(0.0, float(stale_sec))
+        fresh_until = now + ttl
+        with self._lock:
+            self._data[key] = (status, headers_list, body, fresh_until, fresh_until + stale, variants or {}, ttl, stale)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def refresh(self, key: str) -> bool:
+        """条件回源确认未变更（304）时延长条目有效期，无需重新下载；条目已不存在返回 False。"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            ttl, stale = entry[6], entry[7]
+            fresh_until = now + ttl
+            self._data[key] = entry[:3] + (fresh_until, fresh_until + stale) + entry[5:]
+            self._data.move_to_end(key)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class _Call:
+    __slots__ = ("event", "result", "exc")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.exc: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同 key 并发调用合并为一次执行；N 个并发相同请求只产生 1 次上游调用。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.exc is not None:
+                raise call.exc
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.exc = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class Revalidator:
+    """后台刷新陈旧条目：有界线程池执行，同 key 在排队或执行中时不重复提交（含 SingleFlight 在途的前台回源），不阻塞当前请求。"""
+
+    def __init__(self, single_flight: SingleFlight, max_workers: int = 4):
+        self._sf = single_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gateway-revalidate")
+        self._lock = threading.Lock()
+        self._pending: set = set()
+
+    def submit(self, key: str, fn: Callable[[], Any]) -> bool:
+        """同 key 已排队、执行中或有调用在途时不重复提交，返回是否提交。"""
+        with self._lock:
+            if key in self._pending or self._sf.in_flight(key):
+                return False
+            self._pending.add(key)
+
+        def _run():
+            try:
+                self._sf.do(key, fn)
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+
+        self._executor.submit(_run)
+        return True
+
+
+__all__ = ["LRUTTLCache", "SingleFlight", "Revalidator", "base_etag", "etag_matches", "variant_etag"]
@@ -1,16 +1,38 @@
 """
-网关 HTTP 转发性能优化：连接池复用、可选 GET 缓存、压缩传输。
+网关 HTTP 转发性能优化：连接池复用、可选 GET 缓存、压缩传输、流式转发。
 - 连接池：urllib3 PoolManager 复用 TCP 连接，降低转发耗时。
-- GET 缓存：对 GET 请求且 2xx 响应做短 TTL 缓存，避免重复穿透细胞（可选）。
-- 压缩：向上游发送 Accept-Encoding: gzip；向客户端返回时对较大 body 做 gzip 压缩（可选）。
+- GET 缓存：对 GET 请求且 2xx 响应做短 TTL 缓存（O(1) LRU），并发相同请求单飞合并为一次上游调用；
+  过期后在陈旧窗口内先返回旧值并后台刷新（stale-while-revalidate），热点接口预热后不再同步穿透。
+- 压缩：向上游发送 Accept-Encoding: gzip；上游已压缩且客户端接受 gzip 时原样透传，不解压再压缩；
+  未压缩的 body 按大小/内容类型策略选择压缩级别（过小或已压缩格式不压缩，大 body 用低级别）；
+  可缓存的 GET 响应写入时压缩一次并与原始 body 一同缓存，命中时按客户端编码直接返回。
+- 条件请求：可缓存的 GET 响应带强 ETag（上游强 ETag 原样沿用，否则对原始 body 计算一次）；
+  客户端 If-None-Match 命中缓存时直接返回 304；陈旧条目后台刷新时携带 If-None-Match 回源，
+  细胞返回 304 则仅延长有效期，不重新下载。未启用缓存时 If-None-Match 透传给细胞。
+- 缓存策略：调用方可传入细胞合约声明的 cache_policy（TTL/陈旧窗口）与 cache_scope（租户/用户/角色与失效代数），
+  见 cache_policy；未传入时使用 GATEWAY_GET_CACHE_TTL_SEC 全局 TTL。
+- 字段投影：调用方传入 fields（查询串 fields=a,b）时，2xx JSON 列表响应在缓存与压缩之前按字段投影（见 projection）。
+- 流式：导出/下载类路径与大请求体走 stream_request，按固定块大小在客户端与细胞之间管道传输，网关内存有界。
+- 进程内调度：inproc://<cell> 地址（见 inprocess）在单次尝试处直接调用细胞 WSGI 应用，其余逻辑不变；进程内调用不对冲。
+- 无 urllib3 时同样在单次尝试处回退到 urllib，缓存、条件请求、字段投影与重试逻辑不变。
+- 重试：由 retry_policy 按方法/路由与细胞、全局重试预算决定；幂等 GET 首个请求在请求线程内发出并等待 p95 延迟，
+  仍未返回时才发出对冲请求。
 不改变与 Cell 的接口契约，100% 兼容现有调用。
 """
 import os
+import select
 import time
 import gzip
+import hashlib
+import zlib
 import logging
 import threading
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from . import inprocess as _inprocess
+from . import projection as _projection
+from . import retry_policy as _retry_policy
+from .get_cache import LRUTTLCache, Revalidator, SingleFlight, base_etag, etag_matches
 
 logger = logging.getLogger("gateway.http_client")
 
@@ -18,12 +40,34 @@ logger = logging.getLogger("gateway.http_client")
 _pool: Optional[Any] = None
 _pool_lock = threading.Lock()
 
-# GET 缓存：key -> (status, headers_list, body, expire_ts)
-_get_cache: Dict[str, Tuple[int, List[Tuple[str, str]], bytes, float]] = {}
-_get_cache_lock = threading.Lock()
 _CACHE_MAX = int(os.environ.get("GATEWAY_GET_CACHE_MAX", "1000"))
 _CACHE_TTL_SEC = float(os.environ.get("GATEWAY_GET_CACHE_TTL_SEC", "0"))  # 0=关闭缓存；建议 10 用于列表/健康等读多场景
+# 过期后仍可返回旧值并后台刷新的窗口（秒），0=过期即同步回源
+_CACHE_STALE_SEC = float(os.environ.get("GATEWAY_GET_CACHE_STALE_SEC", "30"))
+# GET 缓存：O(1) LRU/TTL；单飞合并并发未命中；后台刷新陈旧条目
+_get_cache = LRUTTLCache(_CACHE_MAX, _CACHE_TTL_SEC, _CACHE_STALE_SEC)
+_single_flight = SingleFlight()
+_revalidator = Revalidator(_single_flight, max_workers=int(os.environ.get("GATEWAY_GET_CACHE_REVALIDATE_WORKERS", "4")))
 _COMPRESS_MIN_BYTES = int(os.environ.get("GATEWAY_COMPRESS_MIN_BYTES", "256"))
+# 压缩级别策略：常规级别、超过 LARGE_BYTES 的大 body 用的低级别、缓存变体（只压一次）用的级别
+_COMPRESS_LEVEL = int(os.environ.get("GATEWAY_COMPRESS_LEVEL", "6"))
+_COMPRESS_LARGE_BYTES = int(os.environ.get("GATEWAY_COMPRESS_LARGE_BYTES", str(1024 * 1024)))
+_COMPRESS_LEVEL_LARGE = int(os.environ.get("GATEWAY_COMPRESS_LEVEL_LARGE", "1"))
+_COMPRESS_CACHE_LEVEL = int(os.environ.get("GATEWAY_COMPRESS_CACHE_LEVEL", "9"))
+# 已压缩或二进制格式，再压缩收益小
+_INCOMPRESSIBLE_TYPES = (
+    "image/", "video/", "audio/", "font/woff", "application/zip", "application/gzip", "application/x-gzip",
+    "application/pdf", "application/octet-stream",
+)
+# 流式转发：块大小（即单请求网关侧缓冲上限）、触发路径关键字、上传体阈值
+STREAM_CHUNK_BYTES = int(os.environ.get("GATEWAY_STREAM_CHUNK_BYTES", "65536"))
+STREAM_PATH_KEYWORDS = tuple(
+    p.strip().lower() for p in os.environ.get("GATEWAY_STREAM_PATHS", "export,download").split(",") if p.strip()
+)
+STREAM_MIN_UPLOAD_BYTES = int(os.environ.get("GATEWAY_STREAM_MIN_UPLOAD_BYTES", str(1024 * 1024)))
+_HOP_BY_HOP = ("transfer-encoding", "connection", "keep-alive")
+# 304 响应保留的头（RFC 9110 15.4.5）
+_NOT_MODIFIED_HEADERS = ("etag", "cache-control", "expires", "vary", "content-location", "date")
 
 
 def _get_pool():
@@ -46,43 +90,284 @@ def _get_pool():
         return _pool
 
 
-def _cache_key(cell: str, path: str, query: str) -> str:
-    return f"{cell}:{path}:{query}"
+def _cache_key(cell: str, path: str, query: str, scope: str = "") -> str:
+    return f"{cell}:{path}:{query}|{scope}" if scope else f"{cell}:{path}:{query}"
+
+
+def _cache_ttl(policy: Optional[Any]) -> float:
+    return policy.ttl_sec if policy is not None else _CACHE_TTL_SEC
+
+
+def _get_cached(key: str, allow_stale: bool = False) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+    """返回 (status, headers_dict, body) 或 None；allow_stale 时陈旧窗口内的条目也返回。"""
+    hit = _get_cache.get(key, allow_stale=allow_stale)
+    return hit[0] if hit else None
+
+
+def _header(headers: Dict[str, str], name: str) -> str:
+    name = name.lower()
+    for k, v in headers.items():
+        if k.lower() == name:
+            return v or ""
+    return ""
+
+
+def _without(headers: Dict[str, str], name: str) -> Dict[str, str]:
+    name = name.lower()
+    return {k: v for k, v in headers.items() if k.lower() != name}
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """客户端 Accept-Encoding 是否接受 gzip（支持 q 值，gzip;q=0 视为不接受）。"""
+    for part in (accept_encoding or "").lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip() not in ("gzip", "*"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return True
+        return True
+    return False
+
+
+def compress_level(content_type: str, size: int) -> int:
+    """按大小与内容类型选择 gzip 级别；0 表示不压缩。"""
+    if size < _COMPRESS_MIN_BYTES:
+        return 0
+    ct = (content_type or "").lower()
+    if any(ct.startswith(t) for t in _INCOMPRESSIBLE_TYPES):
+        return 0
+    return _COMPRESS_LEVEL_LARGE if size >= _COMPRESS_LARGE_BYTES else _COMPRESS_LEVEL
 
 
-def _get_cached(key: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
-    """返回 (status, headers_dict, body) 或 None。"""
-    with _get_cache_lock:
-        if key not in _get_cache:
-            return None
-        status, headers_list, body, expire = _get_cache[key]
-        if time.time() > expire:
-            del _get_cache[key]
-            return None
-        return status, dict(headers_list), body
+def strong_etag(body: bytes) -> str:
+    """按 body 内容计算强 ETag（128 位 BLAKE2b）。"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
 
 
-def _set_cache(key: str, status: int, headers: Dict[str, str], body: bytes) -> None:
-    with _get_cache_lock:
-        while len(_get_cache) >= _CACHE_MAX:
-            oldest = min(_get_cache.keys(), key=lambda k: _get_cache[k][3])
-            del _get_cache[oldest]
-        headers_list = [(k, v) for k, v in headers.items() if k.lower() not in ("transfer-encoding", "connection")]
-        _get_cache[key] = (status, headers_list, body, time.time() + _CACHE_TTL_SEC)
+def not_modified(headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+    """由完整响应头构造 304：只保留校验与缓存相关头，不带 body。"""
+    return 304, {k: v for k, v in headers.items() if k.lower() in _NOT_MODIFIED_HEADERS}, b""
 
 
-def _compress_if_needed(body: bytes, accept_encoding: str) -> Tuple[bytes, bool]:
-    """若客户端支持 gzip 且 body 足够大则压缩，返回 (body, was_compressed)。"""
-    if not body or len(body) < _COMPRESS_MIN_BYTES:
+def _conditional(result: Tuple[int, Dict[str, str], bytes], if_none_match: Optional[str]) -> Tuple[int, Dict[str, str], bytes]:
+    """客户端 If-None-Match 与响应 ETag 匹配时返回 304，否则原样返回。"""
+    status, headers, _ = result
+    if if_none_match and 200 <= status < 300 and etag_matches(if_none_match, _header(headers, "ETag")):
+        return not_modified(headers)
+    return result
+
+
+def _set_cache(key: str, status: int, headers: Dict[str, str], body: bytes, policy: Optional[Any] = None) -> None:
+    """
+    缓存原始（未压缩）body 与 gzip 变体：上游已是 gzip 时直接复用其字节，否则按策略压缩一次；其他编码不缓存。
+    条目 ETag 取上游强 ETag，缺失或为弱 ETag 时对原始 body 计算。
+    """
+    etag = _header(headers, "ETag")
+    headers = _without(headers, "ETag")
+    encoding = _header(headers, "Content-Encoding").lower()
+    variants: Dict[str, bytes] = {}
+    if encoding == "gzip":
+        try:
+            raw = gzip.decompress(body)
+        except Exception:
+            return
+        variants["gzip"], body, headers = body, raw, _without(headers, "Content-Encoding")
+    elif encoding and encoding != "identity":
+        return
+    elif compress_level(_header(headers, "Content-Type"), len(body)):
+        variants["gzip"] = gzip.compress(body, compresslevel=_COMPRESS_CACHE_LEVEL)
+    headers["ETag"] = etag if etag and not etag.startswith("W/") else strong_etag(body)
+    if policy is not None:
+        _get_cache.set(key, status, headers, body, variants, policy.ttl_sec, policy.stale_sec)
+    else:
+        _get_cache.set(key, status, headers, body, variants)
+
+
+def _revalidated(key: str, result: Tuple[int, Dict[str, str], bytes], etag: str,
+                 policy: Optional[Any] = None) -> None:
+    """回源结果写回缓存：带 If-None-Match 且细胞返回 304 时仅延长有效期，2xx 时整体替换。"""
+    if etag and result[0] == 304:
+        _get_cache.refresh(key)
+    elif 200 <= result[0] < 300:
+        _set_cache(key, *result, policy=policy)
+
+
+def _cached(key: str, client_accept_encoding: Optional[str], allow_stale: bool = False):
+    """按客户端编码取缓存：返回 ((status, headers, body), is_stale) 或 None，body 已是最终输出形式。"""
+    return _get_cache.get(key, allow_stale=allow_stale, encoding="gzip" if accepts_gzip(client_accept_encoding) else "")
+
+
+def _compress_if_needed(body: bytes, accept_encoding: str, content_type: str = "") -> Tuple[bytes, bool]:
+    """若客户端支持 gzip 且压缩策略允许则按策略级别压缩，返回 (body, was_compressed)。"""
+    if not body or not accepts_gzip(accept_encoding):
         return body, False
-    if "gzip" not in (accept_encoding or "").lower():
+    level = compress_level(content_type, len(body))
+    if not level:
         return body, False
     try:
-        return gzip.compress(body, compresslevel=6), True
+        return gzip.compress(body, compresslevel=level), True
     except Exception:
         return body, False
 
 
+def _finish(status: int, headers: Dict[str, str], body: bytes, client_accept_encoding: Optional[str]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    按客户端 Accept-Encoding 输出：上游 gzip 且客户端接受时原样透传；客户端不接受时解压；
+    其他编码原样返回；未压缩 body 按策略压缩。
+    """
+    encoding = _header(headers, "Content-Encoding").lower()
+    if encoding == "gzip":
+        if accepts_gzip(client_accept_encoding):
+            return status, headers, body
+        try:
+            return status, _without(headers, "Content-Encoding"), gzip.decompress(body)
+        except Exception:
+            return status, headers, body
+    if encoding and encoding != "identity":
+        return status, headers, body
+    body, compressed = _compress_if_needed(body, client_accept_encoding or "", _header(headers, "Content-Type"))
+    if compressed:
+        headers = {**_without(headers, "Content-Encoding"), "Content-Encoding": "gzip"}
+    return status, headers, body
+
+
+def _attempt(pool: Any, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+             timeout: float) -> Tuple[int, Dict[str, str], bytes]:
+    """单次上游请求，返回 (status, headers, body)；body 保持上游编码（gzip 不解压，由 _finish 决定透传或解压）。"""
+    if _inprocess.is_inprocess(url):
+        return _inprocess.get_dispatcher().call(url, method, body, headers)
+    if pool is False:
+        return _urllib_attempt(method, url, body, headers, timeout)
+    import urllib3 as _urllib3
+    resp = pool.request(
+        method,
+        url,
+        body=body,
+        headers=headers,
+        timeout=_urllib3.util.Timeout(connect=5, read=timeout),
+        retries=False,
+        decode_content=False,
+    )
+    out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in _HOP_BY_HOP and k.lower() != "content-length"}
+    return resp.status, out_headers, resp.data
+
+
+class _SentAttempt:
+    """已在请求线程内发出、尚未读取响应的单次上游请求（对冲用，见 retry_policy.run_hedged）。"""
+
+    __slots__ = ("_cp", "_conn", "_read_timeout", "_result")
+
+    def __init__(self, cp: Any = None, conn: Any = None, read_timeout: float = 0.0,
+                 result: Optional[Tuple[int, Dict[str, str], bytes]] = None):
+        self._cp = cp
+        self._conn = conn
+        self._read_timeout = read_timeout
+        self._result = result
+
+    def ready(self, timeout: float) -> bool:
+        """最多等待 timeout 秒直至响应可读（或连接已断开，由 finish 报错）。"""
+        sock = getattr(self._conn, "sock", None)
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], timeout)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def finish(self) -> Tuple[int, Dict[str, str], bytes]:
+        """读取响应并归还连接；出错时关闭连接并释放连接池名额。"""
+        if self._conn is None:
+            return self._result
+        conn = self._conn
+        try:
+            conn.timeout = self._read_timeout
+            resp = conn.getresponse()
+            data = resp.data
+        except BaseException:
+            conn.close()
+            self._cp._put_conn(None)
+            raise
+        self._cp._put_conn(conn)
+        out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in _HOP_BY_HOP and k.lower() != "content-length"}
+        return resp.status, out_headers, data
+
+
+def _start_attempt(pool: Any, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+                   timeout: float) -> _SentAttempt:
+    """
+    在请求线程内发出单次上游请求但暂不读取响应，供对冲先在本线程等待 p95 延迟；
+    无 urllib3 时同步完成整个请求（不对冲）。
+    """
+    if pool is False:
+        return _SentAttempt(result=_urllib_attempt(method, url, body, headers, timeout))
+    import urllib3 as _urllib3
+    cp = pool.connection_from_url(url)
+    conn = cp._get_conn()
+    try:
+        conn.timeout = 5
+        conn.request(method, _urllib3.util.parse_url(url).request_uri, body=body, headers=headers,
+                     decode_content=False)
+    except BaseException:
+        conn.close()
+        cp._put_conn(None)
+        raise
+    return _SentAttempt(cp, conn, timeout)
+
+
+def _urllib_attempt(method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+                    timeout: float) -> Tuple[int, Dict[str, str], bytes]:
+    """无 urllib3 时的单次尝试：非 2xx（含 304）同样作为结果返回，由调用方按重试策略处理。"""
+    import urllib.request
+    import urllib.error
+    req = urllib.request.Request(url, data=body, method=method)
+    for k, v in headers.items():
+        req.add_header(k, v)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            status, raw_headers, data = r.getcode(), r.headers, r.read()
+    except urllib.error.HTTPError as e:
+        status, raw_headers, data = e.code, e.headers, (e.read() if e.fp else b"")
+    out_headers = {k: v for k, v in raw_headers.items() if k.lower() not in _HOP_BY_HOP and k.lower() != "content-length"}
+    return status, out_headers, data
+
+
+def _fetch(pool: Any, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+           timeout: float, max_retries: int, cell: str = "", path: str = "",
+           deadline: float = 0.0) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    经连接池请求上游（按重试策略与细胞重试预算退避重试，GET 超过 p95 时对冲），返回 (status, headers, body)。
+    deadline（Unix 秒）给出时每次尝试的读超时不超过剩余预算，过期抛出 DeadlineExceeded。
+    """
+    ctl = _retry_policy.begin(method, cell, path, max_retries, deadline=deadline)
+    inprocess = _inprocess.is_inprocess(url)
+    for attempt in range(ctl.max_attempts):
+        start = time.perf_counter()
+        attempt_timeout = ctl.attempt_timeout(timeout)
+        try:
+            delay = None if inprocess else ctl.hedge_delay()
+            if delay is not None:
+                result = _retry_policy.run_hedged(ctl, delay, _start_attempt, _attempt,
+                                                  pool, method, url, body, headers, attempt_timeout)
+            else:
+                result = _attempt(pool, method, url, body, headers, attempt_timeout)
+        except Exception as e:
+            if ctl.retry_error(e, attempt):
+                ctl.sleep(attempt)
+                continue
+            raise
+        ctl.record_latency((time.perf_counter() - start) * 1000)
+        if ctl.retry_status(result[0], attempt):
+            ctl.sleep(attempt)
+            continue
+        return result
+    raise RuntimeError("forward failed")
+
+
 def forward_request(
     base_url: str,
     path: str,
@@ -95,124 +380,235 @@ def forward_request(
     query_string: str = "",
     use_cache: bool = True,
     client_accept_encoding: Optional[str] = None,
+    deadline: float = 0.0,
+    client_if_none_match: Optional[str] = None,
+    cache_policy: Optional[Any] = None,
+    cache_scope: str = "",
+    fields: Optional[Tuple[str, ...]] = None,
 ) -> Tuple[int, Dict[str, str], bytes]:
     """
     使用连接池转发请求，可选 GET 缓存与响应压缩。
+    缓存开启时：新鲜命中直接返回；陈旧命中先返回旧值并后台刷新；未命中经单飞合并，仅一个请求回源；
+    client_if_none_match 与条目 ETag 匹配时返回 304（无 body）。
+    cache_policy/cache_scope 为合约声明的缓存策略与键后缀（见 cache_policy.cache_args）。
+    deadline 为请求截止时间（Unix 秒，0=无），重试与对冲不超出剩余预算；后台刷新不受其约束。
+    fields 为列表字段投影（projection.parse_fields），投影后的 body 才进入缓存。
     返回 (status_code, response_headers, body_bytes)。
     """
     pool = _get_pool()
-    if pool is False:
-        return _fallback_forward(base_url, path, method, body, headers, timeout, max_retries, client_accept_encoding, query_string)
-
     method = method.upper()
     url = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
-    is_get = method == "GET"
-    cache_key = _cache_key(cell, path, query_string or "") if is_get and use_cache else None
-
-    if is_get and use_cache and _CACHE_TTL_SEC > 0 and cache_key:
-        cached = _get_cached(cache_key)
-        if cached:
-            status, hdrs, b = cached
-            b, compressed = _compress_if_needed(b, client_accept_encoding or "")
-            if compressed:
-                hdrs = {**hdrs, "Content-Encoding": "gzip"}
-            return status, hdrs, b
-
     forward_headers = dict(headers)
-    if "Accept-Encoding" not in [k for k in forward_headers if k.lower() == "accept-encoding"]:
+    if not any(k.lower() == "accept-encoding" for k in forward_headers):
         forward_headers["Accept-Encoding"] = "gzip"
 
+    if not (method == "GET" and use_cache and _cache_ttl(cache_policy) > 0):
+        if method == "GET" and client_if_none_match:
+            forward_headers["If-None-Match"] = client_if_none_match
+        status, out_headers, data = _projection.apply(
+            _fetch(pool, method, url, body, forward_headers, timeout, max_retries, cell, path, deadline), fields)
+        return _finish(status, out_headers, data, client_accept_encoding)
+
+    cache_key = _cache_key(cell, path, query_string or "", cache_scope)
+
+    def _fetch_and_store(deadline: float = 0.0, etag: str = "") -> Tuple[int, Dict[str, str], bytes]:
+        fetch_headers = {**forward_headers, "If-None-Match": etag} if etag else forward_headers
+        result = _projection.apply(
+            _fetch(pool, method, url, body, fetch_headers, timeout, max_retries, cell, path, deadline), fields)
+        _revalidated(cache_key, result, etag, cache_policy)
+        return result
+
+    hit = _cached(cache_key, client_accept_encoding, allow_stale=True)
+    if hit:
+        result, stale = hit
+        if stale:
+            etag = base_etag(_header(result[1], "ETag"))
+            _revalidator.submit(cache_key, lambda: _fetch_and_store(etag=etag))
+        return _conditional(result, client_if_none_match)
+    status, out_headers, data = _single_flight.do(cache_key, lambda: _fetch_and_store(deadline))
+    hit = _cached(cache_key, client_accept_encoding)
+    if hit:
+        return _conditional(hit[0], client_if_none_match)
+    return _finish(status, dict(out_headers), data, client_accept_encoding)
+
+
+# ---------- 流式转发：请求体与响应体均以有界块管道传输，不在网关内整体缓冲 ----------
+def should_stream(path: str, content_length: Optional[int], chunked_upload: bool) -> bool:
+    """导出/下载类路径（GATEWAY_STREAM_PATHS 关键字）或大请求体/分块上传时走流式转发。"""
+    if chunked_upload:
+        return True
+    if content_length is not None and content_length >= STREAM_MIN_UPLOAD_BYTES:
+        return True
+    p = (path or "").lower()
+    return any(k in p for k in STREAM_PATH_KEYWORDS)
+
+
+def _stream_out_headers(raw_headers, passthrough_encoding: bool) -> Dict[str, str]:
+    """上游响应头 -> 客户端响应头：去掉逐跳头；需解码时一并去掉 Content-Encoding/Content-Length。"""
+    out = {}
+    for k, v in raw_headers.items():
+        kl = k.lower()
+        if kl in _HOP_BY_HOP:
+            continue
+        if not passthrough_encoding and kl in ("content-encoding", "content-length"):
+            continue
+        out[k] = v
+    return out
+
+
+def _gunzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """增量解压 gzip 块流（客户端不接受 gzip 时使用），内存占用与块大小同阶。"""
+    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = d.decompress(chunk)
+        if out:
+            yield out
+    tail = d.flush()
+    if tail:
+        yield tail
+
+
+def iter_file_chunks(fp: Any, close: Optional[Any] = None) -> Iterator[bytes]:
+    """按 STREAM_CHUNK_BYTES 读取 file-like 直至 EOF，结束或客户端断开时调用 close。"""
+    try:
+        while True:
+            chunk = fp.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        if close is not None:
+            close()
+
+
+def stream_request(
+    base_url: str,
+    path: str,
+    method: str,
+    body_stream: Optional[Any],
+    headers: Dict[str, str],
+    timeout: float = 30,
+    max_retries: int = 2,
+    query_string: str = "",
+    content_length: Optional[int] = None,
+    client_accept_encoding: Optional[str] = None,
+    cell: str = "",
+    deadline: float = 0.0,
+) -> Tuple[int, Dict[str, str], Iterator[bytes]]:
+    """
+    流式转发：body_stream 为 file-like（如 Flask request.stream）或 None。
+    返回 (status_code, response_headers, body_chunks)；body_chunks 为生成器，迭代结束/关闭时释放上游连接。
+    - 上游 gzip 且客户端接受 gzip：原样透传压缩字节；否则增量解压。
+    - 仅无请求体或请求体为 bytes 时重试（file-like 请求体已消费无法重放）；流式不做对冲。
+    - deadline（Unix 秒）约束建连与首字节等待（单次读超时不超过剩余预算），不截断已开始的响应体传输。
+    """
+    if _inprocess.is_inprocess(base_url):
+        url = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
+        return _inprocess.get_dispatcher().stream(url, method, body_stream, headers, content_length)
+    pool = _get_pool()
+    if pool is False:
+        return _fallback_stream(base_url, path, method, body_stream, headers, timeout, max_retries,
+                                query_string, content_length, client_accept_encoding, cell, deadline)
     import urllib3 as _urllib3
-    last_exc = None
-    for attempt in range(max_retries + 1):
+    method = method.upper()
+    url = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
+    client_gzip = accepts_gzip(client_accept_encoding)
+    forward_headers = {k: v for k, v in headers.items() if k.lower() not in ("content-length", "transfer-encoding")}
+    forward_headers["Accept-Encoding"] = "gzip" if client_gzip else "identity"
+    chunked = False
+    if body_stream is not None:
+        if content_length is not None:
+            forward_headers["Content-Length"] = str(content_length)
+        else:
+            chunked = True
+    ctl = _retry_policy.begin(method, cell, path, max_retries,
+                              replayable=body_stream is None or isinstance(body_stream, bytes), deadline=deadline)
+    for attempt in range(ctl.max_attempts):
+        attempt_timeout = ctl.attempt_timeout(timeout)
         try:
-            resp = pool.request(
+            resp = pool.urlopen(
                 method,
                 url,
-                body=body,
+                body=body_stream,
                 headers=forward_headers,
-                timeout=_urllib3.util.Timeout(connect=5, read=timeout),
+                timeout=_urllib3.util.Timeout(connect=5, read=attempt_timeout),
                 retries=False,
+                chunked=chunked,
+                preload_content=False,
+                decode_content=False,
             )
-            data = resp.data
-            if resp.headers.get("Content-Encoding", "").lower() == "gzip" and data:
-                try:
-                    data = gzip.decompress(data)
-                except Exception:
-                    pass
-            status = resp.status
-            out_headers = {k: v for k, v in resp.headers.items() if k.lower() not in ("transfer-encoding", "connection")}
-
-            if is_get and 200 <= status < 300 and use_cache and _CACHE_TTL_SEC > 0 and cache_key:
-                _set_cache(cache_key, status, out_headers, data)
-
-            data, compressed = _compress_if_needed(data, client_accept_encoding or "")
-            if compressed:
-                out_headers = {**out_headers, "Content-Encoding": "gzip"}
-
-            if 500 <= status < 600 and attempt < max_retries:
-                time.sleep(0.2 * (2 ** attempt))
-                continue
-            return status, out_headers, data
         except Exception as e:
-            last_exc = e
-            if attempt < max_retries:
-                time.sleep(0.2 * (2 ** attempt))
+            if ctl.retry_error(e, attempt):
+                ctl.sleep(attempt)
                 continue
-            raise last_exc
+            raise
+        if ctl.retry_status(resp.status, attempt):
+            resp.drain_conn()
+            resp.release_conn()
+            ctl.sleep(attempt)
+            continue
+        upstream_gzip = resp.headers.get("Content-Encoding", "").lower() == "gzip"
+        passthrough = client_gzip or not upstream_gzip
+        out_headers = _stream_out_headers(resp.headers, passthrough)
 
-    raise last_exc or RuntimeError("forward failed")
+        def _chunks(r=resp, decode=not passthrough):
+            try:
+                for chunk in r.stream(STREAM_CHUNK_BYTES, decode_content=decode):
+                    if chunk:
+                        yield chunk
+            finally:
+                r.release_conn()
 
+        return resp.status, out_headers, _chunks()
+    raise RuntimeError("forward failed")
 
-def _fallback_forward(
+
+def _fallback_stream(
     base_url: str,
     path: str,
     method: str,
-    body: Optional[bytes],
+    body_stream: Optional[Any],
     headers: Dict[str, str],
     timeout: float,
     max_retries: int,
+    query_string: str,
+    content_length: Optional[int],
     client_accept_encoding: Optional[str],
-    query_string: str = "",
-) -> Tuple[int, Dict[str, str], bytes]:
-    """无 urllib3 时回退到 urllib。"""
+    cell: str = "",
+    deadline: float = 0.0,
+) -> Tuple[int, Dict[str, str], Iterator[bytes]]:
+    """无 urllib3 时的流式回退：urllib 对 file-like 请求体按块发送（无长度时 chunked）。"""
     import urllib.request
     import urllib.error
     url = f"{base_url.rstrip('/')}/{path}" + (f"?{query_string}" if query_string else "")
-    last_exc = None
-    for attempt in range(max_retries + 1):
-        try:
-            req = urllib.request.Request(url, data=body, method=method.upper())
-            for k, v in headers.items():
+    client_gzip = accepts_gzip(client_accept_encoding)
+    ctl = _retry_policy.begin(method, cell, path, max_retries,
+                              replayable=body_stream is None or isinstance(body_stream, bytes), deadline=deadline)
+    for attempt in range(ctl.max_attempts):
+        attempt_timeout = ctl.attempt_timeout(timeout)
+        req = urllib.request.Request(url, data=body_stream, method=method.upper())
+        for k, v in headers.items():
+            if k.lower() not in ("content-length", "transfer-encoding"):
                 req.add_header(k, v)
-            if "Accept-Encoding" not in headers:
-                req.add_header("Accept-Encoding", "gzip")
-            with urllib.request.urlopen(req, timeout=timeout) as r:
-                data = r.read()
-                if r.headers.get("Content-Encoding", "").lower() == "gzip" and data:
-                    try:
-                        data = gzip.decompress(data)
-                    except Exception:
-                        pass
-                out_h = {k: v for k, v in r.headers.items() if k.lower() not in ("transfer-encoding", "connection")}
-                data, compressed = _compress_if_needed(data, client_accept_encoding or "")
-                if compressed:
-                    out_h = {**out_h, "Content-Encoding": "gzip"}
-                return r.getcode(), out_h, data
+        if body_stream is not None and content_length is not None:
+            req.add_header("Content-Length", str(content_length))
+        req.add_header("Accept-Encoding", "gzip" if client_gzip else "identity")
+        try:
+            r = urllib.request.urlopen(req, timeout=attempt_timeout)
         except urllib.error.HTTPError as e:
-            last_exc = e
-            data = e.read() if e.fp else b"{}"
-            if attempt < max_retries and 500 <= e.code < 600:
-                time.sleep(0.2 * (2 ** attempt))
+            if ctl.retry_status(e.code, attempt):
+                e.close()
+                ctl.sleep(attempt)
                 continue
-            out_h = {"Content-Type": e.headers.get("Content-Type", "application/json")}
-            return e.code, out_h, data
+            r = e
         except Exception as e:
-            last_exc = e
-            if attempt < max_retries:
-                time.sleep(0.2 * (2 ** attempt))
+            if ctl.retry_error(e, attempt):
+                ctl.sleep(attempt)
                 continue
-            raise e
-    raise last_exc or RuntimeError("forward failed")
-
-
+            raise
+        upstream_gzip = (r.headers.get("Content-Encoding") or "").lower() == "gzip"
+        passthrough = client_gzip or not upstream_gzip
+        out_h = _stream_out_headers(r.headers, passthrough)
+        chunks = iter_file_chunks(r, close=r.close)
+        return r.getcode(), out_h, (chunks if passthrough else _gunzip_chunks(chunks))
+    raise RuntimeError("forward failed")
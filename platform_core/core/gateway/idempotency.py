@@ -0,0 +1,212 @@
+"""
+网关幂等重放缓存：写请求（POST/PATCH）按 (租户, X-Request-ID) 去重，客户端重试不再到达细胞。
+- 首个请求为执行者，完成后响应按 TTL 保存；TTL 内同键重试直接重放已存响应（带 Idempotent-Replayed: true）。
+- 同键并发重复请求等待执行者完成后重放；执行者失败（5xx、超时、异常）时不保存，等待者之一接替执行。
+  等待超过 GATEWAY_IDEMPOTENCY_WAIT_SEC（且不超过截止时间）时返回 409 REQUEST_IN_PROGRESS。
+- 请求指纹（方法、细胞、路径、请求体摘要）与已存条目不一致时返回 422 IDEMPOTENCY_KEY_REUSED，不重放他人响应。
+- 不保存：5xx、408/409/425/429、流式请求/响应与超过 GATEWAY_IDEMPOTENCY_MAX_BODY_BYTES 的响应体。
+- 容量有界（OrderedDict LRU），条目过期后惰性删除。
+- prefork 多 worker 时执行者占位与已完成响应写入共享内存表（shared_state.SharedIdempotencyTable），
+  落到其他 worker 的重试同样重放或等待（跨进程等待以 GATEWAY_IDEMPOTENCY_POLL_MS 轮询）；
+  超过共享槽位大小的响应仅保存在执行者所在 worker。
+- GATEWAY_IDEMPOTENCY_TTL_SEC=0 关闭。
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+IDEMPOTENCY_TTL_SEC = float(os.environ.get("GATEWAY_IDEMPOTENCY_TTL_SEC", "300"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("GATEWAY_IDEMPOTENCY_MAX_ENTRIES", "10000"))
+IDEMPOTENCY_WAIT_SEC = float(os.environ.get("GATEWAY_IDEMPOTENCY_WAIT_SEC", "10"))
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.environ.get("GATEWAY_IDEMPOTENCY_MAX_BODY_BYTES", str(1024 * 1024)))
+IDEMPOTENCY_POLL_SEC = float(os.environ.get("GATEWAY_IDEMPOTENCY_POLL_MS", "20")) / 1000.0
+METHODS = ("POST", "PATCH")
+REPLAY_HEADER = "Idempotent-Replayed"
+# 不保存的状态码：可重试的失败或冲突，重试应重新执行
+_NOT_STORED = (408, 409, 425, 429)
+# 逐请求生成的网关响应头不随条目保存
+_SKIP_HEADERS = frozenset(h.lower() for h in (
+    "Content-Length", "Date", "Server", "Connection", "Transfer-Encoding", "Set-Cookie",
+    "X-Trace-Id", "X-Span-Id", "X-Response-Time", "Server-Timing",
+    "X-Content-Type-Options", "X-Frame-Options", "X-XSS-Protection",
+))
+
+REPLAY = "replay"
+OWNER = "owner"
+BUSY = "busy"
+MISMATCH = "mismatch"
+
+# 已存响应：(指纹, status, headers_list, body, expires_at)
+_Stored = Tuple[str, int, List[Tuple[str, str]], bytes, float]
+
+
+def fingerprint(method: str, cell: str, path: str, body: Optional[bytes]) -> str:
+    """请求指纹：方法、细胞、路径与请求体摘要。"""
+    digest = hashlib.blake2b(body or b"", digest_size=16).hexdigest()
+    return f"{method.upper()} {cell}/{path.strip('/')} {digest}"
+
+
+def storable(status: int, body_len: int) -> bool:
+    return status < 500 and status not in _NOT_STORED and body_len <= IDEMPOTENCY_MAX_BODY_BYTES
+
+
+class _Pending:
+    __slots__ = ("fingerprint", "done")
+
+    def __init__(self, fp: str) -> None:
+        self.fingerprint = fp
+        self.done = threading.Event()
+
+
+class IdempotencyTicket:
+    """执行者凭据：complete 保存响应并唤醒等待者，abandon 放弃（不保存）；二者只生效一次。"""
+
+    __slots__ = ("cache", "key", "fingerprint", "_pending")
+
+    def __init__(self, cache: "IdempotencyCache", key: Tuple[str, str], pending: _Pending) -> None:
+        self.cache = cache
+        self.key = key
+        self.fingerprint = pending.fingerprint
+        self._pending: Optional[_Pending] = pending
+
+    def complete(self, status: int, headers, body: bytes) -> bool:
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return False
+        return self.cache._finish(self.key, pending, status, headers, body)
+
+    def abandon(self) -> None:
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self.cache._finish(self.key, pending, 0, None, None)
+
+    release = abandon  # 与舱壁、租户名额等凭据一致，异常路径统一 release
+
+    @property
+    def pending(self) -> bool:
+        return self._pending is not None
+
+
+class IdempotencyCache:
+    """(租户, 请求 ID) -> 已完成响应；同键在途请求只放行一个执行者。"""
+
+    def __init__(self, ttl_sec: float = IDEMPOTENCY_TTL_SEC, max_entries: int = IDEMPOTENCY_MAX_ENTRIES,
+                 shared: Optional[Any] = None) -> None:
+        self.ttl_sec = float(ttl_sec)
+        self.max_entries = max(1, int(max_entries))
+        self._done: "OrderedDict[Tuple[str, str], _Stored]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], _Pending] = {}
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.shared = shared  # 跨 worker 条目表（prefork），None 时仅进程内
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_sec > 0
+
+    def begin(self, tenant_id: str, request_id: str, fp: str, wait_sec: float = IDEMPOTENCY_WAIT_SEC):
+        """
+        返回 (REPLAY, (status, headers, body)) / (OWNER, ticket) / (BUSY, None) / (MISMATCH, None)。
+        同键有在途执行者时最多等待 wait_sec；wait_sec<=0 时不等待直接返回 BUSY。
+        """
+        key = (tenant_id or "", request_id)
+        deadline = time.monotonic() + max(0.0, wait_sec)
+        while True:
+            with self._lock:
+                stored = self._done.get(key)
+                if stored is not None:
+                    if time.monotonic() <= stored[4]:
+                        if stored[0] != fp:
+                            return MISMATCH, None
+                        self._done.move_to_end(key)
+                        self.replayed += 1
+                        return REPLAY, (stored[1], dict(stored[2]), stored[3])
+                    del self._done[key]
+                pending = self._inflight.get(key)
+                if pending is None:
+                    state, value = self._claim_shared(key, fp)
+                    if state == OWNER:
+                        pending = self._inflight[key] = _Pending(fp)
+                        return OWNER, IdempotencyTicket(self, key, pending)
+                    if state != BUSY:
+                        return state, value
+                elif pending.fingerprint != fp:
+                    return MISMATCH, None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return BUSY, None
+            if pending is None:
+                time.sleep(min(IDEMPOTENCY_POLL_SEC, remaining))  # 执行者在其他 worker：轮询共享表
+            elif not pending.done.wait(remaining):
+                return BUSY, None
+
+    def _claim_shared(self, key: Tuple[str, str], fp: str):
+        """共享表占位（持有 self._lock 时调用）；未启用共享表时直接成为执行者。"""
+        if self.shared is None:
+            return OWNER, None
+        state, value = self.shared.claim("|".join(key), fp, self.ttl_sec)
+        if state == REPLAY:
+            self.replayed += 1
+            status, headers, body = value
+            return REPLAY, (status, dict(headers), body)
+        return state, None
+
+    def _finish(self, key: Tuple[str, str], pending: _Pending, status: int, headers, body: Optional[bytes]) -> bool:
+        stored = False
+        with self._lock:
+            if self._inflight.get(key) is pending:
+                del self._inflight[key]
+            kept = None
+            if body is not None and storable(status, len(body)):
+                items = headers.items() if hasattr(headers, "items") else headers
+                kept = [(k, v) for k, v in items if k.lower() not in _SKIP_HEADERS]
+            if self.shared is not None:
+                stored = self.shared.finish("|".join(key), pending.fingerprint, status, kept,
+                                            body if kept is not None else None, self.ttl_sec)
+            if kept is not None and not stored:
+                self._done[key] = (pending.fingerprint, status, kept, bytes(body), time.monotonic() + self.ttl_sec)
+                self._done.move_to_end(key)
+                while len(self._done) > self.max_entries:
+                    self._done.popitem(last=False)
+                stored = True
+        pending.done.set()
+        return stored
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._done), "inFlight": len(self._inflight), "replayed": self.replayed}
+
+
+_default: Optional[IdempotencyCache] = None
+_default_lock = threading.Lock()
+_shared_table: Optional[Any] = None
+
+
+def set_shared_table(table: Any) -> None:
+    """启用跨 worker 条目表（prefork worker 启动时调用）。"""
+    global _shared_table
+    with _default_lock:
+        _shared_table = table
+        if _default is not None:
+            _default.shared = table
+
+
+def get_idempotency_cache() -> IdempotencyCache:
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            _default = IdempotencyCache(shared=_shared_table)
+        return _default
+
+
+__all__ = [
+    "BUSY", "IdempotencyCache", "IdempotencyTicket", "METHODS", "MISMATCH", "OWNER", "REPLAY", "REPLAY_HEADER",
+    "fingerprint", "get_idempotency_cache", "set_shared_table", "storable",
+]
@@ -0,0 +1,194 @@
+"""
+单机部署的进程内细胞调度：将 cells/<cell>/src/app.py 的 Flask 应用（create_app() 或模块级 app）挂载到网关进程，
+转发时直接以 WSGI 调用，省去回环 HTTP 的套接字、请求/响应序列化与头部拷贝。
+- GATEWAY_INPROCESS_CELLS：逗号分隔的细胞名，* 表示 cells 目录下全部带 src/app.py 的细胞；为空（默认）关闭。
+- 挂载的细胞解析为 inproc://<cell>；http_client/async_http_client 在单次尝试处改为进程内调用，
+  重试、截止时间、GET 缓存与压缩、熔断/舱壁、限流、租户配额、审计均沿用 HTTP 模式的同一路径。
+- 细胞收到的请求头与 HTTP 模式一致（签名、X-Tenant-Id、X-Trace-Id、X-Request-Deadline 等逐字传入 WSGI environ），
+  细胞侧验签、租户隔离与审计日志行为不变。
+- 各细胞的 src 包以 _inproc_<cell> 名称独立导入，互不覆盖；细胞按首次请求懒加载。
+- 进程内调用无法按超时中断，单机部署应配合截止时间与舱壁使用；需要进程隔离的细胞不要挂载。
+"""
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import io
+import logging
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger("gateway.inprocess")
+
+SCHEME = "inproc://"
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+CELLS_DIR = os.environ.get("GATEWAY_CELLS_DIR", "") or os.path.join(_ROOT, "cells")
+INPROCESS_CELLS = os.environ.get("GATEWAY_INPROCESS_CELLS", "").strip()
+_HOP_BY_HOP = ("transfer-encoding", "connection", "keep-alive", "content-length")
+
+
+def is_inprocess(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(SCHEME)
+
+
+def load_cell_app(cell: str, cells_dir: Optional[str] = None) -> Any:
+    """导入 <cells_dir>/<cell>/src 为独立包 _inproc_<cell>，返回其 WSGI 应用；不存在时抛 LookupError。"""
+    src_dir = os.path.join(cells_dir or CELLS_DIR, cell, "src")
+    init_py = os.path.join(src_dir, "__init__.py")
+    if not os.path.isfile(os.path.join(src_dir, "app.py")) or not os.path.isfile(init_py):
+        raise LookupError(f"cell app not found: {src_dir}")
+    package = "_inproc_" + cell.replace("-", "_")
+    if package not in sys.modules:
+        spec = importlib.util.spec_from_file_location(package, init_py, submodule_search_locations=[src_dir])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[package] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[package]
+            raise
+    module = importlib.import_module(package + ".app")
+    factory = getattr(module, "create_app", None)
+    return factory() if callable(factory) else module.app
+
+
+def _environ(cell: str, method: str, path: str, query: str, headers: Dict[str, str],
+             body: Any, content_length: Optional[int]) -> Dict[str, Any]:
+    """按 HTTP 模式下细胞会收到的请求构造 WSGI environ；body 为 bytes、file-like 或 None。"""
+    if body is None:
+        body, content_length = b"", 0
+    if isinstance(body, (bytes, bytearray)):
+        content_length = len(body)
+        body = io.BytesIO(body)
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": method.upper(),
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": query,
+        "SERVER_NAME": cell,
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": "127.0.0.1",
+        "HTTP_HOST": cell,
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "http",
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if content_length is not None:
+        environ["CONTENT_LENGTH"] = str(content_length)
+    else:
+        environ["wsgi.input_terminated"] = True
+    for k, v in headers.items():
+        key = k.upper().replace("-", "_")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = v
+        elif key not in ("CONTENT_LENGTH", "TRANSFER_ENCODING", "HOST"):
+            environ["HTTP_" + key] = v
+    return environ
+
+
+class InProcessDispatcher:
+    """进程内细胞调度：cells 为挂载的细胞名集合（"*" 表示全部），细胞应用懒加载并缓存。"""
+
+    def __init__(self, cells: str = INPROCESS_CELLS, cells_dir: Optional[str] = None) -> None:
+        self.cells_dir = cells_dir or CELLS_DIR
+        names = {c.strip().lower() for c in cells.split(",") if c.strip()}
+        self._all = "*" in names
+        self._names = names - {"*"}
+        self._apps: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._all or bool(self._names)
+
+    def mounted(self, cell: str) -> bool:
+        if not (self._all or cell in self._names):
+            return False
+        return cell in self._apps or os.path.isfile(os.path.join(self.cells_dir, cell, "src", "app.py"))
+
+    def app(self, cell: str) -> Any:
+        app = self._apps.get(cell)
+        if app is None:
+            with self._lock:
+                app = self._apps.get(cell)
+                if app is None:
+                    app = self._apps[cell] = load_cell_app(cell, self.cells_dir)
+                    logger.info("cell %s mounted in-process", cell)
+        return app
+
+    def _run(self, url: str, method: str, body: Any, headers: Dict[str, str],
+             content_length: Optional[int] = None) -> Tuple[int, Dict[str, str], Iterator[bytes]]:
+        parts = urlsplit(url)
+        cell = parts.netloc
+        environ = _environ(cell, method, parts.path or "/", parts.query, headers, body, content_length)
+        captured: Dict[str, Any] = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            captured["status"], captured["headers"] = status, response_headers
+            return lambda data: None
+
+        app_iter = self.app(cell)(environ, start_response)
+        out_headers = {k: v for k, v in captured["headers"] if k.lower() not in _HOP_BY_HOP}
+        return int(captured["status"].split(" ", 1)[0]), out_headers, app_iter
+
+    def call(self, url: str, method: str, body: Optional[bytes],
+             headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """单次进程内请求，返回 (status, headers, body)。"""
+        status, out_headers, app_iter = self._run(url, method, body, headers)
+        try:
+            data = b"".join(app_iter)
+        finally:
+            close = getattr(app_iter, "close", None)
+            if close:
+                close()
+        return status, out_headers, data
+
+    def stream(self, url: str, method: str, body_stream: Any, headers: Dict[str, str],
+               content_length: Optional[int] = None) -> Tuple[int, Dict[str, str], Iterator[bytes]]:
+        """流式进程内请求：请求体直接作为 wsgi.input，响应体为细胞 app_iter（迭代结束时关闭）。"""
+        status, out_headers, app_iter = self._run(url, method, body_stream, headers, content_length)
+
+        def _chunks():
+            try:
+                for chunk in app_iter:
+                    if chunk:
+                        yield chunk
+            finally:
+                close = getattr(app_iter, "close", None)
+                if close:
+                    close()
+
+        return status, out_headers, _chunks()
+
+    def wrap_resolver(self, resolver: Optional[Callable[[str], Any]]) -> Callable[[str], Any]:
+        """已挂载的细胞解析为 inproc://<cell>，其余交给原解析器。"""
+        def _resolve(cell: str) -> Any:
+            if self.mounted(cell):
+                return SCHEME + cell
+            return resolver(cell) if callable(resolver) else None
+        return _resolve
+
+
+_default: Optional[InProcessDispatcher] = None
+_default_lock = threading.Lock()
+
+
+def get_dispatcher() -> InProcessDispatcher:
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            _default = InProcessDispatcher()
+        return _default
+
+
+__all__ = ["InProcessDispatcher", "SCHEME", "get_dispatcher", "is_inprocess", "load_cell_app"]
@@ -0,0 +1,207 @@
+"""
+细胞多实例负载均衡：P2C（两次随机选择）+ EWMA 延迟，被动离群检测（摘除异常实例）。
+- 解析器返回单个 base_url 或逗号分隔的多个实例（CELL_<X>_URL、注册中心、治理中心发现快照均可）。
+- 选择：随机取两个可用实例，比较 EWMA 延迟 ×（在途请求 + 1），取代价小者；慢副本与堆积副本自然少分流量；
+  失败请求按惩罚延迟计入 EWMA，EWMA 随闲置时间衰减。
+- 离群检测：连续失败达阈值，或窗口内错误率 / 延迟（相对同细胞其他实例 EWMA 中位数）超阈值时摘除，
+  摘除时长随摘除次数线性增长（有上限）；同一细胞被摘除实例不超过 GATEWAY_OUTLIER_MAX_EJECTION_PERCENT，
+  全部不可用时退回全部实例（宁可尝试也不全量拒绝）。
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger("gateway.lb")
+
+_EWMA_ALPHA = float(os.environ.get("GATEWAY_LB_EWMA_ALPHA", "0.3"))
+# 失败请求按该延迟计入 EWMA，避免快速失败的实例因“延迟低”反而吸走流量
+_FAILURE_PENALTY_MS = float(os.environ.get("GATEWAY_LB_FAILURE_PENALTY_MS", "1000"))
+# 久未被选中的实例其 EWMA 按该时间常数衰减，被惩罚的实例恢复后可重新获得流量
+_DECAY_SEC = float(os.environ.get("GATEWAY_LB_DECAY_SEC", "10"))
+# 离群检测参数
+_CONSECUTIVE_ERRORS = int(os.environ.get("GATEWAY_OUTLIER_CONSECUTIVE_ERRORS", "5"))
+_INTERVAL_SEC = float(os.environ.get("GATEWAY_OUTLIER_INTERVAL_SEC", "10"))
+_MIN_REQUESTS = int(os.environ.get("GATEWAY_OUTLIER_MIN_REQUESTS", "20"))
+_ERROR_RATE = float(os.environ.get("GATEWAY_OUTLIER_ERROR_RATE", "0.5"))
+_LATENCY_FACTOR = float(os.environ.get("GATEWAY_OUTLIER_LATENCY_FACTOR", "3"))
+_BASE_EJECTION_SEC = float(os.environ.get("GATEWAY_OUTLIER_BASE_EJECTION_SEC", "30"))
+_MAX_EJECTION_SEC = float(os.environ.get("GATEWAY_OUTLIER_MAX_EJECTION_SEC", "300"))
+_MAX_EJECTION_PERCENT = float(os.environ.get("GATEWAY_OUTLIER_MAX_EJECTION_PERCENT", "50"))
+
+
+def split_urls(value: Union[str, List[str], None]) -> List[str]:
+    """解析器返回值 -> 实例 base_url 列表（逗号分隔或列表，去空去尾斜杠）。"""
+    if not value:
+        return []
+    items = value if isinstance(value, (list, tuple)) else str(value).split(",")
+    return [u.strip().rstrip("/") for u in items if u and u.strip()]
+
+
+class Endpoint:
+    """单个实例：EWMA 延迟、在途请求数、离群检测窗口计数。"""
+
+    def __init__(self, cell: str, url: str):
+        self.cell = cell
+        self.url = url
+        self.ewma_ms = 0.0
+        self.updated_at = 0.0
+        self.outstanding = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self._consecutive_errors = 0
+        self._window_start = time.monotonic()
+        self._window_total = 0
+        self._window_errors = 0
+        self._lock = threading.Lock()
+
+    def score(self, now: float) -> float:
+        # 未有样本的新实例按 1ms 计，尽快获得流量以建立延迟基线
+        ewma = self.ewma_ms * math.exp(-(now - self.updated_at) / _DECAY_SEC) if self.ewma_ms else 0.0
+        return max(ewma, 1.0) * (self.outstanding + 1)
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def begin(self) -> None:
+        with self._lock:
+            self.outstanding += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "ewmaMs": round(self.ewma_ms, 2),
+            "outstanding": self.outstanding,
+            "ejected": self.is_ejected(time.monotonic()),
+            "ejections": self.ejections,
+        }
+
+
+class CellBalancer:
+    """单细胞实例集合；实例列表随解析结果同步（新增/下线）。"""
+
+    def __init__(self, cell: str):
+        self.cell = cell
+        self._endpoints: Dict[str, Endpoint] = {}
+        self._urls: List[str] = []
+        self._lock = threading.Lock()
+
+    def _sync(self, urls: List[str]) -> List[Endpoint]:
+        if urls != self._urls:
+            with self._lock:
+                self._endpoints = {u: self._endpoints.get(u) or Endpoint(self.cell, u) for u in urls}
+                self._urls = list(urls)
+        return list(self._endpoints.values())
+
+    def pick(self, urls: List[str]) -> Optional[Endpoint]:
+        endpoints = self._sync(urls)
+        if not endpoints:
+            return None
+        now = time.monotonic()
+        candidates = [e for e in endpoints if not e.is_ejected(now)] or endpoints
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        else:
+            a, b = random.sample(candidates, 2)
+            chosen = a if a.score(now) <= b.score(now) else b
+        chosen.begin()
+        return chosen
+
+    def on_result(self, ep: Endpoint, duration_ms: float, success: bool) -> None:
+        """请求完成：更新 EWMA 与在途数，并做离群判定。"""
+        now = time.monotonic()
+        sample = max(0.1, float(duration_ms) if success else max(float(duration_ms), _FAILURE_PENALTY_MS))
+        with ep._lock:
+            ep.outstanding = max(0, ep.outstanding - 1)
+            ep.ewma_ms = sample if ep.ewma_ms == 0.0 else ep.ewma_ms + (sample - ep.ewma_ms) * _EWMA_ALPHA
+            ep.updated_at = now
+            if now - ep._window_start >= _INTERVAL_SEC:
+                ep._window_start, ep._window_total, ep._window_errors = now, 0, 0
+            ep._window_total += 1
+            if success:
+                ep._consecutive_errors = 0
+            else:
+                ep._consecutive_errors += 1
+                ep._window_errors += 1
+            reason = ""
+            if ep._consecutive_errors >= _CONSECUTIVE_ERRORS:
+                reason = "consecutive_errors"
+            elif ep._window_total >= _MIN_REQUESTS:
+                if ep._window_errors / ep._window_total >= _ERROR_RATE:
+                    reason = "error_rate"
+                elif self._latency_outlier(ep):
+                    reason = "latency"
+        if reason:
+            self._eject(ep, now, reason)
+
+    def _latency_outlier(self, ep: Endpoint) -> bool:
+        peers = sorted(e.ewma_ms for e in self._endpoints.values() if e is not ep and e.ewma_ms > 0)
+        if not peers:
+            return False
+        return ep.ewma_ms > _LATENCY_FACTOR * peers[len(peers) // 2]
+
+    def _eject(self, ep: Endpoint, now: float, reason: str) -> None:
+        with self._lock:
+            if ep.is_ejected(now):
+                return
+            endpoints = list(self._endpoints.values())
+            ejected = sum(1 for e in endpoints if e.is_ejected(now))
+            if (ejected + 1) * 100 > _MAX_EJECTION_PERCENT * len(endpoints):
+                return
+            ep.ejections += 1
+            ep.ejected_until = now + min(_MAX_EJECTION_SEC, _BASE_EJECTION_SEC * ep.ejections)
+            with ep._lock:
+                ep._consecutive_errors = 0
+                ep._window_start, ep._window_total, ep._window_errors = now, 0, 0
+        logger.warning("outlier ejected cell=%s url=%s reason=%s ejections=%d", self.cell, ep.url, reason, ep.ejections)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [e.stats() for e in list(self._endpoints.values())]
+
+
+class LoadBalancer:
+    """按细胞管理 CellBalancer。"""
+
+    def __init__(self):
+        self._cells: Dict[str, CellBalancer] = {}
+        self._lock = threading.Lock()
+
+    def cell(self, cell: str) -> CellBalancer:
+        cb = self._cells.get(cell)
+        if cb is not None:
+            return cb
+        with self._lock:
+            if cell not in self._cells:
+                self._cells[cell] = CellBalancer(cell)
+            return self._cells[cell]
+
+    def pick(self, cell: str, resolved: Union[str, List[str], None]) -> Optional[Endpoint]:
+        """从解析结果中选一个实例并计入在途；无实例返回 None。完成后须调用 on_result。"""
+        return self.cell(cell).pick(split_urls(resolved))
+
+    def on_result(self, ep: Endpoint, duration_ms: float, success: bool) -> None:
+        self.cell(ep.cell).on_result(ep, duration_ms, success)
+
+    def stats(self) -> Dict[str, List[Dict[str, Any]]]:
+        with self._lock:
+            cells = dict(self._cells)
+        return {c: cb.stats() for c, cb in cells.items()}
+
+
+_default: Optional[LoadBalancer] = None
+_default_lock = threading.Lock()
+
+
+def get_load_balancer() -> LoadBalancer:
+    global _default
+    if _default is not None:
+        return _default
+    with _default_lock:
+        if _default is None:
+            _default = LoadBalancer()
+        return _default
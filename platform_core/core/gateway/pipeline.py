@@ -0,0 +1,230 @@
+"""
+网关请求中间件流水线：启动时按不可变配置快照编译启用的阶段，请求期只按序执行，不再逐请求读取环境变量。
+- GatewayConfig：USE_REAL_FORWARD、GATEWAY_VALIDATE_TENANT、GATEWAY_APP_KEYS 等开关在 create_app 时读取一次；
+  修改这些环境变量需重启网关（与路由表、签名密钥等启动期配置一致）。
+- RequestPrincipal：请求级身份，Bearer token 在首次取用时向会话存储解析一次，限流、管理端鉴权、缓存键与审计共用。
+- Pipeline：未启用的阶段在编译时剔除；每个阶段计时，GET /api/admin/gateway/pipeline 返回各阶段累计耗时，
+  GATEWAY_SERVER_TIMING=1 时响应携带 Server-Timing 头（gw-<阶段>;dur=<毫秒>）。
+- AsyncEmitter：监控回调（monitor_emit）经有界队列交给后台线程，响应不等待；队列满时丢弃并计数。
+  后台线程中没有请求上下文，span_id 等请求级字段须在入队时作为参数传入（见 bind_monitor_emit）。
+"""
+from __future__ import annotations
+
+import inspect
+import logging
+import os
+import queue
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from .signing import parse_secret
+
+logger = logging.getLogger("gateway.pipeline")
+
+Stage = Tuple[str, Callable[..., Any]]
+
+
+class GatewayConfig(NamedTuple):
+    """网关启动期配置快照（不可变）。"""
+
+    real_forward: bool = False
+    validate_tenant: bool = False
+    require_tenant_id: bool = False
+    app_keys: Mapping[str, str] = MappingProxyType({})
+    apm_log: bool = False
+    proxy_timeout_sec: int = 30
+    proxy_retry_count: int = 2
+    server_timing: bool = False
+    monitor_async: bool = True
+    signing_secret: bytes = b""
+    traffic_light: bool = True
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None,
+                 app_keys: Optional[Dict[str, str]] = None) -> "GatewayConfig":
+        env = os.environ if environ is None else environ
+        return cls(
+            real_forward=env.get("USE_REAL_FORWARD") == "1",
+            validate_tenant=env.get("GATEWAY_VALIDATE_TENANT") == "1",
+            require_tenant_id=env.get("GATEWAY_REQUIRE_TENANT_ID") == "1",
+            app_keys=MappingProxyType(dict(app_keys or {})),
+            apm_log=env.get("APM_LOG") == "1",
+            proxy_timeout_sec=int(env.get("GATEWAY_PROXY_TIMEOUT_SEC", "30")),
+            proxy_retry_count=max(0, int(env.get("GATEWAY_PROXY_RETRY_COUNT", "2"))),
+            server_timing=env.get("GATEWAY_SERVER_TIMING") == "1",
+            monitor_async=env.get("GATEWAY_MONITOR_ASYNC", "1") != "0",
+            signing_secret=parse_secret(env.get("GATEWAY_SIGNING_SECRET")) or b"",
+            traffic_light=env.get("GATEWAY_TRAFFIC_LIGHT_ENABLED", "1") == "1",
+        )
+
+    def public(self) -> Dict[str, Any]:
+        """管理端展示用：密钥只显示是否配置。"""
+        return {**self._asdict(), "app_keys": len(self.app_keys), "signing_secret": bool(self.signing_secret)}
+
+
+class RequestPrincipal:
+    """请求级身份：token 取自 Authorization 头，用户信息首次取用时解析并缓存。"""
+
+    __slots__ = ("token", "_store", "_info")
+
+    def __init__(self, token_store: Any, auth_header: Optional[str]) -> None:
+        auth = auth_header or ""
+        self.token = auth[7:].strip() if auth.startswith("Bearer ") else ""
+        self._store = token_store
+        self._info: Optional[Dict[str, Any]] = None
+
+    def info(self) -> Dict[str, Any]:
+        if self._info is None:
+            found = self._store.get(self.token) if self.token and self._store is not None else None
+            self._info = found or {}
+        return self._info
+
+    @property
+    def username(self) -> str:
+        return self.info().get("username", "")
+
+    @property
+    def role(self) -> str:
+        return self.info().get("role", "")
+
+
+def server_timing(timings: Sequence[Tuple[str, int]]) -> str:
+    """各阶段耗时（纳秒）格式化为 Server-Timing 头。"""
+    return ", ".join(f"gw-{name};dur={ns / 1e6:.3f}" for name, ns in timings)
+
+
+class Pipeline:
+    """已编译的前置/后置阶段；阶段函数签名：前置 fn() -> 响应或 None，后置 fn(resp, duration_ms)。"""
+
+    def __init__(self, before: Sequence[Stage], after: Sequence[Stage], server_timing: bool = False) -> None:
+        self.before: Tuple[Stage, ...] = tuple(before)
+        self.after: Tuple[Stage, ...] = tuple(after)
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+        # 阶段名 -> [次数, 累计纳秒, 最大纳秒]
+        self._stats: Dict[str, List[int]] = {name: [0, 0, 0] for name, _ in self.before + self.after}
+        self._requests = 0
+
+    @property
+    def stage_names(self) -> Tuple[str, ...]:
+        return tuple(name for name, _ in self.before + self.after)
+
+    def run_before(self, ctx: Any) -> Any:
+        """依次执行前置阶段，任一阶段返回响应即短路；耗时记入 ctx.stage_timings。"""
+        timings: List[Tuple[str, int]] = []
+        ctx.stage_timings = timings
+        clock = time.perf_counter_ns
+        for name, fn in self.before:
+            t0 = clock()
+            out = fn()
+            timings.append((name, clock() - t0))
+            if out is not None:
+                return out
+        return None
+
+    def run_after(self, ctx: Any, resp: Any, duration_ms: int) -> Any:
+        timings = getattr(ctx, "stage_timings", None)
+        if timings is None:
+            timings = ctx.stage_timings = []
+        clock = time.perf_counter_ns
+        for name, fn in self.after:
+            t0 = clock()
+            fn(resp, duration_ms)
+            timings.append((name, clock() - t0))
+        self.record(timings)
+        if self.server_timing:
+            resp.headers["Server-Timing"] = server_timing(timings)
+        return resp
+
+    def record(self, timings: Sequence[Tuple[str, int]]) -> None:
+        """单次请求的阶段耗时并入累计统计（每请求加锁一次）。"""
+        with self._lock:
+            self._requests += 1
+            for name, ns in timings:
+                st = self._stats.get(name)
+                if st is None:
+                    st = self._stats[name] = [0, 0, 0]
+                st[0] += 1
+                st[1] += ns
+                if ns > st[2]:
+                    st[2] = ns
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = [
+                {"stage": name, "count": c, "avgUs": round(total / c / 1000, 2) if c else 0.0,
+                 "maxUs": round(mx / 1000, 2), "totalMs": round(total / 1e6, 3)}
+                for name, (c, total, mx) in self._stats.items()
+            ]
+            requests = self._requests
+        overhead = sum(s["totalMs"] for s in stages)
+        return {
+            "before": [name for name, _ in self.before],
+            "after": [name for name, _ in self.after],
+            "requests": requests,
+            "avgOverheadUs": round(overhead * 1000 / requests, 2) if requests else 0.0,
+            "stages": stages,
+        }
+
+
+def bind_monitor_emit(fn: Optional[Callable[..., Any]]) -> Optional[Callable[..., Any]]:
+    """
+    监控回调统一为 emit(trace_id, cell, path, status, duration_ms, span_id)：回调声明了 span_id（或 **kwargs）
+    时按关键字传入，否则省略，兼容既有五参数回调。
+    """
+    if not callable(fn):
+        return None
+    try:
+        params = inspect.signature(fn).parameters.values()
+        accepts = any(p.name == "span_id" or p.kind is p.VAR_KEYWORD for p in params)
+    except (TypeError, ValueError):
+        accepts = False
+    if accepts:
+        return lambda trace_id, cell, path, status, duration_ms, span_id="": fn(
+            trace_id, cell, path, status, duration_ms, span_id=span_id)
+    return lambda trace_id, cell, path, status, duration_ms, span_id="": fn(trace_id, cell, path, status, duration_ms)
+
+
+class AsyncEmitter:
+    """后台线程执行回调：submit 只入有界队列即返回；flush() 等待已提交的回调执行完毕。"""
+
+    def __init__(self, fn: Callable[..., Any], maxsize: int = 10000, name: str = "gateway-monitor") -> None:
+        self.fn = fn
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, *args: Any) -> bool:
+        try:
+            self._queue.put_nowait(args)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("monitor queue full, dropped=%s", self.dropped)
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self.fn(*item)
+            except Exception as e:
+                logger.debug("monitor_emit failed: %s", e)
+
+
+__all__ = ["AsyncEmitter", "GatewayConfig", "Pipeline", "RequestPrincipal", "bind_monitor_emit", "server_timing"]
@@ -0,0 +1,168 @@
+"""
+网关 prefork 多进程运行时：master 绑定端口后 fork N 个 worker 共享同一监听 socket（由内核分发连接），
+吞吐随 CPU 核数扩展；限流、熔断/舱壁、Token 会话、GET 缓存失效代数、租户配额用量与幂等条目位于 fork 前创建的共享内存（shared_state），
+全局额度保持正确，事件失效对所有 worker 生效。
+- 审计日志：master 持有唯一写线程，worker 的记录经跨进程队列提交，哈希链、段滚动与段索引只有一个写者。
+- GATEWAY_WORKERS：worker 数（0=CPU 核数，1=单进程不 fork）。
+- 应用在 worker 内 fork 之后构建，线程池与后台线程不跨进程继承。
+- 路由快照：master 监听路由文件，变更时向 worker 发送 SIGHUP 重新编译；kill -HUP <master> 可手动触发。
+- worker 异常退出时 master 回收其舱壁与租户并发名额、撤销其幂等执行者占位并重新拉起；SIGTERM/SIGINT 时 worker 停止接收新连接、
+  处理完在途请求后退出（超过 GATEWAY_GRACEFUL_TIMEOUT_SEC 强制结束）。
+- 仍按 worker 独立的状态：GET 缓存、负载均衡 EWMA、自适应并发与公平排队（配置值按单个 worker 计）、
+  管理接口写入的租户配额配置（多 worker 时以 TENANT_QUOTA_DEFAULT_* 配置为准）、
+  审计检索（worker 无内存缓存与活动段增量索引，每次检索从文件重建活动段索引；GATEWAY_AUDIT_ASYNC=0 时同样异步落盘）。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from . import audit_log
+from .config import _WATCH_INTERVAL_SEC, RouteTable, set_route_table
+from .shared_state import _CTX, MAX_WORKERS, SharedControlState
+
+logger = logging.getLogger("gateway.prefork")
+
+GATEWAY_WORKERS = int(os.environ.get("GATEWAY_WORKERS", "1") or 1)
+_BACKLOG = int(os.environ.get("GATEWAY_LISTEN_BACKLOG", "1024"))
+_GRACEFUL_TIMEOUT_SEC = float(os.environ.get("GATEWAY_GRACEFUL_TIMEOUT_SEC", "10"))
+_RESPAWN_DELAY_SEC = 1.0
+
+
+def resolve_workers(workers: Optional[int] = None) -> int:
+    """worker 数：参数 > GATEWAY_WORKERS；<=0 取 CPU 核数，上限 MAX_WORKERS。"""
+    n = GATEWAY_WORKERS if workers is None else workers
+    if n <= 0:
+        n = os.cpu_count() or 1
+    return max(1, min(n, MAX_WORKERS))
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(_BACKLOG)
+    return sock
+
+
+def _serve_wsgi(app, sock: socket.socket, host: str, port: int) -> None:
+    from werkzeug.serving import make_server
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    server.daemon_threads = False  # server_close 等待在途请求
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def _serve_asgi(app, sock: socket.socket) -> None:
+    import uvicorn
+    uvicorn.run(app, fd=sock.fileno(), lifespan="on", log_level="info")
+
+
+def _worker_main(index: int, sock: socket.socket, state: SharedControlState,
+                 build_app: Callable[[Any], Any], host: str, port: int, asgi: bool) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # 终端 Ctrl-C 由 master 统一处理
+    routes = RouteTable(watch_interval_sec=0)
+    set_route_table(routes)
+    signal.signal(signal.SIGHUP, lambda *_: routes.reload())
+    app = build_app(state.install(index))
+    logger.info("gateway worker %d started pid=%d", index, os.getpid())
+    if asgi:
+        _serve_asgi(app, sock)
+    else:
+        _serve_wsgi(app, sock, host, port)
+
+
+class PreforkServer:
+    """master：创建共享状态与监听 socket，拉起并看护 worker；build_app(circuit_breakers) 在每个 worker 内调用。"""
+
+    def __init__(self, build_app: Callable[[Any], Any], host: str = "0.0.0.0", port: int = 8000,
+                 workers: Optional[int] = None, asgi: bool = False) -> None:
+        self.build_app = build_app
+        self.host = host
+        self.port = port
+        self.asgi = asgi
+        self.workers = resolve_workers(workers)
+        self.state = SharedControlState()
+        self.sock = _listen(host, port)
+        self._procs: Dict[int, Any] = {}
+        self._stopping = False
+        self._reload = False
+
+    def _spawn(self, index: int) -> None:
+        p = _CTX.Process(
+            target=_worker_main,
+            args=(index, self.sock, self.state, self.build_app, self.host, self.port, self.asgi),
+            name=f"gateway-worker-{index}",
+        )
+        p.start()
+        self._procs[index] = p
+
+    def _signal_workers(self, signum: int) -> None:
+        for p in self._procs.values():
+            if p.pid and p.is_alive():
+                try:
+                    os.kill(p.pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def _on_stop(self, *_: Any) -> None:
+        self._stopping = True
+
+    def _on_hup(self, *_: Any) -> None:
+        self._reload = True
+
+    def serve_forever(self, poll_sec: float = 0.5) -> None:
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_hup)
+        routes = RouteTable(watch_interval_sec=0)  # master 仅用于检测路由文件变化
+        self.state.install_master()
+        for i in range(self.workers):
+            self._spawn(i)
+        logger.info("gateway prefork master pid=%d workers=%d listen=%s:%d", os.getpid(), self.workers, self.host, self.port)
+        next_check = time.monotonic() + _WATCH_INTERVAL_SEC
+        try:
+            while not self._stopping:
+                time.sleep(poll_sec)
+                for i, p in list(self._procs.items()):
+                    if not p.is_alive() and not self._stopping:
+                        logger.warning("gateway worker %d exited code=%s, respawning", i, p.exitcode)
+                        self.state.reap_worker(i)
+                        time.sleep(_RESPAWN_DELAY_SEC)
+                        self._spawn(i)
+                now = time.monotonic()
+                if self._reload or (_WATCH_INTERVAL_SEC > 0 and now >= next_check):
+                    next_check = now + _WATCH_INTERVAL_SEC
+                    if routes.check() or self._reload:
+                        self._signal_workers(signal.SIGHUP)
+                    self._reload = False
+        finally:
+            self.stop()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止全部 worker：先 SIGTERM 优雅退出，超时后强制结束。"""
+        self._stopping = True
+        self._signal_workers(signal.SIGTERM)
+        deadline = time.monotonic() + (_GRACEFUL_TIMEOUT_SEC if timeout is None else timeout)
+        for p in self._procs.values():
+            p.join(max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                p.kill()
+                p.join()
+        self._procs.clear()
+        audit_log.flush()
+        self.sock.close()
+
+
+def serve(build_app: Callable[[Any], Any], host: str = "0.0.0.0", port: int = 8000,
+          workers: Optional[int] = None, asgi: bool = False) -> None:
+    """以 prefork 方式运行网关直至收到 SIGTERM/SIGINT。"""
+    PreforkServer(build_app, host, port, workers, asgi=asgi).serve_forever()
@@ -0,0 +1,132 @@
+"""
+列表接口字段投影（稀疏字段集）：GET 请求携带 fields=a,b,c 时只返回所列字段。
+- 网关在细胞响应后对 JSON 列表投影：顶层数组，或信封 {data|items|list|records|rows: [...], total...} 中的列表，
+  信封其他字段保留；单个对象响应不投影。字段支持点号路径（customer.name）选取嵌套对象的子字段，未知字段忽略。
+- 查询串原样转发给细胞：基于 _template 服务层的细胞在服务层按 fields 投影（不序列化多余列），
+  并以 X-Fields-Applied 响应头声明已投影，网关不再解析该响应。
+- 投影在 GET 缓存与压缩之前进行，缓存条目按含 fields 的查询串区分；投影改变 body 时丢弃上游 ETag，
+  由缓存层对投影后的 body 重新计算。
+- GATEWAY_FIELD_PROJECTION=0 关闭网关侧投影（细胞侧不受影响）。
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl
+
+ENABLED = os.environ.get("GATEWAY_FIELD_PROJECTION", "1") != "0"
+FIELDS_PARAM = "fields"
+FIELDS_APPLIED_HEADER = "X-Fields-Applied"
+MAX_FIELDS = 64
+LIST_KEYS = ("data", "items", "list", "records", "rows")
+
+# 字段树：{"name": None, "customer": {"name": None}}，None 表示整体保留
+FieldTree = Dict[str, Any]
+
+
+def parse_fields(query_string: str) -> Optional[Tuple[str, ...]]:
+    """从查询串取 fields（可重复、逗号分隔），去重保序；未携带或为空时返回 None。"""
+    if not ENABLED or not query_string or FIELDS_PARAM + "=" not in query_string:
+        return None
+    seen: Dict[str, None] = {}
+    for key, value in parse_qsl(query_string):
+        if key == FIELDS_PARAM:
+            for name in value.split(","):
+                name = name.strip()
+                if name and len(seen) < MAX_FIELDS:
+                    seen[name] = None
+    return tuple(seen) or None
+
+
+def compile_fields(fields: Tuple[str, ...]) -> FieldTree:
+    tree: FieldTree = {}
+    for path in fields:
+        node = tree
+        parts = [p for p in path.split(".") if p]
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            if part in node and node[part] is None:
+                break  # 父字段已整体保留
+            if last:
+                node[part] = None
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def _project(value: Any, tree: FieldTree) -> Tuple[Any, bool]:
+    """按字段树投影，返回 (结果, 是否有字段被剔除)。"""
+    if isinstance(value, list):
+        out, changed = [], False
+        for v in value:
+            pv, c = _project(v, tree)
+            out.append(pv)
+            changed = changed or c
+        return out, changed
+    if not isinstance(value, dict):
+        return value, False
+    out = {}
+    changed = False
+    for key, sub in tree.items():
+        if key not in value:
+            continue
+        if sub is None:
+            out[key] = value[key]
+        else:
+            out[key], c = _project(value[key], sub)
+            changed = changed or c
+    return out, changed or len(out) < len(value)
+
+
+def project_document(doc: Any, fields: Tuple[str, ...]) -> Tuple[Any, bool]:
+    """投影 JSON 文档中的列表；非列表文档原样返回 (doc, False)。"""
+    tree = compile_fields(fields)
+    if isinstance(doc, list):
+        return _project(doc, tree)
+    if isinstance(doc, dict):
+        for key in LIST_KEYS:
+            if isinstance(doc.get(key), list):
+                projected, changed = _project(doc[key], tree)
+                return ({**doc, key: projected}, True) if changed else (doc, False)
+    return doc, False
+
+
+def _header(headers: Dict[str, str], name: str) -> str:
+    lname = name.lower()
+    for k, v in headers.items():
+        if k.lower() == lname:
+            return v or ""
+    return ""
+
+
+def apply(result: Tuple[int, Dict[str, str], bytes],
+          fields: Optional[Tuple[str, ...]]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    对上游响应 (status, headers, body) 投影：仅 2xx JSON 且细胞未声明已投影时处理；
+    上游 gzip 时先解压，投影后以未压缩 body 返回（由调用方按客户端编码压缩/缓存）。无需投影时原样返回。
+    """
+    status, headers, body = result
+    if not fields or not body or not 200 <= status < 300 or _header(headers, FIELDS_APPLIED_HEADER):
+        return result
+    if "json" not in _header(headers, "Content-Type").lower():
+        return result
+    encoding = _header(headers, "Content-Encoding").lower()
+    if encoding not in ("", "identity", "gzip"):
+        return result
+    try:
+        raw = gzip.decompress(body) if encoding == "gzip" else body
+        doc, changed = project_document(json.loads(raw), fields)
+    except (ValueError, OSError, EOFError):
+        return result
+    if not changed:
+        return result
+    out = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    drop = ("content-encoding", "etag", "content-length")
+    out_headers = {k: v for k, v in headers.items() if k.lower() not in drop}
+    out_headers[FIELDS_APPLIED_HEADER] = ",".join(fields)
+    return status, out_headers, out
+
+
+__all__ = ["FIELDS_APPLIED_HEADER", "apply", "compile_fields", "parse_fields", "project_document"]
@@ -1,29 +1,133 @@
 """
-网关防刷/限流：按 IP 与按 Token 双维度，内存滑动窗口。
+网关防刷/限流：按 IP 与按 Token 双维度，GCRA（通用信元速率算法，等价于令牌桶）。
 不修改核心路由逻辑；未配置时跳过限流。
+- 每个 key 仅保存一个 TAT（理论到达时间），判定 O(1)，不再维护时间戳列表。
+- 内存后端：key 按哈希分片，分片独立锁 + LRU 上限，IP 喷射流量下内存有界。
+- 共享后端：GATEWAY_RATE_LIMIT_STORE_URL 指向 Redis 时多网关实例共享同一额度（Lua 脚本原子判定）；
+  也可通过 set_backend 注入任意实现 acquire(key, limit, period) 的后端。
 """
 from __future__ import annotations
 
+import logging
 import os
 import time
 import threading
-from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("gateway.rate_limit")
 
 # 默认：每 IP 每分钟 120 次；每 Token 每分钟 200 次
 RATE_LIMIT_IP_PER_MIN = int(os.environ.get("GATEWAY_RATE_LIMIT_IP_PER_MIN", "120"))
 RATE_LIMIT_TOKEN_PER_MIN = int(os.environ.get("GATEWAY_RATE_LIMIT_TOKEN_PER_MIN", "200"))
 # 是否启用限流（0 关闭）
 RATE_LIMIT_ENABLED = os.environ.get("GATEWAY_RATE_LIMIT_ENABLED", "1") == "1"
-
-_lock = threading.Lock()
-_ip_ts: Dict[str, list] = {}  # ip -> [ts, ts, ...]
-_token_ts: Dict[str, list] = {}  # token -> [ts, ts, ...]
+# 内存后端：锁分片数、全部分片合计最多保留的 key 数（超出按 LRU 淘汰）
+RATE_LIMIT_STRIPES = int(os.environ.get("GATEWAY_RATE_LIMIT_STRIPES", "64"))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("GATEWAY_RATE_LIMIT_MAX_KEYS", "100000"))
 _WINDOW = 60.0  # 秒
 
 
-def _prune(ts_list: list, window: float) -> list:
-    now = time.time()
-    return [t for t in ts_list if now - t < window]
+class MemoryRateLimitBackend:
+    """进程内 GCRA 后端：分片锁 + 每分片 LRU（OrderedDict），单实例或未配置共享存储时使用。"""
+
+    def __init__(self, stripes: Optional[int] = None, max_keys: Optional[int] = None) -> None:
+        n = max(1, stripes or RATE_LIMIT_STRIPES)
+        self._per_stripe = max(1, (max_keys or RATE_LIMIT_MAX_KEYS) // n)
+        self._stripes: List["OrderedDict[str, float]"] = [OrderedDict() for _ in range(n)]
+        self._locks = [threading.Lock() for _ in range(n)]
+
+    def acquire(self, key: str, limit: int, period: float = _WINDOW, now: Optional[float] = None) -> bool:
+        """limit 次 / period 秒，允许突发 limit 次；放行返回 True 并占用一次额度。"""
+        if limit <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        interval = period / limit
+        tolerance = period - interval
+        i = hash(key) % len(self._stripes)
+        table = self._stripes[i]
+        with self._locks[i]:
+            tat = max(table.get(key, now), now)
+            if tat - now > tolerance:
+                table.move_to_end(key)
+                return False
+            table[key] = tat + interval
+            table.move_to_end(key)
+            if len(table) > self._per_stripe:
+                table.popitem(last=False)
+        return True
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self._stripes)
+
+
+# KEYS[1]=key; ARGV: interval_ms, tolerance_ms, period_ms。使用 Redis 服务器时间，多实例无时钟偏差
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+if tat - now > tolerance then return 0 end
+redis.call('SET', KEYS[1], tat + interval, 'PX', tonumber(ARGV[3]))
+return 1
+"""
+
+
+class RedisRateLimitBackend:
+    """Redis GCRA 后端：多网关实例共享额度；Redis 异常时放行（fail-open），不因限流存储故障拒绝业务。"""
+
+    def __init__(self, url: str, key_prefix: str = "gateway:rl:") -> None:
+        import redis
+        self._client = redis.from_url(url)
+        self._prefix = key_prefix
+        self._script = self._client.register_script(_GCRA_LUA)
+
+    def acquire(self, key: str, limit: int, period: float = _WINDOW, now: Optional[float] = None) -> bool:
+        if limit <= 0:
+            return False
+        interval_ms = int(period * 1000 / limit)
+        try:
+            return bool(self._script(keys=[self._prefix + key],
+                                     args=[interval_ms, int(period * 1000) - interval_ms, int(period * 1000)]))
+        except Exception as e:
+            logger.debug("redis rate limit failed, allow: %s", e)
+            return True
+
+
+def create_rate_limit_backend():
+    """GATEWAY_RATE_LIMIT_STORE_URL 为 redis://... 时使用共享后端，否则（或初始化失败）使用内存后端。"""
+    url = (os.environ.get("GATEWAY_RATE_LIMIT_STORE_URL") or "").strip()
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        try:
+            backend = RedisRateLimitBackend(url)
+            logger.info("gateway rate limit backend: redis (shared)")
+            return backend
+        except Exception as e:
+            logger.warning("Redis rate limit backend init failed, fallback to memory: %s", e)
+    return MemoryRateLimitBackend()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _get_backend():
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_rate_limit_backend()
+        return _backend
+
+
+def set_backend(backend) -> None:
+    """注入限流后端（需实现 acquire(key, limit, period) -> bool）；None 表示按环境变量重建。"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
 
 
 def allow_request(ip: str, token: Optional[str]) -> Tuple[bool, str]:
@@ -33,19 +137,11 @@ def allow_request(ip: str, token: Optional[str]) -> Tuple[bool, str]:
     """
     if not RATE_LIMIT_ENABLED:
         return True, ""
-    now = time.time()
-    with _lock:
-        # 按 IP
-        _ip_ts[ip] = _prune(_ip_ts.get(ip, []), _WINDOW)
-        if len(_ip_ts[ip]) >= RATE_LIMIT_IP_PER_MIN:
-            return False, "RATE_LIMIT_IP"
-        _ip_ts[ip].append(now)
-        # 按 Token（若有）
-        if token:
-            _token_ts[token] = _prune(_token_ts.get(token, []), _WINDOW)
-            if len(_token_ts[token]) >= RATE_LIMIT_TOKEN_PER_MIN:
-                return False, "RATE_LIMIT_TOKEN"
-            _token_ts[token].append(now)
+    backend = _get_backend()
+    if not backend.acquire("ip:" + ip, RATE_LIMIT_IP_PER_MIN, _WINDOW):
+        return False, "RATE_LIMIT_IP"
+    if token and not backend.acquire("tok:" + token, RATE_LIMIT_TOKEN_PER_MIN, _WINDOW):
+        return False, "RATE_LIMIT_TOKEN"
     return True, ""
 
 
@@ -55,18 +151,12 @@ def record_request(ip: str, token: Optional[str]) -> None:
 
 # 登录接口专用：每 IP 每分钟尝试次数，防暴力破解
 LOGIN_RATE_PER_IP_PER_MIN = int(os.environ.get("GATEWAY_LOGIN_RATE_PER_IP_PER_MIN", "10"))
-_login_ip_ts: Dict[str, list] = {}
-_LOGIN_LOCK = threading.Lock()
 
 
 def allow_login(ip: str) -> Tuple[bool, str]:
     """登录接口限流：每 IP 每分钟最多 LOGIN_RATE_PER_IP_PER_MIN 次。"""
     if not RATE_LIMIT_ENABLED:
         return True, ""
-    now = time.time()
-    with _LOGIN_LOCK:
-        _login_ip_ts[ip] = _prune(_login_ip_ts.get(ip, []), _WINDOW)
-        if len(_login_ip_ts[ip]) >= LOGIN_RATE_PER_IP_PER_MIN:
-            return False, "LOGIN_RATE_LIMIT"
-        _login_ip_ts[ip].append(now)
+    if not _get_backend().acquire("login:" + ip, LOGIN_RATE_PER_IP_PER_MIN, _WINDOW):
+        return False, "LOGIN_RATE_LIMIT"
     return True, ""
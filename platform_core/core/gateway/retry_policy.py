@@ -0,0 +1,358 @@
+"""
+网关重试策略引擎：按方法与路由决定是否重试，按细胞与全局重试预算限制重试总量，GET 对冲请求降低长尾延迟。
+- 幂等方法（GET/HEAD/OPTIONS/PUT/DELETE）：网络错误与 502/503/504 重试；非幂等（POST/PATCH）仅在连接未建立时重试。
+- 路由规则：GATEWAY_RETRY_RULES（JSON 数组，按顺序首个匹配生效），
+  例 [{"cell": "erp", "path": "orders/", "methods": ["GET"], "maxRetries": 0, "hedge": false}]。
+- 重试预算：每个请求存入 ratio 个令牌、每次重试/对冲消耗 1 个，另有每秒最低保底；
+  细胞大面积失败时重试量被限制在正常流量的 ratio 倍以内，避免重试风暴。
+  每次重试须同时取得细胞预算与进程级全局预算，多个细胞同时失败时总重试量仍受全局比例约束。
+- 对冲：GET 首个请求在调用线程内发出并等待 p95 延迟，多数请求在此返回、不额外占用线程；
+  仍未返回时才把首个请求的读取与第二个请求交给有界对冲线程池（GATEWAY_HEDGE_MAX_INFLIGHT），
+  取先成功者；对冲同样消耗重试预算，线程池满时不对冲。
+- 截止时间：请求带截止时间（X-Request-Deadline）时，单次尝试超时不超过剩余预算，
+  剩余预算不足以再发一次时不重试、不对冲，已过期则直接抛出 DeadlineExceeded。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger("gateway.retry")
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({502, 503, 504})
+_BACKOFF_BASE_SEC = float(os.environ.get("GATEWAY_RETRY_BACKOFF_BASE_MS", "200")) / 1000.0
+_BACKOFF_MAX_SEC = float(os.environ.get("GATEWAY_RETRY_BACKOFF_MAX_MS", "2000")) / 1000.0
+# 重试预算：重试量占请求量比例、每秒保底重试数
+_BUDGET_RATIO = float(os.environ.get("GATEWAY_RETRY_BUDGET_RATIO", "0.1"))
+_BUDGET_MIN_PER_SEC = float(os.environ.get("GATEWAY_RETRY_BUDGET_MIN_PER_SEC", "5"))
+_GLOBAL_BUDGET_MIN_PER_SEC = float(os.environ.get("GATEWAY_RETRY_BUDGET_GLOBAL_MIN_PER_SEC", "20"))
+# 对冲：开关、最小延迟、开始对冲所需的最少延迟样本数
+HEDGE_ENABLED = os.environ.get("GATEWAY_HEDGE_ENABLED", "1") == "1"
+_HEDGE_MIN_DELAY_MS = float(os.environ.get("GATEWAY_HEDGE_MIN_DELAY_MS", "50"))
+_HEDGE_MIN_SAMPLES = int(os.environ.get("GATEWAY_HEDGE_MIN_SAMPLES", "20"))
+# 同时处于对冲中的请求数上限（每个占用两个对冲线程）
+_HEDGE_MAX_INFLIGHT = max(1, int(os.environ.get("GATEWAY_HEDGE_MAX_INFLIGHT", "32")))
+_LATENCY_WINDOW = 256
+# 剩余预算低于该值时不再发起重试/对冲（不足以完成一次上游往返）
+_MIN_ATTEMPT_SEC = float(os.environ.get("GATEWAY_DEADLINE_MIN_ATTEMPT_MS", "20")) / 1000.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """请求截止时间已过，不再发起上游调用。"""
+
+
+def _load_rules() -> List[Dict[str, Any]]:
+    raw = (os.environ.get("GATEWAY_RETRY_RULES") or "").strip()
+    if not raw:
+        return []
+    try:
+        rules = json.loads(raw)
+        return [r for r in rules if isinstance(r, dict)]
+    except Exception as e:
+        logger.warning("invalid GATEWAY_RETRY_RULES ignored: %s", e)
+        return []
+
+
+_RULES = _load_rules()
+
+
+def is_connect_error(exc: BaseException) -> bool:
+    """连接未建立（请求未发出）的错误：对任何方法重试都是安全的。"""
+    seen = 0
+    while exc is not None and seen < 5:
+        name = type(exc).__name__
+        if isinstance(exc, (ConnectionRefusedError, socket.gaierror)) or name in ("NewConnectionError", "ConnectTimeoutError", "NameResolutionError"):
+            return True
+        exc = getattr(exc, "reason", None) or exc.__cause__
+        seen += 1
+    return False
+
+
+class RetryPolicy:
+    """单次请求适用的重试策略。"""
+
+    __slots__ = ("max_retries", "idempotent", "hedge", "statuses")
+
+    def __init__(self, max_retries: int, idempotent: bool, hedge: bool, statuses=RETRY_STATUSES):
+        self.max_retries = max(0, max_retries)
+        self.idempotent = idempotent
+        self.hedge = hedge
+        self.statuses = statuses
+
+    def backoff(self, attempt: int) -> float:
+        """指数退避 + 全抖动（秒）。"""
+        return random.uniform(0, min(_BACKOFF_MAX_SEC, _BACKOFF_BASE_SEC * (2 ** attempt)))
+
+
+def policy_for(method: str, cell: str = "", path: str = "", default_max_retries: int = 2) -> RetryPolicy:
+    method = (method or "GET").upper()
+    idempotent = method in IDEMPOTENT_METHODS
+    max_retries = default_max_retries
+    hedge = HEDGE_ENABLED and method == "GET"
+    for rule in _RULES:
+        if rule.get("cell") and rule["cell"] != cell:
+            continue
+        if rule.get("path") and not path.startswith(str(rule["path"]).lstrip("/")):
+            continue
+        methods = [m.upper() for m in rule.get("methods") or []]
+        if methods and method not in methods:
+            continue
+        max_retries = int(rule.get("maxRetries", max_retries))
+        idempotent = bool(rule.get("idempotent", idempotent))
+        hedge = bool(rule.get("hedge", hedge)) and method == "GET"
+        break
+    return RetryPolicy(max_retries, idempotent, hedge)
+
+
+class RetryBudget:
+    """重试预算（令牌桶）：请求存入 ratio，重试取出 1；另按 min_per_sec 匀速补充保底。细胞级与全局各一份。"""
+
+    def __init__(self, ratio: Optional[float] = None, min_per_sec: Optional[float] = None):
+        self.ratio = _BUDGET_RATIO if ratio is None else ratio
+        self.min_per_sec = _BUDGET_MIN_PER_SEC if min_per_sec is None else min_per_sec
+        self.cap = max(10.0, self.min_per_sec * 10)
+        self._tokens = self.cap
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.exhausted = 0
+
+    def on_request(self) -> None:
+        with self._lock:
+            self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.cap, self._tokens + (now - self._last) * self.min_per_sec)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.spent += 1
+                return True
+            self.exhausted += 1
+            return False
+
+    def refund(self) -> None:
+        """退回一次 try_spend 取出的令牌（另一份预算不足、重试未发生时）。"""
+        with self._lock:
+            self._tokens = min(self.cap, self._tokens + 1)
+            self.spent -= 1
+
+
+class LatencyTracker:
+    """细胞最近 N 次上游延迟，p95 每 32 个样本重算一次并缓存。"""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._p95 = 0.0
+        self._since_calc = 0
+        self._lock = threading.Lock()
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self._since_calc += 1
+            if self._since_calc >= 32 or len(self._samples) == _HEDGE_MIN_SAMPLES:
+                s = sorted(self._samples)
+                self._p95 = s[min(len(s) - 1, int(len(s) * 0.95))]
+                self._since_calc = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲等待秒数；样本不足时返回 None（不对冲）。"""
+        if len(self._samples) < _HEDGE_MIN_SAMPLES:
+            return None
+        return max(_HEDGE_MIN_DELAY_MS, self._p95) / 1000.0
+
+
+class RetryController:
+    """单次请求的重试决策：结合策略、细胞预算与全局预算；由各转发循环调用。"""
+
+    def __init__(self, policy: RetryPolicy, budget: RetryBudget, latency: LatencyTracker, deadline: float = 0.0):
+        self.policy = policy
+        self.budget = budget
+        self.latency = latency
+        self.deadline = deadline  # Unix 秒，0 表示无截止时间
+
+    @property
+    def max_attempts(self) -> int:
+        return self.policy.max_retries + 1
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数；无截止时间返回 None。"""
+        return self.deadline - time.time() if self.deadline else None
+
+    def attempt_timeout(self, timeout: float) -> float:
+        """单次尝试的读超时：不超过剩余预算；已过期抛出 DeadlineExceeded。"""
+        left = self.remaining()
+        if left is None:
+            return timeout
+        if left <= 0:
+            raise DeadlineExceeded("request deadline exceeded")
+        return min(timeout, left)
+
+    def _has_budget(self) -> bool:
+        left = self.remaining()
+        return left is None or left > _MIN_ATTEMPT_SEC
+
+    def _spend(self) -> bool:
+        """同时从细胞预算与全局预算各取 1 个令牌；任一不足则不重试。"""
+        if not self.budget.try_spend():
+            return False
+        if _global_budget.try_spend():
+            return True
+        self.budget.refund()
+        return False
+
+    def retry_status(self, status: int, attempt: int) -> bool:
+        return (self.policy.idempotent and status in self.policy.statuses
+                and attempt < self.policy.max_retries and self._has_budget() and self._spend())
+
+    def retry_error(self, exc: BaseException, attempt: int) -> bool:
+        return ((self.policy.idempotent or is_connect_error(exc)) and not isinstance(exc, DeadlineExceeded)
+                and attempt < self.policy.max_retries and self._has_budget() and self._spend())
+
+    def backoff(self, attempt: int) -> float:
+        """退避秒数；有截止时间时为下一次尝试至少保留 _MIN_ATTEMPT_SEC。"""
+        delay = self.policy.backoff(attempt)
+        left = self.remaining()
+        return delay if left is None else max(0.0, min(delay, left - _MIN_ATTEMPT_SEC))
+
+    def sleep(self, attempt: int) -> None:
+        time.sleep(self.backoff(attempt))
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲等待秒数；剩余预算不足以在等待后再发一次时不对冲。"""
+        delay = self.latency.hedge_delay() if self.policy.hedge else None
+        left = self.remaining()
+        if delay is not None and left is not None and left - delay <= _MIN_ATTEMPT_SEC:
+            return None
+        return delay
+
+    def try_hedge(self) -> bool:
+        if self._spend():
+            with _stats_lock:
+                _stats["hedges"] += 1
+            return True
+        return False
+
+    def record_latency(self, ms: float) -> None:
+        self.latency.record(ms)
+
+
+_budgets: Dict[str, RetryBudget] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_global_budget = RetryBudget(min_per_sec=_GLOBAL_BUDGET_MIN_PER_SEC)
+_registry_lock = threading.Lock()
+_stats = {"hedges": 0, "hedgeWins": 0}
+_stats_lock = threading.Lock()
+
+
+def _for_cell(cell: str):
+    with _registry_lock:
+        budget = _budgets.get(cell)
+        if budget is None:
+            budget = _budgets[cell] = RetryBudget()
+            _latencies[cell] = LatencyTracker()
+        return budget, _latencies[cell]
+
+
+def begin(method: str, cell: str = "", path: str = "", default_max_retries: int = 2,
+          replayable: bool = True, deadline: float = 0.0) -> RetryController:
+    """
+    开始一次上游请求：选定策略并向细胞预算与全局预算存入本次请求份额。请求体不可重放时不重试、不对冲。
+    deadline 为 Unix 秒（0=无），重试、退避与对冲均不超出剩余预算。
+    """
+    policy = policy_for(method, cell, path, default_max_retries if replayable else 0)
+    if not replayable:
+        policy.max_retries, policy.hedge = 0, False
+    budget, latency = _for_cell(cell)
+    budget.on_request()
+    _global_budget.on_request()
+    return RetryController(policy, budget, latency, deadline)
+
+
+def note_hedge_win() -> None:
+    with _stats_lock:
+        _stats["hedgeWins"] += 1
+
+
+def stats() -> Dict[str, Any]:
+    with _registry_lock:
+        budgets = {c: {"spent": b.spent, "exhausted": b.exhausted} for c, b in _budgets.items()}
+    g = _global_budget
+    with _stats_lock:
+        return {**_stats, "budgets": budgets, "global": {"spent": g.spent, "exhausted": g.exhausted}}
+
+
+_hedge_slots = threading.BoundedSemaphore(_HEDGE_MAX_INFLIGHT)
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+
+def _get_hedge_pool():
+    """对冲线程池：线程数为在途对冲上限的两倍，配合 _hedge_slots 保证任务从不排队。"""
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _hedge_pool = ThreadPoolExecutor(max_workers=2 * _HEDGE_MAX_INFLIGHT, thread_name_prefix="gateway-hedge")
+        return _hedge_pool
+
+
+def run_hedged(ctl: RetryController, delay: float, start, fn, *args):
+    """
+    对冲执行：start(*args) 在调用线程内发出首个请求并返回待读取对象（ready(timeout) 等待响应可读、
+    finish() 读取 (status, headers, body)），fn(*args) 为完整的单次请求。
+    首个请求 delay 秒内可读、对冲名额已满或预算不足时在调用线程内读取；否则首个请求的读取与第二个请求
+    一起交给对冲线程池，取先返回且状态不在重试集合内的结果；都不理想时返回最后结果或抛出最后异常。
+    落败请求在后台自然结束后归还名额。
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+    sent = start(*args)
+    if sent.ready(delay) or not _hedge_slots.acquire(blocking=False):
+        return sent.finish()
+    if not ctl.try_hedge():
+        _hedge_slots.release()
+        return sent.finish()
+    pool = _get_hedge_pool()
+    first = pool.submit(sent.finish)
+    second = pool.submit(fn, *args)
+    left = [2]
+    left_lock = threading.Lock()
+
+    def release(_):
+        with left_lock:
+            left[0] -= 1
+            if left[0]:
+                return
+        _hedge_slots.release()
+
+    first.add_done_callback(release)
+    second.add_done_callback(release)
+    pending = {first, second}
+    last_result, last_exc = None, None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                result = f.result()
+            except Exception as e:
+                last_exc = e
+                continue
+            if result[0] not in ctl.policy.statuses:
+                if f is second:
+                    note_hedge_win()
+                return result
+            last_result = result
+    if last_result is not None:
+        return last_result
+    raise last_exc or RuntimeError("hedged request failed")
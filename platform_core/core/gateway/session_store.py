@@ -2,6 +2,7 @@
 网关会话/Token 存储抽象（高可用：支持多实例共享；性能：本地缓存与黑名单）。
 - 单实例：内存存储，无外部依赖。
 - 集群：GATEWAY_SESSION_STORE_URL 指向 Redis 时，多网关实例共享 Token，支持无状态水平扩展与故障转移。
+- 单机多进程：prefork worker 未配置 Redis 时使用共享内存存储（shared_state.SharedTokenStore）。
 - 性能：可选本地 LRU 缓存减少 Redis 往返；黑名单避免对已失效 Token 重复查询。
 不引入业务逻辑，仅提供 token -> user_info 的读写与 TTL。
 """
@@ -20,9 +21,18 @@ _TOKEN_CACHE_TTL_SEC = float(os.environ.get("GATEWAY_TOKEN_CACHE_TTL_SEC", "60")
 _BLACKLIST_TTL_SEC = float(os.environ.get("GATEWAY_TOKEN_BLACKLIST_TTL_SEC", "300"))
 
 
-def _memory_store() -> "MemoryTokenStore":
-    """默认内存存储，单实例或未配置 Redis 时使用。"""
-    return MemoryTokenStore()
+_shared_store: Optional[Any] = None
+
+
+def use_shared_store(store: Optional[Any]) -> None:
+    """prefork worker 启动时注入跨进程 Token 存储；未配置 Redis 时 create_token_store 返回它。"""
+    global _shared_store
+    _shared_store = store
+
+
+def _memory_store() -> Any:
+    """默认内存存储，单实例或未配置 Redis 时使用（prefork 下为共享内存存储）。"""
+    return _shared_store if _shared_store is not None else MemoryTokenStore()
 
 
 def _redis_store(url: str) -> Optional["RedisTokenStore"]:
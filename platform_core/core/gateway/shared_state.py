@@ -0,0 +1,625 @@
+"""
+多进程共享的网关控制状态（prefork 多 worker）：限流 GCRA、熔断窗口与舱壁在途数、Token 会话、GET 缓存失效代数、租户配额用量、
+写请求幂等条目；另含审计日志的跨进程记录队列（master 单写者）。
+- master 在 fork 前创建匿名共享内存（mmap MAP_SHARED）与进程间锁，worker 继承后直接读写，无 IPC 往返。
+- 限流与 Token 表为组相联结构：key 哈希定位到固定大小的组，组内线性查找，组满时淘汰最早过期项；内存有界。
+- 锁按组/细胞分片（multiprocessing.Lock，POSIX 信号量），不同 key、不同细胞之间无竞争。
+- 舱壁与租户并发在途数按 worker 分列记账，幂等执行者记录所属 worker；worker 异常退出时 master 调用 reap_worker 回收。
+"""
+from __future__ import annotations
+
+import ctypes
+import hashlib
+import json
+import logging
+import mmap
+import multiprocessing
+import copy
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .circuit_breaker import (
+    _BUCKETS,
+    _WINDOW_SEC,
+    Bulkhead,
+    CircuitBreaker,
+    CircuitBreakerRegistry,
+    _float_env,
+    _int_env,
+    _RollingWindow,
+)
+
+logger = logging.getLogger("gateway.shared_state")
+
+_CTX = multiprocessing.get_context("fork")
+_WAYS = 8  # 每组槽位数
+MAX_WORKERS = 64
+_MAX_BUCKETS = 64
+_STATES = ("closed", "open", "half_open")
+
+SHARED_LOCK_STRIPES = int(os.environ.get("GATEWAY_SHARED_LOCK_STRIPES", "64"))
+SHARED_RATE_LIMIT_SLOTS = int(os.environ.get("GATEWAY_SHARED_RATE_LIMIT_SLOTS", "65536"))
+SHARED_TOKEN_SLOTS = int(os.environ.get("GATEWAY_SHARED_TOKEN_SLOTS", "16384"))
+SHARED_TOKEN_BYTES = int(os.environ.get("GATEWAY_SHARED_TOKEN_BYTES", "1024"))
+SHARED_MAX_CELLS = int(os.environ.get("GATEWAY_SHARED_MAX_CELLS", "64"))
+SHARED_CACHE_GEN_SLOTS = int(os.environ.get("GATEWAY_SHARED_CACHE_GEN_SLOTS", "4096"))
+SHARED_TENANT_QUOTA_SLOTS = int(os.environ.get("GATEWAY_SHARED_TENANT_QUOTA_SLOTS", "16384"))
+SHARED_IDEMPOTENCY_SLOTS = int(os.environ.get("GATEWAY_SHARED_IDEMPOTENCY_SLOTS", "4096"))
+SHARED_IDEMPOTENCY_BYTES = int(os.environ.get("GATEWAY_SHARED_IDEMPOTENCY_BYTES", "8192"))
+
+
+def _alloc(ctype):
+    """匿名共享内存上分配 ctypes 对象（fork 后父子进程可见同一份数据）。"""
+    buf = mmap.mmap(-1, ctypes.sizeof(ctype))
+    return ctype.from_buffer(buf), buf
+
+
+def _digest(key: str) -> Tuple[int, int]:
+    d = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(d[:8], "little") or 1, int.from_bytes(d[8:], "little")
+
+
+class _Sets:
+    """组相联定位：哈希 -> (组起始下标, 组锁)。"""
+
+    def __init__(self, slots: int):
+        self.count = max(1, slots // _WAYS)
+        self.locks = [_CTX.Lock() for _ in range(max(1, min(SHARED_LOCK_STRIPES, self.count)))]
+
+    def locate(self, h: int):
+        s = h % self.count
+        return s * _WAYS, self.locks[s % len(self.locks)]
+
+
+class _RateEntry(ctypes.Structure):
+    _fields_ = [("key", ctypes.c_uint64), ("tat", ctypes.c_double)]
+
+
+class SharedRateLimitBackend:
+    """跨进程 GCRA 后端：语义同 MemoryRateLimitBackend；time.monotonic 为系统级时钟，各 worker 一致。"""
+
+    def __init__(self, slots: Optional[int] = None) -> None:
+        self._sets = _Sets(max(_WAYS, slots or SHARED_RATE_LIMIT_SLOTS))
+        self._table, self._buf = _alloc(_RateEntry * (self._sets.count * _WAYS))
+
+    def acquire(self, key: str, limit: int, period: float = 60.0, now: Optional[float] = None) -> bool:
+        if limit <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        interval = period / limit
+        h = _digest(key)[0]
+        base, lock = self._sets.locate(h)
+        table = self._table
+        with lock:
+            slot, found = base, False
+            for i in range(base, base + _WAYS):
+                if table[i].key == h:
+                    slot, found = i, True
+                    break
+                if table[i].tat < table[slot].tat:
+                    slot = i  # 空槽（tat=0）或最早到期者作为淘汰位
+            entry = table[slot]
+            tat = max(entry.tat, now) if found else now
+            if tat - now > period - interval:
+                return False
+            entry.key = h
+            entry.tat = tat + interval
+        return True
+
+
+class _GenEntry(ctypes.Structure):
+    _fields_ = [("key", ctypes.c_uint64), ("gen", ctypes.c_uint64)]
+
+
+class SharedGenerationTable:
+    """
+    跨进程 GET 缓存失效代数（接口同 cache_policy.MemoryGenerations）：事件投递到任一 worker，所有 worker 的缓存键随之变化。
+    组满时淘汰代数最小者并把它记入该组下限；不在表中的键按组下限读取，因此每个键的代数只增不减，旧缓存条目不会重新可达。
+    """
+
+    def __init__(self, slots: Optional[int] = None) -> None:
+        self._sets = _Sets(max(_WAYS, slots or SHARED_CACHE_GEN_SLOTS))
+        self._table, self._buf = _alloc(_GenEntry * (self._sets.count * _WAYS))
+        self._floors, self._floor_buf = _alloc(ctypes.c_uint64 * self._sets.count)
+
+    def get(self, key: str) -> int:
+        h = _digest(key)[0]
+        base, lock = self._sets.locate(h)
+        table = self._table
+        with lock:
+            for i in range(base, base + _WAYS):
+                if table[i].key == h:
+                    return table[i].gen
+            return self._floors[base // _WAYS]
+
+    def bump(self, key: str) -> None:
+        h = _digest(key)[0]
+        base, lock = self._sets.locate(h)
+        table = self._table
+        with lock:
+            slot, victim = -1, base
+            for i in range(base, base + _WAYS):
+                if table[i].key == h:
+                    slot = i
+                    break
+                if table[i].key == 0 or (table[victim].key and table[i].gen < table[victim].gen):
+                    victim = i
+            if slot < 0:
+                s = base // _WAYS
+                evicted = table[victim]
+                if evicted.key:
+                    self._floors[s] = max(self._floors[s], evicted.gen)
+                evicted.key, evicted.gen = h, self._floors[s]
+                slot = victim
+            table[slot].gen += 1
+
+
+class _QuotaEntry(ctypes.Structure):
+    """字段与 tenant.quota._Usage 同名，admit/release 逻辑直接作用于共享槽位。"""
+
+    _fields_ = [
+        ("key", ctypes.c_uint64),
+        ("requests_tat", ctypes.c_double),
+        ("request_bytes_tat", ctypes.c_double),
+        ("response_bytes_tat", ctypes.c_double),
+        ("in_flight", ctypes.c_int),
+        ("held", ctypes.c_int * MAX_WORKERS),
+    ]
+
+
+class SharedQuotaUsage:
+    """
+    跨进程租户配额用量表（接口同 tenant.quota.MemoryQuotaUsage）：请求量/流量 TAT 与并发数对整个网关生效。
+    组满时优先淘汰无在途请求、TAT 最早者；在途数按 worker 分列，reap_worker 回收异常退出 worker 的名额。
+    """
+
+    def __init__(self, slots: Optional[int] = None) -> None:
+        self._sets = _Sets(max(_WAYS, slots or SHARED_TENANT_QUOTA_SLOTS))
+        self._table, self._buf = _alloc(_QuotaEntry * (self._sets.count * _WAYS))
+        self._worker = 0
+
+    def for_worker(self, worker: int) -> "SharedQuotaUsage":
+        """绑定 worker 序号的视图（共享同一块内存）。"""
+        view = copy.copy(self)
+        view._worker = worker
+        return view
+
+    @contextmanager
+    def entry(self, tenant_id: str, now: float, create: bool = True) -> Iterator[Optional[_QuotaEntry]]:
+        h = _digest(tenant_id)[0]
+        base, lock = self._sets.locate(h)
+        table = self._table
+        with lock:
+            slot, victim, rank = -1, base, None
+            for i in range(base, base + _WAYS):
+                e = table[i]
+                if e.key == h:
+                    slot = i
+                    break
+                r = (e.key != 0, e.in_flight > 0, max(e.requests_tat, e.request_bytes_tat, e.response_bytes_tat))
+                if rank is None or r < rank:
+                    victim, rank = i, r
+            if slot < 0:
+                if not create:
+                    yield None
+                    return
+                ctypes.memset(ctypes.addressof(table[victim]), 0, ctypes.sizeof(_QuotaEntry))
+                table[victim].key = h
+                slot = victim
+            yield table[slot]
+
+    def hold(self, u: _QuotaEntry) -> None:
+        u.in_flight += 1
+        u.held[self._worker] += 1
+
+    def unhold(self, u: _QuotaEntry) -> None:
+        if u.held[self._worker] > 0:
+            u.held[self._worker] -= 1
+            u.in_flight -= 1
+
+    def reap_worker(self, worker: int) -> None:
+        """回收已退出 worker 仍持有的租户并发名额。"""
+        table = self._table
+        for s in range(self._sets.count):
+            base, lock = s * _WAYS, self._sets.locks[s % len(self._sets.locks)]
+            with lock:
+                for i in range(base, base + _WAYS):
+                    e = table[i]
+                    if e.key and e.held[worker]:
+                        e.in_flight -= e.held[worker]
+                        e.held[worker] = 0
+
+
+def _token_entry_type(value_bytes: int):
+    class _TokenEntry(ctypes.Structure):
+        _fields_ = [
+            ("hi", ctypes.c_uint64),
+            ("lo", ctypes.c_uint64),
+            ("expires", ctypes.c_double),
+            ("length", ctypes.c_uint32),
+            ("data", ctypes.c_char * value_bytes),
+        ]
+    return _TokenEntry
+
+
+class SharedTokenStore:
+    """跨进程 Token 存储（接口同 MemoryTokenStore）：token 以 128 位摘要定位，user_info 以 JSON 存放；登出对所有 worker 立即生效。"""
+
+    def __init__(self, slots: Optional[int] = None, value_bytes: Optional[int] = None) -> None:
+        self.value_bytes = value_bytes or SHARED_TOKEN_BYTES
+        entry = _token_entry_type(self.value_bytes)
+        self._data_offset = entry.data.offset  # c_char 数组字段读取会按 NUL 截断，按地址整段读写
+        self._sets = _Sets(max(_WAYS, slots or SHARED_TOKEN_SLOTS))
+        self._table, self._buf = _alloc(entry * (self._sets.count * _WAYS))
+
+    def _find(self, hi: int, lo: int, base: int) -> int:
+        for i in range(base, base + _WAYS):
+            e = self._table[i]
+            if e.hi == hi and e.lo == lo:
+                return i
+        return -1
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        if not token:
+            return None
+        hi, lo = _digest(token)
+        base, lock = self._sets.locate(hi)
+        with lock:
+            i = self._find(hi, lo, base)
+            if i < 0:
+                return None
+            e = self._table[i]
+            if e.expires < time.time():
+                e.hi = e.lo = 0
+                return None
+            raw = ctypes.string_at(ctypes.addressof(e) + self._data_offset, e.length)
+        return json.loads(raw)
+
+    def set(self, token: str, user_info: Dict[str, Any], ttl_sec: int = 86400) -> None:
+        raw = json.dumps(user_info, ensure_ascii=False).encode("utf-8")
+        if len(raw) > self.value_bytes:
+            logger.warning("token user_info too large for shared store (%d > %d bytes)", len(raw), self.value_bytes)
+            return
+        hi, lo = _digest(token)
+        base, lock = self._sets.locate(hi)
+        with lock:
+            i = self._find(hi, lo, base)
+            if i < 0:
+                i = min(range(base, base + _WAYS), key=lambda j: self._table[j].expires)
+            e = self._table[i]
+            e.hi, e.lo = hi, lo
+            e.expires = time.time() + (ttl_sec or 86400)
+            ctypes.memmove(ctypes.addressof(e) + self._data_offset, raw, len(raw))
+            e.length = len(raw)
+
+    def delete(self, token: str) -> None:
+        hi, lo = _digest(token)
+        base, lock = self._sets.locate(hi)
+        with lock:
+            i = self._find(hi, lo, base)
+            if i >= 0:
+                e = self._table[i]
+                e.hi = e.lo = 0
+                e.expires = 0.0
+
+
+_IDEM_EMPTY, _IDEM_PENDING, _IDEM_DONE = 0, 1, 2
+
+
+def _idempotency_entry_type(value_bytes: int):
+    class _IdempotencyEntry(ctypes.Structure):
+        _fields_ = [
+            ("hi", ctypes.c_uint64),
+            ("lo", ctypes.c_uint64),
+            ("fp_hi", ctypes.c_uint64),
+            ("fp_lo", ctypes.c_uint64),
+            ("state", ctypes.c_int),
+            ("worker", ctypes.c_int),
+            ("expires", ctypes.c_double),
+            ("status", ctypes.c_int),
+            ("header_length", ctypes.c_uint32),
+            ("length", ctypes.c_uint32),
+            ("data", ctypes.c_char * value_bytes),
+        ]
+    return _IdempotencyEntry
+
+
+class SharedIdempotencyTable:
+    """
+    跨进程幂等条目（供 idempotency.IdempotencyCache 使用）：执行者占位与已完成响应对所有 worker 可见，
+    落到其他 worker 的重试同样重放或等待，不再到达细胞。响应头（JSON）与 body 合计超过 value_bytes 时不写入共享表。
+    """
+
+    def __init__(self, slots: Optional[int] = None, value_bytes: Optional[int] = None) -> None:
+        self.value_bytes = value_bytes or SHARED_IDEMPOTENCY_BYTES
+        entry = _idempotency_entry_type(self.value_bytes)
+        self._data_offset = entry.data.offset
+        self._sets = _Sets(max(_WAYS, slots or SHARED_IDEMPOTENCY_SLOTS))
+        self._table, self._buf = _alloc(entry * (self._sets.count * _WAYS))
+        self._worker = 0
+
+    def for_worker(self, worker: int) -> "SharedIdempotencyTable":
+        """绑定 worker 序号的视图（共享同一块内存）。"""
+        view = copy.copy(self)
+        view._worker = worker
+        return view
+
+    def _find(self, hi: int, lo: int, base: int, now: float) -> int:
+        for i in range(base, base + _WAYS):
+            e = self._table[i]
+            if e.hi == hi and e.lo == lo:
+                if e.expires >= now:
+                    return i
+                e.hi = e.lo = 0
+                e.state = _IDEM_EMPTY
+        return -1
+
+    def claim(self, key: str, fp: str, pending_ttl: float):
+        """
+        返回 ("replay", (status, headers, body)) / ("owner", None) / ("busy", None) / ("mismatch", None)；
+        键不存在时占位为执行者（pending_ttl 秒后过期，防止执行者卡死后永久占位）。
+        """
+        hi, lo = _digest(key)
+        fp_hi, fp_lo = _digest(fp)
+        base, lock = self._sets.locate(hi)
+        now = time.monotonic()
+        with lock:
+            i = self._find(hi, lo, base, now)
+            if i >= 0:
+                e = self._table[i]
+                if (e.fp_hi, e.fp_lo) != (fp_hi, fp_lo):
+                    return "mismatch", None
+                if e.state == _IDEM_PENDING:
+                    return "busy", None
+                raw = ctypes.string_at(ctypes.addressof(e) + self._data_offset, e.length)
+                headers = [tuple(h) for h in json.loads(raw[:e.header_length])]
+                return "replay", (e.status, headers, raw[e.header_length:])
+            # 淘汰：空槽优先，其次最早过期的已完成条目，最后才是执行中的占位
+            i = min(range(base, base + _WAYS),
+                    key=lambda j: (self._table[j].state == _IDEM_PENDING, self._table[j].state != _IDEM_EMPTY,
+                                   self._table[j].expires))
+            e = self._table[i]
+            e.hi, e.lo, e.fp_hi, e.fp_lo = hi, lo, fp_hi, fp_lo
+            e.state, e.worker, e.expires = _IDEM_PENDING, self._worker, now + pending_ttl
+            e.length = 0
+        return "owner", None
+
+    def finish(self, key: str, fp: str, status: int = 0, headers=None, body: Optional[bytes] = None,
+               ttl_sec: float = 0.0) -> bool:
+        """执行者结束：body 给出且放得下时保存为已完成条目并返回 True，否则撤销占位。"""
+        hi, lo = _digest(key)
+        fp_hi, fp_lo = _digest(fp)
+        raw = b""
+        if body is not None:
+            head = json.dumps(list(headers or []), ensure_ascii=False).encode("utf-8")
+            raw = head + bytes(body)
+            if len(raw) > self.value_bytes:
+                body = None
+        base, lock = self._sets.locate(hi)
+        with lock:
+            i = self._find(hi, lo, base, time.monotonic())
+            if i < 0:
+                return False
+            e = self._table[i]
+            if e.state != _IDEM_PENDING or (e.fp_hi, e.fp_lo) != (fp_hi, fp_lo):
+                return False
+            if body is None:
+                e.hi = e.lo = 0
+                e.state = _IDEM_EMPTY
+                return False
+            ctypes.memmove(ctypes.addressof(e) + self._data_offset, raw, len(raw))
+            e.header_length, e.length = len(head), len(raw)
+            e.status, e.state, e.expires = status, _IDEM_DONE, time.monotonic() + ttl_sec
+        return True
+
+    def reap_worker(self, worker: int) -> None:
+        """撤销已退出 worker 的执行者占位，其他 worker 的等待者随即接替执行。"""
+        table = self._table
+        for s in range(self._sets.count):
+            base, lock = s * _WAYS, self._sets.locks[s % len(self._sets.locks)]
+            with lock:
+                for i in range(base, base + _WAYS):
+                    e = table[i]
+                    if e.state == _IDEM_PENDING and e.worker == worker:
+                        e.hi = e.lo = 0
+                        e.state = _IDEM_EMPTY
+
+
+class _WindowSlot(ctypes.Structure):
+    _fields_ = [
+        ("buckets", ctypes.c_int),
+        ("width", ctypes.c_double),
+        ("_last", ctypes.c_longlong),
+        ("total", ctypes.c_longlong),
+        ("failures", ctypes.c_longlong),
+        ("slow", ctypes.c_longlong),
+        ("_ids", ctypes.c_longlong * _MAX_BUCKETS),
+        ("_total", ctypes.c_longlong * _MAX_BUCKETS),
+        ("_failures", ctypes.c_longlong * _MAX_BUCKETS),
+        ("_slow", ctypes.c_longlong * _MAX_BUCKETS),
+    ]
+
+
+class _SharedWindow(_WindowSlot):
+    """共享内存版滚动窗口：字段与 _RollingWindow 同名，直接复用其滑动逻辑。"""
+
+    _reset_slot = _RollingWindow._reset_slot
+    advance = _RollingWindow.advance
+    add = _RollingWindow.add
+    clear = _RollingWindow.clear
+
+
+class _CellSlot(ctypes.Structure):
+    _fields_ = [
+        ("name", ctypes.c_char * 64),
+        ("state", ctypes.c_int),
+        ("opened_at", ctypes.c_double),
+        ("half_open_successes", ctypes.c_int),
+        ("half_open_probes", ctypes.c_int),
+        ("in_flight_total", ctypes.c_int),
+        ("in_flight", ctypes.c_int * MAX_WORKERS),
+        ("rejected", ctypes.c_longlong),
+        ("window", _SharedWindow),
+    ]
+
+
+def _slot_property(field: str):
+    return property(lambda self: getattr(self._slot, field), lambda self, v: setattr(self._slot, field, v))
+
+
+class SharedCircuitBreaker(CircuitBreaker):
+    """熔断状态机与滚动窗口位于共享内存：任一 worker 触发熔断，所有 worker 立即生效。"""
+
+    def __init__(self, cell_name: str, slot: _CellSlot, lock, **kwargs):
+        self._slot = slot
+        self._shared_lock = lock
+        super().__init__(cell_name, **kwargs)
+
+    def _init_state(self, buckets: int) -> None:
+        self._lock = self._shared_lock
+        self._window = self._slot.window
+
+    _state = property(lambda self: _STATES[self._slot.state],
+                      lambda self, v: setattr(self._slot, "state", _STATES.index(v)))
+    _opened_at = _slot_property("opened_at")
+    _half_open_successes = _slot_property("half_open_successes")
+    _half_open_probes = _slot_property("half_open_probes")
+
+
+class SharedBulkhead(Bulkhead):
+    """跨 worker 的细胞并发舱壁：上限对整个网关生效；在途数按 worker 分列，便于回收异常退出 worker 的名额。"""
+
+    def __init__(self, cell_name: str, slot: _CellSlot, lock, worker: int, max_concurrent: Optional[int] = None):
+        self._slot = slot
+        self._shared_lock = lock
+        self._worker = worker
+        super().__init__(cell_name, max_concurrent)
+
+    def _init_state(self) -> None:
+        self._lock = self._shared_lock
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            s = self._slot
+            if 0 < self.max_concurrent <= s.in_flight_total:
+                s.rejected += 1
+                return False
+            s.in_flight_total += 1
+            s.in_flight[self._worker] += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            s = self._slot
+            if s.in_flight[self._worker] > 0:
+                s.in_flight[self._worker] -= 1
+                s.in_flight_total -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return self._slot.in_flight_total
+
+    @property
+    def rejected(self) -> int:
+        return self._slot.rejected
+
+
+class SharedCellTable:
+    """细胞槽位表：细胞名 -> 共享熔断/舱壁状态；槽位在首次使用时分配（任一 worker）。"""
+
+    def __init__(self, max_cells: Optional[int] = None) -> None:
+        self.max_cells = max_cells or SHARED_MAX_CELLS
+        self.slots, self._buf = _alloc(_CellSlot * self.max_cells)
+        self.locks = [_CTX.Lock() for _ in range(self.max_cells)]
+        self._alloc_lock = _CTX.Lock()
+
+    def slot(self, cell_name: str):
+        """返回 (slot, lock)；槽位用尽返回 None（调用方退回进程内状态）。"""
+        raw = cell_name.encode("utf-8")[:63]
+        with self._alloc_lock:
+            for i in range(self.max_cells):
+                s = self.slots[i]
+                if s.name == raw:
+                    return s, self.locks[i]
+                if not s.name:
+                    # 初始化须在分配锁内完成，其他 worker 不会看到半初始化的窗口
+                    w = s.window
+                    w.buckets = max(1, min(_MAX_BUCKETS, _int_env("GATEWAY_CB_BUCKETS", _BUCKETS)))
+                    w.width = max(_float_env("GATEWAY_CB_WINDOW_SEC", _WINDOW_SEC) / w.buckets, 1e-3)
+                    w._last = -1
+                    for b in range(_MAX_BUCKETS):
+                        w._ids[b] = -1
+                    s.opened_at = time.monotonic()
+                    s.name = raw
+                    return s, self.locks[i]
+        logger.warning("shared cell slots exhausted (%d), %s uses per-worker breaker", self.max_cells, cell_name)
+        return None
+
+    def reap_worker(self, worker: int) -> None:
+        """回收已退出 worker 仍持有的舱壁名额。"""
+        for i in range(self.max_cells):
+            s = self.slots[i]
+            if not s.name:
+                break
+            with self.locks[i]:
+                s.in_flight_total -= s.in_flight[worker]
+                s.in_flight[worker] = 0
+
+
+class SharedCircuitBreakerRegistry(CircuitBreakerRegistry):
+    """worker 内的注册表：熔断器与舱壁绑定共享槽位；参数仍由 GATEWAY_CB_* / GATEWAY_BULKHEAD_* 决定。"""
+
+    def __init__(self, cells: SharedCellTable, worker: int = 0):
+        super().__init__()
+        self._cells = cells
+        self._worker = worker
+
+    def _new_breaker(self, cell_name: str) -> CircuitBreaker:
+        bound = self._cells.slot(cell_name)
+        if bound is None:
+            return super()._new_breaker(cell_name)
+        return SharedCircuitBreaker(cell_name, bound[0], bound[1])
+
+    def _new_bulkhead(self, cell_name: str) -> Bulkhead:
+        bound = self._cells.slot(cell_name)
+        if bound is None:
+            return super()._new_bulkhead(cell_name)
+        return SharedBulkhead(cell_name, bound[0], bound[1], self._worker)
+
+
+class SharedControlState:
+    """fork 前创建的共享控制状态；worker 启动后调用 install 切换到共享后端。"""
+
+    def __init__(self) -> None:
+        from . import audit_log
+        self.rate_limit = SharedRateLimitBackend()
+        self.tokens = SharedTokenStore()
+        self.cells = SharedCellTable()
+        self.cache_generations = SharedGenerationTable()
+        self.tenant_usage = SharedQuotaUsage()
+        self.idempotency = SharedIdempotencyTable()
+        self.audit = audit_log.create_shared_queue()
+
+    def install_master(self) -> None:
+        """master 侧：启动审计日志唯一写线程，消费各 worker 提交的记录。"""
+        from . import audit_log
+        audit_log.use_shared_queue(self.audit, consume=True)
+
+    def install(self, worker: int) -> SharedCircuitBreakerRegistry:
+        """限流、Token 存储、缓存失效代数、租户配额用量与幂等条目切换为共享后端，审计记录改经队列交给 master，返回绑定共享槽位的熔断注册表（供 create_app 使用）。"""
+        from ..tenant import quota as tenant_quota
+        from . import audit_log, cache_policy, idempotency, rate_limit, session_store
+        audit_log.use_shared_queue(self.audit)
+        rate_limit.set_backend(self.rate_limit)
+        session_store.use_shared_store(self.tokens)
+        cache_policy.set_generation_backend(self.cache_generations)
+        tenant_quota.set_usage_backend(self.tenant_usage.for_worker(worker))
+        idempotency.set_shared_table(self.idempotency.for_worker(worker))
+        return SharedCircuitBreakerRegistry(self.cells, worker)
+
+    def reap_worker(self, worker: int) -> None:
+        self.cells.reap_worker(worker)
+        self.tenant_usage.reap_worker(worker)
+        self.idempotency.reap_worker(worker)
@@ -20,7 +20,11 @@ TIME_WINDOW_SEC = 300
 
 
 def _get_secret() -> Optional[bytes]:
-    raw = os.environ.get("GATEWAY_SIGNING_SECRET") or os.environ.get("CELL_SIGNING_SECRET")
+    return parse_secret(os.environ.get("GATEWAY_SIGNING_SECRET") or os.environ.get("CELL_SIGNING_SECRET"))
+
+
+def parse_secret(raw: Optional[str]) -> Optional[bytes]:
+    """密钥字符串 -> bytes；base64: 前缀按 base64 解码，未配置返回 None。"""
     if not raw:
         return None
     raw = raw.strip()
@@ -32,17 +36,19 @@ def _get_secret() -> Optional[bytes]:
     return raw.encode("utf-8")
 
 
-def compute_signature(method: str, path: str, body: bytes, headers: dict, timestamp: Optional[int] = None) -> Optional[str]:
+def compute_signature(method: str, path: str, body: bytes, headers: dict, timestamp: Optional[int] = None,
+                      secret: Optional[bytes] = None) -> Optional[str]:
     """
     计算请求签名。用于网关转发前加签。
     method, path, body 及 SIGNED_HEADERS 对应头按固定顺序拼接后 HMAC-SHA256。
+    secret 未传时读取环境变量（网关传入启动期快照中的密钥）。
     """
-    secret = _get_secret()
+    secret = secret or _get_secret()
     if not secret:
         return None
     if timestamp is None:
         timestamp = int(time.time())
-    parts = [method.upper(), path or "/", body or b""]
+    parts = [method.upper().encode("utf-8"), (path or "/").encode("utf-8"), body or b""]
     for h in SIGNED_HEADERS:
         parts.append((headers.get(h) or "").encode("utf-8"))
     parts.append(str(timestamp).encode("utf-8"))
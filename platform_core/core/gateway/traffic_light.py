@@ -1,13 +1,35 @@
 """
 00 元规则 #8 红绿灯原则
-CPU 使用率超过阈值时自动开启「红灯模式」：只读/降级，保护数据库不被压垮。
+主机负载过高时自动开启「红灯模式」：只读/降级，保护数据库不被压垮。
+- 主机信号（CPU、审计队列深度等全局饱和度）由后台定时器采样，请求路径只读缓存值，不再逐请求系统调用。
+  单个细胞的上游压力不作为全局信号（否则一个慢细胞会拒绝所有写请求），由下方按细胞的自适应并发限制承担。
+- 自适应并发限制（梯度算法，参考 Vegas/Gradient2）：按细胞根据观测延迟调节允许的在途请求数，
+  延迟相对基线上升时收缩、利用率高且延迟平稳时扩张；502/503/504 乘性收缩。超出限制的请求在 proxy() 中直接 503。
 """
+import math
 import os
 import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
 
+TRAFFIC_LIGHT_ENABLED = os.environ.get("GATEWAY_TRAFFIC_LIGHT_ENABLED", "1") == "1"
 _CPU_THRESHOLD = float(os.environ.get("GATEWAY_CPU_THRESHOLD", "80"))  # 默认 80%
+# 其他饱和度信号（0~1，如审计队列）达到该值即红灯
+_SATURATION_THRESHOLD = float(os.environ.get("GATEWAY_SATURATION_THRESHOLD", "0.95"))
+_SAMPLE_INTERVAL_SEC = float(os.environ.get("GATEWAY_HOST_SAMPLE_INTERVAL_MS", "500")) / 1000.0
+# 自适应并发限制参数
+ADAPTIVE_LIMIT_ENABLED = os.environ.get("GATEWAY_ADAPTIVE_LIMIT_ENABLED", "1") == "1"
+_LIMIT_INITIAL = int(os.environ.get("GATEWAY_ADAPTIVE_LIMIT_INITIAL", "200"))
+_LIMIT_MIN = int(os.environ.get("GATEWAY_ADAPTIVE_LIMIT_MIN", "10"))
+_LIMIT_MAX = int(os.environ.get("GATEWAY_ADAPTIVE_LIMIT_MAX", "1000"))
+# 延迟容忍度：短期延迟超过基线 × 容忍度才收缩
+_LIMIT_TOLERANCE = float(os.environ.get("GATEWAY_ADAPTIVE_LIMIT_TOLERANCE", "1.5"))
+_LIMIT_SMOOTHING = 0.2
+_LIMIT_BACKOFF = 0.9
 _psutil = None
 
+
 def _get_cpu_percent() -> float:
     try:
         global _psutil
@@ -19,18 +41,168 @@ def _get_cpu_percent() -> float:
         return 0.0
 
 
+class HostSampler:
+    """后台采样主机信号：cpu（百分比）+ 通过 register_signal 注册的饱和度信号（0~1）。"""
+
+    def __init__(self, interval_sec: Optional[float] = None) -> None:
+        self.interval_sec = interval_sec or _SAMPLE_INTERVAL_SEC
+        self._signals: Dict[str, Callable[[], float]] = {"cpu": _get_cpu_percent}
+        self._values: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def register_signal(self, name: str, fn: Callable[[], float]) -> None:
+        with self._lock:
+            self._signals[name] = fn
+
+    def sample_once(self) -> Dict[str, float]:
+        with self._lock:
+            signals = dict(self._signals)
+        values = {}
+        for name, fn in signals.items():
+            try:
+                values[name] = float(fn() or 0.0)
+            except Exception:
+                values[name] = 0.0
+        self._values = values  # 整表替换，读路径无锁
+        return values
+
+    def values(self) -> Dict[str, float]:
+        if self._thread is None:
+            self.start()
+        return self._values
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="gateway-host-sampler", daemon=True)
+        self.sample_once()
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_sec)
+            self.sample_once()
+
+
+class AdaptiveLimiter:
+    """
+    单细胞自适应并发限制（梯度算法）：
+    - 短期延迟 short_rtt（快 EWMA）、基线 long_rtt（慢 EWMA，只在延迟下降时快速跟随）。
+    - gradient = clamp(tolerance × long_rtt / short_rtt, 0.5, 1)；new = limit × gradient + sqrt(limit)（排队余量）。
+    - 在途不足限制一半时不扩张（未被利用的额度不可信）；上游不可达/过载/超时乘性收缩。
+    """
+
+    def __init__(self, name: str, initial: Optional[int] = None, min_limit: Optional[int] = None,
+                 max_limit: Optional[int] = None, tolerance: Optional[float] = None) -> None:
+        self.name = name
+        self.min_limit = min_limit or _LIMIT_MIN
+        self.max_limit = max_limit or _LIMIT_MAX
+        self.tolerance = tolerance or _LIMIT_TOLERANCE
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial or _LIMIT_INITIAL)))
+        self._in_flight = 0
+        self._short_rtt = 0.0
+        self._long_rtt = 0.0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight >= int(self._limit):
+                self.rejected += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            if self._in_flight > 0:
+                self._in_flight -= 1
+
+    def on_sample(self, rtt_ms: float, dropped: bool = False) -> None:
+        """记录一次完成请求的延迟；dropped 表示上游不可达/过载/超时（502/503/504，乘性收缩）。"""
+        rtt = max(float(rtt_ms), 0.1)
+        with self._lock:
+            if dropped:
+                self._limit = max(self.min_limit, self._limit * _LIMIT_BACKOFF)
+                return
+            if self._short_rtt == 0.0:
+                self._short_rtt = self._long_rtt = rtt
+            else:
+                self._short_rtt += (rtt - self._short_rtt) * 0.2
+                # 基线：上升缓慢跟随，下降快速跟随（近似窗口最小值）
+                alpha = 0.5 if rtt < self._long_rtt else 0.01
+                self._long_rtt += (rtt - self._long_rtt) * alpha
+            gradient = max(0.5, min(1.0, self.tolerance * self._long_rtt / self._short_rtt))
+            new_limit = self._limit * gradient + math.sqrt(self._limit)
+            if self._in_flight < self._limit / 2:
+                new_limit = min(new_limit, self._limit)
+            new_limit = self._limit * (1 - _LIMIT_SMOOTHING) + new_limit * _LIMIT_SMOOTHING
+            self._limit = float(min(self.max_limit, max(self.min_limit, new_limit)))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "inFlight": self._in_flight,
+                "shortRttMs": round(self._short_rtt, 2),
+                "longRttMs": round(self._long_rtt, 2),
+                "rejected": self.rejected,
+            }
+
+
+_sampler = HostSampler()
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def register_signal(name: str, fn: Callable[[], float]) -> None:
+    """注册饱和度信号（返回 0~1），由后台定时采样；达到 GATEWAY_SATURATION_THRESHOLD 即红灯。"""
+    _sampler.register_signal(name, fn)
+
+
+def host_signals() -> Dict[str, float]:
+    """最近一次采样的主机信号。"""
+    return dict(_sampler.values())
+
+
+def get_limiter(cell: str) -> Optional[AdaptiveLimiter]:
+    """细胞的自适应并发限制器；GATEWAY_ADAPTIVE_LIMIT_ENABLED=0 时返回 None。"""
+    if not ADAPTIVE_LIMIT_ENABLED:
+        return None
+    limiter = _limiters.get(cell)
+    if limiter is not None:
+        return limiter
+    with _limiters_lock:
+        if cell not in _limiters:
+            _limiters[cell] = AdaptiveLimiter(cell)
+        return _limiters[cell]
+
+
 def is_red_light() -> bool:
-    """CPU 超过阈值时返回 True，应拒绝非只读请求。"""
-    if os.environ.get("GATEWAY_TRAFFIC_LIGHT_ENABLED", "1") != "1":
+    """CPU 或任一饱和度信号超过阈值时返回 True，应拒绝非只读请求。读取后台采样值，无系统调用。"""
+    if not TRAFFIC_LIGHT_ENABLED:
         return False
     try:
-        pct = _get_cpu_percent()
-        return pct >= _CPU_THRESHOLD
+        values = _sampler.values()
+        if values.get("cpu", 0.0) >= _CPU_THRESHOLD:
+            return True
+        return any(v >= _SATURATION_THRESHOLD for k, v in values.items() if k != "cpu")
     except Exception:
         return False
 
 
 def emit_red_light_log(trace_id: str, method: str, path: str) -> None:
     """记录红灯模式拒绝请求，用于告警与审计。"""
-    log = {"level": "warn", "message": "red_light_reject", "trace_id": trace_id, "method": method, "path": path}
+    log = {"level": "warn", "message": "red_light_reject", "trace_id": trace_id, "method": method, "path": path,
+           "signals": host_signals()}
     logging.getLogger("gateway").warning(str(log))
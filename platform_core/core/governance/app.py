@@ -14,14 +14,18 @@ app = Flask(__name__)
 app.config["JSON_AS_ASCII"] = False
 
 _store: GovernanceStore = GovernanceStore()
+# 发现长轮询单次最长挂起时间（秒）
+_DISCOVERY_MAX_WAIT_SEC = float(os.environ.get("GOVERNANCE_DISCOVERY_MAX_WAIT_SEC", "60"))
 
 
 def _seed_from_env():
-    """从环境变量 CELL_*_URL 预填注册表，便于 Docker 一键启动。"""
+    """从环境变量 CELL_*_URL 预填注册表（多实例逗号分隔），便于 Docker 一键启动。"""
     for key, val in os.environ.items():
         if key.startswith("CELL_") and key.endswith("_URL") and val:
             cell = key[5:-4].lower()
-            _store.register(cell, val.strip().rstrip("/"))
+            for url in val.split(","):
+                if url.strip():
+                    _store.register(cell, url.strip().rstrip("/"))
             logger.info("governance seed cell=%s url=%s", cell, val)
 
 
@@ -29,7 +33,7 @@ def _start_health_loop():
     from .health_runner import run_health_loop
     run_health_loop(
         get_cells_and_urls=lambda: _store.get_cells_for_health_check(),
-        set_healthy=lambda cell, healthy: _store.set_health(cell, healthy, time.time()),
+        set_healthy=lambda cell, healthy, base_url: _store.set_health(cell, healthy, time.time(), base_url),
         interval_sec=float(os.environ.get("GOVERNANCE_HEALTH_INTERVAL_SEC", "30")),
         failure_threshold=int(os.environ.get("GOVERNANCE_HEALTH_FAILURE_THRESHOLD", "3")),
         timeout_sec=float(os.environ.get("GOVERNANCE_HEALTH_TIMEOUT_SEC", "5")),
@@ -39,23 +43,27 @@ def _start_health_loop():
 # ---------- 注册与发现 ----------
 @app.route("/api/governance/register", methods=["POST"])
 def register():
-    """注册细胞。body: { "cell": "crm", "base_url": "http://crm-cell:8001" }"""
+    """
+    注册细胞实例。body: { "cell": "crm", "base_url": "http://crm-cell-1:8001" }；
+    同一细胞以不同 base_url 多次注册即为多实例，也可一次传 "instances": [base_url, ...]。
+    """
     if not request.is_json:
         return jsonify({"code": "BAD_REQUEST", "message": "Content-Type: application/json"}), 400
     body = request.get_json() or {}
     cell = (body.get("cell") or "").strip().lower()
-    base_url = (body.get("base_url") or "").strip()
-    if not cell or not base_url:
+    urls = [u.strip() for u in (body.get("instances") or [body.get("base_url") or ""]) if isinstance(u, str) and u.strip()]
+    if not cell or not urls:
         return jsonify({"code": "BAD_REQUEST", "message": "cell 与 base_url 必填"}), 400
-    _store.register(cell, base_url)
-    return jsonify({"ok": True, "cell": cell, "base_url": base_url.rstrip("/")}), 200
+    for url in urls:
+        _store.register(cell, url)
+    return jsonify({"ok": True, "cell": cell, "base_url": urls[0].rstrip("/"), "instances": _store.resolve_all(cell)}), 200
 
 
 @app.route("/api/governance/register/<cell>", methods=["DELETE"])
 def deregister(cell):
-    """注销细胞。"""
+    """注销细胞；?base_url= 时仅注销该实例。"""
     cell = cell.strip().lower()
-    _store.deregister(cell)
+    _store.deregister(cell, request.args.get("base_url", "").strip() or None)
     return jsonify({"ok": True, "cell": cell}), 200
 
 
@@ -68,32 +76,63 @@ def list_cells():
 
 @app.route("/api/governance/discovery/<cell>", methods=["GET"])
 def discovery(cell):
-    """服务发现：仅返回健康细胞的 base_url，否则 503（故障隔离）。"""
+    """服务发现：返回健康实例（base_url 多实例逗号分隔，instances 为列表），无健康实例 503（故障隔离）。"""
     cell = cell.strip().lower()
-    base_url = _store.resolve(cell)
-    if not base_url:
+    instances = _store.resolve_all(cell)
+    if not instances:
         return jsonify({"code": "CELL_UNAVAILABLE", "message": "细胞未注册或不可用"}), 503
-    return jsonify({"base_url": base_url}), 200
+    return jsonify({"base_url": ",".join(instances), "instances": instances}), 200
+
+
+@app.route("/api/governance/discovery", methods=["GET"])
+def discovery_snapshot():
+    """
+    发现快照（供网关本地缓存）：返回 {version, cells: {cell: base_url}}，仅含健康实例，多实例逗号分隔。
+    ?version=<客户端当前版本>&wait=<秒>：版本未变时长轮询等待变更，超时仍未变返回 304。
+    """
+    since_raw = request.args.get("version", "").strip()
+    since = int(since_raw) if since_raw.lstrip("-").isdigit() else None
+    try:
+        wait = min(_DISCOVERY_MAX_WAIT_SEC, max(0.0, float(request.args.get("wait", 0) or 0)))
+    except (TypeError, ValueError):
+        wait = 0.0
+    version, cells = _store.wait_for_change(since, wait) if since is not None else _store.snapshot()
+    if since is not None and version == since:
+        return "", 304
+    return jsonify({"version": version, "cells": cells}), 200
 
 
 # ---------- 数据上报（网关调用，不侵入细胞） ----------
 @app.route("/api/governance/ingest", methods=["POST"])
 def ingest():
-    """网关上报：链路 span + RED 指标。body: trace_id, span_id, cell, path, status_code, duration_ms"""
+    """
+    网关上报：链路 span + RED 指标。body: {trace_id, span_id, cell, path, status_code, duration_ms}，
+    或上述对象的数组（批量上报；缺少 cell 的条目跳过并计入 rejected）。
+    """
     if not request.is_json:
         return jsonify({"code": "BAD_REQUEST", "message": "Content-Type: application/json"}), 400
-    body = request.get_json() or {}
-    trace_id = body.get("trace_id") or ""
-    span_id = body.get("span_id") or ""
+    body = request.get_json(silent=True)
+    if isinstance(body, list):
+        accepted = sum(1 for item in body if isinstance(item, dict) and _ingest_one(item))
+        return jsonify({"ok": True, "accepted": accepted, "rejected": len(body) - accepted}), 200
+    if not _ingest_one(body or {}):
+        return jsonify({"code": "BAD_REQUEST", "message": "cell 必填"}), 400
+    return jsonify({"ok": True}), 200
+
+
+def _ingest_one(body: dict) -> bool:
     cell = (body.get("cell") or "").strip().lower()
-    path = body.get("path") or ""
-    status_code = int(body.get("status_code", 0))
-    duration_ms = int(body.get("duration_ms", 0))
     if not cell:
-        return jsonify({"code": "BAD_REQUEST", "message": "cell 必填"}), 400
-    _store.add_span(trace_id, span_id, cell, path, status_code, duration_ms)
+        return False
+    try:
+        status_code = int(body.get("status_code", 0))
+        duration_ms = int(body.get("duration_ms", 0))
+    except (TypeError, ValueError):
+        return False
+    path = body.get("path") or ""
+    _store.add_span(body.get("trace_id") or "", body.get("span_id") or "", cell, path, status_code, duration_ms)
     _store.ingest(cell, path, status_code, duration_ms)
-    return jsonify({"ok": True}), 200
+    return True
 
 
 # ---------- 链路追踪 ----------
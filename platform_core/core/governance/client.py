@@ -2,14 +2,21 @@
 治理中心客户端：供网关做服务发现与指标/链路上报
 不侵入细胞；网关可选启用（GOVERNANCE_URL 配置）。
 高可用：resolve 支持重试与退避，提升故障自动恢复能力。
+性能：DiscoveryCache 在网关本地维护发现快照，后台线程对治理中心长轮询订阅版本变更；
+请求路径上的解析仅为进程内字典查询。治理中心不可达时继续使用最后一次成功的快照（last-known-good）。
+上报：SpanExporter 将 span 放入有界队列即返回，后台线程按条数或时间触发批量 POST（一次携带数百条），
+队列满时丢弃最旧记录，上报不再占用用户请求延迟。
 """
+import atexit
 import logging
 import os
+import threading
 import time
 import urllib.request
 import urllib.error
 import json
-from typing import Callable, Optional
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
 
 logger = logging.getLogger("gateway.governance")
 
@@ -17,6 +24,15 @@ logger = logging.getLogger("gateway.governance")
 DISCOVERY_TIMEOUT = 5
 INGEST_TIMEOUT = 2
 DISCOVERY_RETRY_COUNT = 2  # 可被 GOVERNANCE_DISCOVERY_RETRY 覆盖
+# 本地发现缓存：1=后台长轮询订阅快照（默认）；0=逐请求调用 resolve（旧行为）
+DISCOVERY_WATCH = os.environ.get("GOVERNANCE_DISCOVERY_WATCH", "1") == "1"
+DISCOVERY_WAIT_SEC = float(os.environ.get("GOVERNANCE_DISCOVERY_WAIT_SEC", "25"))
+# 治理中心不可达时的重连退避上限（秒）
+DISCOVERY_MAX_BACKOFF_SEC = float(os.environ.get("GOVERNANCE_DISCOVERY_MAX_BACKOFF_SEC", "30"))
+# 批量上报：队列上限（满则丢最旧）、单批条数、最长攒批时间
+INGEST_QUEUE_MAX = int(os.environ.get("GOVERNANCE_INGEST_QUEUE_MAX", "10000"))
+INGEST_BATCH_MAX = int(os.environ.get("GOVERNANCE_INGEST_BATCH_MAX", "500"))
+INGEST_FLUSH_INTERVAL_SEC = float(os.environ.get("GOVERNANCE_INGEST_FLUSH_INTERVAL_MS", "1000")) / 1000.0
 
 
 def _get_base() -> str:
@@ -63,6 +79,112 @@ def resolve(cell: str) -> Optional[str]:
     return None
 
 
+class DiscoveryCache:
+    """
+    网关本地发现缓存：{cell: base_url} 快照 + 版本号。
+    - start() 启动后台线程：GET /api/governance/discovery?version=&wait= 长轮询，版本变化即整表替换。
+    - resolve(cell) 只读本地字典；首次解析前若尚未同步，阻塞同步一次快照（短超时）。
+    - 治理中心不可达：保留最后一次成功快照继续服务，后台指数退避重连。
+    """
+
+    def __init__(self, base: Optional[str] = None, wait_sec: Optional[float] = None, timeout: Optional[float] = None):
+        self._base = (base or _get_base()).rstrip("/")
+        self.wait_sec = DISCOVERY_WAIT_SEC if wait_sec is None else wait_sec
+        self.timeout = float(os.environ.get("GOVERNANCE_DISCOVERY_TIMEOUT", str(DISCOVERY_TIMEOUT))) if timeout is None else timeout
+        self._cells: Dict[str, str] = {}
+        self._version: Optional[int] = None
+        self._synced = threading.Event()
+        self._initial_attempted = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.last_sync_ts: Optional[float] = None
+        self.failures = 0
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    def resolve(self, cell: str) -> Optional[str]:
+        if not self._synced.is_set() and not self._initial_attempted:
+            # 仅首次同步阻塞一次；失败后不再在请求路径重试，由后台线程负责重连
+            with self._lock:
+                if not self._synced.is_set() and not self._initial_attempted:
+                    self._initial_attempted = True
+                    self.refresh(wait=0)
+        return self._cells.get(cell)
+
+    def refresh(self, wait: float = 0) -> bool:
+        """拉取一次快照（wait>0 时长轮询）。返回是否与治理中心通信成功；失败时保留原快照。"""
+        url = f"{self._base}/api/governance/discovery?wait={wait:g}"
+        if self._version is not None:
+            url += f"&version={self._version}"
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, method="GET"), timeout=self.timeout + wait) as r:
+                data = json.loads(r.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                self.failures += 1
+                logger.debug("governance discovery snapshot status=%s", e.code)
+                return False
+            data = None
+        except Exception as e:
+            self.failures += 1
+            logger.debug("governance discovery snapshot failed err=%s", e)
+            return False
+        if data is not None:
+            cells = {str(k): str(v).rstrip("/") for k, v in (data.get("cells") or {}).items() if v}
+            self._cells = cells  # 整表替换，读路径无需加锁
+            self._version = data.get("version")
+        self.last_sync_ts = time.time()
+        self.failures = 0
+        self._synced.set()
+        return True
+
+    def start(self) -> "DiscoveryCache":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="governance-discovery-watch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        attempt = 0
+        while not self._stop.is_set():
+            if self.refresh(wait=self.wait_sec if self._synced.is_set() else 0):
+                attempt = 0
+                continue
+            # 失败：保留 last-known-good，退避后重连
+            self._stop.wait(min(DISCOVERY_MAX_BACKOFF_SEC, _retry_delay(attempt)))
+            attempt = min(attempt + 1, 16)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "version": self._version,
+            "cells": len(self._cells),
+            "synced": self._synced.is_set(),
+            "lastSyncAgeSec": round(time.time() - self.last_sync_ts, 3) if self.last_sync_ts else None,
+            "failures": self.failures,
+        }
+
+
+_discovery_cache: Optional[DiscoveryCache] = None
+_discovery_cache_lock = threading.Lock()
+
+
+def get_discovery_cache() -> DiscoveryCache:
+    """进程级发现缓存（懒加载，首次调用时启动后台订阅线程）。"""
+    global _discovery_cache
+    if _discovery_cache is not None:
+        return _discovery_cache
+    with _discovery_cache_lock:
+        if _discovery_cache is None:
+            _discovery_cache = DiscoveryCache().start()
+        return _discovery_cache
+
+
 def ingest(trace_id: str, span_id: str, cell: str, path: str, status_code: int, duration_ms: int) -> None:
     """上报 span + RED 指标到治理中心；失败仅打日志，不阻塞请求。"""
     base = _get_base()
@@ -85,27 +207,147 @@ def ingest(trace_id: str, span_id: str, cell: str, path: str, status_code: int,
         logger.debug("governance ingest failed trace_id=%s cell=%s err=%s", trace_id, cell, e)
 
 
-def create_resolver_with_fallback(env_or_file_resolver: Callable[[str], Optional[str]]):
-    """返回解析函数：优先治理中心，失败时回退到 env/文件。"""
+def ingest_batch(spans: List[Dict[str, Any]], base: Optional[str] = None) -> bool:
+    """一次 POST 上报多条 span（JSON 数组）；返回是否成功，失败仅打日志。"""
+    base = (base or _get_base()).rstrip("/")
+    if not base or not spans:
+        return False
+    try:
+        data = json.dumps(spans).encode("utf-8")
+        req = urllib.request.Request(f"{base}/api/governance/ingest", data=data, method="POST",
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=INGEST_TIMEOUT) as r:
+            return 200 <= r.status < 300
+    except Exception as e:
+        logger.debug("governance ingest batch failed size=%s err=%s", len(spans), e)
+        return False
+
+
+class SpanExporter:
+    """
+    span 批量导出器：submit 放入有界 deque（满则淘汰最旧并计数）后立即返回；
+    后台线程在攒满 batch_max 条或距上次发送超过 flush_interval 时批量上报。
+    """
+
+    def __init__(self, base: Optional[str] = None, queue_max: Optional[int] = None,
+                 batch_max: Optional[int] = None, flush_interval: Optional[float] = None,
+                 send: Optional[Callable[[List[Dict[str, Any]]], bool]] = None):
+        self._base = base
+        self.batch_max = batch_max or INGEST_BATCH_MAX
+        self.flush_interval = INGEST_FLUSH_INTERVAL_SEC if flush_interval is None else flush_interval
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=queue_max or INGEST_QUEUE_MAX)
+        self._cond = threading.Condition()
+        self._send = send or (lambda spans: ingest_batch(spans, self._base))
+        self._inflight = 0
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="governance-span-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, span: Dict[str, Any]) -> None:
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(span)
+            if len(self._queue) >= self.batch_max:
+                self._cond.notify()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        """调用方须持有 self._cond。"""
+        n = min(len(self._queue), self.batch_max)
+        batch = [self._queue.popleft() for _ in range(n)]
+        self._inflight += 1 if batch else 0
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._queue) < self.batch_max:
+                    self._cond.wait(self.flush_interval)
+                batch = self._take()
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            ok = self._send(batch)
+        except Exception:
+            ok = False
+        with self._cond:
+            self._inflight -= 1
+            if ok:
+                self.sent += len(batch)
+            else:
+                self.failed += len(batch)
+            self._cond.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """同步发送队列中剩余记录并等待在途批次完成（用于退出前或测试）。"""
+        deadline = time.time() + timeout
+        while True:
+            with self._cond:
+                batch = self._take()
+                if not batch:
+                    while self._inflight and time.time() < deadline:
+                        self._cond.wait(max(0.0, deadline - time.time()))
+                    return not self._queue and not self._inflight
+            self._deliver(batch)
+            if time.time() >= deadline:
+                return False
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"queued": len(self._queue), "sent": self.sent, "failed": self.failed, "dropped": self.dropped}
+
+
+_span_exporter: Optional[SpanExporter] = None
+_span_exporter_lock = threading.Lock()
+
+
+def get_span_exporter() -> SpanExporter:
+    """进程级 span 导出器（懒加载；进程退出前尽量发送剩余记录）。"""
+    global _span_exporter
+    if _span_exporter is not None:
+        return _span_exporter
+    with _span_exporter_lock:
+        if _span_exporter is None:
+            _span_exporter = SpanExporter()
+            atexit.register(_span_exporter.flush, 2.0)
+        return _span_exporter
+
+
+def create_resolver_with_fallback(env_or_file_resolver: Callable[[str], Optional[str]],
+                                  cache: Optional[DiscoveryCache] = None):
+    """返回解析函数：优先治理中心（默认走本地发现缓存），无结果时回退到 env/文件。"""
+    if cache is None and DISCOVERY_WATCH and _get_base():
+        cache = get_discovery_cache()
+    lookup = cache.resolve if cache is not None else resolve
+
     def resolve_with_fallback(cell: str) -> Optional[str]:
-        u = resolve(cell)
+        u = lookup(cell)
         if u:
             return u
         return env_or_file_resolver(cell)
     return resolve_with_fallback
 
 
-def create_emit_with_ingest(log_emit: Optional[Callable] = None):
-    """返回 monitor_emit 函数：写日志 + 上报治理中心。"""
-    def emit(trace_id: str, cell: str, path: str, status_code: int, duration_ms: int) -> None:
-        span_id = ""
-        try:
-            from flask import request as flask_req
-            if flask_req:
-                span_id = getattr(flask_req, "span_id", "") or ""
-        except Exception:
-            pass
+def create_emit_with_ingest(log_emit: Optional[Callable] = None, exporter: Optional[SpanExporter] = None):
+    """返回 monitor_emit 函数：写日志 + 上报治理中心（入队批量发送，不阻塞请求）。"""
+    if exporter is None and _get_base():
+        exporter = get_span_exporter()
+
+    def emit(trace_id: str, cell: str, path: str, status_code: int, duration_ms: int, span_id: str = "") -> None:
         if log_emit:
             log_emit(trace_id, cell, path, status_code, duration_ms)
-        ingest(trace_id, span_id, cell, path, status_code, duration_ms)
+        if exporter is None:
+            return
+        exporter.submit({
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "cell": cell,
+            "path": path,
+            "status_code": status_code,
+            "duration_ms": duration_ms,
+        })
     return emit
@@ -34,14 +34,15 @@ def _get_health_pool():
 
 def run_health_loop(
     get_cells_and_urls: Callable[[], list],
-    set_healthy: Callable[[str, bool], None],
+    set_healthy: Callable[[str, bool, str], None],
     interval_sec: float = 30,
     failure_threshold: int = 3,
     timeout_sec: float = 5,
 ) -> threading.Thread:
     """
-    后台线程：周期性对 get_cells_and_urls() 返回的 (cell, base_url) 做 GET /health，
-    连续 failure_threshold 次失败则 set_healthy(cell, False)，任一次成功则 set_healthy(cell, True)（故障自动恢复）。
+    后台线程：周期性对 get_cells_and_urls() 返回的 (cell, base_url)（每个实例一项）做 GET /health，
+    按实例计数：连续 failure_threshold 次失败则 set_healthy(cell, False, base_url)，
+    任一次成功则 set_healthy(cell, True, base_url)（故障自动恢复）。
     参数可由环境变量覆盖：GOVERNANCE_HEALTH_INTERVAL_SEC、GOVERNANCE_HEALTH_FAILURE_THRESHOLD、GOVERNANCE_HEALTH_TIMEOUT_SEC。
     """
     interval_sec = float(os.environ.get("GOVERNANCE_HEALTH_INTERVAL_SEC", str(interval_sec)))
@@ -77,12 +78,13 @@ def run_health_loop(
                     if stop[0]:
                         break
                     ok = _check_one(cell, base_url)
+                    key = (cell, base_url)
                     if not ok:
-                        failures[cell] = failures.get(cell, 0) + 1
-                        set_healthy(cell, failures[cell] < failure_threshold)
+                        failures[key] = failures.get(key, 0) + 1
+                        set_healthy(cell, failures[key] < failure_threshold, base_url)
                     else:
-                        failures[cell] = 0
-                        set_healthy(cell, True)  # 一次成功即恢复，支持故障自动恢复
+                        failures[key] = 0
+                        set_healthy(cell, True, base_url)  # 一次成功即恢复，支持故障自动恢复
             except Exception as e:
                 logger.warning("health loop error: %s", e)
             time.sleep(interval_sec)
@@ -2,12 +2,13 @@
 治理中心存储：注册表、健康状态、链路 span、RED 指标
 线程安全，内存存储；不侵入业务细胞。
 性能优化：Span 分片降低锁竞争；指标按 cell 分表；冷热分离（近期 trace 热表，超量淘汰）。
+发现快照带版本号：注册/注销/健康翻转时递增，网关以长轮询 wait_for_change 订阅变更，无需逐请求解析。
 """
 import os
 import threading
 import time
 from collections import deque
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 # 链路保留条数及 TTL（秒）
 SPAN_MAX_PER_TRACE = 50
@@ -25,55 +26,122 @@ class GovernanceStore:
 
     def __init__(self):
         self._lock = threading.RLock()
-        self._registry: Dict[str, Dict[str, Any]] = {}
+        # cell -> {base_url: {"healthy", "last_check_ts"}}
+        self._registry: Dict[str, Dict[str, Dict[str, Any]]] = {}
         self._span_shards: List[Dict[str, List[Dict]]] = [{} for _ in range(SPAN_SHARDS)]
         self._span_shard_locks: List[threading.RLock] = [threading.RLock() for _ in range(SPAN_SHARDS)]
         self._metrics: Dict[str, Dict[str, Any]] = {}
+        # 发现快照版本：以启动时间起始，治理中心重启后版本必然不同，客户端据此全量刷新
+        self._version = int(time.time() * 1000)
+        self._changed = threading.Condition(self._lock)
 
-    # ---------- 注册与发现 ----------
+    def _bump_version(self) -> None:
+        """调用方须持有 self._lock。"""
+        self._version += 1
+        self._changed.notify_all()
+
+    # ---------- 注册与发现（细胞可有多个实例，按 base_url 区分） ----------
     def register(self, cell: str, base_url: str) -> None:
+        """注册细胞实例；同一细胞多次以不同 base_url 注册即为多实例（水平扩容）。"""
+        base_url = base_url.rstrip("/")
         with self._lock:
-            self._registry[cell] = {
-                "base_url": base_url.rstrip("/"),
-                "healthy": True,
-                "last_check_ts": None,
-            }
-
-    def deregister(self, cell: str) -> None:
+            instances = self._registry.setdefault(cell, {})
+            prev = instances.get(base_url)
+            instances[base_url] = {"healthy": True, "last_check_ts": prev.get("last_check_ts") if prev else None}
+            if prev is None or not prev.get("healthy", True):
+                self._bump_version()
+
+    def deregister(self, cell: str, base_url: Optional[str] = None) -> None:
+        """注销细胞（base_url 为空时注销全部实例）。"""
         with self._lock:
+            instances = self._registry.get(cell)
+            if instances is None:
+                return
+            if base_url:
+                if instances.pop(base_url.rstrip("/"), None) is None:
+                    return
+                if instances:
+                    self._bump_version()
+                    return
             self._registry.pop(cell, None)
             self._metrics.pop(cell, None)
+            self._bump_version()
 
     def list_cells(self) -> List[Dict]:
         with self._lock:
-            return [
-                {"cell": c, "base_url": v["base_url"], "healthy": v["healthy"], "last_check_at": v.get("last_check_ts")}
-                for c, v in self._registry.items()
-            ]
+            out = []
+            for c, instances in self._registry.items():
+                items = [
+                    {"base_url": u, "healthy": v["healthy"], "last_check_at": v.get("last_check_ts")}
+                    for u, v in instances.items()
+                ]
+                out.append({
+                    "cell": c,
+                    "base_url": items[0]["base_url"] if items else "",
+                    "healthy": any(i["healthy"] for i in items),
+                    "last_check_at": max((i["last_check_at"] or 0 for i in items), default=0) or None,
+                    "instances": items,
+                })
+            return out
 
     def get_cells_for_health_check(self) -> List[tuple]:
-        """返回 [(cell, base_url), ...] 供健康巡检使用。"""
+        """返回 [(cell, base_url), ...]（每个实例一项）供健康巡检使用。"""
         with self._lock:
-            return [(c, v["base_url"]) for c, v in self._registry.items()]
+            return [(c, u) for c, instances in self._registry.items() for u in instances]
 
-    def resolve(self, cell: str) -> Optional[str]:
-        """仅返回健康细胞的 base_url，否则 None（故障隔离）。"""
+    def resolve_all(self, cell: str) -> List[str]:
+        """细胞全部健康实例的 base_url。"""
         with self._lock:
-            r = self._registry.get(cell)
-            if not r or not r.get("healthy", True):
-                return None
-            return r["base_url"]
+            return [u for u, v in (self._registry.get(cell) or {}).items() if v.get("healthy", True)]
 
-    def set_health(self, cell: str, healthy: bool, ts: Optional[float] = None) -> None:
+    def resolve(self, cell: str) -> Optional[str]:
+        """仅返回健康实例的 base_url（多实例逗号分隔），无健康实例返回 None（故障隔离）。"""
+        return ",".join(self.resolve_all(cell)) or None
+
+    def snapshot(self) -> Tuple[int, Dict[str, str]]:
+        """(版本号, {cell: base_url})，仅含健康实例，多实例逗号分隔。"""
         with self._lock:
-            if cell in self._registry:
-                self._registry[cell]["healthy"] = healthy
-                self._registry[cell]["last_check_ts"] = ts or time.time()
+            cells = {}
+            for c, instances in self._registry.items():
+                urls = [u for u, v in instances.items() if v.get("healthy", True)]
+                if urls:
+                    cells[c] = ",".join(urls)
+            return self._version, cells
+
+    def wait_for_change(self, since_version: Optional[int], timeout: float) -> Tuple[int, Dict[str, str]]:
+        """长轮询：since_version 与当前版本一致时最多等待 timeout 秒直到发生变更，然后返回快照。"""
+        deadline = time.time() + max(0.0, timeout)
+        with self._changed:
+            while since_version == self._version:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return self.snapshot()
+
+    def set_health(self, cell: str, healthy: bool, ts: Optional[float] = None, base_url: Optional[str] = None) -> None:
+        """更新实例健康状态；base_url 为空时作用于该细胞全部实例。"""
+        with self._lock:
+            instances = self._registry.get(cell)
+            if not instances:
+                return
+            changed = False
+            for u, v in instances.items():
+                if base_url and u != base_url.rstrip("/"):
+                    continue
+                changed = changed or v.get("healthy", True) != healthy
+                v["healthy"] = healthy
+                v["last_check_ts"] = ts or time.time()
+            if changed:
+                self._bump_version()
 
     def get_health(self, cell: str) -> Optional[bool]:
+        """任一实例健康即为 True；未注册返回 None。"""
         with self._lock:
-            r = self._registry.get(cell)
-            return r.get("healthy", True) if r else None
+            instances = self._registry.get(cell)
+            if instances is None:
+                return None
+            return any(v.get("healthy", True) for v in instances.values())
 
     def _span_shard_idx(self, trace_id: str) -> int:
         return hash(trace_id) % SPAN_SHARDS
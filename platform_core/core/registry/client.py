@@ -1,33 +1,47 @@
 """
 细胞注册与发现中心客户端
 供网关解析 /api/v1/{cell} 时获取细胞 base_url；支持熔断时按注册表摘除/恢复。
+细胞可注册多个实例，resolve 以逗号分隔返回，由网关 load_balancer 选择实例。
 遵循《03_超级_PaaS_平台逻辑全景图》：注册中心服务名 {cell}-cell。
 """
 import threading
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class RegistryClient:
-    """细胞注册表：服务名 -> base_url；线程安全。"""
+    """细胞注册表：服务名 -> [base_url, ...]（多实例）；线程安全。"""
 
     def __init__(self):
-        self._cells = {}
+        self._cells: Dict[str, List[str]] = {}
         self._lock = threading.Lock()
 
     def register(self, cell_name: str, base_url: str) -> None:
-        """注册细胞。cell_name 如 crm, erp；base_url 如 https://crm-cell:8001。"""
+        """注册细胞实例。cell_name 如 crm, erp；base_url 如 https://crm-cell:8001；不同 base_url 多次注册即多实例。"""
+        base_url = base_url.rstrip("/")
         with self._lock:
-            self._cells[cell_name] = base_url.rstrip("/")
+            urls = self._cells.setdefault(cell_name, [])
+            if base_url not in urls:
+                urls.append(base_url)
 
-    def deregister(self, cell_name: str) -> None:
-        """注销细胞。"""
+    def deregister(self, cell_name: str, base_url: Optional[str] = None) -> None:
+        """注销细胞；指定 base_url 时仅注销该实例。"""
         with self._lock:
-            self._cells.pop(cell_name, None)
+            urls = self._cells.get(cell_name)
+            if urls and base_url and base_url.rstrip("/") in urls:
+                urls.remove(base_url.rstrip("/"))
+                if urls:
+                    return
+            if not base_url or not urls:
+                self._cells.pop(cell_name, None)
+
+    def resolve_all(self, cell_name: str) -> List[str]:
+        """细胞全部实例的 base_url。"""
+        with self._lock:
+            return list(self._cells.get(cell_name) or [])
 
     def resolve(self, cell_name: str) -> Optional[str]:
-        """解析细胞 base_url；未注册返回 None（网关可返回 503）。"""
-        with self._lock:
-            return self._cells.get(cell_name)
+        """解析细胞 base_url（多实例逗号分隔）；未注册返回 None（网关可返回 503）。"""
+        return ",".join(self.resolve_all(cell_name)) or None
 
     def list_cells(self):
         """返回已注册细胞名列表。"""
@@ -1,82 +1,227 @@
 """
-租户级资源配额：接口请求量、CPU/内存/存储配额配置。
-网关仅强制「接口请求量」限流，超配额返回 429；CPU/内存/存储为配置项，由细胞或基础设施按配置执行隔离。
+租户级资源配额：接口请求量、并发数、请求/响应流量，以及 CPU/内存/存储配额配置。
+网关强制请求量、并发与流量配额，超配额返回 429；CPU/内存/存储为配置项，由细胞或基础设施按配置执行隔离。
+- 请求量与流量：GCRA（每维度仅保存一个理论到达时间 TAT），判定 O(1)，与配额大小无关。
+- 响应流量在响应发出后记账（可透支），透支期间新请求被拒绝，直至额度按速率恢复。
+- admit 一次完成全部维度判定，任一维度超限时不扣减其他维度。
+- 用量表可替换：单进程为 MemoryQuotaUsage；prefork 多 worker 切换为共享内存实现，配额对整个网关生效而非每个 worker 各一份。
 """
 from __future__ import annotations
 
 import os
 import time
 import threading
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
 
-# 默认：每租户每分钟请求上限（0 表示不限制）
+# 默认配额（0 表示不限制，仅当该租户未单独配置时生效）
 DEFAULT_REQUESTS_PER_MIN = int(os.environ.get("TENANT_QUOTA_DEFAULT_REQUESTS_PER_MIN", "0"))
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("TENANT_QUOTA_DEFAULT_MAX_CONCURRENT", "0"))
+DEFAULT_REQUEST_BYTES_PER_MIN = int(os.environ.get("TENANT_QUOTA_DEFAULT_REQUEST_BYTES_PER_MIN", "0"))
+DEFAULT_RESPONSE_BYTES_PER_MIN = int(os.environ.get("TENANT_QUOTA_DEFAULT_RESPONSE_BYTES_PER_MIN", "0"))
 _WINDOW_SEC = 60.0
 
+# 拒绝原因 -> 提示信息
+REASON_MESSAGES = {
+    "QUOTA_EXCEEDED": "租户接口请求量已达配额上限，请稍后重试",
+    "CONCURRENCY_QUOTA_EXCEEDED": "租户并发请求数已达配额上限，请稍后重试",
+    "REQUEST_BYTES_QUOTA_EXCEEDED": "租户请求流量已达配额上限，请稍后重试",
+    "RESPONSE_BYTES_QUOTA_EXCEEDED": "租户响应流量已达配额上限，请稍后重试",
+}
 
-class TenantQuota:
-    """租户配额：请求量滑动窗口限流 + 配额配置（CPU/内存/存储为配置，供下游使用）。"""
+# 配额配置键 -> 默认值
+_LIMIT_DEFAULTS = (
+    ("requests_per_min", DEFAULT_REQUESTS_PER_MIN),
+    ("max_concurrent", DEFAULT_MAX_CONCURRENT),
+    ("request_bytes_per_min", DEFAULT_REQUEST_BYTES_PER_MIN),
+    ("response_bytes_per_min", DEFAULT_RESPONSE_BYTES_PER_MIN),
+)
+
+
+class _Usage:
+    """单租户用量：三个 TAT（单调时钟秒）+ 在途请求数。"""
+
+    __slots__ = ("requests_tat", "request_bytes_tat", "response_bytes_tat", "in_flight")
 
     def __init__(self) -> None:
-        self._lock = threading.RLock()
-        self._quota_config: Dict[str, Dict[str, Any]] = {}  # tenant_id -> { requests_per_min, cpu_limit, memory_mb, storage_gb }
-        self._request_ts: Dict[str, list] = {}  # tenant_id -> [ts, ts, ...]
-        self._max_ts_entries = 10000
+        self.requests_tat = 0.0
+        self.request_bytes_tat = 0.0
+        self.response_bytes_tat = 0.0
+        self.in_flight = 0
+
+    def idle(self, now: float) -> bool:
+        return self.in_flight == 0 and max(self.requests_tat, self.request_bytes_tat, self.response_bytes_tat) <= now
+
+
+class MemoryQuotaUsage:
+    """进程内用量表：租户 -> _Usage；租户数达上限时清理空闲项。"""
+
+    def __init__(self, max_tenants: int = 10000) -> None:
+        self._lock = threading.Lock()
+        self._usage: Dict[str, _Usage] = {}
+        self._max_tenants = max_tenants
+
+    @contextmanager
+    def entry(self, tenant_id: str, now: float, create: bool = True) -> Iterator[Optional[_Usage]]:
+        """加锁取租户用量；create=False 且不存在时给出 None。"""
+        with self._lock:
+            u = self._usage.get(tenant_id)
+            if u is None and create:
+                if len(self._usage) >= self._max_tenants:
+                    for k in [k for k, v in self._usage.items() if v.idle(now)]:
+                        del self._usage[k]
+                u = self._usage[tenant_id] = _Usage()
+            yield u
+
+    def hold(self, u: _Usage) -> None:
+        u.in_flight += 1
+
+    def unhold(self, u: _Usage) -> None:
+        if u.in_flight > 0:
+            u.in_flight -= 1
+
+
+class TenantLease:
+    """已放行请求的配额凭据：release 归还并发名额并按 response_bytes 记账响应流量；幂等。"""
 
-    def _prune(self, ts_list: list) -> list:
-        now = time.time()
-        return [t for t in ts_list if now - t < _WINDOW_SEC]
+    __slots__ = ("_quota", "tenant_id", "holds", "response_bytes", "_released")
+
+    def __init__(self, quota: "TenantQuota", tenant_id: str, holds: bool) -> None:
+        self._quota = quota
+        self.tenant_id = tenant_id
+        self.holds = holds
+        self.response_bytes = 0
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._quota._release(self)
+
+
+class TenantQuota:
+    """租户配额：请求量/流量 GCRA + 并发计数 + 配额配置（CPU/内存/存储为配置，供下游使用）。"""
+
+    def __init__(self, max_tenants: int = 10000, usage: Optional[Any] = None) -> None:
+        self._lock = threading.Lock()
+        self._quota_config: Dict[str, Dict[str, Any]] = {}  # tenant_id -> { requests_per_min, max_concurrent, ..., cpu_limit, memory_mb, storage_gb }
+        self._limits: Dict[str, Tuple[int, int, int, int]] = {}  # tenant_id -> 生效限额（配置与默认值合并）
+        self.usage_table = usage if usage is not None else MemoryQuotaUsage(max_tenants)
 
     def set_quota(self, tenant_id: str, requests_per_min: Optional[int] = None,
                   cpu_limit: Optional[str] = None, memory_mb: Optional[int] = None,
-                  storage_gb: Optional[int] = None) -> Dict[str, Any]:
-        """设置租户配额。requests_per_min 由网关限流；其余为配置项。"""
+                  storage_gb: Optional[int] = None, max_concurrent: Optional[int] = None,
+                  request_bytes_per_min: Optional[int] = None,
+                  response_bytes_per_min: Optional[int] = None) -> Dict[str, Any]:
+        """设置租户配额。请求量、并发与流量由网关强制；其余为配置项。"""
+        updates = {
+            "requests_per_min": requests_per_min,
+            "max_concurrent": max_concurrent,
+            "request_bytes_per_min": request_bytes_per_min,
+            "response_bytes_per_min": response_bytes_per_min,
+            "cpu_limit": cpu_limit,
+            "memory_mb": memory_mb,
+            "storage_gb": storage_gb,
+        }
         with self._lock:
-            if tenant_id not in self._quota_config:
-                self._quota_config[tenant_id] = {}
-            q = self._quota_config[tenant_id]
-            if requests_per_min is not None:
-                q["requests_per_min"] = requests_per_min
-            if cpu_limit is not None:
-                q["cpu_limit"] = cpu_limit
-            if memory_mb is not None:
-                q["memory_mb"] = memory_mb
-            if storage_gb is not None:
-                q["storage_gb"] = storage_gb
+            q = self._quota_config.setdefault(tenant_id, {})
+            q.update({k: v for k, v in updates.items() if v is not None})
+            self._limits.pop(tenant_id, None)
             return dict(q)
 
     def get_quota(self, tenant_id: str) -> Dict[str, Any]:
         with self._lock:
             return dict(self._quota_config.get(tenant_id, {}))
 
-    def allow_request(self, tenant_id: str) -> tuple[bool, str]:
+    def usage(self, tenant_id: str) -> Dict[str, Any]:
+        """当前在途请求数与各流量维度的剩余突发额度（秒）。"""
+        now = time.monotonic()
+        with self.usage_table.entry(tenant_id, now, create=False) as u:
+            u = u or _Usage()
+            return {
+                "inFlight": u.in_flight,
+                "requestsBacklogSec": round(max(0.0, u.requests_tat - now), 3),
+                "requestBytesBacklogSec": round(max(0.0, u.request_bytes_tat - now), 3),
+                "responseBytesBacklogSec": round(max(0.0, u.response_bytes_tat - now), 3),
+            }
+
+    def _limits_for(self, tenant_id: str) -> Tuple[int, int, int, int]:
+        limits = self._limits.get(tenant_id)
+        if limits is None:
+            q = self._quota_config.get(tenant_id, {})
+            limits = tuple(int(q[k]) if q.get(k) is not None else d for k, d in _LIMIT_DEFAULTS)
+            self._limits[tenant_id] = limits
+        return limits
+
+    def admit(self, tenant_id: str, request_bytes: int = 0, hold: bool = True) -> Tuple[bool, str, Optional[TenantLease]]:
         """
-        检查是否允许本次请求（请求量配额）。
-        返回 (允许, 原因)；超配额返回 (False, "QUOTA_EXCEEDED")。
+        一次判定请求量、并发、请求流量、响应流量（透支）四个维度。
+        返回 (允许, 原因, 凭据)；允许时须在响应结束后调用 lease.release()。hold=False 时不占用并发名额。
         """
         if not tenant_id:
-            return True, ""
+            return True, "", None
         with self._lock:
-            q = self._quota_config.get(tenant_id, {})
-            limit = q.get("requests_per_min")
-            if limit is None:
-                limit = DEFAULT_REQUESTS_PER_MIN
-            if limit <= 0:
-                return True, ""
-            if tenant_id not in self._request_ts:
-                self._request_ts[tenant_id] = []
-            self._request_ts[tenant_id] = self._prune(self._request_ts[tenant_id])
-            if len(self._request_ts[tenant_id]) >= limit:
-                return False, "QUOTA_EXCEEDED"
-            self._request_ts[tenant_id].append(time.time())
-            if len(self._request_ts) > self._max_ts_entries:
-                for k in list(self._request_ts.keys())[:100]:
-                    del self._request_ts[k]
-            return True, ""
+            rpm, max_concurrent, in_bpm, out_bpm = self._limits_for(tenant_id)
+        if rpm <= 0 and max_concurrent <= 0 and in_bpm <= 0 and out_bpm <= 0:
+            return True, "", None
+        now = time.monotonic()
+        table = self.usage_table
+        with table.entry(tenant_id, now) as u:
+            req_tat = in_tat = 0.0
+            if rpm > 0:
+                req_tat = max(u.requests_tat, now) + _WINDOW_SEC / rpm
+                if req_tat - now > _WINDOW_SEC:
+                    return False, "QUOTA_EXCEEDED", None
+            if hold and max_concurrent > 0 and u.in_flight >= max_concurrent:
+                return False, "CONCURRENCY_QUOTA_EXCEEDED", None
+            if in_bpm > 0 and request_bytes > 0:
+                in_tat = max(u.request_bytes_tat, now) + request_bytes * _WINDOW_SEC / in_bpm
+                if in_tat - now > _WINDOW_SEC:
+                    return False, "REQUEST_BYTES_QUOTA_EXCEEDED", None
+            if out_bpm > 0 and u.response_bytes_tat - now > _WINDOW_SEC:
+                return False, "RESPONSE_BYTES_QUOTA_EXCEEDED", None
+            if rpm > 0:
+                u.requests_tat = req_tat
+            if in_tat:
+                u.request_bytes_tat = in_tat
+            if hold:
+                table.hold(u)
+            return True, "", TenantLease(self, tenant_id, hold)
+
+    def _release(self, lease: TenantLease) -> None:
+        with self._lock:
+            out_bpm = self._limits_for(lease.tenant_id)[3]
+        now = time.monotonic()
+        table = self.usage_table
+        with table.entry(lease.tenant_id, now, create=False) as u:
+            if u is None:
+                return
+            if lease.holds:
+                table.unhold(u)
+            if out_bpm > 0 and lease.response_bytes > 0:
+                u.response_bytes_tat = max(u.response_bytes_tat, now) + lease.response_bytes * _WINDOW_SEC / out_bpm
+
+    def allow_request(self, tenant_id: str) -> tuple[bool, str]:
+        """
+        检查是否允许本次请求（请求量与流量维度，不占用并发名额）。
+        返回 (允许, 原因)；超配额返回 (False, "QUOTA_EXCEEDED" 等)。
+        """
+        ok, reason, _ = self.admit(tenant_id, hold=False)
+        return ok, reason
 
 
 _quota: Optional[TenantQuota] = None
 _quota_lock = threading.Lock()
+_usage_backend: Optional[Any] = None
+
+
+def set_usage_backend(backend: Any) -> None:
+    """切换用量表（prefork worker 启动时切换为共享内存实现）。"""
+    global _usage_backend
+    with _quota_lock:
+        _usage_backend = backend
+        if _quota is not None:
+            _quota.usage_table = backend
 
 
 def get_tenant_quota() -> TenantQuota:
@@ -86,5 +231,5 @@ def get_tenant_quota() -> TenantQuota:
     with _quota_lock:
         if _quota is not None:
             return _quota
-        _quota = TenantQuota()
+        _quota = TenantQuota(usage=_usage_backend)
         return _quota
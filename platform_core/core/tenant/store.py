@@ -1,21 +1,42 @@
 """
-租户生命周期管理：创建、启用/禁用、到期回收、数据隔离校验。
-存储仅租户元数据（id/name/status/expire_at），不存业务数据；不同租户数据 100% 隔离。
+租户生命周期管理：创建、启用/禁用、到期回收、套餐、数据隔离校验。
+存储仅租户元数据（id/name/status/plan/expire_at），不存业务数据；不同租户数据 100% 隔离。
+套餐决定网关公平调度权重（过载时按权重分配上游并发），TENANT_PLAN_WEIGHTS（JSON）可覆盖默认权重。
 """
+import json
+import logging
 import os
 import time
 import threading
 from typing import Any, Dict, List, Optional
 
+logger = logging.getLogger("tenant.store")
+
 # 状态
 STATUS_ENABLED = "enabled"
 STATUS_DISABLED = "disabled"
 # 默认租户，始终存在且启用
 DEFAULT_TENANT_ID = "default"
+# 套餐 -> 公平调度权重
+DEFAULT_PLAN = os.environ.get("TENANT_DEFAULT_PLAN", "standard")
+
+
+def _load_plan_weights() -> Dict[str, float]:
+    weights = {"free": 1.0, "standard": 2.0, "professional": 4.0, "enterprise": 8.0}
+    raw = (os.environ.get("TENANT_PLAN_WEIGHTS") or "").strip()
+    if raw:
+        try:
+            weights.update({str(k): float(v) for k, v in json.loads(raw).items() if float(v) > 0})
+        except Exception as e:
+            logger.warning("invalid TENANT_PLAN_WEIGHTS ignored: %s", e)
+    return weights
+
+
+PLAN_WEIGHTS = _load_plan_weights()
 
 
 class TenantStore:
-    """租户注册表：tenant_id -> { id, name, status, expire_at, created_at }。"""
+    """租户注册表：tenant_id -> { id, name, status, plan, expire_at, created_at }。"""
 
     def __init__(self) -> None:
         self._lock = threading.RLock()
@@ -29,16 +50,21 @@ class TenantStore:
                     "id": DEFAULT_TENANT_ID,
                     "name": "默认租户",
                     "status": STATUS_ENABLED,
+                    "plan": DEFAULT_PLAN,
                     "expire_at": None,
                     "created_at": time.time(),
                 }
 
-    def create(self, tenant_id: str, name: str, expire_at: Optional[float] = None) -> Dict[str, Any]:
-        """创建租户，默认启用。返回租户信息。"""
+    def create(self, tenant_id: str, name: str, expire_at: Optional[float] = None,
+               plan: Optional[str] = None) -> Dict[str, Any]:
+        """创建租户，默认启用、默认套餐 DEFAULT_PLAN。返回租户信息。"""
         tenant_id = (tenant_id or "").strip()
         name = (name or tenant_id or "").strip()
+        plan = (plan or DEFAULT_PLAN).strip()
         if not tenant_id:
             raise ValueError("tenant_id 必填")
+        if plan not in PLAN_WEIGHTS:
+            raise ValueError(f"未知套餐: {plan}")
         with self._lock:
             if tenant_id in self._tenants:
                 raise ValueError("租户已存在")
@@ -46,6 +72,7 @@ class TenantStore:
                 "id": tenant_id,
                 "name": name,
                 "status": STATUS_ENABLED,
+                "plan": plan,
                 "expire_at": expire_at,
                 "created_at": time.time(),
             }
@@ -87,6 +114,19 @@ class TenantStore:
             if tenant_id in self._tenants:
                 self._tenants[tenant_id]["expire_at"] = expire_at
 
+    def set_plan(self, tenant_id: str, plan: str) -> None:
+        if plan not in PLAN_WEIGHTS:
+            raise ValueError(f"未知套餐: {plan}")
+        with self._lock:
+            if tenant_id in self._tenants:
+                self._tenants[tenant_id]["plan"] = plan
+
+    def weight(self, tenant_id: str) -> float:
+        """公平调度权重：按租户套餐取 PLAN_WEIGHTS；未知租户按默认套餐。"""
+        t = self._tenants.get(tenant_id)
+        plan = (t or {}).get("plan") or DEFAULT_PLAN
+        return PLAN_WEIGHTS.get(plan, 1.0)
+
     def list_tenants(self) -> List[Dict[str, Any]]:
         with self._lock:
             return [dict(t) for t in self._tenants.values()]
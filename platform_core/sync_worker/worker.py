@@ -11,6 +11,7 @@ import json
 import logging
 import urllib.request
 import urllib.error
+from contextvars import ContextVar
 
 logger = logging.getLogger("sync_worker")
 
@@ -31,14 +32,29 @@ GATEWAY_URL = (os.environ.get("GATEWAY_URL") or "http://localhost:8000").strip()
 DATALAKE_URL = (os.environ.get("DATALAKE_URL") or "").strip().rstrip("/")
 AUTH_TOKEN = os.environ.get("EVENT_BUS_TOKEN") or os.environ.get("GATEWAY_TOKEN") or "smoke-test"
 POLL_INTERVAL_SEC = max(1, int(os.environ.get("SYNC_WORKER_POLL_INTERVAL_SEC", "5")))
+# 截止时间：单次 HTTP 调用超时；单个事件的整条联动链（多次调用）共享 EVENT_DEADLINE_SEC 预算
+REQUEST_TIMEOUT_SEC = float(os.environ.get("SYNC_WORKER_REQUEST_TIMEOUT_SEC", "15"))
+EVENT_DEADLINE_SEC = float(os.environ.get("SYNC_WORKER_EVENT_DEADLINE_SEC", "60"))
+DEADLINE_HEADER = "X-Request-Deadline"
+_deadline: ContextVar[float] = ContextVar("sync_deadline", default=0.0)
 
 
 def _req(method: str, url: str, body: dict | None = None, tenant_id: str = "default") -> tuple[int, dict]:
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {AUTH_TOKEN}", "X-Tenant-Id": tenant_id, "X-Request-ID": f"sync-{int(time.time()*1000)}"}
+    """
+    调用网关/数据湖：X-Request-Deadline 取当前事件截止时间与单次超时的较早者并透传，
+    超时不超过剩余预算；事件预算已耗尽时不再发起调用（返回 0）。
+    """
+    now = time.time()
+    deadline = min(_deadline.get() or now + REQUEST_TIMEOUT_SEC, now + REQUEST_TIMEOUT_SEC)
+    if deadline <= now:
+        logger.warning("deadline exceeded, skip %s %s", method, url)
+        return 0, {}
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {AUTH_TOKEN}", "X-Tenant-Id": tenant_id, "X-Request-ID": f"sync-{int(now*1000)}",
+               DEADLINE_HEADER: str(int(deadline * 1000))}
     data = json.dumps(body).encode("utf-8") if body else None
     req = urllib.request.Request(url, data=data, headers=headers, method=method)
     try:
-        with urllib.request.urlopen(req, timeout=15) as r:
+        with urllib.request.urlopen(req, timeout=deadline - now) as r:
             return r.getcode(), json.loads(r.read().decode()) if r.length else {}
     except urllib.error.HTTPError as e:
         return e.code, {}
@@ -238,6 +254,7 @@ def _handle_oa_approval_completed(payload: dict) -> None:
 
 
 def dispatch(event_type: str, payload: dict) -> None:
+    token = _deadline.set(time.time() + EVENT_DEADLINE_SEC)
     try:
         if event_type == "crm.contract.signed":
             _handle_crm_contract_signed(payload)
@@ -268,6 +285,8 @@ def dispatch(event_type: str, payload: dict) -> None:
                 _ingest(tenant_id, cell, "events", [{"eventType": event_type, **payload}])
     except Exception as e:
         logger.exception("dispatch %s: %s", event_type, e)
+    finally:
+        _deadline.reset(token)
 
 
 def run_once(since_ts: float) -> float:
@@ -3,8 +3,15 @@ PaaS 核心层单元测试公共 fixture：路径与网关 app。
 """
 from __future__ import annotations
 
+import gzip
+import hashlib
+import json
 import os
 import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 
@@ -28,3 +35,120 @@ def gateway_client(gateway_app):
     """网关测试客户端。"""
     with gateway_app.test_client() as c:
         yield c
+
+
+class CellHandler(BaseHTTPRequestHandler):
+    """模拟细胞：导出类路径（含 export）以 chunked 返回 size 字节（gzip=1 时压缩）；其余路径回显请求（status= 指定状态码，etag=1 时带 ETag 并响应 If-None-Match）。"""
+    protocol_version = "HTTP/1.1"
+    delay_sec = 0.0
+    hits = 0
+
+    def _read_body(self) -> bytes:
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self):
+        body = self._read_body()
+        CellHandler.hits += 1
+        if self.delay_sec:
+            time.sleep(self.delay_sec)
+        url = urlsplit(self.path)
+        qs = parse_qs(url.query)
+        if "export" in url.path:
+            size = int(qs.get("size", ["0"])[0])
+            payload = b"x" * size
+            if qs.get("gzip") == ["1"] and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                payload = gzip.compress(payload)
+                self.send_response(200)
+                self.send_header("Content-Encoding", "gzip")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(payload), 8192):
+                part = payload[i:i + 8192]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        data = json.dumps({
+            "method": self.command,
+            "path": self.path,
+            "body": body.decode("utf-8"),
+            "bodyLength": len(body),
+            "traceId": self.headers.get("X-Trace-Id", ""),
+            "deadline": self.headers.get("X-Request-Deadline", ""),
+        }).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(url.path.encode()).hexdigest() if qs.get("etag") == ["1"] else ""
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(int(qs.get("status", ["200"])[0]))
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _reply
+    do_POST = _reply
+    do_PUT = _reply
+    do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class _CellServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+@pytest.fixture
+def cell_server():
+    """本地模拟细胞 HTTP 服务（随机端口），供转发类测试使用。各用例从初始自适应并发限制开始。"""
+    from platform_core.core.gateway import traffic_light
+    traffic_light._limiters.clear()
+    CellHandler.hits = 0
+    server = _CellServer(("127.0.0.1", 0), CellHandler)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield server
+    server.shutdown()
+    CellHandler.delay_sec = 0.0
+
+
+@pytest.fixture
+def cell_base_url(cell_server):
+    return "http://127.0.0.1:%d" % cell_server.server_address[1]
+
+
+@pytest.fixture
+def make_gateway(cell_base_url, monkeypatch):
+    """真实转发网关工厂：开启 USE_REAL_FORWARD、关闭 IP 限流；resolver 默认把所有细胞解析到模拟细胞，env 为额外环境变量，asgi=True 时返回 ASGI 应用。"""
+    from platform_core.core.gateway import rate_limit
+    from platform_core.core.gateway.app import create_app
+    from platform_core.core.gateway.asgi_app import create_asgi_app
+
+    def make(resolver=None, env=None, asgi=False, **kwargs):
+        monkeypatch.setenv("USE_REAL_FORWARD", "1")
+        for name, value in (env or {}).items():
+            monkeypatch.setenv(name, str(value))
+        monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", False)
+        factory = create_asgi_app if asgi else create_app
+        return factory(registry_resolver=resolver or (lambda c: cell_base_url), **kwargs)
+
+    return make
@@ -0,0 +1,129 @@
+"""
+操作审计日志单元测试：异步组提交落盘、哈希链校验与篡改检测、段滚动后链延续、检索、段索引与流式导出。
+"""
+from __future__ import annotations
+
+import glob
+import json
+import os
+
+import pytest
+
+from platform_core.core.gateway import audit_log
+from platform_core.core.gateway.audit_index import SegmentIndex
+
+
+@pytest.fixture
+def audit_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_log, "_AUDIT_DIR", str(tmp_path))
+    monkeypatch.setattr(audit_log, "_AUDIT_FILE", str(tmp_path / "operation_audit.log"))
+    audit_log._MEM_CACHE.clear()
+    audit_log._INDEX_CACHE.clear()
+    yield tmp_path
+    audit_log.flush()
+    audit_log._MEM_CACHE.clear()
+
+
+def test_append_is_batched_and_chained(audit_dir):
+    for i in range(200):
+        audit_log.append("GET", f"/api/v1/crm/c{i}", 200, 1, trace_id=f"t{i}", tenant_id="t1", cell="crm")
+    assert audit_log.flush()
+    with open(audit_dir / "operation_audit.log", encoding="utf-8") as f:
+        lines = [json.loads(x) for x in f if x.strip()]
+    assert len(lines) == 200
+    assert lines[1]["prevHash"] == lines[0]["lineHash"]
+    assert audit_log.verify_chain() == (True, 200)
+    assert audit_log.stats()["dropped"] == 0
+
+
+def test_verify_chain_detects_tampering(audit_dir):
+    for i in range(5):
+        audit_log.append("POST", "/api/v1/erp/orders", 200, 1, trace_id=f"t{i}")
+    audit_log.flush()
+    path = audit_dir / "operation_audit.log"
+    lines = path.read_text(encoding="utf-8").splitlines()
+    rec = json.loads(lines[2])
+    rec["status"] = 500
+    lines[2] = json.dumps(rec, ensure_ascii=False)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    ok, line_no = audit_log.verify_chain()
+    assert not ok and line_no == 3
+
+
+def test_segment_rotation_keeps_chain(audit_dir, monkeypatch):
+    monkeypatch.setattr(audit_log, "_SEGMENT_MAX_BYTES", 2000)
+    for i in range(40):
+        audit_log.append("GET", "/api/v1/crm/customers", 200, 1, trace_id=f"r{i}")
+    audit_log.flush()
+    audit_log.append("GET", "/api/v1/crm/customers", 200, 1, trace_id="after-rotate")
+    audit_log.flush()
+    sealed = sorted(glob.glob(os.path.join(str(audit_dir), "operation_audit.*.log")))
+    assert sealed
+    with open(sealed[-1], encoding="utf-8") as f:
+        last_sealed = [json.loads(x) for x in f if x.strip()][-1]
+    with open(audit_dir / "operation_audit.log", encoding="utf-8") as f:
+        first_active = json.loads(f.readline())
+    assert first_active["prevHash"] == last_sealed["lineHash"]
+    assert audit_log.verify_chain(sealed[0])[0]
+
+
+def test_search_filters(audit_dir):
+    audit_log.append("GET", "/a", 200, 1, trace_id="x1", tenant_id="ta", cell="crm")
+    audit_log.append("GET", "/b", 200, 1, trace_id="x2", tenant_id="tb", cell="erp")
+    audit_log.flush()
+    assert [r["traceId"] for r in audit_log.search(tenant_id="tb")] == ["x2"]
+    assert [r["path"] for r in audit_log.search(cell="crm")] == ["/a"]
+
+
+@pytest.fixture
+def segmented(audit_dir, monkeypatch):
+    """写入 300 条、跨多个已封存段的数据；内存缓存清空，强制走段索引。"""
+    monkeypatch.setattr(audit_log, "_SEGMENT_MAX_BYTES", 8000)
+    for i in range(300):
+        audit_log.append("GET", f"/api/v1/crm/c{i}", 500 if i % 50 == 0 else 200, 1, trace_id=f"t{i}",
+                         tenant_id=f"tenant{i % 3}", user=f"u{i % 7}", cell="crm")
+        if i % 20 == 19:
+            audit_log.flush()  # 段滚动在每批写入后判断
+    audit_log._MEM_CACHE.clear()
+    return audit_dir
+
+
+def test_sealed_segments_get_index_files(segmented):
+    sealed = sorted(glob.glob(os.path.join(str(segmented), "operation_audit.*.log")))
+    assert len(sealed) > 2
+    for path in sealed:
+        idx = SegmentIndex.load(path + ".idx")
+        assert idx.count == sum(1 for x in open(path, encoding="utf-8") if x.strip())
+
+
+def test_search_by_trace_and_secondary_fields_across_segments(segmented):
+    assert [r["path"] for r in audit_log.search(trace_id="t123")] == ["/api/v1/crm/c123"]
+    errors = audit_log.search(status=500, limit=100)
+    assert [r["traceId"] for r in errors] == [f"t{i}" for i in range(0, 300, 50)]
+    hits = audit_log.search(tenant_id="tenant1", user="u2", limit=100)
+    assert [r["traceId"] for r in hits] == [f"t{i}" for i in range(300) if i % 3 == 1 and i % 7 == 2]
+
+
+def test_search_time_range_seeks(segmented):
+    all_recs = audit_log.search(limit=1000)
+    assert len(all_recs) == 300
+    since, to = all_recs[100]["ts"], all_recs[110]["ts"]
+    out = audit_log.search(since_ts=since, to_ts=to, limit=1000)
+    assert out and all(since <= r["ts"] <= to for r in out)
+    assert [r for r in all_recs if since <= r["ts"] <= to] == out
+
+
+def test_missing_index_is_rebuilt(segmented):
+    for idx_path in glob.glob(os.path.join(str(segmented), "*.idx")):
+        os.remove(idx_path)
+    audit_log._INDEX_CACHE.clear()
+    assert [r["traceId"] for r in audit_log.search(trace_id="t5")] == ["t5"]
+    assert glob.glob(os.path.join(str(segmented), "*.idx"))
+
+
+def test_export_iter_streams_all_segments_and_filters(segmented):
+    raw = b"".join(audit_log.export_iter())
+    lines = [json.loads(x) for x in raw.decode("utf-8").splitlines() if x.strip()]
+    assert [r["traceId"] for r in lines] == [f"t{i}" for i in range(300)]
+    filtered = b"".join(audit_log.export_iter(tenant_id="tenant0"))
+    assert len(filtered.splitlines()) == 100
@@ -0,0 +1,134 @@
+"""
+合约驱动缓存策略单元测试：x-cache 解析与路径模板匹配、varyBy 键隔离、事件失效（按租户/全局/通配）、网关接入。
+"""
+from __future__ import annotations
+
+import pytest
+
+from platform_core.core import event_bus
+from platform_core.core.gateway import cache_policy
+from platform_core.core.gateway import http_client as gateway_http_client
+from platform_core.core.gateway.get_cache import LRUTTLCache
+
+from .conftest import CellHandler
+
+_CONTRACT = """
+openapi: 3.0.3
+paths:
+  /items:
+    get:
+      x-cache: { ttlSec: 60, invalidateOn: [crm.item.*] }
+    post:
+      summary: 新建
+  /items/{itemId}/detail:
+    get:
+      x-cache: { ttlSec: 30, staleSec: 0, varyBy: [tenant, user], invalidateOn: [crm.item.updated] }
+  /catalog:
+    get:
+      x-cache: { ttlSec: 300, varyBy: [role], invalidateOn: ["*"] }
+  /broken:
+    get:
+      x-cache: { ttlSec: 0 }
+  /live:
+    get:
+      summary: 未声明，不缓存
+"""
+
+
+@pytest.fixture
+def table(tmp_path):
+    (tmp_path / "crm").mkdir()
+    (tmp_path / "crm" / "api_contract.yaml").write_text(_CONTRACT, encoding="utf-8")
+    (tmp_path / "erp").mkdir()
+    (tmp_path / "erp" / "api_contract.yaml").write_text("openapi: 3.0.3\npaths: {}\n", encoding="utf-8")
+    return cache_policy.PolicyTable(str(tmp_path))
+
+
+def test_contract_policies_resolved_by_path_template(table):
+    governed, policy = table.resolve("crm", "items")
+    assert governed and policy.ttl_sec == 60 and policy.vary == ("tenant",)
+    _, detail = table.resolve("crm", "/items/42/detail")
+    assert detail.ttl_sec == 30 and detail.stale_sec == 0 and detail.needs_principal
+    assert table.resolve("crm", "items/42/detail/extra") == (True, None)
+    assert table.resolve("crm", "live") == (True, None)
+    assert table.resolve("crm", "broken") == (True, None)  # 非法声明被忽略
+    assert table.resolve("erp", "anything") == (False, None)  # 未声明策略：沿用全局 TTL
+
+
+def test_scope_isolates_vary_dimensions(table):
+    _, detail = table.resolve("crm", "items/1/detail")
+    assert table.scope(detail, "t1", "alice") != table.scope(detail, "t1", "bob")
+    assert table.scope(detail, "t1", "alice") != table.scope(detail, "t2", "alice")
+    _, catalog = table.resolve("crm", "catalog")
+    assert table.scope(catalog, "t1", "alice", "admin") == table.scope(catalog, "t2", "bob", "admin")
+
+
+def test_events_invalidate_by_topic_and_tenant(table):
+    _, items = table.resolve("crm", "items")
+    _, catalog = table.resolve("crm", "catalog")
+    before = {t: table.scope(items, t) for t in ("t1", "t2")}
+    catalog_before = table.scope(catalog, role="admin")
+    assert table.invalidate("crm.item.created", "t1") == 2  # crm.item.* 与 *
+    assert table.scope(items, "t1") != before["t1"]
+    assert table.scope(items, "t2") == before["t2"]  # 其他租户的条目仍有效
+    assert table.scope(catalog, role="admin") != catalog_before  # 不按租户区分的策略全部失效
+    table.invalidate("crm.item.deleted")  # 无租户事件：全部租户失效
+    assert table.scope(items, "t2") != before["t2"]
+    assert table.invalidate("erp.order.created") == 1  # 仅命中 *
+
+
+def test_event_bus_notifies_subscribers(table, monkeypatch):
+    monkeypatch.setattr(event_bus, "_SUBSCRIBERS", [])
+    event_bus.subscribe(table.on_event)
+    event_bus.subscribe(table.on_event)  # 重复订阅只回调一次
+    _, items = table.resolve("crm", "items")
+    before = table.scope(items, "t1")
+    event_bus.accept_event("evt-cache-1", "crm.item.updated", payload={"tenantId": "t1"})
+    after = table.scope(items, "t1")
+    assert after != before
+    event_bus.accept_event("evt-cache-1", "crm.item.updated", payload={"tenantId": "t1"})  # 幂等重复不再失效
+    assert table.scope(items, "t1") == after
+
+
+@pytest.fixture
+def policy_client(table, make_gateway, monkeypatch):
+    monkeypatch.setattr(gateway_http_client, "_get_cache", LRUTTLCache(100, 0.0))
+    monkeypatch.setattr(cache_policy, "_default", table)
+    monkeypatch.setattr(event_bus, "_SUBSCRIBERS", [table.on_event])
+    return make_gateway().test_client()
+
+
+def test_gateway_caches_declared_endpoints_until_event(policy_client):
+    def get(path, tenant):
+        headers = {"Authorization": "Bearer t", "X-Request-ID": "r", "X-Tenant-Id": tenant}
+        with policy_client.get(f"/api/v1/crm/{path}", headers=headers) as r:
+            assert r.status_code == 200
+
+    get("items", "acme")
+    get("items", "acme")
+    assert CellHandler.hits == 1
+    get("items", "globex")  # 按租户区分
+    get("live", "acme")
+    get("live", "acme")  # 未声明接口不缓存
+    assert CellHandler.hits == 4
+    with policy_client.post("/api/events", json={"eventId": "evt-gw-1", "eventType": "crm.item.updated",
+                                                 "data": {"tenantId": "acme"}},
+                            headers={"Authorization": "Bearer t"}) as r:
+        assert r.status_code == 202
+    get("items", "acme")
+    get("items", "globex")
+    assert CellHandler.hits == 5  # 仅 acme 重新回源
+
+
+def test_gateway_subscribes_before_first_get(table, make_gateway, monkeypatch):
+    monkeypatch.setattr(cache_policy, "CONTRACTS_DIR", table.contracts_dir)
+    monkeypatch.setattr(cache_policy, "_default", None)
+    monkeypatch.setattr(event_bus, "_SUBSCRIBERS", [])
+    client = make_gateway().test_client()
+    subscribed = cache_policy._default
+    _, items = subscribed.resolve("crm", "items")
+    before = subscribed.scope(items, "acme")
+    with client.post("/api/events", json={"eventId": "evt-gw-early", "eventType": "crm.item.created",
+                                          "data": {"tenantId": "acme"}}, headers={"Authorization": "Bearer t"}) as r:
+        assert r.status_code == 202
+    assert subscribed.scope(items, "acme") != before  # 未经任何 GET 也已失效
@@ -1,9 +1,10 @@
 """
-熔断器单元测试：状态转换、半开探测、环境变量。
+熔断器单元测试：状态转换、半开探测、环境变量、滚动窗口与慢调用率、细胞并发舱壁。
 """
 from __future__ import annotations
 
 import os
+import threading
 import time
 
 import pytest
@@ -65,3 +66,74 @@ def test_circuit_breaker_registry_returns_same_instance():
     b = reg.get("crm")
     assert a is b
     assert reg.get("erp") is not a
+
+
+def test_rolling_window_expires_old_failures():
+    cb = CircuitBreaker("test-cell", window_sec=0.2, failure_ratio=0.5, min_calls=3, buckets=4)
+    cb.record(success=False)
+    cb.record(success=False)
+    time.sleep(0.3)
+    cb.record(success=True)
+    cb.record(success=True)
+    cb.record(success=False)
+    assert cb.state() == "closed"
+    assert cb.stats()["calls"] == 3
+
+
+def test_circuit_breaker_opens_on_slow_call_rate():
+    cb = CircuitBreaker("test-cell", window_sec=10, failure_ratio=0.5, slow_call_ms=100, slow_call_ratio=0.6, min_calls=4)
+    for ms in (20, 150, 200, 300):
+        cb.record(success=True, duration_ms=ms)
+    assert cb.state() == "open"
+
+
+def test_slow_probe_counts_as_failure_in_half_open():
+    cb = CircuitBreaker("test-cell", window_sec=0.1, failure_ratio=0.5, half_open_probes=1, probe_successes_to_close=1, slow_call_ms=100)
+    cb.record(success=False)
+    cb.record(success=False)
+    time.sleep(0.2)
+    assert cb.allow_request()
+    cb.record(success=True, duration_ms=500)
+    assert cb.state() == "open"
+
+
+def test_bulkhead_rejects_when_full_and_recovers():
+    reg = CircuitBreakerRegistry()
+    bh = reg.bulkhead("crm")
+    bh.max_concurrent = 2
+    assert bh.try_acquire() and bh.try_acquire()
+    assert not bh.try_acquire()
+    assert bh.rejected == 1
+    bh.release()
+    assert bh.try_acquire()
+    assert reg.bulkhead("erp").in_flight == 0
+
+
+def test_gateway_bulkhead_isolates_slow_cell(make_gateway):
+    from .conftest import CellHandler
+
+    breakers = CircuitBreakerRegistry()
+    app = make_gateway(env={"GATEWAY_BULKHEAD_CRM_MAX_CONCURRENT": 1}, circuit_breakers=breakers)
+    CellHandler.delay_sec = 0.3
+    started = threading.Event()
+    results = {}
+
+    def slow_call():
+        started.set()
+        with app.test_client().get("/api/v1/crm/slow", headers={"Authorization": "Bearer t"}) as r:
+            results["first"] = r.status_code
+
+    t = threading.Thread(target=slow_call)
+    t.start()
+    started.wait()
+    deadline = time.time() + 1
+    while breakers.bulkhead("crm").in_flight == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    with app.test_client().get("/api/v1/crm/other", headers={"Authorization": "Bearer t"}) as busy:
+        assert busy.status_code == 503 and busy.get_json()["code"] == "CELL_BUSY"
+    t.join()
+    assert results["first"] == 200
+    assert breakers.bulkhead("crm").in_flight == 0  # 响应关闭后归还名额
+    assert breakers.get("crm").stats()["calls"] == 1  # 舱壁拒绝不计入熔断
+    CellHandler.delay_sec = 0.0
+    assert app.test_client().get("/api/v1/erp/fast", headers={"Authorization": "Bearer t"}).status_code == 200
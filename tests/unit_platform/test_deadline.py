@@ -0,0 +1,86 @@
+"""
+截止时间传递单元测试：客户端提示与路由默认、重试/对冲受剩余预算约束、网关拒绝过期请求并透传、Sync Worker 预算。
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from platform_core.core.gateway import deadline as gateway_deadline
+from platform_core.core.gateway import retry_policy
+
+from .conftest import CellHandler
+
+
+def test_compute_takes_earliest_of_hint_and_route_default(monkeypatch):
+    now = 1_000.0
+    assert gateway_deadline.compute({}, "crm", "items", 30, now=now) == now + 30
+    assert gateway_deadline.compute({"X-Request-Timeout": "500"}, "crm", "items", 30, now=now) == now + 0.5
+    hint = gateway_deadline.header_value(now + 2)
+    assert gateway_deadline.compute({"X-Request-Deadline": hint}, "crm", "items", 30, now=now) == now + 2
+    # 客户端不能把预算放宽到路由默认之外
+    assert gateway_deadline.compute({"X-Request-Timeout": "600000"}, "crm", "items", 30, now=now) == now + 30
+    monkeypatch.setattr(gateway_deadline, "_RULES", [{"cell": "erp", "path": "reports/", "timeoutMs": 60000}])
+    assert gateway_deadline.compute({}, "erp", "reports/monthly", 30, now=now) == now + 60
+    assert gateway_deadline.compute({"X-Request-Deadline": "junk"}, "erp", "orders", 30, now=now) == now + 30
+
+
+def test_retry_controller_respects_remaining_budget():
+    ctl = retry_policy.begin("GET", "dl-cell", "items", 3, deadline=time.time() + 0.5)
+    assert ctl.attempt_timeout(30) <= 0.5
+    assert ctl.backoff(5) <= 0.5
+    assert ctl.retry_status(503, 0)
+    ctl.deadline = time.time() + 0.01  # 不足一次尝试
+    assert not ctl.retry_status(503, 0)
+    assert not ctl.retry_error(ConnectionRefusedError(), 0)
+    ctl.deadline = time.time() - 0.01
+    with pytest.raises(retry_policy.DeadlineExceeded):
+        ctl.attempt_timeout(30)
+    assert retry_policy.begin("GET", "dl-cell", "items", 3).attempt_timeout(30) == 30
+
+
+def test_hedge_suppressed_when_budget_too_small(monkeypatch):
+    ctl = retry_policy.begin("GET", "dl-hedge", "items", 1, deadline=time.time() + 10)
+    monkeypatch.setattr(ctl.latency, "hedge_delay", lambda: 0.2)
+    assert ctl.hedge_delay() == 0.2
+    ctl.deadline = time.time() + 0.21
+    assert ctl.hedge_delay() is None
+
+
+@pytest.fixture
+def forward_client(make_gateway):
+    return make_gateway(env={"GATEWAY_PROXY_RETRY_COUNT": 2}).test_client()
+
+
+def test_gateway_rejects_expired_and_propagates_deadline(forward_client):
+    expired = gateway_deadline.header_value(time.time() - 1)
+    with forward_client.get("/api/v1/crm/items", headers={"Authorization": "Bearer t", "X-Request-Deadline": expired}) as r:
+        assert r.status_code == 504 and r.get_json()["code"] == "DEADLINE_EXCEEDED"
+    assert CellHandler.hits == 0
+    before = time.time()
+    with forward_client.get("/api/v1/crm/items", headers={"Authorization": "Bearer t", "X-Request-Timeout": "5000"}) as r:
+        assert r.status_code == 200
+        forwarded = gateway_deadline.parse(r.get_json()["deadline"])
+    assert before < forwarded <= time.time() + 5
+
+
+def test_gateway_stops_retrying_at_deadline(forward_client):
+    CellHandler.delay_sec = 0.5
+    start = time.perf_counter()
+    with forward_client.get("/api/v1/crm/slow", headers={"Authorization": "Bearer t", "X-Request-Timeout": "200"}) as r:
+        assert r.status_code == 504 and r.get_json()["code"] == "DEADLINE_EXCEEDED"
+    assert time.perf_counter() - start < 0.45
+    assert CellHandler.hits == 1  # 超时后不再重试
+
+
+def test_sync_worker_shares_event_budget(cell_base_url):
+    import platform_core.sync_worker.worker as w
+    code, resp = w._req("GET", f"{cell_base_url}/items")
+    assert code == 200 and 0 < gateway_deadline.parse(resp["deadline"]) - time.time() <= w.REQUEST_TIMEOUT_SEC
+    token = w._deadline.set(time.time() - 1)
+    try:
+        assert w._req("GET", f"{cell_base_url}/items") == (0, {})
+    finally:
+        w._deadline.reset(token)
+    assert CellHandler.hits == 1
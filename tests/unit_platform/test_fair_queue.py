@@ -0,0 +1,135 @@
+"""
+租户加权公平排队单元测试：按套餐权重出队、单租户队列上限、排队超时、协程等待、网关接入。
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from platform_core.core.gateway import fair_queue
+from platform_core.core.tenant.store import TenantStore
+
+
+def _drain_order(sched, waiters):
+    """依次释放名额，记录被唤醒的租户顺序。"""
+    order = []
+    for _ in waiters:
+        with sched._lock:
+            before = {id(w) for w in waiters if w.granted}
+        sched._release()
+        with sched._lock:
+            order += [w.tenant for w in waiters if w.granted and id(w) not in before]
+    return order
+
+
+def test_dequeues_by_weighted_fair_share():
+    sched = fair_queue.FairScheduler(concurrency=1)
+    held = sched.acquire("warmup", 1.0, timeout=0)
+    assert held is not None
+    # 重负载租户 heavy（权重 1）先压入 6 个请求，轻负载 light（权重 2）随后到达 3 个
+    waiters = [sched._enqueue("heavy", 1.0, threading.Event()) for _ in range(6)]
+    waiters += [sched._enqueue("light", 2.0, threading.Event()) for _ in range(3)]
+    order = _drain_order(sched, waiters)
+    # light 虽后到，不必等 heavy 全部出队；按权重 2:1 交错后 heavy 独占剩余名额
+    assert order == ["light", "heavy", "light", "light"] + ["heavy"] * 5
+    assert order.count("heavy") == 6 and order.count("light") == 3
+
+
+def test_per_tenant_queue_bound_and_timeout():
+    sched = fair_queue.FairScheduler(concurrency=1, max_per_tenant=2)
+    held = sched.acquire("a", timeout=0)
+    sched._enqueue("noisy", 1.0, threading.Event())
+    sched._enqueue("noisy", 1.0, threading.Event())
+    with pytest.raises(fair_queue.QueueFull):
+        sched.acquire("noisy", timeout=1)
+    # 其他租户不受 noisy 队列上限影响，仅排队等待（此处超时）
+    start = time.perf_counter()
+    assert sched.acquire("quiet", timeout=0.05) is None
+    assert time.perf_counter() - start < 0.5
+    st = sched.stats()
+    assert st["queued"] == {"noisy": 2}
+    assert st["tenants"]["noisy"]["rejected"] == 1 and st["tenants"]["quiet"]["timeouts"] == 1
+    held.release()
+    held.release()  # 幂等
+    assert sched.stats()["inFlight"] == 1  # 名额转给 noisy 队首
+
+
+def test_acquire_async_waits_without_thread():
+    sched = fair_queue.FairScheduler(concurrency=1)
+
+    async def run():
+        held = await sched.acquire_async("a", timeout=0)
+        task = asyncio.ensure_future(sched.acquire_async("b", 1.0, timeout=2))
+        await asyncio.sleep(0.02)
+        assert not task.done()
+        threading.Thread(target=held.release).start()
+        ticket = await task
+        assert ticket is not None and ticket.waited_ms > 0
+        ticket.release()
+        return sched.stats()["inFlight"]
+
+    assert asyncio.run(run()) == 0
+
+
+def test_plan_weights_from_tenant_store():
+    store = TenantStore()
+    store.create("t-free", "免费", plan="free")
+    store.create("t-ent", "旗舰", plan="enterprise")
+    assert store.weight("t-ent") == 8 * store.weight("t-free")
+    assert store.weight("unknown") == store.weight("default")
+    with pytest.raises(ValueError):
+        store.create("t-bad", "x", plan="gold")
+    store.set_plan("t-free", "professional")
+    assert store.get("t-free")["plan"] == "professional"
+
+
+@pytest.fixture
+def fair_client(make_gateway, monkeypatch):
+    monkeypatch.setattr(fair_queue, "FAIR_QUEUE_TIMEOUT_SEC", 0.05)
+    sched = fair_queue.FairScheduler(concurrency=1, max_per_tenant=1)
+    monkeypatch.setattr(fair_queue, "_schedulers", {"crm": sched})
+    client = make_gateway().test_client()
+    client.scheduler = sched
+    return client
+
+
+def test_gateway_queues_per_tenant(fair_client):
+    headers = {"Authorization": "Bearer t", "X-Tenant-Id": "acme"}
+    with fair_client.get("/api/v1/crm/items", headers=headers) as r:
+        assert r.status_code == 200
+    assert fair_client.scheduler.stats()["inFlight"] == 0  # 响应关闭后归还名额
+    held = fair_client.scheduler.acquire("other", timeout=0)
+    with fair_client.get("/api/v1/crm/items", headers=headers) as r:
+        assert r.status_code == 503 and r.get_json()["code"] == "QUEUE_TIMEOUT"
+    fair_client.scheduler._enqueue("acme", 1.0, threading.Event())
+    with fair_client.get("/api/v1/crm/items", headers=headers) as r:
+        assert r.status_code == 429 and r.get_json()["code"] == "TENANT_QUEUE_FULL"
+    held.release()
+
+
+def test_gateway_queue_is_scoped_per_cell_after_admission(make_gateway, monkeypatch):
+    from platform_core.core.gateway.circuit_breaker import CircuitBreakerRegistry
+    monkeypatch.setattr(fair_queue, "FAIR_QUEUE_TIMEOUT_SEC", 0.05)
+    monkeypatch.setattr(fair_queue, "_schedulers", {})
+    breakers = CircuitBreakerRegistry()
+    app = make_gateway(env={"GATEWAY_BULKHEAD_CRM_MAX_CONCURRENT": 1}, circuit_breakers=breakers)
+    client = app.test_client()
+    crm = fair_queue.get_scheduler("crm")
+    crm.concurrency = 1
+    headers = {"Authorization": "Bearer t", "X-Tenant-Id": "acme"}
+    held = crm.acquire("other", timeout=0)  # crm 名额被慢请求占满
+    with client.get("/api/v1/erp/items", headers=headers) as r:
+        assert r.status_code == 200  # 其他细胞不受影响
+    bulkhead = breakers.bulkhead("crm")
+    with client.get("/api/v1/crm/items", headers=headers) as r:
+        assert r.status_code == 503 and r.get_json()["code"] == "QUEUE_TIMEOUT"
+    assert bulkhead.in_flight == 0  # 排队被拒时归还舱壁名额
+    assert bulkhead.try_acquire()
+    with client.get("/api/v1/crm/items", headers=headers) as r:
+        assert r.get_json()["code"] == "CELL_BUSY"  # 先过舱壁，未进入排队
+    assert crm.stats()["tenants"]["acme"]["timeouts"] == 1
+    bulkhead.release()
+    held.release()
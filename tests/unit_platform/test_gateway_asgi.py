@@ -0,0 +1,180 @@
+"""
+网关 ASGI 引擎单元测试：异步转发、链路头、必填头校验、Flask 路由桥接、并发不占线程、流式转发。
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import time
+
+import pytest
+
+from platform_core.core.gateway.async_http_client import AsyncConnectionPool
+
+from .conftest import CellHandler
+
+
+@pytest.fixture
+def asgi_gateway(make_gateway, cell_base_url):
+    return make_gateway(resolver=lambda c: cell_base_url if c == "crm" else None, asgi=True)
+
+
+async def _call(app, method, path, headers=None, body=b"", query=b"", parts=None):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    chunks = parts or [body]
+    sent = [{"type": "http.request", "body": c, "more_body": i < len(chunks) - 1} for i, c in enumerate(chunks)]
+    out = {"status": None, "headers": {}, "body": b"", "messages": 0}
+
+    async def receive():
+        return sent.pop(0) if sent else {"type": "http.disconnect"}
+
+    async def send(msg):
+        if msg["type"] == "http.response.start":
+            out["status"] = msg["status"]
+            out["headers"] = {k.decode().lower(): v.decode() for k, v in msg["headers"]}
+        else:
+            out["body"] += msg.get("body", b"")
+            out["messages"] += 1
+
+    await app(scope, receive, send)
+    return out
+
+
+def test_asgi_proxy_forwards_get(asgi_gateway):
+    r = asyncio.run(_call(asgi_gateway, "GET", "/api/v1/crm/customers", {"Authorization": "Bearer t", "X-Trace-Id": "tr-1"}, query=b"page=2"))
+    assert r["status"] == 200
+    data = json.loads(r["body"])
+    assert data["path"] == "/customers?page=2"
+    assert data["traceId"] == "tr-1"
+    assert r["headers"]["x-trace-id"] == "tr-1"
+    assert r["headers"]["x-content-type-options"] == "nosniff"
+
+
+def test_asgi_proxy_forwards_post_body(asgi_gateway):
+    headers = {"Authorization": "Bearer t", "Content-Type": "application/json", "X-Request-ID": "r-1"}
+    r = asyncio.run(_call(asgi_gateway, "POST", "/api/v1/crm/customers", headers, body=b'{"name":"a"}'))
+    assert r["status"] == 200
+    assert json.loads(r["body"])["body"] == '{"name":"a"}'
+
+
+def test_asgi_proxy_replays_retried_post(asgi_gateway, monkeypatch):
+    from platform_core.core.gateway import idempotency
+    monkeypatch.setattr(idempotency, "_default", idempotency.IdempotencyCache(ttl_sec=60))
+    headers = {"Authorization": "Bearer t", "Content-Type": "application/json", "X-Request-ID": "r-idem"}
+    first = asyncio.run(_call(asgi_gateway, "POST", "/api/v1/crm/customers", headers, body=b'{"name":"a"}'))
+    retry = asyncio.run(_call(asgi_gateway, "POST", "/api/v1/crm/customers", headers, body=b'{"name":"a"}'))
+    assert CellHandler.hits == 1 and retry["body"] == first["body"]
+    assert retry["headers"]["idempotent-replayed"] == "true"
+    reused = asyncio.run(_call(asgi_gateway, "POST", "/api/v1/crm/customers", headers, body=b'{"name":"b"}'))
+    assert reused["status"] == 422
+
+
+def test_asgi_proxy_missing_headers(asgi_gateway):
+    r = asyncio.run(_call(asgi_gateway, "POST", "/api/v1/crm/customers", {"Content-Type": "application/json"}, body=b"{}"))
+    assert r["status"] == 400
+    assert json.loads(r["body"])["code"] == "MISSING_HEADER"
+
+
+def test_asgi_proxy_unknown_cell(asgi_gateway):
+    r = asyncio.run(_call(asgi_gateway, "GET", "/api/v1/erp/orders", {"Authorization": "Bearer t"}))
+    assert r["status"] == 503
+    assert json.loads(r["body"])["code"] == "CELL_NOT_FOUND"
+
+
+def test_asgi_bridges_flask_routes(asgi_gateway):
+    r = asyncio.run(_call(asgi_gateway, "GET", "/health"))
+    assert r["status"] == 200
+    assert json.loads(r["body"])["status"] == "up"
+    r = asyncio.run(_call(asgi_gateway, "POST", "/api/auth/login", {"Content-Type": "application/json"}, body=b'{"username":"admin","password":"admin"}'))
+    assert r["status"] == 200
+    assert json.loads(r["body"])["token"]
+
+
+def test_asgi_concurrent_slow_upstream(asgi_gateway):
+    """慢细胞下大量并发：总耗时接近单次延迟，而非按线程数分批。"""
+    CellHandler.delay_sec = 0.3
+
+    async def _many():
+        return await asyncio.gather(*[
+            _call(asgi_gateway, "GET", "/api/v1/crm/slow", {"Authorization": "Bearer t"}) for _ in range(100)
+        ])
+
+    start = time.perf_counter()
+    results = asyncio.run(_many())
+    elapsed = time.perf_counter() - start
+    assert all(r["status"] == 200 for r in results)
+    assert elapsed < 3.0
+
+
+def test_asgi_gateway_rejections_do_not_trip_breaker(make_gateway):
+    from platform_core.core.gateway.circuit_breaker import CircuitBreakerRegistry
+    breakers = CircuitBreakerRegistry()
+    app = make_gateway(env={"GATEWAY_BULKHEAD_CRM_MAX_CONCURRENT": 1}, asgi=True, circuit_breakers=breakers)
+    CellHandler.delay_sec = 0.3
+
+    async def _many():
+        return await asyncio.gather(*[
+            _call(app, "GET", "/api/v1/crm/slow", {"Authorization": "Bearer t"}) for _ in range(5)
+        ])
+
+    codes = sorted(json.loads(r["body"]).get("code", "") for r in asyncio.run(_many()) if r["status"] == 503)
+    assert codes == ["CELL_BUSY"] * 4
+    assert breakers.get("crm").state() == "closed" and breakers.get("crm").stats()["calls"] == 1
+
+def test_asgi_streams_export_response(asgi_gateway):
+    headers = {"Authorization": "Bearer t"}
+    r = asyncio.run(_call(asgi_gateway, "GET", "/api/v1/crm/export/orders", headers, query=b"size=300000"))
+    assert r["status"] == 200 and r["body"] == b"x" * 300000
+    assert "content-length" not in r["headers"] and r["messages"] > 2  # 按块发送
+    r = asyncio.run(_call(asgi_gateway, "GET", "/api/v1/crm/export/orders", headers, query=b"size=100000&gzip=1"))
+    assert r["body"] == b"x" * 100000  # 客户端不接受 gzip：增量解压
+    r = asyncio.run(_call(asgi_gateway, "GET", "/api/v1/crm/export/orders", {**headers, "Accept-Encoding": "gzip"},
+                          query=b"size=100000&gzip=1"))
+    assert r["headers"]["content-encoding"] == "gzip" and gzip.decompress(r["body"]) == b"x" * 100000
+    r = asyncio.run(_call(asgi_gateway, "GET", "/api/v1/crm/export/orders", {**headers, "Accept-Encoding": "gzip;q=0"},
+                          query=b"size=100000&gzip=1"))
+    assert "content-encoding" not in r["headers"] and r["body"] == b"x" * 100000
+
+
+def test_asgi_streams_chunked_upload(asgi_gateway):
+    headers = {"Authorization": "Bearer t", "Content-Type": "application/json", "X-Request-ID": "up-1",
+               "Transfer-Encoding": "chunked"}
+    parts = [b'{"rows":[', b"1,2,", b"3]}"]
+    r = asyncio.run(_call(asgi_gateway, "POST", "/api/v1/crm/import", headers, parts=parts))
+    assert r["status"] == 200
+    assert json.loads(r["body"])["body"] == '{"rows":[1,2,3]}'
+
+
+def test_pool_reconnects_when_reused_connection_was_closed():
+    async def scenario():
+        conns = []
+
+        async def handle(reader, writer):
+            conns.append(writer)
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+            # 每条连接只服务一次：收到下一个请求时不响应直接关闭（模拟对端回收空闲连接）
+            await reader.readuntil(b"\r\n\r\n")
+            writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        url = "http://127.0.0.1:%d/x" % server.sockets[0].getsockname()[1]
+        pool = AsyncConnectionPool()
+        async with server:
+            first = await pool.request("GET", url, {}, None, 2)
+            second = await pool.request("GET", url, {}, None, 2)
+        return first, second, len(conns)
+
+    first, second, opened = asyncio.run(scenario())
+    assert (first.status, second.status, second.body) == (200, 200, b"ok")
+    assert opened == 2  # 复用的旧连接被丢弃后新建一次
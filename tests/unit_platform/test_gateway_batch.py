@@ -0,0 +1,118 @@
+"""
+网关批量接口单元测试：请求体校验、并发扇出、逐项状态码、子请求超时、逐项限流、熔断与租户配额。
+"""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from platform_core.core.gateway import batch as gateway_batch
+from platform_core.core.gateway import rate_limit as gateway_rate_limit
+from platform_core.core.gateway.circuit_breaker import CircuitBreakerRegistry
+
+from .conftest import CellHandler
+
+_HEADERS = {"Authorization": "Bearer t", "Content-Type": "application/json", "X-Request-ID": "batch-1"}
+
+
+def test_parse_batch_validation():
+    items, err = gateway_batch.parse_batch({"requests": [
+        {"id": "a", "path": "/api/v1/crm/customers?page=2"},
+        {"method": "post", "cell": "erp", "path": "/orders", "body": {"n": 1}, "headers": {"Authorization": "x"}},
+        {"path": "/api/v1/wms/stock", "query": {"sku": ["1", "2"]}, "timeoutMs": 50},
+    ]}, default_timeout=5)
+    assert err == ""
+    a, b, c = items
+    assert (a.id, a.method, a.cell, a.path, a.query_string) == ("a", "GET", "crm", "customers", "page=2")
+    assert (b.id, b.method, b.cell, b.path, b.body) == ("1", "POST", "erp", "orders", b'{"n": 1}')
+    assert b.headers == {"Content-Type": "application/json"}  # 子请求不可覆盖认证头
+    assert c.query_string == "sku=1&sku=2" and c.timeout == 0.05
+    assert gateway_batch.parse_batch({"requests": []})[1]
+    assert gateway_batch.parse_batch({"requests": [{"path": "/api/v1/crm"}]})[1]
+    assert gateway_batch.parse_batch({"requests": [{"cell": "crm", "path": "x", "method": "TRACE"}]})[1]
+    assert gateway_batch.parse_batch({"requests": [{"id": 1, "cell": "a", "path": "x"}] * 2})[1]
+    assert gateway_batch.parse_batch({"requests": [{"cell": "a", "path": "x"}] * 3}, max_items=2)[1]
+
+
+@pytest.fixture
+def batch_client(make_gateway, cell_base_url):
+    breakers = CircuitBreakerRegistry()
+    app = make_gateway(resolver=lambda c: None if c == "ghost" else cell_base_url,
+                       env={"GATEWAY_PROXY_RETRY_COUNT": 0}, circuit_breakers=breakers)
+    client = app.test_client()
+    client.breakers = breakers
+    return client
+
+
+def _post(client, requests):
+    with client.post("/api/v1/batch", json={"requests": requests}, headers=_HEADERS) as r:
+        return r.status_code, r.get_json()
+
+
+def test_batch_preserves_per_item_status(batch_client):
+    status, data = _post(batch_client, [
+        {"id": "ok", "path": "/api/v1/crm/customers", "query": {"page": 1}},
+        {"id": "missing", "path": "/api/v1/crm/customers/9?status=404"},
+        {"id": "create", "method": "POST", "path": "/api/v1/erp/orders", "body": {"sku": "A"}},
+        {"id": "ghost", "path": "/api/v1/ghost/items"},
+    ])
+    assert status == 200
+    by_id = {r["id"]: r for r in data["responses"]}
+    assert [r["id"] for r in data["responses"]] == ["ok", "missing", "create", "ghost"]
+    assert by_id["ok"]["status"] == 200 and by_id["ok"]["body"]["path"] == "/customers?page=1"
+    assert by_id["missing"]["status"] == 404
+    assert by_id["create"]["status"] == 200 and by_id["create"]["body"]["body"] == '{"sku": "A"}'
+    assert by_id["ghost"]["status"] == 503 and by_id["ghost"]["body"]["code"] == "CELL_NOT_FOUND"
+    assert batch_client.breakers.get("ghost").stats()["calls"] == 0  # 未发往细胞的子请求不计入熔断
+    assert by_id["ok"]["body"]["traceId"] == by_id["create"]["body"]["traceId"] != ""
+
+
+def test_batch_fans_out_concurrently_with_item_timeout(batch_client):
+    CellHandler.delay_sec = 0.3
+    start = time.perf_counter()
+    status, data = _post(batch_client, [{"id": str(i), "path": f"/api/v1/crm/items/{i}"} for i in range(4)]
+                         + [{"id": "slow", "path": "/api/v1/crm/items/x", "timeoutMs": 100}])
+    elapsed = time.perf_counter() - start
+    assert status == 200 and elapsed < 1.0  # 串行需 1.5s
+    statuses = {r["id"]: r["status"] for r in data["responses"]}
+    assert statuses == {"0": 200, "1": 200, "2": 200, "3": 200, "slow": 504}
+
+
+def test_batch_applies_rate_limit_and_breaker_per_item(batch_client, monkeypatch):
+    allowed = iter([True, True, True, False])  # 批量请求本身在 before_request 计一次
+    monkeypatch.setattr(gateway_rate_limit, "allow_request", lambda ip, token: (next(allowed, False), "ip"))
+    batch_client.breakers.get("erp")._open(time.monotonic())
+    status, data = _post(batch_client, [
+        {"id": "a", "path": "/api/v1/crm/a"},
+        {"id": "b", "path": "/api/v1/erp/b"},
+        {"id": "c", "path": "/api/v1/crm/c"},
+    ])
+    assert status == 200
+    codes = [(r["status"], r["body"].get("code")) for r in data["responses"]]
+    assert codes == [(200, None), (503, "CIRCUIT_OPEN"), (429, "RATE_LIMIT")]
+    assert batch_client.breakers.bulkhead("crm").in_flight == 0
+
+
+def test_batch_requires_auth_once_and_valid_body(batch_client):
+    with batch_client.post("/api/v1/batch", json={"requests": []}, headers={"X-Request-ID": "r"}) as r:
+        assert r.status_code == 400 and r.get_json()["code"] == "MISSING_HEADER"
+    with batch_client.post("/api/v1/batch", json={"items": []}, headers=_HEADERS) as r:
+        assert r.status_code == 400 and r.get_json()["code"] == "INVALID_BATCH"
+
+
+def test_batch_charges_tenant_quota_per_item_only(make_gateway, monkeypatch):
+    from platform_core.core.tenant import quota as tenant_quota
+    from platform_core.core.tenant import store as tenant_store
+    store, quota = tenant_store.TenantStore(), tenant_quota.TenantQuota()
+    store.create("acme", "Acme")
+    quota.set_quota("acme", requests_per_min=3)
+    monkeypatch.setattr(tenant_store, "_store", store)
+    monkeypatch.setattr(tenant_quota, "_quota", quota)
+    client = make_gateway(env={"GATEWAY_VALIDATE_TENANT": 1}).test_client()
+    headers = {**_HEADERS, "X-Tenant-Id": "acme"}
+    with client.post("/api/v1/batch", json={"requests": [{"cell": "crm", "path": p} for p in "abc"]}, headers=headers) as r:
+        assert [i["status"] for i in r.get_json()["responses"]] == [200, 200, 200]  # 信封不占请求量
+    with client.get("/api/v1/crm/d", headers=headers) as r:
+        assert r.status_code == 429 and r.get_json()["code"] == "QUOTA_EXCEEDED"
+    assert quota.usage("acme")["inFlight"] == 0
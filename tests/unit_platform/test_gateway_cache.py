@@ -0,0 +1,235 @@
+"""
+网关 GET 缓存单元测试：O(1) LRU 淘汰、TTL 与陈旧窗口、单飞合并、stale-while-revalidate（排队中的刷新去重）、
+压缩透传与缓存压缩变体、ETag 与条件请求。
+"""
+from __future__ import annotations
+
+import gzip
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from platform_core.core.gateway import http_client as gateway_http_client
+from platform_core.core.gateway.get_cache import LRUTTLCache, Revalidator, SingleFlight, etag_matches, variant_etag
+
+from .conftest import CellHandler
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUTTLCache(max_entries=2, ttl_sec=60)
+    cache.set("a", 200, {}, b"a")
+    cache.set("b", 200, {}, b"b")
+    assert cache.get("a") is not None  # a 变为最近使用
+    cache.set("c", 200, {}, b"c")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert len(cache) == 2
+
+
+def test_ttl_and_stale_window():
+    cache = LRUTTLCache(max_entries=10, ttl_sec=0.05, stale_sec=0.2)
+    cache.set("k", 200, {"Content-Type": "application/json"}, b"{}")
+    (status, headers, body), stale = cache.get("k")
+    assert status == 200 and not stale and headers["Content-Type"] == "application/json"
+    time.sleep(0.08)
+    assert cache.get("k") is None
+    (_, _, body), stale = cache.get("k", allow_stale=True)
+    assert stale and body == b"{}"
+    time.sleep(0.25)
+    assert cache.get("k", allow_stale=True) is None
+    assert len(cache) == 0
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    sf = SingleFlight()
+    calls = []
+    barrier = threading.Barrier(20)
+    results = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.1)
+        return "v"
+
+    def worker():
+        barrier.wait()
+        results.append(sf.do("k", fn))
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["v"] * 20
+    assert len(calls) == 1
+
+
+def test_revalidator_dedupes_queued_refreshes():
+    revalidator = Revalidator(SingleFlight(), max_workers=1)
+    gate = threading.Event()
+    calls = []
+    revalidator.submit("busy", gate.wait)  # 占满线程池，后续刷新只能排队
+    try:
+        submitted = [revalidator.submit("k", lambda: calls.append(1)) for _ in range(50)]
+    finally:
+        gate.set()
+    assert submitted.count(True) == 1  # 排队中的同 key 刷新不重复提交
+    deadline = time.time() + 2
+    while not calls and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert calls == [1]
+    assert revalidator.submit("k", lambda: calls.append(1))  # 完成后可再次刷新
+
+
+@pytest.fixture
+def cached_forward(monkeypatch):
+    monkeypatch.setattr(gateway_http_client, "_CACHE_TTL_SEC", 60.0)
+    cache = LRUTTLCache(100, 60.0, 30.0)
+    monkeypatch.setattr(gateway_http_client, "_get_cache", cache)
+    return cache
+
+
+def test_forward_request_concurrent_misses_hit_upstream_once(cell_base_url, cached_forward):
+    CellHandler.delay_sec = 0.2
+    barrier = threading.Barrier(10)
+    statuses = []
+
+    def worker():
+        barrier.wait()
+        status, _, _ = gateway_http_client.forward_request(cell_base_url, "dashboard/summary", "GET", None, {}, cell="crm")
+        statuses.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert statuses == [200] * 10
+    assert CellHandler.hits == 1
+
+
+def test_forward_request_serves_stale_and_revalidates(cell_base_url, monkeypatch):
+    monkeypatch.setattr(gateway_http_client, "_CACHE_TTL_SEC", 0.05)
+    monkeypatch.setattr(gateway_http_client, "_get_cache", LRUTTLCache(100, 0.05, 30.0))
+    gateway_http_client.forward_request(cell_base_url, "board", "GET", None, {}, cell="crm")
+    assert CellHandler.hits == 1
+    time.sleep(0.1)
+    CellHandler.delay_sec = 0.3
+    start = time.perf_counter()
+    status, _, _ = gateway_http_client.forward_request(cell_base_url, "board", "GET", None, {}, cell="crm")
+    assert status == 200
+    assert time.perf_counter() - start < 0.2  # 陈旧值立即返回，不等待上游
+    deadline = time.time() + 2
+    while CellHandler.hits < 2 and time.time() < deadline:
+        time.sleep(0.05)
+    assert CellHandler.hits == 2
+
+
+@pytest.fixture
+def compress_calls(monkeypatch):
+    """记录网关侧 gzip.compress 调用（模拟细胞自身的压缩不计入）。"""
+    calls = []
+
+    def counting(data, compresslevel=9):
+        calls.append(compresslevel)
+        return gzip.compress(data, compresslevel=compresslevel)
+
+    monkeypatch.setattr(gateway_http_client, "gzip", SimpleNamespace(compress=counting, decompress=gzip.decompress))
+    return calls
+
+
+def test_compression_policy():
+    hc = gateway_http_client
+    assert hc.accepts_gzip("br, gzip;q=0.5") and hc.accepts_gzip("*")
+    assert not hc.accepts_gzip("gzip;q=0") and not hc.accepts_gzip("identity")
+    assert hc.compress_level("application/json", 10) == 0
+    assert hc.compress_level("image/png", 100000) == 0
+    assert hc.compress_level("application/json", 100000) == hc._COMPRESS_LEVEL
+    assert hc.compress_level("text/csv", hc._COMPRESS_LARGE_BYTES) == hc._COMPRESS_LEVEL_LARGE
+
+
+def test_gzip_upstream_passed_through_without_recompress(cell_base_url, compress_calls):
+    path, qs = "orders/export", "size=50000&gzip=1"
+    status, headers, body = gateway_http_client.forward_request(
+        cell_base_url, path, "GET", None, {}, cell="crm", query_string=qs, use_cache=False,
+        client_accept_encoding="gzip, deflate",
+    )
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == b"x" * 50000
+    status, headers, body = gateway_http_client.forward_request(
+        cell_base_url, path, "GET", None, {"Accept-Encoding": "gzip"}, cell="crm", query_string=qs,
+        use_cache=False, client_accept_encoding="identity",
+    )
+    assert "Content-Encoding" not in headers and body == b"x" * 50000
+    assert compress_calls == []
+
+
+def test_cached_get_compressed_once(cell_base_url, cached_forward, compress_calls):
+    path = "reports/" + "a" * 400
+    for _ in range(5):
+        status, headers, body = gateway_http_client.forward_request(
+            cell_base_url, path, "GET", None, {}, cell="crm", client_accept_encoding="gzip",
+        )
+        assert status == 200 and headers["Content-Encoding"] == "gzip"
+        assert path in gzip.decompress(body).decode()
+    _, headers, body = gateway_http_client.forward_request(
+        cell_base_url, path, "GET", None, {}, cell="crm", client_accept_encoding="",
+    )
+    assert "Content-Encoding" not in headers and path in body.decode()
+    assert CellHandler.hits == 1
+    assert compress_calls == [gateway_http_client._COMPRESS_CACHE_LEVEL]
+
+
+def test_etag_matching_rules():
+    assert variant_etag('"abc"', "gzip") == '"abc-gzip"'
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches('"abc"', '"abc-gzip"')  # 编码变体视为同一表示
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"') and not etag_matches('"abc"', "")
+
+
+def test_cached_get_answers_if_none_match_with_304(cell_base_url, cached_forward):
+    hc = gateway_http_client
+    status, headers, body = hc.forward_request(cell_base_url, "items", "GET", None, {}, cell="crm")
+    assert status == 200 and headers["ETag"] == hc.strong_etag(body)
+    status, headers_304, body = hc.forward_request(
+        cell_base_url, "items", "GET", None, {}, cell="crm", client_if_none_match=headers["ETag"],
+    )
+    assert status == 304 and body == b"" and headers_304["ETag"] == headers["ETag"] and "Content-Type" not in headers_304
+    path = "reports/" + "a" * 400
+    _, gz_headers, _ = hc.forward_request(cell_base_url, path, "GET", None, {}, cell="crm", client_accept_encoding="gzip")
+    assert gz_headers["Content-Encoding"] == "gzip" and gz_headers["ETag"].endswith('-gzip"')
+    status, _, _ = hc.forward_request(cell_base_url, path, "GET", None, {}, cell="crm",
+                                      client_accept_encoding="gzip", client_if_none_match=gz_headers["ETag"])
+    assert status == 304
+    assert CellHandler.hits == 2
+
+
+def test_stale_entry_revalidated_with_conditional_request(cell_base_url, monkeypatch):
+    hc = gateway_http_client
+    monkeypatch.setattr(hc, "_CACHE_TTL_SEC", 0.05)
+    cache = LRUTTLCache(100, 0.05, 30.0)
+    monkeypatch.setattr(hc, "_get_cache", cache)
+    _, headers, body = hc.forward_request(cell_base_url, "board", "GET", None, {}, cell="crm", query_string="etag=1")
+    etag = headers["ETag"]  # 上游强 ETag 原样沿用
+    time.sleep(0.1)
+    hc.forward_request(cell_base_url, "board", "GET", None, {}, cell="crm", query_string="etag=1")
+    deadline = time.time() + 2
+    while cache.get(hc._cache_key("crm", "board", "etag=1")) is None and time.time() < deadline:
+        time.sleep(0.01)
+    # 细胞以 304 确认未变化：条目恢复新鲜，内容与 ETag 不变
+    assert CellHandler.hits == 2
+    (status, cached_headers, cached_body), stale = cache.get(hc._cache_key("crm", "board", "etag=1"))
+    assert status == 200 and not stale and cached_body == body and cached_headers["ETag"] == etag
+
+
+def test_uncached_get_forwards_if_none_match(cell_base_url):
+    hc = gateway_http_client
+    _, headers, _ = hc.forward_request(cell_base_url, "items", "GET", None, {}, cell="crm", query_string="etag=1",
+                                       use_cache=False)
+    status, _, body = hc.forward_request(cell_base_url, "items", "GET", None, {}, cell="crm", query_string="etag=1",
+                                         use_cache=False, client_if_none_match=headers["ETag"])
+    assert status == 304 and body == b""
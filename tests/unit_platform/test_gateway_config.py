@@ -1,5 +1,5 @@
 """
-网关路由配置单元测试：load_routes、文件解析、环境变量。
+网关路由配置单元测试：load_routes、文件解析、环境变量、预编译路由表热加载。
 """
 from __future__ import annotations
 
@@ -7,6 +7,7 @@ import json
 import os
 import sys
 import tempfile
+import time
 
 import pytest
 
@@ -68,3 +69,39 @@ def test_load_routes_from_yaml_file():
         assert "erp" in routes
     finally:
         os.unlink(path)
+
+
+def test_route_table_hot_reload(monkeypatch, tmp_path):
+    for k in list(os.environ.keys()):
+        if k.startswith("CELL_") and k.endswith("_URL"):
+            monkeypatch.delenv(k, raising=False)
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({"routes": {"crm": "http://crm:5001"}}), encoding="utf-8")
+    monkeypatch.setattr(gateway_config, "CONFIG_PATH", str(path))
+    table = gateway_config.RouteTable(watch_interval_sec=0)
+    assert table.get("crm") == "http://crm:5001" and table.get("erp") is None
+    with pytest.raises(TypeError):
+        table.snapshot["erp"] = "x"  # 快照只读
+    assert not table.check()  # 未变化不重新编译
+    path.write_text(json.dumps({"routes": {"crm": "http://crm:5001", "erp": "http://erp:5002"}}), encoding="utf-8")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert table.check()
+    assert table.get("erp") == "http://erp:5002" and table.version == 2
+    path.write_text("{not json", encoding="utf-8")
+    assert not table.check()  # 解析失败保留旧快照
+    assert table.get("erp") == "http://erp:5002"
+
+
+def test_route_table_watcher_thread(monkeypatch, tmp_path):
+    monkeypatch.delenv("CELL_OA_URL", raising=False)
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps({"routes": {"oa": "http://oa:1"}}), encoding="utf-8")
+    monkeypatch.setattr(gateway_config, "CONFIG_PATH", str(path))
+    table = gateway_config.RouteTable(watch_interval_sec=0.02)
+    table.start()
+    path.write_text(json.dumps({"routes": {"oa": "http://oa:2"}}), encoding="utf-8")
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    deadline = time.time() + 2
+    while table.get("oa") != "http://oa:2" and time.time() < deadline:
+        time.sleep(0.02)
+    assert table.get("oa") == "http://oa:2"
@@ -0,0 +1,108 @@
+"""
+网关请求流水线单元测试：启动期配置快照、按开关编译阶段、请求级身份只解析一次、阶段计时与 Server-Timing、监控异步上报。
+"""
+from __future__ import annotations
+
+from platform_core.core.gateway import rate_limit as gateway_rate_limit
+from platform_core.core.gateway.pipeline import GatewayConfig, Pipeline, RequestPrincipal
+
+
+def test_config_snapshot_and_stage_compilation(monkeypatch):
+    monkeypatch.setattr(gateway_rate_limit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setenv("GATEWAY_APP_KEYS", "crm:k1")
+    from platform_core.core.gateway.app import create_app
+    app = create_app(registry_resolver=lambda c: "http://crm:8000")
+    config = app.extensions["gateway_config"]
+    assert not config.real_forward and dict(config.app_keys) == {"k1": "crm"}
+    names = app.extensions["gateway_pipeline"].stage_names
+    assert "app_key" in names and "tenant" not in names and "apm_log" not in names
+    # 快照之后修改环境变量不影响已创建的应用
+    monkeypatch.setenv("USE_REAL_FORWARD", "1")
+    with app.test_client() as c:
+        with c.get("/api/v1/crm/customers", headers={"Authorization": "Bearer t"}) as r:
+            assert r.status_code == 200 and r.get_json() == {"data": [], "total": 0}  # 仍为模拟响应
+        with c.get("/api/v1/crm/customers", headers={"Authorization": "Bearer t", "X-App-Key": "bad"}) as r:
+            assert r.status_code == 401
+    assert GatewayConfig.from_env({"GATEWAY_PROXY_RETRY_COUNT": "-1"}).proxy_retry_count == 0
+
+
+def test_principal_resolved_once_per_request(gateway_client, gateway_app):
+    with gateway_client.post("/api/auth/login", json={"username": "admin", "password": "admin"}) as r:
+        token = r.get_json()["token"]
+    store = gateway_app.extensions["gateway_token_store"]
+    calls = []
+    original = store.get
+
+    def counting_get(t):
+        calls.append(t)
+        return original(t)
+
+    store.get = counting_get
+    try:
+        with gateway_client.get("/api/admin/routes", headers={"Authorization": f"Bearer {token}"}) as r:
+            assert r.status_code == 200
+    finally:
+        del store.get
+    assert calls == [token]  # 管理端鉴权与审计共用一次解析
+    principal = RequestPrincipal(None, "Basic abc")
+    assert principal.token == "" and principal.username == ""
+
+
+def test_stage_timings_and_server_timing(monkeypatch):
+    monkeypatch.setenv("GATEWAY_SERVER_TIMING", "1")
+    monkeypatch.setattr(gateway_rate_limit, "RATE_LIMIT_ENABLED", False)
+    emitted = []
+    from platform_core.core.gateway.app import create_app
+    app = create_app(registry_resolver=lambda c: "http://crm:8000", monitor_emit=lambda *a: emitted.append(a))
+    with app.test_client() as c:
+        with c.post("/api/auth/login", json={"username": "admin", "password": "admin"}) as r:
+            token = r.get_json()["token"]
+        with c.get("/api/v1/crm/customers", headers={"Authorization": "Bearer t", "X-Trace-Id": "tr-p"}) as r:
+            assert r.status_code == 200
+            timing = r.headers["Server-Timing"]
+            assert "gw-trace;dur=" in timing and "gw-release;dur=" in timing
+        with c.get("/api/admin/gateway/pipeline", headers={"Authorization": f"Bearer {token}"}) as r:
+            stats = r.get_json()
+    assert stats["requests"] == 2 and stats["before"][0] == "trace" and "monitor" in stats["after"]
+    assert stats["config"]["server_timing"] is True
+    assert app.extensions["gateway_monitor"].flush()
+    assert emitted == [("tr-p", "crm", "/api/v1/crm/customers", 200, emitted[0][4])]
+
+
+def test_pipeline_short_circuits():
+    seen = []
+
+    class Ctx:
+        pass
+
+    pipeline = Pipeline([("a", lambda: seen.append("a")), ("b", lambda: "denied"), ("c", lambda: seen.append("c"))],
+                        [("z", lambda resp, ms: seen.append("z"))])
+    ctx = Ctx()
+    assert pipeline.run_before(ctx) == "denied"
+    assert seen == ["a"] and [n for n, _ in ctx.stage_timings] == ["a", "b"]
+    stats = pipeline.stats()
+    assert stats["requests"] == 0
+
+
+def test_async_monitor_keeps_span_id(monkeypatch):
+    monkeypatch.setattr(gateway_rate_limit, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setenv("GATEWAY_SIGNING_SECRET", "s3cret")
+    from platform_core.core.gateway.app import create_app
+    from platform_core.core.governance.client import create_emit_with_ingest
+
+    class _Exporter:
+        spans = []
+
+        def submit(self, span):
+            self.spans.append(span)
+
+    exporter = _Exporter()
+    app = create_app(registry_resolver=lambda c: "http://crm:8000",
+                     monitor_emit=create_emit_with_ingest(exporter=exporter))
+    assert app.extensions["gateway_config"].signing_secret == b"s3cret"
+    with app.test_client() as c:
+        with c.get("/api/v1/crm/customers", headers={"Authorization": "Bearer t"}) as r:
+            span_id = r.headers["X-Span-Id"]
+    assert app.extensions["gateway_monitor"].flush()
+    # 回调在后台线程执行，span_id 随参数传入而非读取请求上下文
+    assert span_id and exporter.spans[0]["span_id"] == span_id
@@ -0,0 +1,78 @@
+"""
+网关流式转发单元测试：导出类响应分块透传、gzip 透传/解压、大请求体上传、urllib 回退路径。
+"""
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+
+from platform_core.core.gateway import http_client as gateway_http_client
+
+
+@pytest.fixture
+def forward_client(make_gateway):
+    app = make_gateway()
+    app.config["TESTING"] = True
+    with app.test_client() as c:
+        yield c
+
+
+def test_should_stream_rules():
+    assert gateway_http_client.should_stream("export/orders", None, False)
+    assert gateway_http_client.should_stream("patients/export", None, False)
+    assert gateway_http_client.should_stream("orders", None, True)
+    assert gateway_http_client.should_stream("orders", gateway_http_client.STREAM_MIN_UPLOAD_BYTES, False)
+    assert not gateway_http_client.should_stream("orders", 100, False)
+
+
+def test_stream_export_response(forward_client):
+    r = forward_client.get("/api/v1/erp/export/orders?size=300000", headers={"Authorization": "Bearer t"})
+    assert r.status_code == 200
+    assert r.is_streamed
+    assert len(r.data) == 300000
+    assert r.headers.get("Content-Type", "").startswith("text/csv")
+    assert "X-Trace-Id" in r.headers
+
+
+def test_stream_gzip_passthrough(forward_client):
+    r = forward_client.get(
+        "/api/v1/erp/export/orders?size=100000&gzip=1",
+        headers={"Authorization": "Bearer t", "Accept-Encoding": "gzip"},
+    )
+    assert r.status_code == 200
+    assert r.headers.get("Content-Encoding") == "gzip"
+    assert gzip.decompress(r.data) == b"x" * 100000
+    for refused in ("gzip;q=0", "identity, gzip;q=0"):
+        r = forward_client.get("/api/v1/erp/export/orders?size=100000&gzip=1",
+                               headers={"Authorization": "Bearer t", "Accept-Encoding": refused})
+        assert "Content-Encoding" not in r.headers and r.data == b"x" * 100000
+
+
+def test_gunzip_chunks_incremental():
+    raw = b"abc" * 50000
+    comp = gzip.compress(raw)
+    parts = [comp[i:i + 1000] for i in range(0, len(comp), 1000)]
+    assert b"".join(gateway_http_client._gunzip_chunks(iter(parts))) == raw
+
+
+def test_stream_large_upload(forward_client):
+    body = b"y" * (gateway_http_client.STREAM_MIN_UPLOAD_BYTES + 10)
+    r = forward_client.post(
+        "/api/v1/erp/import",
+        data=body,
+        headers={"Authorization": "Bearer t", "Content-Type": "application/octet-stream", "X-Request-ID": "up-1"},
+    )
+    assert r.status_code == 200
+    assert json.loads(r.data)["bodyLength"] == len(body)
+
+
+def test_stream_urllib_fallback(forward_client, monkeypatch):
+    monkeypatch.setattr(gateway_http_client, "_pool", False)
+    r = forward_client.get("/api/v1/his/patients/export?size=50000", headers={"Authorization": "Bearer t"})
+    assert r.status_code == 200
+    assert r.data == b"x" * 50000
+    r = forward_client.get("/api/v1/his/patients/export?size=50000&gzip=1",
+                           headers={"Authorization": "Bearer t", "Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in r.headers and r.data == b"x" * 50000
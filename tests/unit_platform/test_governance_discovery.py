@@ -0,0 +1,85 @@
+"""
+治理中心发现缓存单元测试：快照版本与长轮询、网关本地缓存订阅变更、治理中心不可达时沿用 last-known-good。
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+from platform_core.core.governance import app as governance_app_module
+from platform_core.core.governance.client import DiscoveryCache, create_resolver_with_fallback
+from platform_core.core.governance.store import GovernanceStore
+
+
+def test_store_version_bumps_only_on_change():
+    store = GovernanceStore()
+    v0, _ = store.snapshot()
+    store.register("crm", "http://crm:8001/")
+    v1, cells = store.snapshot()
+    assert v1 > v0 and cells == {"crm": "http://crm:8001"}
+    store.register("crm", "http://crm:8001")
+    store.set_health("crm", True)
+    assert store.snapshot()[0] == v1
+    store.set_health("crm", False)
+    v2, cells = store.snapshot()
+    assert v2 > v1 and cells == {}
+
+
+def test_wait_for_change_wakes_on_register():
+    store = GovernanceStore()
+    v0, _ = store.snapshot()
+    threading.Timer(0.05, lambda: store.register("erp", "http://erp:8002")).start()
+    start = time.perf_counter()
+    version, cells = store.wait_for_change(v0, timeout=2)
+    assert time.perf_counter() - start < 1
+    assert version > v0 and cells == {"erp": "http://erp:8002"}
+
+
+@pytest.fixture
+def governance(monkeypatch):
+    store = GovernanceStore()
+    monkeypatch.setattr(governance_app_module, "_store", store)
+    server = make_server("127.0.0.1", 0, governance_app_module.app, threaded=True)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield store, f"http://127.0.0.1:{server.server_port}", server
+    server.shutdown()
+
+
+def test_discovery_cache_follows_changes_and_keeps_last_known_good(governance):
+    store, base, server = governance
+    store.register("crm", "http://crm:8001")
+    cache = DiscoveryCache(base=base, wait_sec=2, timeout=1)
+    assert cache.resolve("crm") == "http://crm:8001"  # 首次同步
+    cache.start()
+    store.register("erp", "http://erp:8002")
+    deadline = time.time() + 3
+    while cache.resolve("erp") is None and time.time() < deadline:
+        time.sleep(0.02)
+    assert cache.resolve("erp") == "http://erp:8002"
+    server.shutdown()
+    server.server_close()
+    time.sleep(0.2)
+    assert cache.resolve("crm") == "http://crm:8001"  # 治理中心不可达：沿用最后快照
+    cache.stop()
+
+
+def test_resolver_falls_back_to_env_when_cell_unknown(governance):
+    store, base, _ = governance
+    store.register("crm", "http://crm:8001")
+    cache = DiscoveryCache(base=base, wait_sec=0, timeout=1)
+    resolve = create_resolver_with_fallback(lambda c: f"http://{c}-env:9000", cache=cache)
+    assert resolve("crm") == "http://crm:8001"
+    assert resolve("wms") == "http://wms-env:9000"
+
+
+def test_unreachable_governance_blocks_only_once():
+    cache = DiscoveryCache(base="http://127.0.0.1:9", wait_sec=0, timeout=0.5)
+    assert cache.resolve("crm") is None
+    start = time.perf_counter()
+    for _ in range(100):
+        cache.resolve("crm")
+    assert time.perf_counter() - start < 0.1
@@ -0,0 +1,68 @@
+"""
+治理中心批量上报单元测试：按条数/时间触发批量发送、队列满丢最旧、emit 不阻塞、ingest 接口接受数组。
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from platform_core.core.governance import app as governance_app_module
+from platform_core.core.governance.client import SpanExporter, create_emit_with_ingest
+from platform_core.core.governance.store import GovernanceStore
+
+
+def _span(i: int) -> dict:
+    return {"trace_id": f"t{i}", "span_id": "", "cell": "crm", "path": "/x", "status_code": 200, "duration_ms": i}
+
+
+def test_exporter_sends_by_size_and_time():
+    batches = []
+    exporter = SpanExporter(batch_max=10, flush_interval=0.1, send=lambda b: batches.append(b) or True)
+    for i in range(25):
+        exporter.submit(_span(i))
+    deadline = time.time() + 2
+    while sum(len(b) for b in batches) < 25 and time.time() < deadline:
+        time.sleep(0.01)
+    assert [len(b) for b in batches][:2] == [10, 10]
+    assert [s["trace_id"] for b in batches for s in b] == [f"t{i}" for i in range(25)]
+    assert exporter.stats()["sent"] == 25
+
+
+def test_exporter_drops_oldest_when_full():
+    release = threading.Event()
+    batches = []
+
+    def slow_send(batch):
+        release.wait(2)
+        batches.append(batch)
+        return True
+
+    exporter = SpanExporter(queue_max=5, batch_max=1000, flush_interval=60, send=slow_send)
+    for i in range(8):
+        exporter.submit(_span(i))
+    assert exporter.stats()["dropped"] == 3
+    release.set()
+    assert exporter.flush(2)
+    assert [s["trace_id"] for b in batches for s in b] == ["t3", "t4", "t5", "t6", "t7"]
+
+
+def test_emit_does_not_wait_for_governance():
+    exporter = SpanExporter(batch_max=100, flush_interval=60, send=lambda b: time.sleep(1) or True)
+    emit = create_emit_with_ingest(exporter=exporter)
+    start = time.perf_counter()
+    for i in range(200):
+        emit(f"t{i}", "crm", "/api/v1/crm/customers", 200, 3)
+    assert time.perf_counter() - start < 0.5
+
+
+def test_ingest_endpoint_accepts_array(monkeypatch):
+    store = GovernanceStore()
+    monkeypatch.setattr(governance_app_module, "_store", store)
+    client = governance_app_module.app.test_client()
+    spans = [_span(i) for i in range(300)] + [{"trace_id": "bad"}]
+    r = client.post("/api/governance/ingest", json=spans)
+    assert r.status_code == 200
+    assert r.get_json() == {"ok": True, "accepted": 300, "rejected": 1}
+    assert store.get_metrics("crm")["crm"]["request_total"] == 300
+    r = client.post("/api/governance/ingest", json=_span(1))
+    assert r.status_code == 200 and store.get_trace("t1")
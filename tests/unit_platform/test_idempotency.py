@@ -0,0 +1,88 @@
+"""
+网关幂等重放单元测试：重放与指纹冲突、失败不保存并由等待者接替、容量淘汰、经网关的重试与并发重复不再到达细胞。
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from platform_core.core.gateway import idempotency
+
+from .conftest import CellHandler
+
+
+def test_replay_and_fingerprint_mismatch():
+    cache = idempotency.IdempotencyCache(ttl_sec=60)
+    fp = idempotency.fingerprint("POST", "crm", "customers", b'{"name":"a"}')
+    state, ticket = cache.begin("t1", "r1", fp)
+    assert state == idempotency.OWNER
+    assert ticket.complete(201, {"Content-Type": "application/json", "X-Trace-Id": "x"}, b'{"id":1}')
+    state, (status, headers, body) = cache.begin("t1", "r1", fp)
+    assert state == idempotency.REPLAY and status == 201 and body == b'{"id":1}'
+    assert headers == {"Content-Type": "application/json"}  # 逐请求头不保存
+    other = idempotency.fingerprint("POST", "crm", "customers", b'{"name":"b"}')
+    assert cache.begin("t1", "r1", other)[0] == idempotency.MISMATCH
+    assert cache.begin("t2", "r1", other)[0] == idempotency.OWNER  # 按租户隔离
+    assert cache.stats()["replayed"] == 1
+
+
+def test_failure_not_stored_and_waiter_takes_over():
+    cache = idempotency.IdempotencyCache(ttl_sec=60)
+    _, ticket = cache.begin("t", "r", "fp")
+    assert cache.begin("t", "r", "fp", wait_sec=0)[0] == idempotency.BUSY
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.begin("t", "r", "fp", wait_sec=5)))
+    waiter.start()
+    assert not ticket.complete(503, {}, b"down")
+    waiter.join(5)
+    state, second = results[0]
+    assert state == idempotency.OWNER  # 执行者失败：等待者接替执行
+    second.release()
+    assert cache.stats()["inFlight"] == 0
+
+
+def test_capacity_bounded():
+    cache = idempotency.IdempotencyCache(ttl_sec=60, max_entries=2)
+    for rid in ("a", "b", "c"):
+        cache.begin("t", rid, "fp")[1].complete(200, {}, b"ok")
+    assert cache.stats()["entries"] == 2
+    assert cache.begin("t", "a", "fp", wait_sec=0)[0] == idempotency.OWNER
+
+
+@pytest.fixture
+def idem_client(make_gateway, monkeypatch):
+    monkeypatch.setattr(idempotency, "_default", idempotency.IdempotencyCache(ttl_sec=60))
+    return make_gateway(env={"GATEWAY_PROXY_RETRY_COUNT": 0}).test_client()
+
+
+def _post(client, request_id, tenant="acme", body=None, query=""):
+    headers = {"Authorization": "Bearer t", "X-Request-ID": request_id, "X-Tenant-Id": tenant,
+               "Content-Type": "application/json"}
+    with client.post(f"/api/v1/crm/customers{query}", json=body or {"name": "a"}, headers=headers) as r:
+        return r.status_code, dict(r.headers), r.get_json()
+
+
+def test_gateway_replays_retried_post(idem_client):
+    first = _post(idem_client, "idem-1")
+    retry = _post(idem_client, "idem-1")
+    assert CellHandler.hits == 1
+    assert retry[0] == first[0] == 200 and retry[2] == first[2]
+    assert retry[1].get("Idempotent-Replayed") == "true" and "Idempotent-Replayed" not in first[1]
+    assert retry[1]["X-Trace-Id"]  # 网关头按本次请求重新生成
+    _post(idem_client, "idem-1", tenant="globex")
+    assert CellHandler.hits == 2
+    assert _post(idem_client, "idem-1", body={"name": "b"})[0] == 422
+    _post(idem_client, "idem-5xx", query="?status=503")
+    _post(idem_client, "idem-5xx", query="?status=503")
+    assert CellHandler.hits == 4  # 5xx 不保存，重试重新执行
+
+
+def test_gateway_holds_concurrent_duplicates(idem_client):
+    CellHandler.delay_sec = 0.3
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: _post(idem_client, "idem-burst"), range(4)))
+    assert CellHandler.hits == 1
+    assert [r[0] for r in results] == [200] * 4
+    assert sum(r[1].get("Idempotent-Replayed") == "true" for r in results) == 3
@@ -0,0 +1,56 @@
+"""
+进程内细胞调度单元测试：多细胞独立挂载、解析器回退、经网关转发时签名/租户头与 HTTP 模式一致、流式导出。
+"""
+from __future__ import annotations
+
+import sys
+
+import pytest
+
+from platform_core.core.gateway import inprocess
+
+
+def test_cells_mounted_side_by_side():
+    dispatcher = inprocess.InProcessDispatcher("crm,erp")
+    assert dispatcher.mounted("crm") and not dispatcher.mounted("wms")
+    assert not inprocess.InProcessDispatcher("*").mounted("no-such-cell")
+    for cell in ("crm", "erp"):
+        status, headers, body = dispatcher.call(f"inproc://{cell}/health", "GET", None, {})
+        assert status == 200 and f'"cell":"{cell}"' in body.decode().replace(" ", "")
+        assert "Content-Length" not in headers
+    assert "_inproc_crm.app" in sys.modules and "_inproc_erp.app" in sys.modules
+    resolve = dispatcher.wrap_resolver(lambda c: f"http://{c}:8000")
+    assert resolve("crm") == "inproc://crm" and resolve("wms") == "http://wms:8000"
+
+
+@pytest.fixture
+def inproc_client(make_gateway, monkeypatch):
+    monkeypatch.setattr(inprocess, "_default", inprocess.InProcessDispatcher("crm"))
+    env = {"GATEWAY_SIGNING_SECRET": "s3cret", "CELL_SIGNING_SECRET": "s3cret", "CELL_VERIFY_SIGNATURE": 1}
+    return make_gateway(resolver=lambda c: None, env=env).test_client()
+
+
+def test_gateway_dispatches_in_process_with_signature(inproc_client, monkeypatch):
+    headers = {"Authorization": "Bearer t", "X-Request-ID": "inproc-1", "X-Tenant-Id": "t-inproc",
+               "Content-Type": "application/json"}
+    with inproc_client.post("/api/v1/crm/customers", json={"name": "进程内客户"}, headers=headers) as r:
+        assert r.status_code == 201
+        assert r.get_json()["tenantId"] == "t-inproc"
+    with inproc_client.get("/api/v1/crm/customers", headers={**headers, "X-Request-ID": "inproc-2"}) as r:
+        assert r.status_code == 200
+        assert [c["name"] for c in r.get_json()["data"]] == ["进程内客户"]
+    with inproc_client.get("/api/v1/crm/customers", headers={**headers, "X-Tenant-Id": "other"}) as r:
+        assert r.get_json()["data"] == []  # 租户隔离与 HTTP 模式一致
+    # 细胞侧验签同样生效：密钥不一致时返回 403
+    monkeypatch.setenv("CELL_SIGNING_SECRET", "other")
+    with inproc_client.get("/api/v1/crm/customers", headers=headers) as r:
+        assert r.status_code == 403 and r.get_json()["code"] == "SIGNATURE_INVALID"
+    with inproc_client.get("/api/v1/wms/inventory", headers=headers) as r:
+        assert r.status_code == 503  # 未挂载且未注册的细胞
+
+
+def test_gateway_streams_in_process_export(inproc_client):
+    headers = {"Authorization": "Bearer t", "X-Request-ID": "inproc-3", "X-Tenant-Id": "t-export"}
+    with inproc_client.get("/api/v1/crm/export/customers", headers=headers) as r:
+        assert r.status_code == 200
+        assert r.get_data()
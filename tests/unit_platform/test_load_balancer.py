@@ -0,0 +1,119 @@
+"""
+细胞多实例负载均衡单元测试：P2C/EWMA 选低延迟实例、连续失败与延迟离群摘除、摘除比例上限、注册中心多实例。
+"""
+from __future__ import annotations
+
+from platform_core.core.gateway import load_balancer
+from platform_core.core.gateway.load_balancer import LoadBalancer, split_urls
+from platform_core.core.governance.store import GovernanceStore
+from platform_core.core.registry.client import RegistryClient
+
+
+def _serve(lb: LoadBalancer, cell: str, urls, latency: dict, n: int, fail=()) -> dict:
+    counts = {u: 0 for u in split_urls(urls)}
+    for _ in range(n):
+        ep = lb.pick(cell, urls)
+        counts[ep.url] += 1
+        lb.on_result(ep, latency.get(ep.url, 5), success=ep.url not in fail)
+    return counts
+
+
+def test_split_urls():
+    assert split_urls("http://a:1/, http://b:2") == ["http://a:1", "http://b:2"]
+    assert split_urls(["http://a:1"]) == ["http://a:1"]
+    assert split_urls(None) == []
+
+
+def test_p2c_prefers_low_latency_and_few_outstanding():
+    lb = LoadBalancer()
+    urls = "http://fast,http://slow"
+    counts = _serve(lb, "crm", urls, {"http://fast": 5, "http://slow": 200}, 200)
+    assert counts["http://fast"] > 190
+    # 快实例在途请求堆积时分流到慢实例
+    held = [lb.pick("crm", "http://fast") for _ in range(60)]
+    assert lb.pick("crm", urls).url == "http://slow"
+    assert all(e.outstanding for e in held)
+
+
+def test_consecutive_errors_eject_and_max_percent(monkeypatch):
+    monkeypatch.setattr(load_balancer, "_BASE_EJECTION_SEC", 60.0)
+    lb = LoadBalancer()
+    urls = "http://a,http://b,http://c,http://d"
+    counts = _serve(lb, "erp", urls, {}, 400, fail={"http://a", "http://b", "http://c"})
+    ejected = [s["url"] for s in lb.stats()["erp"] if s["ejected"]]
+    assert len(ejected) == 2  # 最多摘除 50%
+    after = _serve(lb, "erp", urls, {}, 100)
+    assert all(after[u] == 0 for u in ejected)
+    assert sum(counts.values()) == 400
+
+
+def test_latency_outlier_ejected(monkeypatch):
+    monkeypatch.setattr(load_balancer, "_MIN_REQUESTS", 5)
+    lb = LoadBalancer()
+    urls = ["http://a", "http://b", "http://c"]
+    cb = lb.cell("wms")
+    cb._sync(urls)
+    slow = cb._endpoints["http://c"]
+    for ep in cb._endpoints.values():
+        for _ in range(5):
+            ep.begin()
+            cb.on_result(ep, 500 if ep is slow else 10, success=True)
+    assert [s["url"] for s in lb.stats()["wms"] if s["ejected"]] == ["http://c"]
+
+
+def test_single_instance_never_ejected():
+    lb = LoadBalancer()
+    _serve(lb, "oa", "http://only", {}, 20, fail={"http://only"})
+    assert lb.pick("oa", "http://only").url == "http://only"
+
+
+def test_registries_support_multiple_instances():
+    r = RegistryClient()
+    r.register("crm", "http://crm-1:8001/")
+    r.register("crm", "http://crm-2:8001")
+    assert r.resolve("crm") == "http://crm-1:8001,http://crm-2:8001"
+    r.deregister("crm", "http://crm-1:8001")
+    assert r.resolve("crm") == "http://crm-2:8001"
+
+    store = GovernanceStore()
+    store.register("crm", "http://crm-1:8001")
+    store.register("crm", "http://crm-2:8001")
+    v1, cells = store.snapshot()
+    assert cells == {"crm": "http://crm-1:8001,http://crm-2:8001"}
+    store.set_health("crm", False, base_url="http://crm-1:8001")
+    v2, cells = store.snapshot()
+    assert v2 > v1 and cells == {"crm": "http://crm-2:8001"}
+    assert store.get_health("crm") is True
+    assert store.list_cells()[0]["instances"][0]["healthy"] is False
+    store.deregister("crm", "http://crm-2:8001")
+    assert store.resolve("crm") is None and store.get_health("crm") is False
+    store.deregister("crm")
+    assert store.get_health("crm") is None
+
+
+def test_gateway_avoids_dead_instance(make_gateway, cell_base_url, monkeypatch):
+    monkeypatch.setattr(load_balancer, "_default", LoadBalancer())
+    dead = "http://127.0.0.1:1"
+    app = make_gateway(resolver=lambda c: f"{dead},{cell_base_url}", env={"GATEWAY_PROXY_RETRY_COUNT": 0})
+    client = app.test_client()
+    statuses = []
+    for _ in range(40):
+        with client.get("/api/v1/lbtest/items", headers={"Authorization": "Bearer t"}) as r:
+            statuses.append(r.status_code)
+    # 快速失败的实例计入惩罚延迟，之后不再被选中
+    assert statuses.count(502) <= 1 and statuses[-30:] == [200] * 30
+    stats = {s["url"]: s for s in load_balancer.get_load_balancer().stats()["lbtest"]}
+    assert stats[dead]["ewmaMs"] >= load_balancer._FAILURE_PENALTY_MS
+    assert stats[dead]["outstanding"] == 0 and stats[cell_base_url]["outstanding"] == 0
+
+
+def test_penalized_instance_recovers_after_decay(monkeypatch):
+    monkeypatch.setattr(load_balancer, "_DECAY_SEC", 0.01)
+    lb = LoadBalancer()
+    lb.cell("hrm")._sync(["http://a", "http://b"])
+    ep = lb.cell("hrm")._endpoints["http://a"]
+    ep.begin()
+    lb.on_result(ep, 5, success=False)
+    assert ep.ewma_ms >= load_balancer._FAILURE_PENALTY_MS
+    ep.updated_at -= 1.0  # 闲置 1 秒（>> 衰减时间常数）
+    assert ep.score(ep.updated_at + 1.0) == 1.0
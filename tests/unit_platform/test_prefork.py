@@ -0,0 +1,267 @@
+"""
+prefork 多进程网关单元测试：共享内存限流/熔断/舱壁/Token 跨进程生效、worker 名额回收、多 worker 全局限流、审计日志单写者。
+"""
+from __future__ import annotations
+
+import glob
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from platform_core.core.gateway import audit_log
+from platform_core.core.gateway import cache_policy
+from platform_core.core.gateway import idempotency
+from platform_core.core.gateway import rate_limit as gateway_rate_limit
+from platform_core.core.gateway import shared_state
+from platform_core.core.tenant import quota as tenant_quota
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork 仅支持 POSIX")
+
+_CTX = multiprocessing.get_context("fork")
+
+
+def _in_children(n, fn):
+    """在 n 个子进程中执行 fn(i)，返回各自的退出码。"""
+    procs = [_CTX.Process(target=lambda i=i: os._exit(fn(i))) for i in range(n)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+    return [p.exitcode for p in procs]
+
+
+def test_rate_limit_quota_is_global_across_processes():
+    backend = shared_state.SharedRateLimitBackend(slots=64)
+    # 4 个进程各尝试 30 次，额度 50/分钟：合计放行恰为 50
+    codes = _in_children(4, lambda i: sum(backend.acquire("ip:1.2.3.4", 50, 60.0) for _ in range(30)))
+    assert sum(codes) == 50
+    assert not backend.acquire("ip:1.2.3.4", 50, 60.0)
+    assert backend.acquire("ip:5.6.7.8", 50, 60.0)
+
+
+def test_rate_limit_evicts_within_bounded_sets():
+    backend = shared_state.SharedRateLimitBackend(slots=8)  # 单组 8 路
+    for i in range(100):
+        assert backend.acquire(f"k{i}", 1, 60.0, now=100.0)
+    assert not backend.acquire("k99", 1, 60.0, now=100.0)  # 最近写入者仍在表内
+
+
+def test_breaker_and_bulkhead_shared_between_workers(monkeypatch):
+    monkeypatch.setenv("GATEWAY_CB_MIN_CALLS", "2")
+    cells = shared_state.SharedCellTable(max_cells=4)
+    reg0 = shared_state.SharedCircuitBreakerRegistry(cells, worker=0)
+
+    def worker1(_):
+        reg1 = shared_state.SharedCircuitBreakerRegistry(cells, worker=1)
+        reg1.get("crm").record(False)
+        reg1.get("crm").record(False)
+        bh = reg1.bulkhead("crm")
+        return 0 if bh.try_acquire() and bh.try_acquire() else 1
+
+    breaker = reg0.get("crm")
+    assert breaker.allow_request()
+    assert _in_children(1, worker1) == [0]
+    assert breaker.state() == "open" and not breaker.allow_request()
+    bulkhead = reg0.bulkhead("crm")
+    assert bulkhead.in_flight == 2
+    bulkhead.release()  # worker 0 未持有名额，不影响 worker 1 的计数
+    assert bulkhead.in_flight == 2
+    cells.reap_worker(1)
+    assert bulkhead.in_flight == 0
+    assert reg0.get("erp").state() == "closed"
+
+
+def test_breaker_falls_back_when_slots_exhausted():
+    reg = shared_state.SharedCircuitBreakerRegistry(shared_state.SharedCellTable(max_cells=1))
+    assert isinstance(reg.get("a"), shared_state.SharedCircuitBreaker)
+    assert not isinstance(reg.get("b"), shared_state.SharedCircuitBreaker)
+
+
+def test_tenant_quota_is_global_across_processes():
+    usage = shared_state.SharedQuotaUsage(slots=64)
+    quota = tenant_quota.TenantQuota(usage=usage.for_worker(0))
+    quota.set_quota("t1", requests_per_min=50, max_concurrent=3)
+
+    def worker(i):
+        q = tenant_quota.TenantQuota(usage=usage.for_worker(i + 1))
+        q.set_quota("t1", requests_per_min=50, max_concurrent=3)
+        return sum(q.admit("t1", hold=False)[0] for _ in range(30))
+
+    # 4 个进程各尝试 30 次，额度 50/分钟：合计放行恰为 50
+    assert sum(_in_children(4, worker)) == 50
+    assert quota.admit("t1", hold=False)[1] == "QUOTA_EXCEEDED"
+
+
+def test_tenant_concurrency_shared_and_reaped():
+    usage = shared_state.SharedQuotaUsage(slots=64)
+    quota = tenant_quota.TenantQuota(usage=usage.for_worker(0))
+    quota.set_quota("t1", max_concurrent=2)
+
+    def worker1(_):
+        q = tenant_quota.TenantQuota(usage=usage.for_worker(1))
+        q.set_quota("t1", max_concurrent=2)
+        return 0 if q.admit("t1")[0] and q.admit("t1")[0] else 1  # 名额未归还即退出
+
+    assert _in_children(1, worker1) == [0]
+    assert quota.admit("t1")[1] == "CONCURRENCY_QUOTA_EXCEEDED"
+    assert quota.usage("t1")["inFlight"] == 2
+    usage.reap_worker(1)
+    ok, _, lease = quota.admit("t1")
+    assert ok and quota.usage("t1")["inFlight"] == 1
+    lease.release()
+    assert quota.usage("t1")["inFlight"] == 0
+
+
+def test_idempotency_replays_across_processes():
+    table = shared_state.SharedIdempotencyTable(slots=64, value_bytes=256)
+    cache = idempotency.IdempotencyCache(ttl_sec=60, shared=table.for_worker(0))
+    fp = idempotency.fingerprint("POST", "crm", "orders", b"{}")
+
+    def worker1(_):
+        c = idempotency.IdempotencyCache(ttl_sec=60, shared=table.for_worker(1))
+        state, ticket = c.begin("t1", "r-1", fp, 0)
+        return 0 if state == idempotency.OWNER and ticket.complete(201, {"X-Id": "9"}, b'{"id":9}') else 1
+
+    assert _in_children(1, worker1) == [0]
+    state, value = cache.begin("t1", "r-1", fp, 0)
+    assert state == idempotency.REPLAY and value == (201, {"X-Id": "9"}, b'{"id":9}')
+    assert cache.begin("t1", "r-1", idempotency.fingerprint("POST", "crm", "orders", b"[]"), 0)[0] == idempotency.MISMATCH
+
+
+def test_idempotency_claim_shared_and_reaped():
+    table = shared_state.SharedIdempotencyTable(slots=64, value_bytes=64)
+    cache = idempotency.IdempotencyCache(ttl_sec=60, shared=table.for_worker(0))
+    fp = idempotency.fingerprint("POST", "crm", "orders", b"{}")
+    assert _in_children(1, lambda i: 0 if table.for_worker(1).claim("t1|r-2", fp, 60)[0] == "owner" else 1) == [0]
+    assert cache.begin("t1", "r-2", fp, 0.05)[0] == idempotency.BUSY  # 执行者在其他 worker
+    table.reap_worker(1)  # 执行者 worker 退出后占位撤销
+    state, ticket = cache.begin("t1", "r-2", fp, 0)
+    assert state == idempotency.OWNER
+    assert ticket.complete(200, {}, b"x" * 100)  # 超过共享槽位：仅本 worker 保存
+    assert table.claim("t1|r-2", fp, 60)[0] == "owner"
+    assert cache.begin("t1", "r-2", fp, 0)[0] == idempotency.REPLAY
+
+
+def test_cache_generations_shared_across_processes(tmp_path):
+    (tmp_path / "crm").mkdir()
+    (tmp_path / "crm" / "api_contract.yaml").write_text(
+        "openapi: 3.0.3\npaths:\n  /items:\n    get:\n      x-cache: { ttlSec: 60, invalidateOn: [crm.item.*] }\n",
+        encoding="utf-8",
+    )
+    table = cache_policy.PolicyTable(str(tmp_path), generations=shared_state.SharedGenerationTable(slots=64))
+    _, items = table.resolve("crm", "items")
+    before = {t: table.scope(items, t) for t in ("t1", "t2")}
+    assert _in_children(1, lambda i: 0 if table.invalidate("crm.item.created", "t1") == 1 else 1) == [0]
+    assert table.scope(items, "t1") != before["t1"]  # 其他 worker 的失效在本进程可见
+    assert table.scope(items, "t2") == before["t2"]
+
+
+def test_cache_generation_monotonic_under_eviction():
+    gens = shared_state.SharedGenerationTable(slots=8)
+    seen = {}
+    for i in range(64):
+        key = "t|crm.item.created|t%d" % (i % 20)
+        prev = gens.get(key)
+        gens.bump(key)
+        assert gens.get(key) > prev  # 槽位被淘汰后代数也不回退
+        assert gens.get(key) > seen.get(key, -1)
+        seen[key] = gens.get(key)
+
+
+def test_audit_log_single_writer_keeps_chain(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_log, "_AUDIT_DIR", str(tmp_path))
+    monkeypatch.setattr(audit_log, "_AUDIT_FILE", str(tmp_path / "operation_audit.log"))
+    monkeypatch.setattr(audit_log, "_SEGMENT_MAX_BYTES", 20000)
+    monkeypatch.setattr(audit_log, "_writer", None)
+    monkeypatch.setattr(audit_log, "_shared_queue", None)
+    shared = audit_log.create_shared_queue()
+    audit_log.use_shared_queue(shared, consume=True)  # 本进程充当 master
+
+    def worker(i):
+        audit_log.use_shared_queue(shared)
+        for n in range(100):
+            audit_log.append("GET", "/api/v1/crm/items", 200, 1, trace_id=f"w{i}-{n}")
+        return 0 if audit_log.flush() else 1
+
+    assert _in_children(4, worker) == [0] * 4
+    assert audit_log.flush()
+    segments = sorted(glob.glob(str(tmp_path / "operation_audit.*.log"))) + [str(tmp_path / "operation_audit.log")]
+    assert len(segments) >= 2  # 只有一个写者执行滚动
+    prev, total = audit_log._GENESIS_HASH, 0
+    for path in segments:
+        assert audit_log.verify_chain(path, prev)[0]
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(x) for x in f if x.strip()]
+        prev, total = (lines[-1]["lineHash"] if lines else prev), total + len(lines)  # 刚滚动时活动段为空
+    assert total == 400
+
+def test_token_store_shared_and_logout_visible():
+    store = shared_state.SharedTokenStore(slots=64, value_bytes=128)
+    assert _in_children(1, lambda _: store.set("tok-1", {"username": "张三", "roles": ["admin"]}, 60) or 0) == [0]
+    assert store.get("tok-1") == {"username": "张三", "roles": ["admin"]}
+    assert _in_children(1, lambda _: store.delete("tok-1") or 0) == [0]
+    assert store.get("tok-1") is None
+    store.set("tok-2", {"u": "x"}, ttl_sec=-1)
+    assert store.get("tok-2") is None  # 已过期
+    store.set("tok-3", {"blob": "x" * 200}, 60)
+    assert store.get("tok-3") is None  # 超出单条上限不写入
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(port, path, headers=None):
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as r:
+            return r.status, json.loads(r.read() or b"{}"), r.headers
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b"{}"), e.headers
+
+
+def _run_master(port, workers):
+    from platform_core.core.gateway.app import create_app
+    from platform_core.core.gateway.prefork import PreforkServer
+
+    def build(breakers):
+        from flask import jsonify
+        app = create_app(circuit_breakers=breakers)
+        app.add_url_rule("/pid", "pid", lambda: jsonify({"pid": os.getpid()}))
+        return app
+
+    PreforkServer(build, "127.0.0.1", port, workers).serve_forever(poll_sec=0.05)
+
+
+def test_prefork_workers_share_global_rate_limit(monkeypatch):
+    monkeypatch.setattr(gateway_rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(gateway_rate_limit, "RATE_LIMIT_IP_PER_MIN", 6)
+    port = _free_port()
+    master = _CTX.Process(target=_run_master, args=(port, 2))
+    master.start()
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        # 每个请求新建连接，内核在两个 worker 间分发；额度按整个网关计算
+        results = [_get(port, "/pid", {"Connection": "close"}) for _ in range(10)]
+        statuses = [s for s, _, _ in results]
+        assert statuses.count(200) == 6 and statuses.count(429) == 4
+        pids = {body["pid"] for s, body, _ in results if s == 200}
+        assert master.pid not in pids
+    finally:
+        os.kill(master.pid, signal.SIGTERM)
+        master.join(15)
+    assert master.exitcode == 0
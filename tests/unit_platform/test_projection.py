@@ -0,0 +1,116 @@
+"""
+列表字段投影单元测试：fields 解析、点号路径与信封列表、非列表/已投影响应不处理、经网关转发时投影 gzip 列表响应。
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from platform_core.core.gateway import http_client as gateway_http_client
+from platform_core.core.gateway import projection
+from platform_core.core.gateway.cache_policy import CachePolicy
+from platform_core.core.gateway.get_cache import LRUTTLCache
+
+from .conftest import CellHandler
+
+_ROWS = [
+    {"id": 1, "name": "a", "secret": "x", "customer": {"name": "c1", "phone": "p1"}},
+    {"id": 2, "name": "b", "secret": "y", "customer": {"name": "c2", "phone": "p2"}},
+]
+
+
+def _json(doc, headers=None):
+    return 200, {"Content-Type": "application/json", **(headers or {})}, json.dumps(doc).encode("utf-8")
+
+
+def test_parse_fields():
+    assert projection.parse_fields("") is None
+    assert projection.parse_fields("page=1") is None
+    assert projection.parse_fields("fields=") is None
+    assert projection.parse_fields("fields=id,%20name,id&fields=customer.name") == ("id", "name", "customer.name")
+
+
+def test_project_envelope_and_dotted_paths():
+    status, headers, body = projection.apply(
+        _json({"data": _ROWS, "total": 2}, {"ETag": '"v1"'}), ("id", "customer.name", "missing"))
+    doc = json.loads(body)
+    assert doc == {"data": [{"id": 1, "customer": {"name": "c1"}}, {"id": 2, "customer": {"name": "c2"}}], "total": 2}
+    assert headers[projection.FIELDS_APPLIED_HEADER] == "id,customer.name,missing"
+    assert "ETag" not in headers  # 投影后 body 变化，上游 ETag 失效
+    assert json.loads(projection.apply(_json(_ROWS), ("name",))[2]) == [{"name": "a"}, {"name": "b"}]
+
+
+def test_passthrough_when_not_applicable():
+    single = _json({"id": 1, "name": "a"})
+    assert projection.apply(single, ("id",)) is single  # 单个对象不投影
+    applied = _json({"data": _ROWS}, {projection.FIELDS_APPLIED_HEADER: "id"})
+    assert projection.apply(applied, ("id",)) is applied  # 细胞已投影
+    error = (404, {"Content-Type": "application/json"}, b'{"data":[{"id":1,"x":2}]}')
+    assert projection.apply(error, ("id",)) is error
+    full = _json({"data": [{"id": 1}]})
+    assert projection.apply(full, ("id",)) is full  # 无字段剔除时不重新编码
+    assert projection.apply(_json({"data": _ROWS}), None)[2] == _json({"data": _ROWS})[2]
+
+
+class _ListCell(BaseHTTPRequestHandler):
+    """返回 gzip 压缩的列表信封。"""
+
+    def do_GET(self):
+        body = gzip.compress(json.dumps({"data": _ROWS, "total": 2}).encode("utf-8"))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def list_cell_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ListCell)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_gateway_projects_list_response(list_cell_url, make_gateway):
+    client = make_gateway(resolver=lambda c: list_cell_url).test_client()
+    headers = {"Authorization": "Bearer t", "X-Tenant-Id": "acme"}
+    with client.get("/api/v1/crm/customers?page=1&fields=id,name", headers=headers) as r:
+        assert r.status_code == 200
+        assert r.headers[projection.FIELDS_APPLIED_HEADER] == "id,name"
+        assert r.get_json() == {"data": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}], "total": 2}
+    with client.get("/api/v1/crm/customers?page=1", headers=headers) as r:
+        assert projection.FIELDS_APPLIED_HEADER not in r.headers
+        assert r.get_json()["data"][0]["secret"] == "x"
+
+
+def test_urllib_fallback_projects_and_honours_if_none_match(list_cell_url, cell_base_url, monkeypatch):
+    monkeypatch.setattr(gateway_http_client, "_get_pool", lambda: False)
+    monkeypatch.setattr(gateway_http_client, "_get_cache", LRUTTLCache(100, 0.0))
+    forward = gateway_http_client.forward_request
+    status, headers, body = forward(list_cell_url, "customers", "GET", None, {}, cell="crm",
+                                    query_string="page=1", fields=("id", "name"))
+    assert status == 200 and headers[projection.FIELDS_APPLIED_HEADER] == "id,name"
+    assert json.loads(body)["data"] == [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}]
+    etag = '"%s"' % hashlib.md5(b"/items").hexdigest()
+    assert forward(cell_base_url, "items", "GET", None, {}, cell="crm", query_string="etag=1",
+                   client_if_none_match=etag)[0] == 304  # 未启用缓存：透传给细胞
+    policy = CachePolicy(60)
+    for _ in range(2):
+        status, headers, _ = forward(cell_base_url, "items", "GET", None, {}, cell="crm", query_string="etag=1",
+                                     cache_policy=policy, cache_scope="t1")
+        assert status == 200
+    hits = CellHandler.hits
+    status, _, body = forward(cell_base_url, "items", "GET", None, {}, cell="crm", query_string="etag=1",
+                              cache_policy=policy, cache_scope="t1", client_if_none_match=headers["ETag"])
+    assert status == 304 and body == b"" and CellHandler.hits == hits  # 命中缓存直接 304
@@ -0,0 +1,56 @@
+"""
+网关限流单元测试：GCRA 突发与匀速恢复、key 表 LRU 上限、IP/Token/登录维度、可注入共享后端。
+"""
+from __future__ import annotations
+
+import pytest
+
+from platform_core.core.gateway import rate_limit
+from platform_core.core.gateway.rate_limit import MemoryRateLimitBackend
+
+
+def test_gcra_allows_burst_then_refills_evenly():
+    b = MemoryRateLimitBackend(stripes=4, max_keys=100)
+    assert all(b.acquire("k", 6, 60, now=0.0) for _ in range(6))
+    assert not b.acquire("k", 6, 60, now=0.0)
+    assert not b.acquire("k", 6, 60, now=9.9)
+    assert b.acquire("k", 6, 60, now=10.0)  # 每 10 秒恢复 1 次
+    assert not b.acquire("k", 6, 60, now=10.0)
+    assert all(b.acquire("k", 6, 60, now=200.0) for _ in range(6))
+
+
+def test_key_table_is_lru_bounded():
+    b = MemoryRateLimitBackend(stripes=1, max_keys=50)
+    for i in range(1000):
+        b.acquire(f"ip{i}", 10, 60, now=0.0)
+    assert len(b) == 50
+    assert not any(f"ip{i}" in b._stripes[0] for i in range(950))
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_IP_PER_MIN", 3)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TOKEN_PER_MIN", 2)
+    monkeypatch.setattr(rate_limit, "LOGIN_RATE_PER_IP_PER_MIN", 1)
+    shared = MemoryRateLimitBackend()
+    rate_limit.set_backend(shared)
+    yield shared
+    rate_limit.set_backend(None)
+
+
+def test_allow_request_ip_and_token(limiter):
+    assert rate_limit.allow_request("1.1.1.1", "tk") == (True, "")
+    assert rate_limit.allow_request("1.1.1.1", "tk") == (True, "")
+    assert rate_limit.allow_request("1.1.1.1", "tk") == (False, "RATE_LIMIT_TOKEN")
+    assert rate_limit.allow_request("1.1.1.1", None) == (False, "RATE_LIMIT_IP")
+    assert rate_limit.allow_request("2.2.2.2", None) == (True, "")
+    assert rate_limit.allow_login("3.3.3.3") == (True, "")
+    assert rate_limit.allow_login("3.3.3.3") == (False, "LOGIN_RATE_LIMIT")
+
+
+def test_backend_is_shared_across_callers(limiter):
+    """多个网关 worker 注入同一后端时共享同一额度。"""
+    for _ in range(3):
+        assert limiter.acquire("ip:9.9.9.9", 3, 60)
+    assert rate_limit.allow_request("9.9.9.9", None) == (False, "RATE_LIMIT_IP")
@@ -0,0 +1,151 @@
+"""
+网关重试策略单元测试：非幂等方法不因 503 重试、细胞/全局重试预算封顶、GET 对冲避开慢请求且首个请求在请求线程内执行、按路由规则覆盖。
+"""
+from __future__ import annotations
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from platform_core.core.gateway import http_client, retry_policy
+from platform_core.core.gateway.retry_policy import LatencyTracker, RetryBudget
+
+
+class _Upstream(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    status = 503
+    slow_first_sec = 0.0
+    hits = 0
+    _lock = threading.Lock()
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        with _Upstream._lock:
+            _Upstream.hits += 1
+            first = _Upstream.hits == 1
+        if first and self.slow_first_sec:
+            time.sleep(self.slow_first_sec)
+        body = b'{"ok": true}'
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    if http_client._get_pool() is False:
+        pytest.skip("urllib3 not installed")
+    monkeypatch.setattr(retry_policy, "_BACKOFF_BASE_SEC", 0.0)
+    monkeypatch.setattr(_Upstream, "status", 503)
+    monkeypatch.setattr(_Upstream, "slow_first_sec", 0.0)
+    monkeypatch.setattr(_Upstream, "hits", 0)
+    retry_policy._budgets.clear()
+    retry_policy._latencies.clear()
+    monkeypatch.setattr(retry_policy, "_global_budget", RetryBudget(min_per_sec=100.0))
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Upstream)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_post_not_retried_on_503(upstream):
+    status, _, _ = http_client.forward_request(upstream, "orders", "POST", b"{}", {}, max_retries=2, cell="erp")
+    assert status == 503 and _Upstream.hits == 1
+    status, _, _ = http_client.forward_request(upstream, "orders", "GET", None, {}, max_retries=2, cell="erp",
+                                               use_cache=False)
+    assert status == 503 and _Upstream.hits == 4
+
+
+def test_retry_budget_caps_retries(upstream):
+    retry_policy._budgets["crm"] = RetryBudget(ratio=0.0, min_per_sec=0.0)
+    retry_policy._latencies["crm"] = LatencyTracker()
+    for _ in range(20):
+        http_client.forward_request(upstream, "customers", "GET", None, {}, max_retries=2, cell="crm", use_cache=False)
+    # 20 次请求 + 预算上限 10 次重试（无预算时为 20 + 40）
+    assert _Upstream.hits == 30
+    assert retry_policy.stats()["budgets"]["crm"]["exhausted"] > 0
+
+
+def test_global_budget_caps_retries_across_cells(upstream, monkeypatch):
+    monkeypatch.setattr(retry_policy, "_global_budget", RetryBudget(ratio=0.0, min_per_sec=0.0))
+    for cell in ("crm", "erp"):
+        for _ in range(10):
+            http_client.forward_request(upstream, "items", "GET", None, {}, max_retries=2, cell=cell, use_cache=False)
+    # 20 次请求 + 全局预算上限 10 次重试（每个细胞各自仍有 10 个令牌）
+    assert _Upstream.hits == 30
+    assert retry_policy.stats()["global"]["exhausted"] > 0
+
+
+def test_hedge_wins_over_slow_primary(upstream, monkeypatch):
+    monkeypatch.setattr(_Upstream, "status", 200)
+    monkeypatch.setattr(_Upstream, "slow_first_sec", 1.0)
+    monkeypatch.setattr(retry_policy, "_HEDGE_MIN_DELAY_MS", 20.0)
+    budget, latency = retry_policy._for_cell("wms")
+    for _ in range(retry_policy._HEDGE_MIN_SAMPLES):
+        latency.record(5.0)
+    wins = retry_policy.stats()["hedgeWins"]
+    start = time.perf_counter()
+    status, _, body = http_client.forward_request(upstream, "stock", "GET", None, {}, cell="wms", use_cache=False)
+    assert status == 200 and body == b'{"ok": true}'
+    assert time.perf_counter() - start < 0.5
+    assert retry_policy.stats()["hedgeWins"] == wins + 1
+
+
+def test_fast_hedgeable_get_stays_on_request_thread(upstream, monkeypatch):
+    monkeypatch.setattr(_Upstream, "status", 200)
+    _, latency = retry_policy._for_cell("scm")
+    for _ in range(retry_policy._HEDGE_MIN_SAMPLES):
+        latency.record(5000.0)
+    readers = []
+    finish = http_client._SentAttempt.finish
+
+    def traced(self):
+        readers.append(threading.current_thread())
+        return finish(self)
+
+    monkeypatch.setattr(http_client._SentAttempt, "finish", traced)
+    hedges = retry_policy.stats()["hedges"]
+    for _ in range(3):
+        status, _, _ = http_client.forward_request(upstream, "items", "GET", None, {}, cell="scm", use_cache=False)
+        assert status == 200
+    assert readers == [threading.current_thread()] * 3
+    assert retry_policy.stats()["hedges"] == hedges
+
+
+def test_route_rules_and_connect_errors(monkeypatch):
+    monkeypatch.setattr(retry_policy, "_RULES", [
+        {"cell": "erp", "path": "/orders/", "methods": ["GET"], "maxRetries": 0, "hedge": False},
+        {"cell": "erp", "path": "payments/", "methods": ["POST"], "idempotent": True},
+    ])
+    p = retry_policy.policy_for("GET", "erp", "orders/1", 2)
+    assert p.max_retries == 0 and not p.hedge
+    assert retry_policy.policy_for("POST", "erp", "payments/1", 2).idempotent
+    assert not retry_policy.policy_for("POST", "erp", "orders/1", 2).idempotent
+    assert retry_policy.policy_for("GET", "crm", "orders/1", 2).max_retries == 2
+    assert retry_policy.is_connect_error(ConnectionRefusedError())
+    assert not retry_policy.is_connect_error(ConnectionResetError())
+
+
+def test_gateway_urllib_fallback_uses_retry_policy(upstream, make_gateway, monkeypatch):
+    monkeypatch.setattr(http_client, "_get_pool", lambda: False)
+    client = make_gateway(resolver=lambda c: upstream).test_client()
+    headers = {"Authorization": "Bearer t", "X-Tenant-Id": "acme", "X-Request-ID": "fallback-1"}
+    with client.post("/api/v1/erp/orders", json={}, headers=headers) as r:
+        assert r.status_code == 503
+    assert _Upstream.hits == 1  # 非幂等 POST 不因 503 重试
+    with client.get("/api/v1/erp/orders", headers=headers) as r:
+        assert r.status_code == 503
+    assert _Upstream.hits == 4
@@ -76,3 +76,36 @@ def test_tenant_quota_set_and_exceed():
     assert ok2 is True
     assert ok3 is False
     assert "QUOTA" in reason or "quota" in reason.lower()
+
+
+def test_tenant_quota_concurrency_lease_and_one_pass():
+    quota = TenantQuota()
+    quota.set_quota("t2", requests_per_min=100, max_concurrent=1)
+    ok, _, lease = quota.admit("t2")
+    assert ok and quota.usage("t2")["inFlight"] == 1
+    ok, reason, _ = quota.admit("t2")
+    assert not ok and reason == "CONCURRENCY_QUOTA_EXCEEDED"
+    assert quota.allow_request("t2")[0] is True  # 不占并发名额的判定不受影响
+    lease.release()
+    lease.release()  # 幂等
+    assert quota.usage("t2")["inFlight"] == 0
+    # 并发被拒时不扣减请求量：额度 2，第一次被拒后仍可放行 2 次
+    quota.set_quota("t3", requests_per_min=2, max_concurrent=1)
+    _, _, held = quota.admit("t3")
+    assert quota.admit("t3")[1] == "CONCURRENCY_QUOTA_EXCEEDED"
+    held.release()
+    assert quota.admit("t3")[0] is True and quota.admit("t3", hold=False)[1] == "QUOTA_EXCEEDED"
+
+
+def test_tenant_quota_request_and_response_bytes():
+    quota = TenantQuota()
+    quota.set_quota("t4", request_bytes_per_min=1000, response_bytes_per_min=1000)
+    assert quota.admit("t4", request_bytes=600)[0] is True
+    ok, reason, _ = quota.admit("t4", request_bytes=600)
+    assert not ok and reason == "REQUEST_BYTES_QUOTA_EXCEEDED"
+    ok, _, lease = quota.admit("t4", request_bytes=100)
+    lease.response_bytes = 5000  # 响应后记账，可透支
+    lease.release()
+    ok, reason, _ = quota.admit("t4")
+    assert not ok and reason == "RESPONSE_BYTES_QUOTA_EXCEEDED"
+    assert quota.admit("other")[0] is True
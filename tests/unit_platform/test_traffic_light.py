@@ -0,0 +1,87 @@
+"""
+红绿灯与自适应并发限制单元测试：梯度收缩/扩张、失败乘性收缩、后台采样信号驱动红灯、proxy 降载。
+"""
+from __future__ import annotations
+
+from platform_core.core.gateway import traffic_light
+from platform_core.core.gateway.traffic_light import AdaptiveLimiter, HostSampler
+
+
+def _saturate(limiter: AdaptiveLimiter) -> None:
+    while limiter.try_acquire():
+        pass
+
+
+def test_limiter_shrinks_when_latency_rises():
+    lim = AdaptiveLimiter("crm", initial=100, min_limit=5, max_limit=500)
+    for _ in range(20):
+        lim.on_sample(10)
+    before = lim.limit
+    for _ in range(50):
+        lim.on_sample(200)
+    assert lim.limit < before * 0.6
+
+
+def test_limiter_grows_only_when_utilized():
+    lim = AdaptiveLimiter("crm", initial=20, min_limit=5, max_limit=500)
+    for _ in range(30):
+        lim.on_sample(10)
+    assert lim.limit == 20  # 未被利用的额度不扩张
+    _saturate(lim)
+    for _ in range(30):
+        lim.on_sample(10)
+    assert lim.limit > 20
+
+
+def test_limiter_backoff_on_drop_and_bounds():
+    lim = AdaptiveLimiter("crm", initial=100, min_limit=10, max_limit=500)
+    lim.on_sample(10, dropped=True)
+    assert lim.limit == 90
+    for _ in range(100):
+        lim.on_sample(10, dropped=True)
+    assert lim.limit == 10
+    _saturate(lim)
+    assert lim.in_flight == 10 and not lim.try_acquire()
+    lim.release()
+    assert lim.try_acquire()
+
+
+def test_sampler_signals_drive_red_light(monkeypatch):
+    calls = []
+    sampler = HostSampler(interval_sec=60)
+    sampler.register_signal("cpu", lambda: calls.append(1) or 10.0)
+    sampler.register_signal("audit_queue", lambda: 0.99)
+    monkeypatch.setattr(traffic_light, "_sampler", sampler)
+    assert traffic_light.is_red_light()
+    for _ in range(100):
+        traffic_light.is_red_light()
+    assert len(calls) == 1  # 请求路径只读采样值
+    sampler.register_signal("audit_queue", lambda: 0.2)
+    sampler.sample_once()
+    assert not traffic_light.is_red_light()
+
+
+def test_proxy_sheds_load_when_limit_reached(make_gateway):
+    app = make_gateway()
+    lim = traffic_light.get_limiter("crm")
+    _saturate(lim)
+    with app.test_client().get("/api/v1/crm/customers", headers={"Authorization": "Bearer t"}) as r:
+        assert r.status_code == 503 and r.get_json()["code"] == "OVERLOADED"
+    saturated = lim.in_flight
+    lim.release()
+    with app.test_client().get("/api/v1/crm/customers", headers={"Authorization": "Bearer t"}) as r:
+        assert r.status_code == 200
+    assert lim.in_flight == saturated - 1  # 响应关闭后归还名额
+
+
+def test_gateway_registers_only_global_signals(monkeypatch):
+    sampler = HostSampler(interval_sec=60)
+    monkeypatch.setattr(traffic_light, "_sampler", sampler)
+    from platform_core.core.gateway.app import create_app
+    create_app()
+    # 上游连接池按细胞饱和，不作为全局写请求降级信号
+    assert set(sampler._signals) == {"cpu", "audit_queue"}
+    monkeypatch.setattr(traffic_light, "TRAFFIC_LIGHT_ENABLED", False)
+    sampler.register_signal("audit_queue", lambda: 1.0)
+    sampler.sample_once()
+    assert not traffic_light.is_red_light()